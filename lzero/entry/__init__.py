@@ -3,6 +3,7 @@ from .eval_muzero import eval_muzero
 from .eval_muzero_with_gym_env import eval_muzero_with_gym_env
 from .train_alphazero import train_alphazero
 from .train_muzero import train_muzero
+from .train_muzero_async import train_muzero_async
 from .train_muzero_with_gym_env import train_muzero_with_gym_env
 from .train_muzero_with_gym_env import train_muzero_with_gym_env
 from .train_muzero_with_reward_model import train_muzero_with_reward_model
@@ -0,0 +1,46 @@
+import logging
+import re
+from copy import deepcopy
+
+import pytest
+import torch.multiprocessing as mp
+
+from lzero.entry import train_muzero_async
+from zoo.board_games.tictactoe.config.tictactoe_muzero_bot_mode_config import main_config, create_config
+
+
+@pytest.mark.unittest
+@pytest.mark.parametrize('use_inference_server', [False, True])
+def test_train_muzero_async(tmp_path, caplog, use_inference_server):
+    cfg, create_cfg = deepcopy(main_config), deepcopy(create_config)
+    cfg.exp_name = str(tmp_path / 'tictactoe_muzero_async')
+    cfg.env.collector_env_num = 2
+    cfg.env.evaluator_env_num = 1
+    cfg.env.n_evaluator_episode = 1
+    cfg.policy.collector_env_num = 2
+    cfg.policy.evaluator_env_num = 1
+    cfg.policy.n_episode = 2
+    cfg.policy.num_simulations = 4
+    cfg.policy.batch_size = 8
+    cfg.policy.update_per_collect = 5
+    cfg.policy.eval_freq = int(1e4)
+    cfg.policy.cuda = False
+
+    caplog.set_level(logging.INFO)
+    policy = train_muzero_async(
+        [cfg, create_cfg],
+        seed=0,
+        max_train_iter=30,
+        num_collectors=1,
+        weight_sync_freq=5,
+        use_inference_server=use_inference_server
+    )
+    assert policy is not None
+    # The collector loads the weights broadcast by the learner, so that the later data is collected with newer ones.
+    versions = [
+        int(v) for match in re.findall(r'weight_version \[([\d, ]+)\]', caplog.text) for v in match.split(',')
+    ]
+    assert versions[0] == 0 and max(versions) >= 5
+    assert versions == sorted(versions)
+    # The collector process is stopped and joined.
+    assert not [p for p in mp.active_children() if p.name.startswith('collector')]
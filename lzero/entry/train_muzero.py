@@ -13,7 +13,9 @@ from ding.utils import set_pkg_seed, get_rank
 from ding.worker import BaseLearner
 from tensorboardX import SummaryWriter
 
-from lzero.entry.utils import log_buffer_memory_usage, log_buffer_run_time
+from lzero.entry.utils import log_buffer_memory_usage, log_buffer_run_time, log_prefetch_sampler_metrics, \
+    log_reanalyze_worker_metrics
+from lzero.mcts import PrefetchSampler, ReanalyzeWorkerPool
 from lzero.policy import visit_count_temperature
 from lzero.policy.random_policy import LightZeroRandomPolicy
 from lzero.worker import MuZeroCollector as Collector
@@ -68,6 +70,8 @@ def train_muzero(
     else:
         cfg.policy.device = 'cpu'
 
+    # The experiment directory of the config, before ``compile_config`` suffixes it with the time when it exists.
+    base_exp_name = cfg.get('exp_name', 'default_experiment')
     cfg = compile_config(cfg, seed=seed, env=None, auto=True, create_cfg=create_cfg, save_cfg=True)
     # Create main components: env, policy
     env_fn, collector_env_cfg, evaluator_env_cfg = get_vec_env_setting(cfg.env)
@@ -98,6 +102,13 @@ def train_muzero(
     batch_size = policy_config.batch_size
     # specific game buffer for MCTS+RL algorithms
     replay_buffer = GameBuffer(policy_config)
+    if policy_config.get('disk_replay_buffer', False):
+        # Keep the game segments on the disk, the ones stored in the directory by a previous run of the same config
+        # are reloaded.
+        replay_buffer.open_disk_storage(
+            policy_config.get('disk_replay_buffer_dir') or os.path.join('./{}'.format(base_exp_name), 'replay_buffer'),
+            policy_config.get('disk_replay_buffer_shard_size', 64)
+        )
     collector = Collector(
         env=collector_env,
         policy=policy.collect_mode,
@@ -134,6 +145,27 @@ def train_muzero(
         eval_train_iter_list = []
         eval_train_envstep_list = []
 
+    # Prepare the next minibatches in background threads, so that the learner does not wait for the sampling.
+    sampler = None
+    if policy_config.get('prefetch_batch_num', 0) > 0:
+        sampler = PrefetchSampler(
+            replay_buffer, policy, batch_size, policy_config.prefetch_batch_num, policy_config.get('prefetch_worker_num', 1),
+            policy_config.target_update_freq
+        )
+        sampler.start()
+    # Reanalyze the stored game segments in background threads, instead of the sampled minibatches.
+    reanalyze_pool = None
+    if policy_config.get('reanalyze_worker_num', 0) > 0 and not ReanalyzeWorkerPool.is_supported(replay_buffer):
+        logging.warning(
+            f'{type(replay_buffer).__name__} reanalyzes the sampled minibatches itself, '
+            f'reanalyze_worker_num={policy_config.reanalyze_worker_num} is ignored.'
+        )
+    elif policy_config.get('reanalyze_worker_num', 0) > 0:
+        reanalyze_pool = ReanalyzeWorkerPool(
+            replay_buffer, policy, policy_config.reanalyze_worker_num, policy_config.target_update_freq
+        )
+        reanalyze_pool.start()
+
     # Evaluate the random agent
     stop, reward = evaluator.eval(learner.save_checkpoint, learner.train_iter, collector.envstep)
 
@@ -168,6 +200,7 @@ def train_muzero(
                 eval_train_envstep_list.append(collector.envstep)
             else:
                 stop, reward = evaluator.eval(learner.save_checkpoint, learner.train_iter, collector.envstep)
+                replay_buffer.save_disk_priorities()
                 if stop:
                     break
 
@@ -186,7 +219,7 @@ def train_muzero(
         for i in range(update_per_collect):
             # Learner will train ``update_per_collect`` times in one iteration.
             if replay_buffer.get_num_of_transitions() > batch_size:
-                train_data = replay_buffer.sample(batch_size, policy)
+                train_data = sampler.sample() if sampler is not None else replay_buffer.sample(batch_size, policy)
             else:
                 logging.warning(
                     f'The data in replay_buffer is not sufficient to sample a mini-batch: '
@@ -201,6 +234,15 @@ def train_muzero(
 
             if cfg.policy.use_priority:
                 replay_buffer.update_priority(train_data, log_vars[0]['value_priority_orig'])
+            if sampler is not None:
+                sampler.sync_target_model(learner.train_iter)
+            if reanalyze_pool is not None:
+                reanalyze_pool.sync_target_model(learner.train_iter)
+
+        if sampler is not None:
+            log_prefetch_sampler_metrics(learner.train_iter, sampler, tb_logger)
+        if reanalyze_pool is not None:
+            log_reanalyze_worker_metrics(learner.train_iter, reanalyze_pool, tb_logger)
 
         if collector.envstep >= max_env_step or learner.train_iter >= max_train_iter:
             if cfg.policy.eval_offline:
@@ -218,6 +260,11 @@ def train_muzero(
                 logging.info(f'eval offline finished!')
             break
 
+    if sampler is not None:
+        sampler.close()
+    if reanalyze_pool is not None:
+        reanalyze_pool.close()
+    replay_buffer.flush_disk_storage()
     # Learner's after_run hook.
     learner.call_hook('after_run')
     return policy
@@ -0,0 +1,429 @@
+import copy
+import logging
+import os
+import queue
+import time
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+from ding.config import compile_config
+from ding.envs import create_env_manager
+from ding.envs import get_vec_env_setting
+from ding.policy import create_policy
+from ding.rl_utils import get_epsilon_greedy_fn
+from ding.utils import set_pkg_seed, get_rank
+from ding.worker import BaseLearner
+from easydict import EasyDict
+from tensorboardX import SummaryWriter
+
+from lzero.entry.utils import log_buffer_memory_usage, log_buffer_run_time
+from lzero.policy import visit_count_temperature
+from lzero.policy.random_policy import LightZeroRandomPolicy
+from lzero.worker import MuZeroCollector as Collector
+from lzero.worker import MuZeroEvaluator as Evaluator
+from lzero.worker import InferenceClient, InferenceServer, use_inference_client
+
+
+def _collector_worker(
+        rank: int,
+        cfg: EasyDict,
+        env_fn: Callable,
+        collector_env_cfg: List[dict],
+        model: Optional[torch.nn.Module],
+        shared_state: Dict[str, torch.Tensor],
+        weight_version: 'mp.Value',  # noqa
+        weight_lock: 'mp.Lock',  # noqa
+        data_queue: 'mp.Queue',  # noqa
+        stop_event: 'mp.Event',  # noqa
+        inference_client: Optional[InferenceClient] = None,
+) -> None:
+    """
+    Overview:
+        The loop of a collector process. It plays self-play episodes with the latest weights broadcast by the learner \
+        and publishes the collected game segments to ``data_queue`` as ``(rank, new_data, envstep, weight_version)``.
+    Arguments:
+        - rank (:obj:`int`): The rank of the collector, which offsets the seed of its envs.
+        - cfg (:obj:`EasyDict`): The compiled config.
+        - env_fn (:obj:`Callable`): The env class returned by ``get_vec_env_setting``.
+        - collector_env_cfg (:obj:`List[dict]`): The configs of the collector envs.
+        - model (:obj:`Optional[torch.nn.Module]`): Instance of torch.nn.Module passed to ``train_muzero_async``.
+        - shared_state (:obj:`Dict[str, torch.Tensor]`): The state_dict of the collect model in shared memory.
+        - weight_version (:obj:`mp.Value`): The train_iter of the weights in ``shared_state``.
+        - weight_lock (:obj:`mp.Lock`): The lock of ``shared_state``.
+        - data_queue (:obj:`mp.Queue`): The queue of the collected data.
+        - stop_event (:obj:`mp.Event`): Set by the learner when the training ends.
+        - inference_client (:obj:`Optional[InferenceClient]`): The client of the inference server of the learner, \
+            which replaces the collect model. The weights are then updated by the learner on the server.
+    """
+    policy_config = cfg.policy
+    # The learner owns the device, the self-play of the collectors runs on CPU.
+    policy_config.cuda = False
+    policy_config.device = 'cpu'
+    torch.set_num_threads(1)
+    collector_env = create_env_manager(cfg.env.manager, [partial(env_fn, cfg=c) for c in collector_env_cfg])
+    collector_env.seed(cfg.seed + rank * len(collector_env_cfg))
+    set_pkg_seed(cfg.seed + rank, use_cuda=False)
+
+    # The collect mode of the MuZero-family policies uses the value transforms initialized by the learn mode.
+    policy = create_policy(policy_config, model=model, enable_field=['learn', 'collect'])
+    if inference_client is not None:
+        use_inference_client(policy, inference_client, enable_field=['collect'])
+    collector = Collector(
+        env=collector_env,
+        policy=policy.collect_mode,
+        exp_name=cfg.exp_name,
+        instance_name='collector{}'.format(rank),
+        policy_config=policy_config
+    )
+
+    def publish(new_data, envstep: int, version: int) -> bool:
+        # Block while the learner is behind, so that the staleness of the data is bounded by the queue size.
+        while not stop_event.is_set():
+            try:
+                data_queue.put((rank, new_data, envstep, version), timeout=1.)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    if rank == 0 and policy_config.random_collect_episode_num > 0:
+        random_policy = LightZeroRandomPolicy(cfg=policy_config, action_space=collector_env.env_ref.action_space)
+        collector.reset_policy(random_policy.collect_mode)
+        new_data = collector.collect(
+            n_episode=policy_config.random_collect_episode_num,
+            train_iter=0,
+            policy_kwargs={
+                'temperature': 1,
+                'epsilon': 0.0
+            }
+        )
+        publish(new_data, collector.envstep, 0)
+        collector.reset_policy(policy.collect_mode)
+
+    if policy_config.eps.eps_greedy_exploration_in_collect:
+        epsilon_greedy_fn = get_epsilon_greedy_fn(
+            start=policy_config.eps.start,
+            end=policy_config.eps.end,
+            decay=policy_config.eps.decay,
+            type_=policy_config.eps.type
+        )
+    local_version = -1
+    while not stop_event.is_set():
+        # Load the latest weights broadcast by the learner.
+        if weight_version.value != local_version:
+            with weight_lock:
+                if inference_client is None:
+                    policy.collect_mode.load_state_dict({'model': shared_state})
+                local_version = weight_version.value
+        collect_kwargs = {
+            'temperature': visit_count_temperature(
+                policy_config.manual_temperature_decay,
+                policy_config.fixed_temperature_value,
+                policy_config.threshold_training_steps_for_final_temperature,
+                trained_steps=local_version
+            ),
+            'epsilon': epsilon_greedy_fn(collector.envstep)
+            if policy_config.eps.eps_greedy_exploration_in_collect else 0.0
+        }
+        new_data = collector.collect(train_iter=local_version, policy_kwargs=collect_kwargs)
+        if not publish(new_data, collector.envstep, local_version):
+            break
+    collector.close()
+
+
+def train_muzero_async(
+        input_cfg: Tuple[dict, dict],
+        seed: int = 0,
+        model: Optional[torch.nn.Module] = None,
+        model_path: Optional[str] = None,
+        max_train_iter: Optional[int] = int(1e10),
+        max_env_step: Optional[int] = int(1e10),
+        num_collectors: int = 2,
+        weight_sync_freq: int = 10,
+        max_queue_size: Optional[int] = None,
+        use_inference_server: bool = False,
+        inference_max_batch_size: int = 256,
+        inference_max_latency: float = 0.002,
+) -> 'Policy':  # noqa
+    """
+    Overview:
+        The asynchronous train entry for MCTS+RL algorithms, which supports the same algorithms as ``train_muzero``. \
+        Unlike ``train_muzero``, which alternates between collecting and training, ``num_collectors`` collector \
+        processes play self-play episodes continuously and publish the collected game segments to the replay buffer \
+        of the learner, while the learner trains continuously and broadcasts its weights to the collectors every \
+        ``weight_sync_freq`` train iterations. The staleness of the collected data is logged to TensorBoard.
+    Arguments:
+        - input_cfg (:obj:`Tuple[dict, dict]`): Config in dict type.
+            ``Tuple[dict, dict]`` type means [user_config, create_cfg].
+        - seed (:obj:`int`): Random seed.
+        - model (:obj:`Optional[torch.nn.Module]`): Instance of torch.nn.Module.
+        - model_path (:obj:`Optional[str]`): The pretrained model path, which should
+            point to the ckpt file of the pretrained model, and an absolute path is recommended.
+            In LightZero, the path is usually something like ``exp_name/ckpt/ckpt_best.pth.tar``.
+        - max_train_iter (:obj:`Optional[int]`): Maximum policy update iterations in training.
+        - max_env_step (:obj:`Optional[int]`): Maximum collected environment interaction steps.
+        - num_collectors (:obj:`int`): The number of collector processes, each with ``collector_env_num`` envs.
+        - weight_sync_freq (:obj:`int`): The number of train iterations between two broadcasts of the weights.
+        - max_queue_size (:obj:`Optional[int]`): The maximum number of collected batches waiting for the learner, \
+            defaults to ``2 * num_collectors``. A full queue blocks the collectors, which bounds the staleness.
+        - use_inference_server (:obj:`bool`): Whether the collectors run their inference on one copy of the collect \
+            model on the device of the learner, through an ``InferenceServer`` which batches the requests of all \
+            the collectors, instead of a copy of the model on CPU in each collector.
+        - inference_max_batch_size (:obj:`int`): The ``max_batch_size`` of the inference server.
+        - inference_max_latency (:obj:`float`): The ``max_latency`` in seconds of the inference server.
+    Returns:
+        - policy (:obj:`Policy`): Converged policy.
+
+    .. note::
+        As in ``train_muzero``, the learner trains ``update_per_collect`` times (or ``replay_ratio`` times the number \
+        of the collected transitions) for every batch of collected data, so that the data is reused as often as in \
+        the synchronous entry, but the training of a batch overlaps the collection of the next ones.
+    """
+    cfg, create_cfg = input_cfg
+    assert create_cfg.policy.type in ['efficientzero', 'muzero', 'muzero_context', 'muzero_rnn_full_obs', 'sampled_efficientzero', 'sampled_muzero', 'gumbel_muzero', 'stochastic_muzero'], \
+        "train_muzero_async entry now only support the following algo.: 'efficientzero', 'muzero', 'sampled_efficientzero', 'gumbel_muzero', 'stochastic_muzero'"
+
+    if create_cfg.policy.type in ['muzero', 'muzero_context', 'muzero_rnn_full_obs']:
+        from lzero.mcts import MuZeroGameBuffer as GameBuffer
+    elif create_cfg.policy.type == 'efficientzero':
+        from lzero.mcts import EfficientZeroGameBuffer as GameBuffer
+    elif create_cfg.policy.type == 'sampled_efficientzero':
+        from lzero.mcts import SampledEfficientZeroGameBuffer as GameBuffer
+    elif create_cfg.policy.type == 'sampled_muzero':
+        from lzero.mcts import SampledMuZeroGameBuffer as GameBuffer
+    elif create_cfg.policy.type == 'gumbel_muzero':
+        from lzero.mcts import GumbelMuZeroGameBuffer as GameBuffer
+    elif create_cfg.policy.type == 'stochastic_muzero':
+        from lzero.mcts import StochasticMuZeroGameBuffer as GameBuffer
+
+    if cfg.policy.cuda and torch.cuda.is_available():
+        cfg.policy.device = 'cuda'
+    else:
+        cfg.policy.device = 'cpu'
+
+    cfg = compile_config(cfg, seed=seed, env=None, auto=True, create_cfg=create_cfg, save_cfg=True)
+    # Create main components: env, policy. The collector envs are created in the collector processes.
+    env_fn, collector_env_cfg, evaluator_env_cfg = get_vec_env_setting(cfg.env)
+    evaluator_env = create_env_manager(cfg.env.manager, [partial(env_fn, cfg=c) for c in evaluator_env_cfg])
+    evaluator_env.seed(cfg.seed, dynamic_seed=False)
+    set_pkg_seed(cfg.seed, use_cuda=cfg.policy.cuda)
+
+    if cfg.policy.eval_offline:
+        cfg.policy.learn.learner.hook.save_ckpt_after_iter = cfg.policy.eval_freq
+
+    policy = create_policy(cfg.policy, model=model, enable_field=['learn', 'collect', 'eval'])
+
+    # load pretrained model
+    if model_path is not None:
+        policy.learn_mode.load_state_dict(torch.load(model_path, map_location=cfg.policy.device))
+
+    # Create worker components: learner, evaluator, replay buffer.
+    tb_logger = SummaryWriter(os.path.join('./{}/log/'.format(cfg.exp_name), 'serial')) if get_rank() == 0 else None
+    learner = BaseLearner(cfg.policy.learn.learner, policy.learn_mode, tb_logger, exp_name=cfg.exp_name)
+
+    # ==============================================================
+    # MCTS+RL algorithms related core code
+    # ==============================================================
+    policy_config = cfg.policy
+    batch_size = policy_config.batch_size
+    # specific game buffer for MCTS+RL algorithms
+    replay_buffer = GameBuffer(policy_config)
+    evaluator = Evaluator(
+        eval_freq=cfg.policy.eval_freq,
+        n_evaluator_episode=cfg.env.n_evaluator_episode,
+        stop_value=cfg.env.stop_value,
+        env=evaluator_env,
+        policy=policy.eval_mode,
+        tb_logger=tb_logger,
+        exp_name=cfg.exp_name,
+        policy_config=policy_config
+    )
+
+    # ==============================================================
+    # Collector processes
+    # ==============================================================
+    # The weights are broadcast through a CPU copy of the collect model in shared memory, which the collectors load
+    # whenever its version (the train_iter of the weights) changes.
+    shared_state = {
+        k: v.detach().cpu().clone().share_memory_()
+        for k, v in policy.collect_mode.state_dict()['model'].items()
+    }
+    # The collector processes create their own env managers, so they are spawned and not daemonic.
+    ctx = mp.get_context('spawn')
+    inference_server = None
+    if use_inference_server:
+        # The collectors share a copy of the collect model, which is only updated by the weight broadcasts.
+        inference_server = InferenceServer(
+            copy.deepcopy(policy._model),
+            cfg.policy.device,
+            max_batch_size=inference_max_batch_size,
+            max_latency=inference_max_latency,
+            mp_context=ctx
+        )
+        inference_server.start()
+    weight_version = ctx.Value('l', 0)
+    weight_lock = ctx.Lock()
+    data_queue = ctx.Queue(maxsize=max_queue_size or 2 * num_collectors)
+    stop_event = ctx.Event()
+    collectors = [
+        ctx.Process(
+            target=_collector_worker,
+            args=(
+                rank, cfg, env_fn, collector_env_cfg, model, shared_state, weight_version, weight_lock, data_queue,
+                stop_event, None if inference_server is None else inference_server.create_client()
+            ),
+            name='collector{}'.format(rank)
+        ) for rank in range(num_collectors)
+    ]
+    for p in collectors:
+        p.start()
+
+    def broadcast_weights() -> None:
+        with weight_lock:
+            if inference_server is not None:
+                inference_server.load_state_dict(policy.collect_mode.state_dict()['model'])
+            else:
+                for k, v in policy.collect_mode.state_dict()['model'].items():
+                    shared_state[k].copy_(v)
+            weight_version.value = learner.train_iter
+
+    # ==============================================================
+    # Main loop
+    # ==============================================================
+    # Learner's before_run hook.
+    learner.call_hook('before_run')
+
+    if cfg.policy.eval_offline:
+        eval_train_iter_list = []
+        eval_train_envstep_list = []
+
+    collector_envstep = [0 for _ in range(num_collectors)]
+    # The number of train iterations allowed by the data received so far.
+    train_budget = 0
+    last_sync_iter = learner.train_iter
+
+    # Evaluate the random agent
+    stop, reward = evaluator.eval(learner.save_checkpoint, learner.train_iter, 0)
+
+    try:
+        while not stop:
+            # Receive the collected data once the data received before is trained on. The collectors keep collecting
+            # meanwhile, until the queue is full.
+            received = []
+            if train_budget <= 0:
+                try:
+                    received.append(data_queue.get(timeout=1.))
+                    while True:
+                        received.append(data_queue.get_nowait())
+                except queue.Empty:
+                    pass
+                if not received and not any(p.is_alive() for p in collectors):
+                    raise RuntimeError('All the collector processes exited, see their logs for the error.')
+            for rank, new_data, envstep, version in received:
+                collector_envstep[rank] = envstep
+                if cfg.policy.update_per_collect is None:
+                    # update_per_collect is None, then update_per_collect is set to the number of collected transitions multiplied by the replay_ratio.
+                    collected_transitions_num = sum([len(game_segment) for game_segment in new_data[0]])
+                    train_budget += int(collected_transitions_num * cfg.policy.replay_ratio)
+                else:
+                    train_budget += cfg.policy.update_per_collect
+                # save returned new_data collected by the collector
+                replay_buffer.push_game_segments(new_data)
+                # remove the oldest data if the replay buffer is full.
+                replay_buffer.remove_oldest_data_to_fit()
+            envstep = sum(collector_envstep)
+            if received:
+                log_buffer_memory_usage(learner.train_iter, replay_buffer, tb_logger)
+                log_buffer_run_time(learner.train_iter, replay_buffer, tb_logger)
+                # The policy lag of the data is the number of train iterations since the weights it was collected with.
+                policy_lag = [learner.train_iter - version for _, _, _, version in received]
+                if tb_logger is not None:
+                    tb_logger.add_scalar('async/policy_lag_mean', np.mean(policy_lag), learner.train_iter)
+                    tb_logger.add_scalar('async/policy_lag_max', np.max(policy_lag), learner.train_iter)
+                    tb_logger.add_scalar('async/weight_version_lag', learner.train_iter - last_sync_iter, learner.train_iter)
+                    tb_logger.add_scalar('async/received_batches', len(received), learner.train_iter)
+                    tb_logger.add_scalar('async/train_budget', train_budget, learner.train_iter)
+                    tb_logger.add_scalar('async/collector_envstep', envstep, learner.train_iter)
+                if inference_server is not None:
+                    for k, v in inference_server.get_metrics().items():
+                        if tb_logger is not None:
+                            tb_logger.add_scalar('async/' + k, v, learner.train_iter)
+                logging.info(
+                    f'async: received {len(received)} batches at train_iter {learner.train_iter}, envstep {envstep}, '
+                    f'weight_version {[version for _, _, _, version in received]}, '
+                    f'policy_lag mean {np.mean(policy_lag):.1f} max {np.max(policy_lag)}'
+                )
+
+            # Evaluate policy performance.
+            if evaluator.should_eval(learner.train_iter):
+                if cfg.policy.eval_offline:
+                    eval_train_iter_list.append(learner.train_iter)
+                    eval_train_envstep_list.append(envstep)
+                else:
+                    stop, reward = evaluator.eval(learner.save_checkpoint, learner.train_iter, envstep)
+                    if stop:
+                        break
+
+            # Learn policy from collected data.
+            while train_budget > 0:
+                if replay_buffer.get_num_of_transitions() > batch_size:
+                    train_data = replay_buffer.sample(batch_size, policy)
+                else:
+                    logging.warning(
+                        f'The data in replay_buffer is not sufficient to sample a mini-batch: '
+                        f'batch_size: {batch_size}, '
+                        f'{replay_buffer} '
+                        f'continue to collect now ....'
+                    )
+                    train_budget = 0
+                    break
+
+                # The core train steps for MCTS+RL algorithms.
+                log_vars = learner.train(train_data, envstep)
+                train_budget -= 1
+
+                if cfg.policy.use_priority:
+                    replay_buffer.update_priority(train_data, log_vars[0]['value_priority_orig'])
+
+                if learner.train_iter - last_sync_iter >= weight_sync_freq:
+                    broadcast_weights()
+                    last_sync_iter = learner.train_iter
+
+            if envstep >= max_env_step or learner.train_iter >= max_train_iter:
+                if cfg.policy.eval_offline:
+                    logging.info(f'eval offline beginning...')
+                    ckpt_dirname = './{}/ckpt'.format(learner.exp_name)
+                    # Evaluate the performance of the pretrained model.
+                    for train_iter, collector_envstep in zip(eval_train_iter_list, eval_train_envstep_list):
+                        ckpt_name = 'iteration_{}.pth.tar'.format(train_iter)
+                        ckpt_path = os.path.join(ckpt_dirname, ckpt_name)
+                        # load the ckpt of pretrained model
+                        policy.learn_mode.load_state_dict(torch.load(ckpt_path, map_location=cfg.policy.device))
+                        stop, reward = evaluator.eval(learner.save_checkpoint, train_iter, collector_envstep)
+                        logging.info(
+                            f'eval offline at train_iter: {train_iter}, collector_envstep: {collector_envstep}, reward: {reward}')
+                    logging.info(f'eval offline finished!')
+                break
+    finally:
+        # Stop the collectors. The queue is drained, so that no collector blocks on a full queue while exiting.
+        stop_event.set()
+        deadline = time.time() + 60
+        while any(p.is_alive() for p in collectors) and time.time() < deadline:
+            try:
+                data_queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        for p in collectors:
+            if p.is_alive():
+                p.terminate()
+            p.join()
+        if inference_server is not None:
+            inference_server.close()
+        evaluator_env.close()
+
+    # Learner's after_run hook.
+    learner.call_hook('after_run')
+    return policy
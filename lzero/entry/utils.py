@@ -136,3 +136,36 @@ def log_buffer_run_time(train_iter: int, buffer: "GameBuffer", writer: SummaryWr
 
         # Reset the time records in the buffer.
         buffer.reset_runtime_metrics()
+
+
+def log_prefetch_sampler_metrics(train_iter: int, sampler: "PrefetchSampler", writer: SummaryWriter) -> None:
+    """
+    Overview:
+        Log the average wait time of the learner for a batch and the average queue depth of the prefetch sampler.
+    Arguments:
+        - train_iter (:obj:`int`): The current training iteration.
+        - sampler (:obj:`PrefetchSampler`): The prefetch sampler, the metrics are reset after they are logged.
+        - writer (:obj:`SummaryWriter`): The TensorBoard writer.
+    """
+    metrics = sampler.get_metrics()
+    # "writer is None" means we are in a slave process in the DDP setup.
+    if writer is not None:
+        writer.add_scalar('Buffer/prefetch_wait_time', metrics['prefetch_wait_time'], train_iter)
+        writer.add_scalar('Buffer/prefetch_queue_depth', metrics['prefetch_queue_depth'], train_iter)
+
+
+def log_reanalyze_worker_metrics(train_iter: int, reanalyze_pool: "ReanalyzeWorkerPool", writer: SummaryWriter) -> None:
+    """
+    Overview:
+        Log the number of the reanalyzed game segments and the ratio of the game segments in the buffer which are \
+        reanalyzed with the current target model.
+    Arguments:
+        - train_iter (:obj:`int`): The current training iteration.
+        - reanalyze_pool (:obj:`ReanalyzeWorkerPool`): The reanalyze workers, the count is reset after it is logged.
+        - writer (:obj:`SummaryWriter`): The TensorBoard writer.
+    """
+    metrics = reanalyze_pool.get_metrics()
+    # "writer is None" means we are in a slave process in the DDP setup.
+    if writer is not None:
+        writer.add_scalar('Buffer/reanalyze_segment_num', metrics['reanalyze_segment_num'], train_iter)
+        writer.add_scalar('Buffer/reanalyze_fresh_ratio', metrics['reanalyze_fresh_ratio'], train_iter)
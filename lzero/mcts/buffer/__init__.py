@@ -8,3 +8,5 @@ from .game_buffer_gumbel_muzero import GumbelMuZeroGameBuffer
 from .game_buffer_stochastic_muzero import StochasticMuZeroGameBuffer
 from .game_buffer_rezero_mz import ReZeroMZGameBuffer
 from .game_buffer_rezero_ez import ReZeroEZGameBuffer
+from .prefetch_sampler import PrefetchSampler
+from .reanalyze_worker import ReanalyzeWorkerPool
@@ -1,4 +1,5 @@
 import copy
+import threading
 import time
 from abc import ABC, abstractmethod
 from typing import Any, List, Tuple, Optional, Union, TYPE_CHECKING
@@ -8,6 +9,10 @@ from ding.torch_utils.data_helper import to_list
 from ding.utils import BUFFER_REGISTRY
 from easydict import EasyDict
 
+from .game_pos_look_up import GamePosLookUp
+from .game_segment_store import GameSegmentStore
+from .priority_tree import PriorityTree
+
 if TYPE_CHECKING:
     from lzero.policy import MuZeroPolicy, EfficientZeroPolicy, SampledEfficientZeroPolicy, GumbelMuZeroPolicy
 
@@ -34,12 +39,26 @@ class GameBuffer(ABC, object):
         # (bool) Whether to consider outdated experiences for reanalyzing. If True, we first sort the data in the minibatch by the time it was produced
         # and only reanalyze the oldest ``reanalyze_ratio`` fraction.
         reanalyze_outdated=True,
+        # (int) The number of the threads of ``ReanalyzeWorkerPool``, which reanalyze the stored game segments in the
+        # background. If > 0, ``MuZeroGameBuffer.sample`` uses the stored policy targets and does no search.
+        reanalyze_worker_num=0,
         # (bool) Whether to use the root value in the reanalyzing part. Please refer to EfficientZero paper for details.
         use_root_value=False,
         # (int) The number of samples required for mini inference.
         mini_infer_size=10240,
         # (str) The type of sampled data. The default is 'transition'. Options: 'transition', 'episode'.
         sample_type='transition',
+        # (bool) Whether to allocate the observations of the sampled batch in pinned memory, for faster copies to GPU.
+        pin_memory=False,
+        # (bool) Whether to keep the game segments in memory-mapped files under ``./<exp_name>/replay_buffer`` in
+        # ``train_muzero``, which are reopened when the training is restarted. Please refer to ``GameSegmentStore``.
+        disk_replay_buffer=False,
+        # (str) The directory of the disk replay buffer. None means ``./<exp_name>/replay_buffer`` with the
+        # ``exp_name`` of the config, not the one suffixed with the time when the experiment directory already exists,
+        # so that a restart of the same config resumes the buffer of the first run.
+        disk_replay_buffer_dir=None,
+        # (int) The number of the game segments written to the disk together.
+        disk_replay_buffer_shard_size=64,
     )
 
     def __init__(self, cfg: dict):
@@ -63,8 +82,13 @@ class GameBuffer(ABC, object):
         self._beta = self._cfg.priority_prob_beta
 
         self.game_segment_buffer = []
-        self.game_pos_priorities = []
-        self.game_segment_game_pos_look_up = []
+        self.game_pos_priorities = PriorityTree(self._alpha)
+        self.game_segment_game_pos_look_up = GamePosLookUp(self.replay_buffer_size)
+        # guards the game segments, the look-up table and the priorities, when batches are sampled in other threads
+        # (e.g. by ``PrefetchSampler``) while new data is pushed and the priorities are updated
+        self.index_lock = threading.Lock()
+        # the disk storage of the game segments, see ``open_disk_storage``
+        self._segment_store = None
 
         self.keep_ratio = 1
         self.num_of_collected_episodes = 0
@@ -116,39 +140,29 @@ class GameBuffer(ABC, object):
             - beta: float the parameter in PER for calculating the priority
         """
         assert self._beta > 0
-        num_of_transitions = self.get_num_of_transitions()
-        if self._cfg.use_priority is False:
-            self.game_pos_priorities = np.ones_like(self.game_pos_priorities)
-
-        # +1e-6 for numerical stability
-        probs = self.game_pos_priorities ** self._alpha + 1e-6
-        probs /= probs.sum()
-
-        # sample according to transition index
-        # TODO(pu): replace=True
-        # print(f"num transitions is {num_of_transitions}")
-        # print(f"length of probs is {len(probs)}")
-        batch_index_list = np.random.choice(num_of_transitions, batch_size, p=probs, replace=False)
-
-        if self._cfg.reanalyze_outdated is True:
-            # NOTE: used in reanalyze part
-            batch_index_list.sort()
-
-        weights_list = (num_of_transitions * probs[batch_index_list]) ** (-self._beta)
-        weights_list /= weights_list.max()
-
-        game_segment_list = []
-        pos_in_game_segment_list = []
-
-        for idx in batch_index_list:
-            game_segment_idx, pos_in_game_segment = self.game_segment_game_pos_look_up[idx]
-            game_segment_idx -= self.base_idx
-            game_segment = self.game_segment_buffer[game_segment_idx]
-
-            game_segment_list.append(game_segment)
-            pos_in_game_segment_list.append(pos_in_game_segment)
-
-        make_time = [time.time() for _ in range(len(batch_index_list))]
+        with self.index_lock:
+            num_of_transitions = self.get_num_of_transitions()
+            if self._cfg.use_priority is False:
+                batch_index_list = np.random.choice(num_of_transitions, batch_size, replace=False)
+                probs = np.full(batch_size, 1. / num_of_transitions)
+            else:
+                # sample according to transition index in the sum tree of priority ** alpha (+1e-6 for numerical stability)
+                # TODO(pu): replace=True
+                batch_index_list, probs = self.game_pos_priorities.sample(batch_size)
+
+            if self._cfg.reanalyze_outdated is True:
+                # NOTE: used in reanalyze part
+                order = np.argsort(batch_index_list)
+                batch_index_list, probs = batch_index_list[order], probs[order]
+
+            weights_list = (num_of_transitions * probs) ** (-self._beta)
+            weights_list /= weights_list.max()
+
+            game_segment_idx_list, pos_in_game_segment_list = self.game_segment_game_pos_look_up[batch_index_list]
+            game_segment_list = [self.game_segment_buffer[idx] for idx in (game_segment_idx_list - self.base_idx).tolist()]
+            pos_in_game_segment_list = pos_in_game_segment_list.tolist()
+
+            make_time = [time.time() for _ in range(len(batch_index_list))]
 
         orig_data = (game_segment_list, pos_in_game_segment_list, batch_index_list, weights_list, make_time)
         return orig_data
@@ -209,40 +223,38 @@ class GameBuffer(ABC, object):
         """
         assert self._beta > 0, "Beta must be greater than zero."
 
-        num_of_transitions = self.get_num_of_transitions()
-
-        if not self._cfg.use_priority:
-            self.game_pos_priorities = np.ones_like(self.game_pos_priorities)
-
-        # Add a small constant for numerical stability
-        probs = self.game_pos_priorities ** self._alpha + 1e-6
-        probs /= probs.sum()
+        with self.index_lock:
+            num_of_transitions = self.get_num_of_transitions()
 
-        # Sample game segment indices
-        num_of_game_segments = self.get_num_of_game_segments()
-        batch_episode_index_list = np.random.choice(num_of_game_segments, batch_size, replace=False)
+            # Sample game segment indices
+            num_of_game_segments = self.get_num_of_game_segments()
+            batch_episode_index_list = np.random.choice(num_of_game_segments, batch_size, replace=False)
 
-        if self._cfg.reanalyze_outdated:
-            # Sort for consistency when reanalyzing
-            batch_episode_index_list.sort()
+            if self._cfg.reanalyze_outdated:
+                # Sort for consistency when reanalyzing
+                batch_episode_index_list.sort()
 
-        batch_index_list = batch_episode_index_list * self._cfg.game_segment_length
+            batch_index_list = batch_episode_index_list * self._cfg.game_segment_length
 
-        # Calculate weights for the sampled transitions
-        weights_list = (num_of_transitions * probs[batch_index_list]) ** (-self._beta)
-        weights_list /= weights_list.max()
+            # Calculate weights for the sampled transitions
+            if self._cfg.use_priority:
+                probs = self.game_pos_priorities.probs(batch_index_list)
+            else:
+                probs = np.full(len(batch_index_list), 1. / num_of_transitions)
+            weights_list = (num_of_transitions * probs) ** (-self._beta)
+            weights_list /= weights_list.max()
 
-        game_segment_list = []
-        pos_in_game_segment_list = []
+            game_segment_list = []
+            pos_in_game_segment_list = []
 
-        # Collect game segments and their initial positions
-        for episode_index in batch_episode_index_list:
-            game_segment = self.game_segment_buffer[episode_index]
-            game_segment_list.append(game_segment)
-            pos_in_game_segment_list.append(0)  # Starting position in game segments
+            # Collect game segments and their initial positions
+            for episode_index in batch_episode_index_list:
+                game_segment = self.game_segment_buffer[episode_index]
+                game_segment_list.append(game_segment)
+                pos_in_game_segment_list.append(0)  # Starting position in game segments
 
-        # Record the time when the batch is created
-        make_time = [time.time() for _ in range(len(batch_episode_index_list))]
+            # Record the time when the batch is created
+            make_time = [time.time() for _ in range(len(batch_episode_index_list))]
 
         orig_data = (game_segment_list, pos_in_game_segment_list, batch_index_list, weights_list, make_time)
         return orig_data
@@ -436,27 +448,22 @@ class GameBuffer(ABC, object):
             valid_len = len(data) - meta['unroll_plus_td_steps']
             # print(f'valid_len is {valid_len}')
 
-        if meta['priorities'] is None:
-            max_prio = self.game_pos_priorities.max() if self.game_segment_buffer else 1
-            # if no 'priorities' provided, set the valid part of the new-added game history the max_prio
-            self.game_pos_priorities = np.concatenate(
-                (
-                    self.game_pos_priorities, [max_prio
-                                               for _ in range(valid_len)] + [0. for _ in range(valid_len, len(data))]
-                )
-            )
-        else:
-            assert len(data) == len(meta['priorities']), " priorities should be of same length as the game steps"
-            priorities = meta['priorities'].copy().reshape(-1)
-            priorities[valid_len:len(data)] = 0.
-            self.game_pos_priorities = np.concatenate((self.game_pos_priorities, priorities))
-
-        self.game_segment_buffer.append(data)
-        self.game_segment_game_pos_look_up += [
-            (self.base_idx + len(self.game_segment_buffer) - 1, step_pos) for step_pos in range(len(data))
-        ]
-        # print(f'potioritys is {self.game_pos_priorities}')
-        # print(f'num of transitions is {len(self.game_segment_game_pos_look_up)}')
+        with self.index_lock:
+            if meta['priorities'] is None:
+                max_prio = self.game_pos_priorities.max() if self.game_segment_buffer else 1
+                # if no 'priorities' provided, set the valid part of the new-added game history the max_prio
+                priorities = np.zeros(len(data))
+                priorities[:valid_len] = max_prio
+            else:
+                assert len(data) == len(meta['priorities']), " priorities should be of same length as the game steps"
+                priorities = meta['priorities'].copy().reshape(-1)
+                priorities[valid_len:len(data)] = 0.
+            self.game_pos_priorities.append(priorities)
+
+            self.game_segment_buffer.append(data)
+            self.game_segment_game_pos_look_up.append(self.base_idx + len(self.game_segment_buffer) - 1, len(data))
+        if self._segment_store is not None and self._segment_store.push(data):
+            self._segment_store.save()
 
     def remove_oldest_data_to_fit(self) -> None:
         """
@@ -464,18 +471,14 @@ class GameBuffer(ABC, object):
             remove some oldest data if the replay buffer is full.
         """
         assert self.replay_buffer_size > self._cfg.batch_size, "replay buffer size should be larger than batch size"
-        nums_of_game_segments = self.get_num_of_game_segments()
         total_transition = self.get_num_of_transitions()
         if total_transition > self.replay_buffer_size:
-            index = 0
-            for i in range(nums_of_game_segments):
-                total_transition -= len(self.game_segment_buffer[i])
-                if total_transition <= self.replay_buffer_size * self.keep_ratio:
-                    # find the max game_segment index to keep in the buffer
-                    index = i
-                    break
+            # find the min number of the oldest game segments to remove, by a binary search of the segment offsets
+            num_of_removed_game_segments, total_transition = self.game_segment_game_pos_look_up.num_segments_to_remove(
+                self.replay_buffer_size * self.keep_ratio
+            )
             if total_transition >= self._cfg.batch_size:
-                self._remove(index + 1)
+                self._remove(num_of_removed_game_segments)
 
     def _remove(self, excess_game_segment_index: List[int]) -> None:
         """
@@ -484,14 +487,55 @@ class GameBuffer(ABC, object):
         Arguments:
             - excess_game_segment_index (:obj:`List[str]`): Index of data.
         """
-        excess_game_positions = sum(
-            [len(game_segment) for game_segment in self.game_segment_buffer[:excess_game_segment_index]]
-        )
-        del self.game_segment_buffer[:excess_game_segment_index]
-        self.game_pos_priorities = self.game_pos_priorities[excess_game_positions:]
-        del self.game_segment_game_pos_look_up[:excess_game_positions]
-        self.base_idx += excess_game_segment_index
-        self.clear_time = time.time()
+        with self.index_lock:
+            excess_game_positions = self.game_segment_game_pos_look_up.pop_front(excess_game_segment_index)
+            del self.game_segment_buffer[:excess_game_segment_index]
+            self.game_pos_priorities.pop_front(excess_game_positions)
+            self.base_idx += excess_game_segment_index
+            self.clear_time = time.time()
+        if self._segment_store is not None:
+            self._segment_store.save(self._segment_store.remove(excess_game_segment_index))
+
+    def open_disk_storage(self, directory: str, shard_size: int = 64) -> None:
+        """
+        Overview:
+            Keep the game segments pushed from now on in memory-mapped files under ``directory``. The game segments \
+            and priorities stored there by a previous run are loaded into the buffer, which must be empty.
+        Arguments:
+            - directory (:obj:`str`): The directory of the ``GameSegmentStore``.
+            - shard_size (:obj:`int`): The number of the game segments written to the disk together.
+        """
+        assert not self.game_segment_buffer, "the disk storage must be opened before the data is pushed"
+        self._segment_store = GameSegmentStore(directory, shard_size)
+        game_segments, priorities = self._segment_store.load()
+        with self.index_lock:
+            for game_segment in game_segments:
+                self.game_segment_buffer.append(game_segment)
+                self.game_segment_game_pos_look_up.append(
+                    self.base_idx + len(self.game_segment_buffer) - 1, len(game_segment)
+                )
+            self.game_pos_priorities.append(priorities)
+
+    def flush_disk_storage(self) -> None:
+        """
+        Overview:
+            Write the game segments which are not on the disk yet and save the priorities, e.g. at the end of training.
+        """
+        if self._segment_store is not None:
+            self._segment_store.flush()
+            self._segment_store.save()
+            self.save_disk_priorities()
+
+    def save_disk_priorities(self) -> None:
+        """
+        Overview:
+            Save the priorities of the game segments on the disk, e.g. when a checkpoint is saved. It is not done when \
+            the segments are pushed or removed, since it writes the priorities of the whole buffer.
+        """
+        if self._segment_store is not None:
+            with self.index_lock:
+                priorities = self.game_pos_priorities[np.arange(self._segment_store.num_sealed_transitions)]
+            self._segment_store.save_priorities(priorities)
 
     def get_num_of_episodes(self) -> int:
         # number of collected episodes
@@ -9,6 +9,8 @@ from lzero.mcts.tree_search.mcts_ptree import EfficientZeroMCTSPtree as MCTSPtre
 from lzero.mcts.utils import prepare_observation
 from lzero.policy import to_detach_cpu_numpy, concat_output, concat_output_value, inverse_scalar_transform
 from .game_buffer_muzero import MuZeroGameBuffer
+from .game_pos_look_up import GamePosLookUp
+from .priority_tree import PriorityTree
 
 
 @BUFFER_REGISTRY.register('game_buffer_efficientzero')
@@ -37,8 +39,8 @@ class EfficientZeroGameBuffer(MuZeroGameBuffer):
         self._beta = self._cfg.priority_prob_beta
 
         self.game_segment_buffer = []
-        self.game_pos_priorities = []
-        self.game_segment_game_pos_look_up = []
+        self.game_pos_priorities = PriorityTree(self._alpha)
+        self.game_segment_game_pos_look_up = GamePosLookUp(self.replay_buffer_size)
 
         self.keep_ratio = 1
         self.num_of_collected_episodes = 0
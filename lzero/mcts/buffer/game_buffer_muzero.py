@@ -1,3 +1,4 @@
+import threading
 from typing import Any, List, Tuple, Union, TYPE_CHECKING, Optional
 
 import numpy as np
@@ -10,6 +11,8 @@ from lzero.mcts.tree_search.mcts_ptree import MuZeroMCTSPtree as MCTSPtree
 from lzero.mcts.utils import prepare_observation
 from lzero.policy import to_detach_cpu_numpy, concat_output, concat_output_value, inverse_scalar_transform
 from .game_buffer import GameBuffer
+from .game_pos_look_up import GamePosLookUp
+from .priority_tree import PriorityTree
 
 if TYPE_CHECKING:
     from lzero.policy import MuZeroPolicy, EfficientZeroPolicy, SampledEfficientZeroPolicy
@@ -47,12 +50,14 @@ class MuZeroGameBuffer(GameBuffer):
         self.clear_time = 0
 
         self.game_segment_buffer = []
-        self.game_pos_priorities = []
-        self.game_segment_game_pos_look_up = []
+        self.game_pos_priorities = PriorityTree(self._alpha)
+        self.game_segment_game_pos_look_up = GamePosLookUp(self.replay_buffer_size)
 
         self._compute_target_timer = EasyTimer()
         self._reuse_search_timer = EasyTimer()
-        self._origin_search_timer = EasyTimer()
+        # The searches of ``_compute_target_policy_reanalyzed`` also run in the threads of ``ReanalyzeWorkerPool``, so
+        # each of them has its own timer, and their times are summed under this lock.
+        self._search_time_lock = threading.Lock()
         self.buffer_reanalyze = False
 
         self.compute_target_re_time = 0
@@ -86,10 +91,12 @@ class MuZeroGameBuffer(GameBuffer):
         """
         policy._target_model.to(self._cfg.device)
         policy._target_model.eval()
+        # The reanalyze workers keep the stored policy targets up to date, so that no search is done here.
+        reanalyze_ratio = 0 if self._cfg.reanalyze_worker_num > 0 else self._cfg.reanalyze_ratio
 
         # obtain the current_batch and prepare target context
         reward_value_context, policy_re_context, policy_non_re_context, current_batch = self._make_batch(
-            batch_size, self._cfg.reanalyze_ratio
+            batch_size, reanalyze_ratio
         )
         # target reward, target value
         batch_rewards, batch_target_values = self._compute_target_reward_value(
@@ -104,11 +111,11 @@ class MuZeroGameBuffer(GameBuffer):
         )
 
         # fusion of batch_target_policies_re and batch_target_policies_non_re to batch_target_policies
-        if 0 < self._cfg.reanalyze_ratio < 1:
+        if 0 < reanalyze_ratio < 1:
             batch_target_policies = np.concatenate([batch_target_policies_re, batch_target_policies_non_re])
-        elif self._cfg.reanalyze_ratio == 1:
+        elif reanalyze_ratio == 1:
             batch_target_policies = batch_target_policies_re
-        elif self._cfg.reanalyze_ratio == 0:
+        elif reanalyze_ratio == 0:
             batch_target_policies = batch_target_policies_non_re
 
         target_batch = [batch_rewards, batch_target_values, batch_target_policies]
@@ -119,6 +126,25 @@ class MuZeroGameBuffer(GameBuffer):
             self.sample_times += 1
         return train_data
 
+    def reanalyze_game_segment(self, game_segment: Any, model: Any, version: int) -> None:
+        """
+        Overview:
+            Reanalyze all the positions of a stored game segment with ``model``, replace its child visits and root \
+            values with the new search results and stamp it with ``version``. It is called by the threads of \
+            ``ReanalyzeWorkerPool``, and ``sample`` reads the new targets as the non-reanalyzed ones.
+        Arguments:
+            - game_segment (:obj:`GameSegment`): The game segment in the buffer.
+            - model (:obj:`torch.nn.Module`): The target model in eval mode.
+            - version (:obj:`int`): The training iteration of the target model.
+        """
+        # The positions are searched in the windows of ``num_unroll_steps + 1`` of the reanalyzed context.
+        pos_in_game_segment_list = list(range(0, len(game_segment), self._cfg.num_unroll_steps + 1))
+        policy_re_context = self._prepare_policy_reanalyzed_context(
+            pos_in_game_segment_list, [game_segment] * len(pos_in_game_segment_list), pos_in_game_segment_list
+        )
+        self._compute_target_policy_reanalyzed(policy_re_context, model)
+        game_segment.reanalyze_version = version
+
     def _make_batch(self, batch_size: int, reanalyze_ratio: float) -> Tuple[Any]:
         """
         Overview:
@@ -138,34 +164,39 @@ class MuZeroGameBuffer(GameBuffer):
         orig_data = self._sample_orig_data(batch_size)
         game_segment_list, pos_in_game_segment_list, batch_index_list, weights_list, make_time_list = orig_data
         batch_size = len(batch_index_list)
-        obs_list, action_list, mask_list = [], [], []
-        # prepare the inputs of a batch
-        for i in range(batch_size):
-            game = game_segment_list[i]
-            pos_in_game_segment = pos_in_game_segment_list[i]
-
-            actions_tmp = game.action_segment[pos_in_game_segment:pos_in_game_segment +
-                                              self._cfg.num_unroll_steps].tolist()
-            # add mask for invalid actions (out of trajectory), 1 for valid, 0 for invalid
-            mask_tmp = [1. for i in range(len(actions_tmp))]
-            mask_tmp += [0. for _ in range(self._cfg.num_unroll_steps + 1 - len(mask_tmp))]
-
-            # pad random action
-            actions_tmp += [
-                np.random.randint(0, game.action_space_size)
-                for _ in range(self._cfg.num_unroll_steps - len(actions_tmp))
-            ]
-
-            # obtain the input observations
-            # pad if length of obs in game_segment is less than stack+num_unroll_steps
-            # e.g. stack+num_unroll_steps = 4+5
-            obs_list.append(
-                game_segment_list[i].get_unroll_obs(
-                    pos_in_game_segment_list[i], num_unroll_steps=self._cfg.num_unroll_steps, padding=True
-                )
-            )
-            action_list.append(actions_tmp)
-            mask_list.append(mask_tmp)
+        num_unroll_steps = self._cfg.num_unroll_steps
+        pos_in_game_segment = np.asarray(pos_in_game_segment_list)
+        game_segment_lens = np.array([len(game_segment) for game_segment in game_segment_list])
+        # the number of actions in the trajectory of each sample, the others are out of the game segment
+        num_actions = np.clip(game_segment_lens - pos_in_game_segment, 0, num_unroll_steps)
+
+        # add mask for invalid actions (out of trajectory), 1 for valid, 0 for invalid
+        mask_list = (np.arange(num_unroll_steps + 1) < num_actions[:, None]).astype(np.float64)
+        # pad random action
+        action_list = np.random.randint(0, self._cfg.model.action_space_size, size=(batch_size, num_unroll_steps))
+
+        # obtain the input observations
+        # pad if length of obs in game_segment is less than stack+num_unroll_steps
+        # e.g. stack+num_unroll_steps = 4+5
+        unroll_obs = [
+            game_segment.get_unroll_obs(pos, num_unroll_steps, decode=False)
+            for game_segment, pos in zip(game_segment_list, pos_in_game_segment_list)
+        ]
+        obs_codec = game_segment_list[0].obs_codec
+        if obs_codec is not None:
+            # decode the encoded frames of the whole batch at once
+            frames = obs_codec.decode([frame for obs in unroll_obs for frame in obs])
+            unroll_obs = np.split(frames, np.cumsum([len(obs) for obs in unroll_obs])[:-1])
+        else:
+            unroll_obs = [np.asarray(obs) for obs in unroll_obs]
+        obs_list = self._empty_batch(
+            (batch_size, self._cfg.model.frame_stack_num + num_unroll_steps) + unroll_obs[0].shape[1:],
+            unroll_obs[0].dtype
+        )
+        for i, (game_segment, pos, obs) in enumerate(zip(game_segment_list, pos_in_game_segment_list, unroll_obs)):
+            action_list[i, :num_actions[i]] = game_segment.action_segment[pos:pos + num_actions[i]]
+            obs_list[i, :len(obs)] = obs
+            obs_list[i, len(obs):] = obs[-1]
 
         # formalize the input observations
         obs_list = prepare_observation(obs_list, self._cfg.model.model_type)
@@ -210,6 +241,17 @@ class MuZeroGameBuffer(GameBuffer):
         context = reward_value_context, policy_re_context, policy_non_re_context, current_batch
         return context
 
+    def _empty_batch(self, shape: Tuple[int, ...], dtype: np.dtype) -> np.ndarray:
+        """
+        Overview:
+            Allocate an uninitialized array of a batch, in pinned (page-locked) memory if ``pin_memory`` is True \
+            and CUDA is available, so that copying it to the GPU is faster and can be asynchronous.
+        """
+        if self._cfg.get('pin_memory', False) and torch.cuda.is_available():
+            torch_dtype = torch.from_numpy(np.empty(0, dtype=dtype)).dtype
+            return torch.empty(shape, dtype=torch_dtype, pin_memory=True).numpy()
+        return np.empty(shape, dtype=dtype)
+
     def _prepare_reward_value_context(
             self, batch_index_list: List[str], game_segment_list: List[Any], pos_in_game_segment_list: List[Any],
             total_transitions: int
@@ -226,51 +268,44 @@ class MuZeroGameBuffer(GameBuffer):
             - reward_value_context (:obj:`list`): value_obs_list, value_mask, pos_in_game_segment_list, rewards_list, game_segment_lens,
               td_steps_list, action_mask_segment, to_play_segment
         """
-        zero_obs = game_segment_list[0].zero_obs()
-        value_obs_list = []
-        # the value is valid or not (out of game_segment)
-        value_mask = []
-        rewards_list = []
-        game_segment_lens = []
+        num_unroll_steps, frame_stack_num = self._cfg.num_unroll_steps, self._cfg.model.frame_stack_num
+        game_segment_lens = [len(game_segment) for game_segment in game_segment_list]
+        lens, state_index = np.asarray(game_segment_lens), np.asarray(pos_in_game_segment_list)
+        rewards_list = [game_segment.reward_segment for game_segment in game_segment_list]
         # for board games
-        action_mask_segment, to_play_segment = [], []
-
-        td_steps_list = []
-        for game_segment, state_index, idx in zip(game_segment_list, pos_in_game_segment_list, batch_index_list):
-            game_segment_len = len(game_segment)
-            game_segment_lens.append(game_segment_len)
-
-            td_steps = np.clip(self._cfg.td_steps, 1, max(1, game_segment_len - state_index)).astype(np.int32)
-
-            # prepare the corresponding observations for bootstrapped values o_{t+k}
-            # o[t+ td_steps, t + td_steps + stack frames + num_unroll_steps]
-            # t=2+3 -> o[2+3, 2+3+4+5] -> o[5, 14]
-            game_obs = game_segment.get_unroll_obs(state_index + td_steps, self._cfg.num_unroll_steps)
-
-            rewards_list.append(game_segment.reward_segment)
-
-            # for board games
-            action_mask_segment.append(game_segment.action_mask_segment)
-            to_play_segment.append(game_segment.to_play_segment)
-
-            for current_index in range(state_index, state_index + self._cfg.num_unroll_steps + 1):
-                # get the <num_unroll_steps+1>  bootstrapped target obs
-                td_steps_list.append(td_steps)
-                # index of bootstrapped obs o_{t+td_steps}
-                bootstrap_index = current_index + td_steps
-
-                if bootstrap_index < game_segment_len:
-                    value_mask.append(1)
-                    # beg_index = bootstrap_index - (state_index + td_steps), max of beg_index is num_unroll_steps
-                    beg_index = current_index - state_index
-                    end_index = beg_index + self._cfg.model.frame_stack_num
-                    # the stacked obs in time t
-                    obs = game_obs[beg_index:end_index]
-                else:
-                    value_mask.append(0)
-                    obs = zero_obs
-
-                value_obs_list.append(obs)
+        action_mask_segment = [game_segment.action_mask_segment for game_segment in game_segment_list]
+        to_play_segment = [game_segment.to_play_segment for game_segment in game_segment_list]
+
+        td_steps = np.clip(self._cfg.td_steps, 1, np.maximum(1, lens - state_index)).astype(np.int32)
+        # get the <num_unroll_steps+1> bootstrapped target obs of each sample
+        td_steps_list = np.repeat(td_steps, num_unroll_steps + 1)
+        # index of bootstrapped obs o_{t+td_steps}, the value is valid or not (out of game_segment)
+        bootstrap_index = (state_index + td_steps)[:, None] + np.arange(num_unroll_steps + 1)
+        value_mask = (bootstrap_index < lens[:, None]).astype(np.int64)
+        num_valid = value_mask.sum(axis=1)
+
+        # prepare the corresponding observations for bootstrapped values o_{t+k}
+        # o[t+ td_steps, t + td_steps + stack frames + num_unroll_steps]
+        # t=2+3 -> o[2+3, 2+3+4+5] -> o[5, 14]
+        game_obs_list = [
+            np.asarray(game_segment.get_unroll_obs(index + td, num_unroll_steps)) if valid else None
+            for game_segment, index, td, valid in zip(game_segment_list, state_index, td_steps, num_valid)
+        ]
+        zero_obs = np.asarray(game_segment_list[0].zero_obs())
+        frame = next((game_obs for game_obs in game_obs_list if game_obs is not None), zero_obs)[0]
+        # the out-of-game_segment values use the zero obs
+        dtype = frame.dtype if value_mask.all() else np.result_type(frame.dtype, zero_obs.dtype)
+        value_obs_list = self._empty_batch(
+            (len(game_segment_list), num_unroll_steps + 1, frame_stack_num) + frame.shape, dtype
+        )
+        value_obs_list[value_mask == 0] = 0
+        stack_index = np.arange(num_unroll_steps + 1)[:, None] + np.arange(frame_stack_num)
+        for i, game_obs in enumerate(game_obs_list):
+            if game_obs is not None:
+                # the stacked obs in time t + k, k < num_valid[i]
+                value_obs_list[i, :num_valid[i]] = game_obs[stack_index[:num_valid[i]]]
+        value_obs_list = value_obs_list.reshape((-1, frame_stack_num) + frame.shape)
+        value_mask = value_mask.reshape(-1)
 
         reward_value_context = [
             value_obs_list, value_mask, pos_in_game_segment_list, rewards_list, game_segment_lens, td_steps_list,
@@ -381,22 +416,23 @@ class MuZeroGameBuffer(GameBuffer):
         transition_batch_size = len(value_obs_list)
         game_segment_batch_size = len(pos_in_game_segment_list)
 
-        to_play, action_mask = self._preprocess_to_play_and_action_mask(
-            game_segment_batch_size, to_play_segment, action_mask_segment, pos_in_game_segment_list
-        )
-        if self._cfg.model.continuous_action_space is True:
-            # when the action space of the environment is continuous, action_mask[:] is None.
-            action_mask = [
-                list(np.ones(self._cfg.model.action_space_size, dtype=np.int8)) for _ in range(transition_batch_size)
-            ]
-            # NOTE: in continuous action space env: we set all legal_actions as -1
-            legal_actions = [
-                [-1 for _ in range(self._cfg.model.action_space_size)] for _ in range(transition_batch_size)
-            ]
-        else:
-            legal_actions = [[i for i, x in enumerate(action_mask[j]) if x == 1] for j in range(transition_batch_size)]
+        if self._cfg.use_root_value:
+            # the to_play and legal actions are only needed by the roots of the MCTS
+            to_play, action_mask = self._preprocess_to_play_and_action_mask(
+                game_segment_batch_size, to_play_segment, action_mask_segment, pos_in_game_segment_list
+            )
+            if self._cfg.model.continuous_action_space is True:
+                # when the action space of the environment is continuous, action_mask[:] is None.
+                action_mask = [
+                    list(np.ones(self._cfg.model.action_space_size, dtype=np.int8)) for _ in range(transition_batch_size)
+                ]
+                # NOTE: in continuous action space env: we set all legal_actions as -1
+                legal_actions = [
+                    [-1 for _ in range(self._cfg.model.action_space_size)] for _ in range(transition_batch_size)
+                ]
+            else:
+                legal_actions = [[i for i, x in enumerate(action_mask[j]) if x == 1] for j in range(transition_batch_size)]
 
-        batch_target_values, batch_rewards = [], []
         with torch.no_grad():
             value_obs_list = prepare_observation(value_obs_list, self._cfg.model.model_type)
             # split a full batch into slices of mini_infer_size: to save the GPU memory for more GPU actors
@@ -464,56 +500,70 @@ class MuZeroGameBuffer(GameBuffer):
             # get last state value
             if self._cfg.env_type == 'board_games' and to_play_segment[0][0] in [1, 2]:
                 # TODO(pu): for board_games, very important, to check
-                value_list = value_list.reshape(-1) * np.array(
-                    [
-                        self._cfg.discount_factor ** td_steps_list[i] if int(td_steps_list[i]) %
-                        2 == 0 else -self._cfg.discount_factor ** td_steps_list[i]
-                        for i in range(transition_batch_size)
-                    ]
-                )
+                td_steps_list = np.asarray(td_steps_list)
+                value_list = value_list.reshape(-1) * np.where(
+                    td_steps_list % 2 == 0, 1., -1.
+                ) * self._cfg.discount_factor ** td_steps_list.astype(np.float64)
             else:
-                value_list = value_list.reshape(-1) * (
-                    np.array([self._cfg.discount_factor for _ in range(transition_batch_size)]) ** td_steps_list
-                )
+                value_list = value_list.reshape(-1) * self._cfg.discount_factor ** np.asarray(td_steps_list, dtype=np.float64)
 
             value_list = value_list * np.array(value_mask)
-            value_list = value_list.tolist()
-            horizon_id, value_index = 0, 0
-
-            for game_segment_len_non_re, reward_list, state_index, to_play_list in zip(game_segment_lens, rewards_list,
-                                                                                       pos_in_game_segment_list,
-                                                                                       to_play_segment):
-                target_values = []
-                target_rewards = []
-                base_index = state_index
-                for current_index in range(state_index, state_index + self._cfg.num_unroll_steps + 1):
-                    bootstrap_index = current_index + td_steps_list[value_index]
-                    # for i, reward in enumerate(game.rewards[current_index:bootstrap_index]):
-                    for i, reward in enumerate(reward_list[current_index:bootstrap_index]):
-                        if self._cfg.env_type == 'board_games' and to_play_segment[0][0] in [1, 2]:
-                            # TODO(pu): for board_games, very important, to check
-                            if to_play_list[base_index] == to_play_list[i]:
-                                value_list[value_index] += reward * self._cfg.discount_factor ** i
-                            else:
-                                value_list[value_index] += -reward * self._cfg.discount_factor ** i
-                        else:
-                            value_list[value_index] += reward * self._cfg.discount_factor ** i
-                    horizon_id += 1
-
-                    if current_index < game_segment_len_non_re:
-                        target_values.append(value_list[value_index])
-                        target_rewards.append(reward_list[current_index])
-                    else:
-                        target_values.append(np.array(0.))
-                        target_rewards.append(np.array(0.))
-                    value_index += 1
+            batch_rewards, batch_target_values = self._compute_n_step_targets(
+                value_list, rewards_list, pos_in_game_segment_list, game_segment_lens, td_steps_list, to_play_segment
+            )
 
-                batch_rewards.append(target_rewards)
-                batch_target_values.append(target_values)
+        return batch_rewards, batch_target_values
 
-        batch_rewards = np.asarray(batch_rewards)
-        batch_target_values = np.asarray(batch_target_values)
+    def _compute_n_step_targets(
+            self, value_list: np.ndarray, rewards_list: List[Any], pos_in_game_segment_list: List[int],
+            game_segment_lens: List[int], td_steps_list: np.ndarray, to_play_segment: List[Any]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Overview:
+            Add the discounted rewards of the next ``td_steps`` to the discounted bootstrapped values, for the \
+            whole batch at once: value_t = r_t + gamma * r_{t+1} + ... + gamma^{td_steps} * v_{t+td_steps}.
+        Arguments:
+            - value_list (:obj:`np.ndarray`): The discounted and masked bootstrapped values of the transitions.
+            - rewards_list (:obj:`list`): The reward segments of the game segments of the samples.
+            - pos_in_game_segment_list (:obj:`list`): The positions of the samples in their game segments.
+            - game_segment_lens (:obj:`list`): The lengths of the game segments of the samples.
+            - td_steps_list (:obj:`np.ndarray`): The td steps of the transitions.
+            - to_play_segment (:obj:`list`): The to_play segments of the game segments of the samples.
+        Returns:
+            - batch_rewards (:obj:`np.ndarray`): The reward targets, of shape (batch_size, num_unroll_steps + 1).
+            - batch_target_values (:obj:`np.ndarray`): The value targets, of shape (batch_size, num_unroll_steps + 1).
+        """
+        num_unroll_steps = self._cfg.num_unroll_steps
+        batch_size = len(pos_in_game_segment_list)
+        state_index = np.asarray(pos_in_game_segment_list)
+        td_steps = np.asarray(td_steps_list).reshape(batch_size, num_unroll_steps + 1)[:, 0]
+        max_td_steps = int(td_steps.max())
+
+        # rewards[b, j] = r_{t+j}, zero after the end of the reward segment
+        rewards = np.zeros((batch_size, num_unroll_steps + max_td_steps))
+        for i, (reward_list, index) in enumerate(zip(rewards_list, state_index)):
+            reward_window = np.asarray(reward_list[index:index + num_unroll_steps + td_steps[i]], dtype=np.float64)
+            rewards[i, :len(reward_window)] = reward_window.reshape(len(reward_window))
+
+        # discounts[b, i] = gamma^i for the i-th reward after the current step, i < td_steps
+        steps = np.arange(max_td_steps)
+        discounts = np.where(steps < td_steps[:, None], self._cfg.discount_factor ** steps, 0.)
+        if self._cfg.env_type == 'board_games' and to_play_segment[0][0] in [1, 2]:
+            # TODO(pu): for board_games, very important, to check
+            # NOTE: the sign compares to_play at the sample position with to_play at the i-th position of the segment
+            for i, (to_play_list, index) in enumerate(zip(to_play_segment, state_index)):
+                to_play_list = np.asarray(to_play_list)
+                num = min(td_steps[i], len(to_play_list))
+                discounts[i, :num] *= np.where(to_play_list[:num] == to_play_list[index], 1, -1)
+        reward_windows = rewards[:, np.arange(num_unroll_steps + 1)[:, None] + steps]
+        value_list = value_list.reshape(batch_size, num_unroll_steps + 1) + np.einsum(
+            'bki,bi->bk', reward_windows, discounts
+        )
 
+        # the targets out of the game segment are 0
+        valid = state_index[:, None] + np.arange(num_unroll_steps + 1) < np.asarray(game_segment_lens)[:, None]
+        batch_rewards = np.where(valid, rewards[:, :num_unroll_steps + 1], 0.)
+        batch_target_values = np.where(valid, value_list, 0.)
         return batch_rewards, batch_target_values
 
     # @profile
@@ -591,9 +641,11 @@ class MuZeroGameBuffer(GameBuffer):
                 else:
                     roots.prepare_no_noise(reward_pool, policy_logits_pool, to_play)
                 # do MCTS for a new policy with the recent target model
-                with self._origin_search_timer:
+                origin_search_timer = EasyTimer()
+                with origin_search_timer:
                     MCTSCtree(self._cfg).search(roots, model, latent_state_roots, to_play)
-                self.origin_search_time += self._origin_search_timer.value
+                with self._search_time_lock:
+                    self.origin_search_time += origin_search_timer.value
             else:
                 # python mcts_tree
                 roots = MCTSPtree.roots(transition_batch_size, legal_actions)
@@ -609,7 +661,9 @@ class MuZeroGameBuffer(GameBuffer):
             roots_values = roots.get_values()
             policy_index = 0
             # NOTE: It is very important to use the latest MCTS visit count distribution.
-            for state_index, child_visit, game_index in zip(pos_in_game_segment_list, child_visits, batch_index_list):
+            for state_index, child_visit, root_value, game_index in zip(
+                    pos_in_game_segment_list, child_visits, root_values, batch_index_list
+            ):
                 target_policies = []
 
                 for current_index in range(state_index, state_index + self._cfg.num_unroll_steps + 1):
@@ -636,7 +690,7 @@ class MuZeroGameBuffer(GameBuffer):
                             # we replace the data at the corresponding location with the latest search results to keep the most up-to-date targets
                             sim_num = sum(distributions)
                             child_visit[current_index] = [visit_count/sim_num for visit_count in distributions]
-                            # root_values[current_index] = searched_value # TODO
+                            root_value[current_index] = searched_value
                             if self._cfg.action_type == 'fixed_action_space':
                                 # for atari/classic_control/box2d environments that only have one player.
                                 sum_visits = sum(distributions)
@@ -682,58 +736,30 @@ class MuZeroGameBuffer(GameBuffer):
             return batch_target_policies_non_re
 
         pos_in_game_segment_list, child_visits, game_segment_lens, action_mask_segment, to_play_segment = policy_non_re_context
+        num_unroll_steps = self._cfg.num_unroll_steps
         game_segment_batch_size = len(pos_in_game_segment_list)
-        transition_batch_size = game_segment_batch_size * (self._cfg.num_unroll_steps + 1)
-
-        to_play, action_mask = self._preprocess_to_play_and_action_mask(
-            game_segment_batch_size, to_play_segment, action_mask_segment, pos_in_game_segment_list
-        )
-
-        if self._cfg.model.continuous_action_space is True:
-            # when the action space of the environment is continuous, action_mask[:] is None.
-            action_mask = [
-                list(np.ones(self._cfg.model.action_space_size, dtype=np.int8)) for _ in range(transition_batch_size)
-            ]
-            # NOTE: in continuous action space env: we set all legal_actions as -1
-            legal_actions = [
-                [-1 for _ in range(self._cfg.model.action_space_size)] for _ in range(transition_batch_size)
-            ]
-        else:
-            legal_actions = [[i for i, x in enumerate(action_mask[j]) if x == 1] for j in range(transition_batch_size)]
-
-        with torch.no_grad():
-            policy_index = 0
-            # 0 -> Invalid target policy for padding outside of game segments,
-            # 1 -> Previous target policy for game segments.
-            policy_mask = []
-            for game_segment_len, child_visit, state_index in zip(game_segment_lens, child_visits,
-                                                                  pos_in_game_segment_list):
-                target_policies = []
-
-                for current_index in range(state_index, state_index + self._cfg.num_unroll_steps + 1):
-                    if current_index < game_segment_len:
-                        policy_mask.append(1)
-                        # NOTE: child_visit is already a distribution
-                        distributions = child_visit[current_index]
-                        if self._cfg.action_type == 'fixed_action_space':
-                            # for atari/classic_control/box2d environments that only have one player.
-                            target_policies.append(distributions)
-                        else:
-                            # for board games that have two players.
-                            policy_tmp = [0 for _ in range(policy_shape)]
-                            for index, legal_action in enumerate(legal_actions[policy_index]):
-                                # only the action in ``legal_action`` the policy logits is nonzero
-                                policy_tmp[legal_action] = distributions[index]
-                            target_policies.append(policy_tmp)
-                    else:
-                        # NOTE: the invalid padding target policy, O is to make sure the correspoding cross_entropy_loss=0
-                        policy_mask.append(0)
-                        target_policies.append([0 for _ in range(policy_shape)])
-
-                    policy_index += 1
-
-                batch_target_policies_non_re.append(target_policies)
-        batch_target_policies_non_re = np.asarray(batch_target_policies_non_re)
+        # the number of transitions of each sample in its game segment, the invalid padding target policies are 0 to
+        # make sure the corresponding cross_entropy_loss=0
+        num_valid = np.clip(np.asarray(game_segment_lens) - np.asarray(pos_in_game_segment_list), 0, num_unroll_steps + 1)
+
+        batch_target_policies_non_re = np.zeros((game_segment_batch_size, num_unroll_steps + 1, policy_shape))
+        for i, (child_visit, state_index) in enumerate(zip(child_visits, pos_in_game_segment_list)):
+            if num_valid[i] == 0:
+                continue
+            # NOTE: child_visit is already a distribution
+            distributions = child_visit[state_index:state_index + num_valid[i]]
+            if self._cfg.action_type == 'fixed_action_space':
+                # for atari/classic_control/box2d environments that only have one player.
+                batch_target_policies_non_re[i, :num_valid[i]] = np.stack(distributions)
+            else:
+                # for board games that have two players, only the action in ``legal_action`` the policy is nonzero
+                legal_actions = np.asarray(action_mask_segment[i][state_index:state_index + num_valid[i]]) == 1
+                batch_target_policies_non_re[i, :num_valid[i]][legal_actions] = np.concatenate(
+                    [
+                        np.asarray(distribution)[:num_legal_actions]
+                        for distribution, num_legal_actions in zip(distributions, legal_actions.sum(axis=1))
+                    ]
+                )
         return batch_target_policies_non_re
 
     def update_priority(self, train_data: List[np.ndarray], batch_priorities: Any) -> None:
@@ -750,7 +776,6 @@ class MuZeroGameBuffer(GameBuffer):
         indices = train_data[0][-3]
         metas = {'make_time': train_data[0][-1], 'batch_priorities': batch_priorities}
         # only update the priorities for data still in replay buffer
-        for i in range(len(indices)):
-            if metas['make_time'][i] > self.clear_time:
-                idx, prio = indices[i], metas['batch_priorities'][i]
-                self.game_pos_priorities[idx] = prio
+        with self.index_lock:
+            still_in_buffer = np.asarray(metas['make_time']) > self.clear_time
+            self.game_pos_priorities[np.asarray(indices)[still_in_buffer]] = np.asarray(metas['batch_priorities'])[still_in_buffer]
@@ -9,6 +9,8 @@ from lzero.mcts.utils import prepare_observation
 from lzero.policy import to_detach_cpu_numpy, concat_output, inverse_scalar_transform
 from .game_buffer_efficientzero import EfficientZeroGameBuffer
 from .game_buffer_rezero_mz import ReZeroMZGameBuffer, compute_all_filters
+from .game_pos_look_up import GamePosLookUp
+from .priority_tree import PriorityTree
 
 # from line_profiler import line_profiler
 
@@ -54,8 +56,8 @@ class ReZeroEZGameBuffer(EfficientZeroGameBuffer, ReZeroMZGameBuffer):
         self.clear_time = 0
 
         self.game_segment_buffer = []
-        self.game_pos_priorities = []
-        self.game_segment_game_pos_look_up = []
+        self.game_pos_priorities = PriorityTree(self._alpha)
+        self.game_segment_game_pos_look_up = GamePosLookUp(self.replay_buffer_size)
 
         # Timers for performance monitoring
         self._compute_target_timer = EasyTimer()
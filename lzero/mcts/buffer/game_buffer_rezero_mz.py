@@ -10,6 +10,8 @@ from lzero.mcts.tree_search.mcts_ptree import MuZeroMCTSPtree as MCTSPtree
 from lzero.mcts.utils import prepare_observation
 from lzero.policy import to_detach_cpu_numpy, concat_output, inverse_scalar_transform
 from .game_buffer_muzero import MuZeroGameBuffer
+from .game_pos_look_up import GamePosLookUp
+from .priority_tree import PriorityTree
 
 # from line_profiler import line_profiler
 if TYPE_CHECKING:
@@ -62,8 +64,8 @@ class ReZeroMZGameBuffer(MuZeroGameBuffer):
         self.clear_time = 0
 
         self.game_segment_buffer = []
-        self.game_pos_priorities = []
-        self.game_segment_game_pos_look_up = []
+        self.game_pos_priorities = PriorityTree(self._alpha)
+        self.game_segment_game_pos_look_up = GamePosLookUp(self.replay_buffer_size)
 
         self._compute_target_timer = EasyTimer()
         self._reuse_search_timer = EasyTimer()
@@ -9,6 +9,8 @@ from lzero.mcts.tree_search.mcts_ptree_sampled import SampledEfficientZeroMCTSPt
 from lzero.mcts.utils import prepare_observation, generate_random_actions_discrete
 from lzero.policy import to_detach_cpu_numpy, concat_output, concat_output_value, inverse_scalar_transform
 from .game_buffer_efficientzero import EfficientZeroGameBuffer
+from .game_pos_look_up import GamePosLookUp
+from .priority_tree import PriorityTree
 
 
 @BUFFER_REGISTRY.register('game_buffer_sampled_efficientzero')
@@ -37,8 +39,8 @@ class SampledEfficientZeroGameBuffer(EfficientZeroGameBuffer):
         self._beta = self._cfg.priority_prob_beta
 
         self.game_segment_buffer = []
-        self.game_pos_priorities = []
-        self.game_segment_game_pos_look_up = []
+        self.game_pos_priorities = PriorityTree(self._alpha)
+        self.game_segment_game_pos_look_up = GamePosLookUp(self.replay_buffer_size)
 
         self.keep_ratio = 1
         self.num_of_collected_episodes = 0
@@ -598,7 +600,6 @@ class SampledEfficientZeroGameBuffer(EfficientZeroGameBuffer):
         batch_index_list = train_data[0][4]
         metas = {'make_time': train_data[0][6], 'batch_priorities': batch_priorities}
         # only update the priorities for data still in replay buffer
-        for i in range(len(batch_index_list)):
-            if metas['make_time'][i] > self.clear_time:
-                idx, prio = batch_index_list[i], metas['batch_priorities'][i]
-                self.game_pos_priorities[idx] = prio
+        with self.index_lock:
+            still_in_buffer = np.asarray(metas['make_time']) > self.clear_time
+            self.game_pos_priorities[np.asarray(batch_index_list)[still_in_buffer]] = np.asarray(metas['batch_priorities'])[still_in_buffer]
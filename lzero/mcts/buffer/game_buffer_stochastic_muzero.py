@@ -5,6 +5,8 @@ from ding.utils import BUFFER_REGISTRY
 
 from lzero.mcts.utils import prepare_observation
 from .game_buffer_muzero import MuZeroGameBuffer
+from .game_pos_look_up import GamePosLookUp
+from .priority_tree import PriorityTree
 
 
 @BUFFER_REGISTRY.register('game_buffer_stochastic_muzero')
@@ -39,8 +41,8 @@ class StochasticMuZeroGameBuffer(MuZeroGameBuffer):
         self.clear_time = 0
 
         self.game_segment_buffer = []
-        self.game_pos_priorities = []
-        self.game_segment_game_pos_look_up = []
+        self.game_pos_priorities = PriorityTree(self._alpha)
+        self.game_segment_game_pos_look_up = GamePosLookUp(self.replay_buffer_size)
 
     def _make_batch(self, batch_size: int, reanalyze_ratio: float) -> Tuple[Any]:
         """
@@ -166,7 +168,6 @@ class StochasticMuZeroGameBuffer(MuZeroGameBuffer):
         indices = train_data[0][3]
         metas = {'make_time': train_data[0][5], 'batch_priorities': batch_priorities}
         # only update the priorities for data still in replay buffer
-        for i in range(len(indices)):
-            if metas['make_time'][i] > self.clear_time:
-                idx, prio = indices[i], metas['batch_priorities'][i]
-                self.game_pos_priorities[idx] = prio
+        with self.index_lock:
+            still_in_buffer = np.asarray(metas['make_time']) > self.clear_time
+            self.game_pos_priorities[np.asarray(indices)[still_in_buffer]] = np.asarray(metas['batch_priorities'])[still_in_buffer]
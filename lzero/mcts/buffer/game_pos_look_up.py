@@ -0,0 +1,129 @@
+from typing import Tuple, Union
+
+import numpy as np
+
+
+class GamePosLookUp(object):
+    """
+    Overview:
+        The look-up table from the transitions of ``GameBuffer`` to their game segments, which replaces the list of
+        ``(game_segment_idx, pos_in_game_segment)`` tuples. The segment indices and positions are kept in two int32
+        rings, and the offset of the first transition of every segment in a third ring, so that removing the oldest
+        segments only advances the heads of the rings and finding how many of them to remove is a binary search.
+        The rings are preallocated with ``capacity`` and doubled when they are full.
+    Interfaces:
+        ``__init__``, ``__len__``, ``__getitem__``, ``append``, ``pop_front``, ``num_segments_to_remove``
+    Properties:
+        ``num_segments``
+    """
+
+    def __init__(self, capacity: int = 1024, segment_capacity: int = 1024) -> None:
+        """
+        Overview:
+            Initialize an empty look-up table.
+        Arguments:
+            - capacity (:obj:`int`): The initial number of transitions, e.g. the ``replay_buffer_size``.
+            - segment_capacity (:obj:`int`): The initial number of game segments.
+        """
+        self._capacity = max(int(capacity), 1)
+        self._head = 0
+        self._size = 0
+        self._segment_idx = np.zeros(self._capacity, dtype=np.int32)
+        self._pos = np.zeros(self._capacity, dtype=np.int32)
+        # The offsets are counted from the first transition ever appended, so that they never change.
+        self._segment_capacity = max(int(segment_capacity), 1)
+        self._segment_head = 0
+        self._num_segments = 0
+        self._segment_start = np.zeros(self._segment_capacity, dtype=np.int64)
+        self._num_appended = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def num_segments(self) -> int:
+        return self._num_segments
+
+    def __getitem__(self, index: Union[int, np.ndarray]) -> Tuple[Union[int, np.ndarray], Union[int, np.ndarray]]:
+        """
+        Overview:
+            The game segment index and the position in the game segment of the ``index``-th transition of the buffer.
+            With an array of indices, the two arrays of them are returned.
+        """
+        index = np.asarray(index)
+        if np.any((index >= self._size) | (index < 0)):
+            raise IndexError('game position index out of range')
+        slots = (self._head + index) % self._capacity
+        if slots.ndim == 0:
+            return int(self._segment_idx[slots]), int(self._pos[slots])
+        return self._segment_idx[slots], self._pos[slots]
+
+    @staticmethod
+    def _grow(ring: np.ndarray, head: int, size: int, capacity: int) -> np.ndarray:
+        # Move the ``size`` items from ``head`` to the front of a ring of ``capacity``.
+        new_ring = np.zeros(capacity, dtype=ring.dtype)
+        new_ring[:size] = np.take(ring, np.arange(head, head + size), mode='wrap')
+        return new_ring
+
+    def append(self, game_segment_idx: int, length: int) -> None:
+        """
+        Overview:
+            Append the ``length`` transitions of the game segment ``game_segment_idx`` at the end of the buffer.
+        """
+        if self._size + length > self._capacity:
+            capacity = max(2 * self._capacity, self._size + length)
+            self._segment_idx = self._grow(self._segment_idx, self._head, self._size, capacity)
+            self._pos = self._grow(self._pos, self._head, self._size, capacity)
+            self._capacity, self._head = capacity, 0
+        if self._num_segments == self._segment_capacity:
+            capacity = 2 * self._segment_capacity
+            self._segment_start = self._grow(self._segment_start, self._segment_head, self._num_segments, capacity)
+            self._segment_capacity, self._segment_head = capacity, 0
+
+        slots = (self._head + self._size + np.arange(length)) % self._capacity
+        self._segment_idx[slots] = game_segment_idx
+        self._pos[slots] = np.arange(length)
+        self._size += length
+        self._segment_start[(self._segment_head + self._num_segments) % self._segment_capacity] = self._num_appended
+        self._num_segments += 1
+        self._num_appended += length
+
+    def _offset(self, num_segments: int) -> int:
+        # The number of the transitions of the ``num_segments`` oldest game segments.
+        if num_segments >= self._num_segments:
+            return self._size
+        first = self._segment_start[self._segment_head]
+        return int(self._segment_start[(self._segment_head + num_segments) % self._segment_capacity] - first)
+
+    def pop_front(self, num_segments: int) -> int:
+        """
+        Overview:
+            Remove the transitions of the ``num_segments`` oldest game segments.
+        Returns:
+            - num_transitions (:obj:`int`): The number of the removed transitions.
+        """
+        num_segments = min(num_segments, self._num_segments)
+        num_transitions = self._offset(num_segments)
+        self._head = (self._head + num_transitions) % self._capacity
+        self._size -= num_transitions
+        self._segment_head = (self._segment_head + num_segments) % self._segment_capacity
+        self._num_segments -= num_segments
+        return num_transitions
+
+    def num_segments_to_remove(self, max_num_transitions: float) -> Tuple[int, int]:
+        """
+        Overview:
+            Find the minimum number (at least 1) of the oldest game segments to remove, so that at most \
+            ``max_num_transitions`` transitions are left.
+        Returns:
+            - num_segments (:obj:`int`): The number of the game segments to remove.
+            - num_transitions (:obj:`int`): The number of the transitions left after the removal.
+        """
+        low, high = 1, max(self._num_segments, 1)
+        while low < high:
+            mid = (low + high) // 2
+            if self._size - self._offset(mid) <= max_num_transitions:
+                high = mid
+            else:
+                low = mid + 1
+        return low, self._size - self._offset(low)
@@ -1,11 +1,147 @@
 import copy
-from typing import List, Tuple
+from typing import Any, Iterator, List, Tuple, Union
 
 import numpy as np
 from easydict import EasyDict
 
 from ding.utils.compression_helper import jpeg_data_decompressor
 
+from .obs_codec import create_obs_codec
+
+
+class _Column(object):
+    """
+    Overview:
+        A preallocated array which a ``GameSegment`` appends its per-step items to, instead of a Python list that is
+        converted to an array when the segment is full. The storage is allocated with the shape and dtype of the first
+        item and doubled when it is full. Items which are not numeric arrays (e.g. ``None`` or the jpeg strings of
+        ``transform2string``) are kept in an object array, and converted as ``np.array`` converts the list of them.
+        With ``ragged=True``, the items are 1-dim rows of different lengths, e.g. the visit count distributions over
+        the legal actions of board games, which are stored zero-padded to the widest row.
+    """
+
+    def __init__(self, capacity: int, is_float: bool = False, ragged: bool = False) -> None:
+        self._capacity = max(int(capacity), 1)
+        self._is_float = is_float
+        self._ragged = ragged
+        self._data = None
+        self._size = 0
+        if ragged:
+            self._lengths = np.zeros(self._capacity, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _allocate(self, item: Any) -> None:
+        item = np.asarray(item)
+        if item.dtype.kind not in 'biuf' or (self._ragged and item.ndim != 1):
+            self._data = np.empty(self._capacity, dtype=object)
+            self._ragged = False
+            return
+        dtype = np.result_type(item.dtype, np.float32) if self._is_float else item.dtype
+        shape = (max(len(item), 1), ) if self._ragged else item.shape
+        self._data = np.zeros((self._capacity, ) + shape, dtype=dtype)
+
+    def _to_object(self) -> None:
+        # Fall back to the object array, e.g. when an item has another shape than the first one.
+        items = list(self)
+        self._data = np.empty(self._capacity, dtype=object)
+        for i, item in enumerate(items):
+            self._data[i] = item
+        self._ragged = False
+
+    def _reserve(self, size: int) -> None:
+        if size <= self._capacity:
+            return
+        self._capacity = max(2 * self._capacity, size)
+        data = np.zeros((self._capacity, ) + self._data.shape[1:], dtype=self._data.dtype)
+        if data.dtype == object:
+            data[:] = None
+        data[:self._size] = self._data[:self._size]
+        self._data = data
+        if self._ragged:
+            self._lengths = np.concatenate([self._lengths, np.zeros(self._capacity - len(self._lengths), np.int64)])
+
+    def _set(self, index: int, item: Any) -> None:
+        if self._data.dtype == object:
+            self._data[index] = item
+        elif self._ragged:
+            row = np.asarray(item)
+            if row.ndim != 1:
+                raise ValueError('the rows of a ragged column must be 1-dim')
+            if len(row) > self._data.shape[1]:
+                data = np.zeros((self._capacity, len(row)), dtype=self._data.dtype)
+                data[:, :self._data.shape[1]] = self._data
+                self._data = data
+            self._data[index, :len(row)] = row
+            self._data[index, len(row):] = 0
+            self._lengths[index] = len(row)
+        else:
+            self._data[index] = item
+
+    def _assign(self, index: int, item: Any) -> None:
+        try:
+            self._set(index, item)
+        except (ValueError, TypeError):
+            self._to_object()
+            self._set(index, item)
+
+    def __setitem__(self, index: int, item: Any) -> None:
+        if not -self._size <= index < self._size:
+            raise IndexError('column index out of range')
+        self._assign(index % self._size, item)
+
+    def append(self, item: Any) -> None:
+        if self._data is None:
+            self._allocate(item)
+        elif self._size == self._capacity:
+            self._reserve(self._size + 1)
+        self._assign(self._size, item)
+        self._size += 1
+
+    def extend(self, items: Any) -> None:
+        for item in items:
+            self.append(item)
+
+    def __getitem__(self, key: Union[int, slice]) -> Any:
+        if self._data is None:
+            return [][key]
+        if self._ragged:
+            if isinstance(key, slice):
+                return [self._data[i, :self._lengths[i]] for i in range(*key.indices(self._size))]
+            if not -self._size <= key < self._size:
+                raise IndexError('column index out of range')
+            key %= self._size
+            return self._data[key, :self._lengths[key]]
+        return self._data[:self._size][key]
+
+    def __iter__(self) -> Iterator:
+        return (self[i] for i in range(self._size))
+
+    def to_array(self) -> np.ndarray:
+        """
+        Overview:
+            The items as the array which ``np.array`` of the list of them would give. The rows of a ragged column \
+            of different lengths are returned in an object array, as ``game_segment_to_array`` does for lists.
+        """
+        if self._data is None:
+            return np.array([])
+        if self._data.dtype == object:
+            return np.array(self._data[:self._size].tolist())
+        if self._ragged:
+            lengths = self._lengths[:self._size]
+            if np.all(lengths == lengths[0]):
+                return self._data[:self._size, :lengths[0]].copy()
+            array = np.empty(self._size, dtype=object)
+            for i in range(self._size):
+                array[i] = self[i]
+            return array
+        # A full segment fills its preallocated storage, which is then kept without copying it. The storage of a
+        # shorter one, e.g. the last segment of an episode, is only copied when a quarter of it would be wasted.
+        if 4 * self._size >= 3 * self._capacity:
+            return self._data[:self._size]
+        return self._data[:self._size].copy()
+
 
 class GameSegment:
     """
@@ -38,6 +174,9 @@ class GameSegment:
         Arguments:
              action_space (:obj:`int`): action space
             - game_segment_length (:obj:`int`): the transition number of one ``GameSegment`` block
+            - config (:obj:`EasyDict`): The policy config. With ``columnar_game_segment=True``, the segment is stored \
+                in preallocated ``_Column`` arrays instead of Python lists. With ``obs_codec``, the observations are \
+                stored encoded by the ``ObsCodec`` of that name.
         """
         self.action_space = action_space
         self.game_segment_length = game_segment_length
@@ -58,29 +197,54 @@ class GameSegment:
         elif len(config.model.observation_shape) == 3:
             # image obs input, e.g. atari environments
             self.zero_obs_shape = (config.model.image_channel, config.model.observation_shape[-2], config.model.observation_shape[-1])
+        self.columnar = config.get('columnar_game_segment', False)
+        self.obs_codec = create_obs_codec(config.get('obs_codec'), getattr(self, 'zero_obs_shape', None))
 
-        self.obs_segment = []
-        self.action_segment = []
-        self.reward_segment = []
-
-        self.child_visit_segment = []
-        self.root_value_segment = []
-
-        self.action_mask_segment = []
-        self.to_play_segment = []
+        self._init_segments()
+        self.improved_policy_probs = self._new_segment(game_segment_length + self.num_unroll_steps + self.td_steps, True)
 
         self.target_values = []
         self.target_rewards = []
         self.target_policies = []
 
-        self.improved_policy_probs = []
-
         if self.sampled_algo:
+            # NOTE: the sampled buffers concatenate slices of it with lists, so it is always a list.
             self.root_sampled_actions = []
-        if self.use_ture_chance_label_in_chance_encoder:
-            self.chance_segment = []
 
-    def get_unroll_obs(self, timestep: int, num_unroll_steps: int = 0, padding: bool = False) -> np.ndarray:
+    def _new_segment(self, capacity: int, is_float: bool = False, ragged: bool = False) -> List:
+        """
+        Overview:
+            An empty container of the per-step items, a list or a ``_Column`` preallocated with ``capacity``.
+        """
+        return _Column(capacity, is_float, ragged) if self.columnar else []
+
+    def _init_segments(self) -> None:
+        """
+        Overview:
+            Create the empty segments. The capacities are the lengths of a full segment in ``game_segment_to_array``.
+        """
+        length, unroll, td = self.game_segment_length, self.num_unroll_steps, self.td_steps
+        if self.obs_codec is None or self.obs_codec.fixed_size:
+            self.obs_segment = self._new_segment(self.frame_stack_num + length + unroll)
+        else:
+            self.obs_segment = []
+        self.action_segment = self._new_segment(length)
+        self.reward_segment = self._new_segment(length + unroll + td - 1, True)
+
+        self.child_visit_segment = self._new_segment(length + unroll, True, ragged=True)
+        self.root_value_segment = self._new_segment(length + unroll + td, True)
+
+        self.action_mask_segment = self._new_segment(length)
+        self.to_play_segment = self._new_segment(length)
+        if self.use_ture_chance_label_in_chance_encoder:
+            self.chance_segment = self._new_segment(length + unroll + td)
+        # The training iteration of the target model which the child visits and root values were last reanalyzed with,
+        # -1 for the results of the self-play search.
+        self.reanalyze_version = -1
+
+    def get_unroll_obs(
+            self, timestep: int, num_unroll_steps: int = 0, padding: bool = False, decode: bool = True
+    ) -> np.ndarray:
         """
         Overview:
             Get an observation of the correct format: o[t, t + stack frames + num_unroll_steps].
@@ -88,8 +252,14 @@ class GameSegment:
             - timestep (int): The time step.
             - num_unroll_steps (int): The extra length of the observation frames.
             - padding (bool): If True, pad frames if (t + stack frames) is outside of the trajectory.
+            - decode (bool): If False, return the frames encoded by ``obs_codec``, to decode the frames of a batch at \
+                once. ``padding`` is not supported then.
         """
         stacked_obs = self.obs_segment[timestep:timestep + self.frame_stack_num + num_unroll_steps]
+        if self.obs_codec is not None:
+            if not decode:
+                return stacked_obs
+            stacked_obs = self.obs_codec.decode(stacked_obs)
         if padding:
             pad_len = self.frame_stack_num + num_unroll_steps - len(stacked_obs)
             if pad_len > 0:
@@ -122,6 +292,8 @@ class GameSegment:
         )
         timestep = timestep_reward
         stacked_obs = self.obs_segment[timestep:timestep + self.frame_stack_num]
+        if self.obs_codec is not None:
+            stacked_obs = list(self.obs_codec.decode(stacked_obs))
         if self.transform2string:
             stacked_obs = [jpeg_data_decompressor(obs, self.gray_scale) for obs in stacked_obs]
         return stacked_obs
@@ -140,7 +312,7 @@ class GameSegment:
             Append a transition tuple, including a_t, o_{t+1}, r_{t}, action_mask_{t}, to_play_{t}.
         """
         self.action_segment.append(action)
-        self.obs_segment.append(obs)
+        self.obs_segment.append(obs if self.obs_codec is None else self.obs_codec.encode(obs))
         self.reward_segment.append(reward)
 
         self.action_mask_segment.append(action_mask)
@@ -176,8 +348,12 @@ class GameSegment:
             assert len(next_segment_improved_policy) <= self.num_unroll_steps + self.td_steps
 
         # NOTE: next block observation should start from (stacked_observation - 1) in next trajectory
-        for observation in next_segment_observations:
-            self.obs_segment.append(copy.deepcopy(observation))
+        if self.columnar:
+            # the observations are copied into the preallocated column
+            self.obs_segment.extend(next_segment_observations)
+        else:
+            for observation in next_segment_observations:
+                self.obs_segment.append(copy.deepcopy(observation))
 
         for reward in next_segment_rewards:
             self.reward_segment.append(reward)
@@ -187,7 +363,7 @@ class GameSegment:
 
         for child_visits in next_segment_child_visits:
             self.child_visit_segment.append(child_visits)
-        
+
         if self.gumbel_algo:
             for improved_policy in next_segment_improved_policy:
                 self.improved_policy_probs.append(improved_policy)
@@ -272,7 +448,24 @@ class GameSegment:
             For environments with a variable action space, such as board games, the elements in `child_visit_segment` may have
             different lengths. In such scenarios, it is necessary to use the object data type for `self.child_visit_segment`.
         """
-        self.obs_segment = np.array(self.obs_segment)
+        if self.obs_codec is not None and not self.obs_codec.fixed_size:
+            self.obs_segment = self.obs_codec.to_array(self.obs_segment)
+        elif self.columnar:
+            self.obs_segment = self.obs_segment.to_array()
+        else:
+            self.obs_segment = np.array(self.obs_segment)
+        if self.columnar:
+            self.action_segment = self.action_segment.to_array()
+            self.reward_segment = self.reward_segment.to_array()
+            self.child_visit_segment = self.child_visit_segment.to_array()
+            self.root_value_segment = self.root_value_segment.to_array()
+            self.improved_policy_probs = self.improved_policy_probs.to_array()
+            self.action_mask_segment = self.action_mask_segment.to_array()
+            self.to_play_segment = self.to_play_segment.to_array()
+            if self.use_ture_chance_label_in_chance_encoder:
+                self.chance_segment = self.chance_segment.to_array()
+            return
+
         self.action_segment = np.array(self.action_segment)
         self.reward_segment = np.array(self.reward_segment)
 
@@ -301,22 +494,17 @@ class GameSegment:
         Arguments:
             - init_observations (:obj:`list`): list of the stack observations in the previous time steps.
         """
-        self.obs_segment = []
-        self.action_segment = []
-        self.reward_segment = []
-
-        self.child_visit_segment = []
-        self.root_value_segment = []
-
-        self.action_mask_segment = []
-        self.to_play_segment = []
-        if self.use_ture_chance_label_in_chance_encoder:
-            self.chance_segment = []
+        self._init_segments()
 
         assert len(init_observations) == self.frame_stack_num
+        if self.obs_codec is not None:
+            init_observations = [self.obs_codec.encode(observation) for observation in init_observations]
 
-        for observation in init_observations:
-            self.obs_segment.append(copy.deepcopy(observation))
+        if self.columnar:
+            self.obs_segment.extend(init_observations)
+        else:
+            for observation in init_observations:
+                self.obs_segment.append(copy.deepcopy(observation))
 
     def is_full(self) -> bool:
         """
@@ -0,0 +1,268 @@
+import os
+import pickle
+import shutil
+from typing import List, Tuple
+
+import numpy as np
+
+from .game_segment import GameSegment
+
+# The per-step arrays of ``GameSegment`` which are stored in the memory-mapped files.
+_COLUMNS = (
+    'obs_segment', 'action_segment', 'reward_segment', 'child_visit_segment', 'root_value_segment',
+    'action_mask_segment', 'to_play_segment', 'chance_segment', 'improved_policy_probs'
+)
+
+
+def _is_ragged(array: np.ndarray) -> bool:
+    # An object array of 1-D numeric rows, e.g. the child visits of the varied action spaces.
+    return array.dtype == object and array.ndim == 1 and all(
+        np.ndim(row) == 1 and np.asarray(row).dtype.kind in 'biuf' for row in array
+    )
+
+
+class GameSegmentStore(object):
+    """
+    Overview:
+        The disk storage of the game segments of ``GameBuffer``, which keeps the per-step arrays of the segments in
+        memory-mapped files under ``directory`` instead of process memory, so that the buffer can be larger than the
+        RAM and is reopened after a restart. Every ``shard_size`` pushed segments are written to a shard, a directory
+        with one ``.npy`` file per column of the concatenated segments and the pickled remaining attributes, and the
+        arrays of the segments are replaced by views of the files opened with ``mmap_mode='r+'``. The in-place
+        updates of the reanalysis are thus written back to the files, except for the ragged child visits, whose rows
+        are replaced. The shards of the removed segments are deleted.
+        The list of the shards is saved to ``state.npz`` when a shard is written and when segments are removed. The
+        priorities of the stored transitions are saved to ``priorities.npz`` only by ``save_priorities``, e.g. at a
+        checkpoint, since writing them is linear in the size of the buffer. ``load`` returns the segments of the
+        saved state, the segments pushed after the last shard are lost, and the transitions stored after the last
+        ``save_priorities`` get the max priority.
+    Interfaces:
+        ``__init__``, ``load``, ``push``, ``remove``, ``save``, ``save_priorities``, ``flush``
+    Properties:
+        ``num_sealed_transitions``
+    """
+
+    def __init__(self, directory: str, shard_size: int = 64) -> None:
+        """
+        Overview:
+            Initialize the storage in ``directory``, which is created if it does not exist.
+        Arguments:
+            - directory (:obj:`str`): The directory of the shards, e.g. ``./<exp_name>/replay_buffer``.
+            - shard_size (:obj:`int`): The number of the game segments of a shard.
+        """
+        self._directory = directory
+        self._shard_size = shard_size
+        os.makedirs(directory, exist_ok=True)
+        # [shard_id, num_segments] of the shards on disk, from the oldest one.
+        self._shards = []
+        # The number of the removed segments of the oldest shard.
+        self._num_removed = 0
+        # The number of the transitions removed since the storage was created, i.e. the index of the oldest stored
+        # transition among all the stored ones, which aligns the saved priorities with the stored transitions.
+        self._num_removed_transitions = 0
+        self._next_shard_id = 0
+        # The lengths of the segments of the shards which are not removed.
+        self._sealed_lens = []
+        self._pending = []
+
+    @property
+    def num_sealed_transitions(self) -> int:
+        """
+        Overview:
+            The number of the transitions of the stored segments in the shards, which are the oldest ones of the buffer.
+        """
+        return sum(self._sealed_lens)
+
+    def _shard_dir(self, shard_id: int) -> str:
+        return os.path.join(self._directory, f'shard_{shard_id:06d}')
+
+    def load(self) -> Tuple[List[GameSegment], np.ndarray]:
+        """
+        Overview:
+            Open the shards of the saved state.
+        Returns:
+            - game_segments (:obj:`List[GameSegment]`): The stored game segments, from the oldest one.
+            - priorities (:obj:`np.ndarray`): The priorities of their transitions.
+        """
+        state_path = os.path.join(self._directory, 'state.npz')
+        if not os.path.exists(state_path):
+            return [], np.zeros(0)
+        with np.load(state_path) as state:
+            self._shards = state['shards'].tolist()
+            self._num_removed = int(state['num_removed'])
+            self._num_removed_transitions = int(state['num_removed_transitions'])
+            self._next_shard_id = int(state['next_shard_id'])
+        game_segments = []
+        for shard_id, _ in self._shards:
+            game_segments.extend(self._open_shard(shard_id))
+        game_segments = game_segments[self._num_removed:]
+        self._sealed_lens = [len(game_segment) for game_segment in game_segments]
+        priorities = self._load_priorities()
+        # The shards of the segments removed after the state was saved are not deleted yet.
+        live_shards = {shard_id for shard_id, _ in self._shards}
+        for name in os.listdir(self._directory):
+            if name.startswith('shard_') and int(name[len('shard_'):].split('.')[0]) not in live_shards:
+                shutil.rmtree(os.path.join(self._directory, name), ignore_errors=True)
+        return game_segments, priorities
+
+    def _load_priorities(self) -> np.ndarray:
+        # The saved priorities start at the transition ``start`` of all the stored ones, which may be older or newer
+        # than the oldest stored transition now.
+        priorities = np.ones(self.num_sealed_transitions)
+        priorities_path = os.path.join(self._directory, 'priorities.npz')
+        if not os.path.exists(priorities_path):
+            return priorities
+        with np.load(priorities_path) as saved:
+            start = int(saved['start']) - self._num_removed_transitions
+            saved_priorities = saved['priorities']
+        if len(saved_priorities) > 0:
+            priorities[:] = saved_priorities.max()
+        begin, end = max(start, 0), min(start + len(saved_priorities), len(priorities))
+        if begin < end:
+            priorities[begin:end] = saved_priorities[begin - start:end - start]
+        return priorities
+
+    def _open_shard(self, shard_id: int) -> List[GameSegment]:
+        shard_dir = self._shard_dir(shard_id)
+        with open(os.path.join(shard_dir, 'segments.pkl'), 'rb') as f:
+            states, layouts = pickle.load(f)
+        columns = {
+            column: np.load(os.path.join(shard_dir, column + '.npy'), mmap_mode='r+')
+            for column in set().union(*layouts)
+        }
+        game_segments = []
+        for state, layout in zip(states, layouts):
+            game_segment = GameSegment.__new__(GameSegment)
+            game_segment.__dict__.update(state)
+            for column, (start, stop, lengths) in layout.items():
+                data = columns[column][start:stop]
+                if lengths is not None:
+                    rows = np.empty(len(lengths), dtype=object)
+                    offsets = np.concatenate([[0], np.cumsum(lengths)])
+                    for i in range(len(lengths)):
+                        rows[i] = data[offsets[i]:offsets[i + 1]]
+                    data = rows
+                setattr(game_segment, column, data)
+            game_segments.append(game_segment)
+        return game_segments
+
+    def push(self, game_segment: GameSegment) -> bool:
+        """
+        Overview:
+            Add a game segment pushed into the buffer, the pending segments are written to a new shard when there \
+            are ``shard_size`` of them.
+        Returns:
+            - sealed (:obj:`bool`): Whether a shard is written, after which the state should be saved.
+        """
+        self._pending.append(game_segment)
+        if len(self._pending) < self._shard_size:
+            return False
+        self.flush()
+        return True
+
+    def flush(self) -> None:
+        """
+        Overview:
+            Write the pending game segments to a new shard and replace their arrays by the memory-mapped views.
+        """
+        if not self._pending:
+            return
+        shard_id = self._next_shard_id
+        shard_dir = self._shard_dir(shard_id)
+        tmp_dir = shard_dir + '.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        states = [dict(vars(game_segment)) for game_segment in self._pending]
+        layouts = [{} for _ in self._pending]
+        for column in _COLUMNS:
+            arrays = [state.get(column) for state in states]
+            if not all(isinstance(array, np.ndarray) for array in arrays):
+                continue
+            if all(array.dtype != object and array.shape[1:] == arrays[0].shape[1:] for array in arrays):
+                lengths = [None] * len(arrays)
+                parts = arrays
+            elif all(_is_ragged(array) or (array.dtype != object and array.ndim == 2) for array in arrays):
+                # The rows of different lengths are concatenated, e.g. the segments of a board game where the
+                # child visits of some segments have the same length and are a 2-D array.
+                lengths = [[len(row) for row in array] for array in arrays]
+                parts = [np.asarray(row).reshape(-1) for array in arrays for row in array]
+            else:
+                # Keep the arrays which can not be concatenated in the pickle.
+                continue
+            data = np.concatenate(parts) if parts else np.zeros(0)
+            if data.size == 0:
+                continue
+            np.save(os.path.join(tmp_dir, column + '.npy'), data)
+            start = 0
+            for state, layout, array, length in zip(states, layouts, arrays, lengths):
+                stop = start + (len(array) if length is None else sum(length))
+                layout[column] = (start, stop, length)
+                state[column] = None
+                start = stop
+        with open(os.path.join(tmp_dir, 'segments.pkl'), 'wb') as f:
+            pickle.dump((states, layouts), f)
+        os.rename(tmp_dir, shard_dir)
+
+        # Swap the arrays in place, the segments are already in the buffer.
+        for game_segment, opened in zip(self._pending, self._open_shard(shard_id)):
+            for column in layouts[0]:
+                setattr(game_segment, column, getattr(opened, column))
+        self._shards.append([shard_id, len(self._pending)])
+        self._next_shard_id += 1
+        self._sealed_lens.extend(len(game_segment) for game_segment in self._pending)
+        self._pending = []
+
+    def remove(self, num_segments: int) -> List[int]:
+        """
+        Overview:
+            Remove the ``num_segments`` oldest game segments, as ``GameBuffer`` does.
+        Returns:
+            - shard_ids (:obj:`List[int]`): The shards whose segments are all removed, which should be deleted by \
+                ``save`` after the new state is saved.
+        """
+        num_sealed = min(num_segments, len(self._sealed_lens))
+        self._num_removed_transitions += sum(self._sealed_lens[:num_sealed])
+        del self._sealed_lens[:num_sealed]
+        del self._pending[:num_segments - num_sealed]
+        self._num_removed += num_sealed
+        removed_shards = []
+        while self._shards and self._num_removed >= self._shards[0][1]:
+            shard_id, shard_size = self._shards.pop(0)
+            self._num_removed -= shard_size
+            removed_shards.append(shard_id)
+        return removed_shards
+
+    def save(self, removed_shards: List[int] = ()) -> None:
+        """
+        Overview:
+            Save the list of the shards, then delete the ``removed_shards``. The state is replaced atomically, so that \
+            a crash leaves the previous one.
+        """
+        self._save_npz(
+            'state.npz',
+            shards=np.array(self._shards, dtype=np.int64).reshape(-1, 2),
+            num_removed=self._num_removed,
+            num_removed_transitions=self._num_removed_transitions,
+            next_shard_id=self._next_shard_id,
+        )
+        # The views of the removed segments which are still used remain valid after the files are deleted.
+        for shard_id in removed_shards:
+            shutil.rmtree(self._shard_dir(shard_id), ignore_errors=True)
+
+    def save_priorities(self, priorities: np.ndarray) -> None:
+        """
+        Overview:
+            Save the priorities of the ``num_sealed_transitions`` oldest transitions of the buffer.
+        """
+        self._save_npz(
+            'priorities.npz',
+            start=self._num_removed_transitions,
+            priorities=np.asarray(priorities, dtype=np.float64),
+        )
+
+    def _save_npz(self, name: str, **arrays) -> None:
+        path = os.path.join(self._directory, name)
+        with open(path + '.tmp', 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(path + '.tmp', path)
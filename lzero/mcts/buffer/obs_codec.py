@@ -0,0 +1,114 @@
+import zlib
+from abc import ABC, abstractmethod
+from typing import Any, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class ObsCodec(ABC, object):
+    """
+    Overview:
+        The base class of the codecs of the observations stored in ``GameSegment.obs_segment``. The observations are
+        encoded when they are appended to the game segment and decoded when they are read, e.g. by ``get_unroll_obs``.
+    Interfaces:
+        ``__init__``, ``encode``, ``decode``, ``to_array``
+    """
+    # Whether the encoded frames are arrays of the same shape, which can be kept in a preallocated ``_Column``.
+    fixed_size = True
+
+    def __init__(self, obs_shape: Tuple[int, ...]) -> None:
+        """
+        Arguments:
+            - obs_shape (:obj:`Tuple[int, ...]`): The shape of a decoded observation frame.
+        """
+        self.obs_shape = tuple(obs_shape)
+
+    @abstractmethod
+    def encode(self, obs: np.ndarray) -> Any:
+        """
+        Overview:
+            Encode an observation frame.
+        """
+
+    @abstractmethod
+    def decode(self, frames: Sequence[Any]) -> np.ndarray:
+        """
+        Overview:
+            Decode a sequence of encoded frames at once into an array of shape ``(len(frames), *obs_shape)``.
+        """
+
+    def to_array(self, frames: Sequence[Any]) -> np.ndarray:
+        """
+        Overview:
+            The array of the encoded frames of a game segment, see ``GameSegment.game_segment_to_array``.
+        """
+        return np.array(frames)
+
+
+class BoardCodec(ObsCodec):
+    """
+    Overview:
+        Store the observations of one-hot planes, e.g. ``DarkChessEnv.encode_board()`` where plane ``i`` marks the
+        squares of the piece ``i``, as the int8 board of the plane indices, and encode the planes again when they are
+        decoded. A frame of ``C x H x W`` float32 is stored in ``H x W`` bytes.
+    """
+
+    def encode(self, obs: np.ndarray) -> np.ndarray:
+        obs = np.asarray(obs)
+        if obs.shape != self.obs_shape or not np.array_equal(obs.sum(axis=0), np.ones(obs.shape[1:])):
+            raise ValueError(f"the obs_codec 'board' needs one-hot planes of shape {self.obs_shape}")
+        return np.argmax(obs, axis=0).astype(np.int8)
+
+    def decode(self, frames: Sequence[np.ndarray]) -> np.ndarray:
+        boards = np.asarray(frames).reshape((-1, ) + self.obs_shape[1:])
+        layers = np.arange(self.obs_shape[0], dtype=np.int8).reshape(-1, 1, 1)
+        return (boards[:, None] == layers).astype(np.float32)
+
+
+class ZlibCodec(ObsCodec):
+    """
+    Overview:
+        Store the observations as ``zlib`` compressed bytes at the fastest level, e.g. the image frames of Atari,
+        which are losslessly decompressed when they are decoded.
+    """
+    fixed_size = False
+
+    def __init__(self, obs_shape: Tuple[int, ...]) -> None:
+        super().__init__(obs_shape)
+        # The dtype of the frames, which is known from the first encoded one.
+        self.dtype = None
+
+    def encode(self, obs: np.ndarray) -> bytes:
+        obs = np.ascontiguousarray(obs)
+        self.dtype = obs.dtype
+        return zlib.compress(obs.tobytes(), 1)
+
+    def decode(self, frames: Sequence[bytes]) -> np.ndarray:
+        obs = np.empty((len(frames), ) + self.obs_shape, dtype=self.dtype)
+        for i, frame in enumerate(frames):
+            obs[i] = np.frombuffer(zlib.decompress(frame), dtype=self.dtype).reshape(self.obs_shape)
+        return obs
+
+    def to_array(self, frames: Sequence[bytes]) -> np.ndarray:
+        # NOTE: a bytes array of ``np.array`` would strip the trailing zero bytes of the frames.
+        array = np.empty(len(frames), dtype=object)
+        array[:] = list(frames)
+        return array
+
+
+OBS_CODECS = {'board': BoardCodec, 'zlib': ZlibCodec}
+
+
+def create_obs_codec(name: Optional[str], obs_shape: Tuple[int, ...]) -> Optional[ObsCodec]:
+    """
+    Overview:
+        Create the codec of the ``obs_codec`` config, None means the observations are stored as they are.
+    Arguments:
+        - name (:obj:`Optional[str]`): The name of the codec, one of ``OBS_CODECS``.
+        - obs_shape (:obj:`Tuple[int, ...]`): The shape of an observation frame.
+    """
+    if name is None:
+        return None
+    if name not in OBS_CODECS:
+        raise ValueError(f'unknown obs_codec: {name}, the supported ones are {list(OBS_CODECS)}')
+    return OBS_CODECS[name](obs_shape if isinstance(obs_shape, (tuple, list)) else (obs_shape, ))
@@ -0,0 +1,179 @@
+import copy
+import queue
+import threading
+import time
+from typing import Any, Dict, List, TYPE_CHECKING
+
+import torch
+
+if TYPE_CHECKING:
+    from lzero.mcts.buffer.game_buffer import GameBuffer
+
+
+def _copy_target_model(policy: Any) -> torch.nn.Module:
+    """
+    Overview:
+        A copy of the target model of ``policy`` in eval mode, for the threads which compute targets while the \
+        learner updates the weights. The model is copied instead of loaded in place, because the threads may still \
+        be using the previous copy.
+    """
+    target_model = copy.deepcopy(policy._model)
+    target_model.load_state_dict(policy._target_model.state_dict())
+    target_model.eval()
+    return target_model
+
+
+class _TargetModelSnapshot(object):
+    """
+    Overview:
+        The stand-in of the policy which ``GameBuffer.sample`` is called with, which only uses ``_target_model``.
+    """
+
+    def __init__(self, target_model: torch.nn.Module) -> None:
+        self._target_model = target_model
+
+
+class PrefetchSampler(object):
+    """
+    Overview:
+        Prepare the next batches of a ``GameBuffer`` in background threads, so that the learner does not wait for
+        the sampling, the value targets and the reanalysis of each batch. Up to ``prefetch_batch_num`` batches are
+        kept in a bounded queue. The batches are computed with a snapshot of the target model of the policy, which
+        is refreshed by ``sync_target_model`` every ``target_update_freq`` training iterations, so that the workers
+        never read the weights while the learner updates them.
+        The index structures of the buffer are guarded by ``GameBuffer.index_lock``, so new data can be pushed and the
+        priorities updated while the workers sample. A batch sampled before the oldest data was removed is not used to
+        update the priorities, as for the batches sampled synchronously.
+    Interfaces:
+        ``__init__``, ``start``, ``sample``, ``sync_target_model``, ``get_metrics``, ``close``
+    """
+
+    def __init__(
+            self,
+            replay_buffer: "GameBuffer",
+            policy: Any,
+            batch_size: int,
+            prefetch_batch_num: int = 2,
+            prefetch_worker_num: int = 1,
+            target_update_freq: int = 100,
+    ) -> None:
+        """
+        Overview:
+            Initialize the sampler, the workers are started by ``start``.
+        Arguments:
+            - replay_buffer (:obj:`GameBuffer`): The game buffer to sample from.
+            - policy (:obj:`Any`): The policy whose ``_model`` and ``_target_model`` are used for the targets.
+            - batch_size (:obj:`int`): The batch size.
+            - prefetch_batch_num (:obj:`int`): The maximum number of the prepared batches in the queue.
+            - prefetch_worker_num (:obj:`int`): The number of the worker threads.
+            - target_update_freq (:obj:`int`): The number of training iterations between the snapshots of the \
+                target model.
+        """
+        self._replay_buffer = replay_buffer
+        self._policy = policy
+        self._batch_size = batch_size
+        self._prefetch_worker_num = prefetch_worker_num
+        self._target_update_freq = target_update_freq
+
+        self._queue = queue.Queue(maxsize=prefetch_batch_num)
+        self._stop_event = threading.Event()
+        self._workers = []
+        self._error = None
+        self._snapshot = self._take_snapshot()
+        self._snapshot_train_iter = 0
+
+        self._wait_time = 0.
+        self._num_samples = 0
+        self._queue_depth = 0
+
+    def _take_snapshot(self) -> _TargetModelSnapshot:
+        return _TargetModelSnapshot(_copy_target_model(self._policy))
+
+    def start(self) -> None:
+        """
+        Overview:
+            Start the worker threads.
+        """
+        for rank in range(self._prefetch_worker_num):
+            worker = threading.Thread(target=self._worker_loop, name=f'prefetch_sampler{rank}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def _worker_loop(self) -> None:
+        while not self._stop_event.is_set():
+            if self._replay_buffer.get_num_of_transitions() <= self._batch_size:
+                time.sleep(0.01)
+                continue
+            try:
+                with torch.no_grad():
+                    train_data = self._replay_buffer.sample(self._batch_size, self._snapshot)
+            except Exception as e:
+                self._error = e
+                self._stop_event.set()
+                return
+            while not self._stop_event.is_set():
+                try:
+                    self._queue.put(train_data, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+
+    def sample(self) -> List[Any]:
+        """
+        Overview:
+            Get the next prepared batch, waiting for it if the queue is empty.
+        Returns:
+            - train_data (:obj:`List`): List of train data, including current_batch and target_batch.
+        """
+        if not self._workers:
+            raise RuntimeError('the prefetch sampler is not started')
+        start = time.time()
+        while True:
+            try:
+                train_data = self._queue.get(timeout=0.1)
+                break
+            except queue.Empty:
+                if self._error is not None:
+                    raise RuntimeError('the prefetch sampler worker failed') from self._error
+        self._wait_time += time.time() - start
+        self._num_samples += 1
+        self._queue_depth += self._queue.qsize()
+        return train_data
+
+    def sync_target_model(self, train_iter: int) -> None:
+        """
+        Overview:
+            Take a new snapshot of the target model if ``target_update_freq`` training iterations passed since the \
+            last one. The batches which are already in the queue keep the targets of the previous snapshot.
+        Arguments:
+            - train_iter (:obj:`int`): The current training iteration of the learner.
+        """
+        if train_iter - self._snapshot_train_iter >= self._target_update_freq:
+            self._snapshot = self._take_snapshot()
+            self._snapshot_train_iter = train_iter
+
+    def get_metrics(self) -> Dict[str, float]:
+        """
+        Overview:
+            The average time waited for a batch and the average number of the batches left in the queue after it, \
+            since the last call. The wait time is 0 when the workers keep up with the learner.
+        """
+        num_samples = max(self._num_samples, 1)
+        metrics = {
+            'prefetch_wait_time': self._wait_time / num_samples,
+            'prefetch_queue_depth': self._queue_depth / num_samples,
+        }
+        self._wait_time, self._num_samples, self._queue_depth = 0., 0, 0
+        return metrics
+
+    def close(self) -> None:
+        """
+        Overview:
+            Stop and join the worker threads, the prepared batches are dropped.
+        """
+        self._stop_event.set()
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+        while not self._queue.empty():
+            self._queue.get_nowait()
@@ -0,0 +1,173 @@
+from typing import Tuple, Union
+
+import numpy as np
+
+
+class PriorityTree(object):
+    """
+    Overview:
+        The priority index of the transitions in ``GameBuffer``, which replaces the flat ``game_pos_priorities`` array.
+        The priorities are kept in a ring of leaves, in the order of the transitions in the buffer, under a sum tree of
+        ``priority ** alpha + 1e-6`` (the sampling weights of prioritized replay) and a max tree of the priorities.
+        Appending, updating and sampling cost O(log N) per transition, and removing the oldest transitions only moves
+        the head of the ring, so that none of them reallocates or normalizes the priorities of the whole buffer.
+        The capacity is doubled when the ring is full, which is amortized O(1) per appended transition.
+    Interfaces:
+        ``__init__``, ``__len__``, ``__getitem__``, ``__setitem__``, ``append``, ``pop_front``, ``max``, ``total``,
+        ``probs``, ``sample``
+    """
+
+    def __init__(self, alpha: float, capacity: int = 1024) -> None:
+        """
+        Overview:
+            Initialize an empty priority index.
+        Arguments:
+            - alpha (:obj:`float`): The priority exponent of prioritized replay.
+            - capacity (:obj:`int`): The initial number of leaves, rounded up to a power of 2.
+        """
+        self.alpha = alpha
+        self._capacity = 1 << max(int(capacity) - 1, 1).bit_length()
+        self._head = 0
+        self._size = 0
+        self._priorities = np.zeros(self._capacity)
+        # Node 1 is the root and nodes [capacity, 2 * capacity) are the leaves, the children of node i are 2i and 2i+1.
+        self._sum_tree = np.zeros(2 * self._capacity)
+        self._max_tree = np.zeros(2 * self._capacity)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _slots(self, index: Union[int, np.ndarray]) -> Union[int, np.ndarray]:
+        # The slot in the ring of the ``index``-th transition of the buffer.
+        index = np.asarray(index)
+        if np.any((index >= self._size) | (index < -self._size)):
+            raise IndexError('priority index out of range')
+        return (self._head + index % self._size) % self._capacity
+
+    def __getitem__(self, index: Union[int, np.ndarray]) -> Union[float, np.ndarray]:
+        return self._priorities[self._slots(index)]
+
+    def __setitem__(self, index: Union[int, np.ndarray], priority: Union[float, np.ndarray]) -> None:
+        slots = np.atleast_1d(self._slots(index))
+        self._priorities[slots] = priority
+        self._update(slots)
+
+    def _update(self, slots: np.ndarray) -> None:
+        # Recompute the leaves of ``slots`` from their priorities, the slots out of the buffer are emptied.
+        nodes = slots + self._capacity
+        priorities = self._priorities[slots]
+        occupied = (slots - self._head) % self._capacity < self._size
+        self._sum_tree[nodes] = np.where(occupied, priorities ** self.alpha + 1e-6, 0.)
+        self._max_tree[nodes] = np.where(occupied, priorities, 0.)
+        self._update_ancestors(nodes)
+
+    def _update_ancestors(self, nodes: np.ndarray, update_max: bool = True) -> None:
+        # Recompute the ancestors of the leaves ``nodes`` level by level, all the leaves have the same depth.
+        while len(nodes) and nodes[0] > 1:
+            nodes = np.unique(nodes // 2)
+            self._sum_tree[nodes] = self._sum_tree[2 * nodes] + self._sum_tree[2 * nodes + 1]
+            if update_max:
+                self._max_tree[nodes] = np.maximum(self._max_tree[2 * nodes], self._max_tree[2 * nodes + 1])
+
+    def _grow(self, capacity: int) -> None:
+        # Move the transitions to the front of a larger ring and rebuild the trees.
+        priorities = self[np.arange(self._size)] if self._size else np.zeros(0)
+        self.__init__(self.alpha, capacity)
+        self._size = len(priorities)
+        self._priorities[:self._size] = priorities
+        leaves = slice(self._capacity, self._capacity + self._size)
+        self._sum_tree[leaves] = priorities ** self.alpha + 1e-6
+        self._max_tree[leaves] = priorities
+        for level in range(self._capacity.bit_length() - 2, -1, -1):
+            nodes = np.arange(1 << level, 2 << level)
+            self._sum_tree[nodes] = self._sum_tree[2 * nodes] + self._sum_tree[2 * nodes + 1]
+            self._max_tree[nodes] = np.maximum(self._max_tree[2 * nodes], self._max_tree[2 * nodes + 1])
+
+    def append(self, priorities: np.ndarray) -> None:
+        """
+        Overview:
+            Append the priorities of new transitions at the end of the buffer.
+        """
+        priorities = np.asarray(priorities, dtype=np.float64).reshape(-1)
+        if self._size + len(priorities) > self._capacity:
+            self._grow(max(2 * self._capacity, self._size + len(priorities)))
+        slots = (self._head + self._size + np.arange(len(priorities))) % self._capacity
+        self._size += len(priorities)
+        self._priorities[slots] = priorities
+        self._update(slots)
+
+    def pop_front(self, num: int) -> None:
+        """
+        Overview:
+            Remove the priorities of the ``num`` oldest transitions. The indices of the remaining transitions are \
+            shifted by ``num``, as in the list of transitions of the buffer.
+        """
+        num = min(num, self._size)
+        slots = (self._head + np.arange(num)) % self._capacity
+        self._head = (self._head + num) % self._capacity
+        self._size -= num
+        self._update(slots)
+
+    def max(self) -> float:
+        """
+        Overview:
+            The maximum priority in the buffer.
+        """
+        return self._max_tree[1]
+
+    def total(self) -> float:
+        """
+        Overview:
+            The sum of the sampling weights ``priority ** alpha + 1e-6`` in the buffer.
+        """
+        return self._sum_tree[1]
+
+    def probs(self, index: np.ndarray) -> np.ndarray:
+        """
+        Overview:
+            The sampling probabilities of the transitions of ``index``.
+        """
+        return self._sum_tree[self._slots(index) + self._capacity] / self.total()
+
+    def _find(self, prefix_sums: np.ndarray) -> np.ndarray:
+        # Find the slots whose range of cumulative sampling weights contains ``prefix_sums``, by descending the sum
+        # tree from the root for all of them at once. Empty subtrees are never entered, even with rounding errors.
+        nodes = np.ones(len(prefix_sums), dtype=np.int64)
+        while nodes[0] < self._capacity:
+            left = 2 * nodes
+            left_sum = self._sum_tree[left]
+            right = (prefix_sums >= left_sum) & (self._sum_tree[left + 1] > 0)
+            prefix_sums = np.where(right, prefix_sums - left_sum, prefix_sums)
+            nodes = left + right
+        return nodes - self._capacity
+
+    def sample(self, batch_size: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Overview:
+            Sample ``batch_size`` distinct transitions with the probabilities of prioritized replay, as \
+            ``np.random.choice(len(self), batch_size, p=self.probs(...), replace=False)`` does: the duplicates of a \
+            draw are drawn again with the sampled transitions excluded.
+        Returns:
+            - index (:obj:`np.ndarray`): The indices of the sampled transitions in the buffer.
+            - probs (:obj:`np.ndarray`): The sampling probabilities of the sampled transitions.
+        """
+        if batch_size > self._size:
+            raise ValueError('Cannot take a larger sample than the number of transitions when replace=False')
+        total = self.total()
+        slots = np.zeros(0, dtype=np.int64)
+        weights = np.zeros(0)
+        excluded = False
+        while len(slots) < batch_size:
+            found = self._find(np.random.random(batch_size - len(slots)) * self.total())
+            _, first = np.unique(found, return_index=True)
+            found = found[np.sort(first)]
+            slots = np.concatenate([slots, found])
+            weights = np.concatenate([weights, self._sum_tree[found + self._capacity]])
+            if len(slots) < batch_size:
+                # Exclude the sampled transitions from the next draw.
+                self._sum_tree[found + self._capacity] = 0.
+                self._update_ancestors(found + self._capacity, update_max=False)
+                excluded = True
+        if excluded:
+            self._update(slots)
+        return (slots - self._head) % self._capacity, weights / total
@@ -0,0 +1,159 @@
+import threading
+import time
+from typing import Any, Dict, Optional, TYPE_CHECKING
+
+import torch
+
+from .prefetch_sampler import _copy_target_model
+
+if TYPE_CHECKING:
+    from lzero.mcts.buffer.game_buffer_muzero import MuZeroGameBuffer
+    from lzero.mcts.buffer.game_segment import GameSegment
+
+
+class ReanalyzeWorkerPool(object):
+    """
+    Overview:
+        Reanalyze the game segments of a ``MuZeroGameBuffer`` in background threads, instead of the reanalyzed part
+        of every sampled batch. The threads walk the buffer from the oldest game segment to the newest one and start
+        over, and search all the positions of each segment with a snapshot of the target model of the policy. The
+        new child visits and root values are written back into the segment, which is stamped with the training
+        iteration of the snapshot (``GameSegment.reanalyze_version``). With ``reanalyze_worker_num > 0`` in the
+        buffer config, ``sample`` reads these stored targets, so no search is on the critical path of the learner.
+        The snapshot is refreshed by ``sync_target_model`` every ``target_update_freq`` training iterations, after
+        which the segments are reanalyzed again. The segments already reanalyzed with the current snapshot are
+        skipped, the threads wait when all of them are.
+    Interfaces:
+        ``__init__``, ``is_supported``, ``start``, ``sync_target_model``, ``get_metrics``, ``close``
+    """
+
+    @staticmethod
+    def is_supported(replay_buffer: "MuZeroGameBuffer") -> bool:
+        """
+        Overview:
+            Whether the buffer reads the targets stored by the workers. Only ``MuZeroGameBuffer.sample`` skips the \
+            reanalyze of the sampled batch, the buffers which override ``sample`` or the reanalyze of the policy \
+            targets (EfficientZero, Sampled, ReZero, UniZero) still reanalyze inline, and the workers would only \
+            compete with them for the GIL and the ``index_lock``.
+        """
+        from lzero.mcts.buffer.game_buffer_muzero import MuZeroGameBuffer
+        buffer_class = type(replay_buffer)
+        return issubclass(buffer_class, MuZeroGameBuffer) and buffer_class.sample is MuZeroGameBuffer.sample and \
+            buffer_class._compute_target_policy_reanalyzed is MuZeroGameBuffer._compute_target_policy_reanalyzed
+
+    def __init__(
+            self,
+            replay_buffer: "MuZeroGameBuffer",
+            policy: Any,
+            reanalyze_worker_num: int = 1,
+            target_update_freq: int = 100,
+    ) -> None:
+        """
+        Overview:
+            Initialize the pool, the threads are started by ``start``.
+        Arguments:
+            - replay_buffer (:obj:`MuZeroGameBuffer`): The game buffer to reanalyze.
+            - policy (:obj:`Any`): The policy whose ``_model`` and ``_target_model`` are used for the search.
+            - reanalyze_worker_num (:obj:`int`): The number of the worker threads.
+            - target_update_freq (:obj:`int`): The number of training iterations between the snapshots of the \
+                target model.
+        """
+        self._replay_buffer = replay_buffer
+        self._policy = policy
+        self._reanalyze_worker_num = reanalyze_worker_num
+        self._target_update_freq = target_update_freq
+
+        self._stop_event = threading.Event()
+        self._workers = []
+        self._error = None
+        self._target_model = _copy_target_model(policy)
+        self._version = 0
+
+        # The index of the next game segment to reanalyze, counted as ``base_idx`` of the buffer.
+        self._cursor = 0
+        # The ids of the game segments which are being reanalyzed, so that no two threads take the same one.
+        self._in_progress = set()
+        self._num_reanalyzed = 0
+
+    def start(self) -> None:
+        """
+        Overview:
+            Start the worker threads.
+        """
+        for rank in range(self._reanalyze_worker_num):
+            worker = threading.Thread(target=self._worker_loop, name=f'reanalyze_worker{rank}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def _next_game_segment(self, version: int) -> Optional["GameSegment"]:
+        # Take the next game segment which is not reanalyzed with the snapshot of ``version`` yet, None if all are.
+        with self._replay_buffer.index_lock:
+            game_segment_buffer = self._replay_buffer.game_segment_buffer
+            base_idx = self._replay_buffer.base_idx
+            for _ in range(len(game_segment_buffer)):
+                if not base_idx <= self._cursor < base_idx + len(game_segment_buffer):
+                    self._cursor = base_idx
+                game_segment = game_segment_buffer[self._cursor - base_idx]
+                self._cursor += 1
+                if game_segment.reanalyze_version < version and id(game_segment) not in self._in_progress:
+                    self._in_progress.add(id(game_segment))
+                    return game_segment
+        return None
+
+    def _worker_loop(self) -> None:
+        while not self._stop_event.is_set():
+            target_model, version = self._target_model, self._version
+            game_segment = self._next_game_segment(version)
+            if game_segment is None:
+                time.sleep(0.01)
+                continue
+            try:
+                with torch.no_grad():
+                    self._replay_buffer.reanalyze_game_segment(game_segment, target_model, version)
+            except Exception as e:
+                self._error = e
+                self._stop_event.set()
+                return
+            finally:
+                with self._replay_buffer.index_lock:
+                    self._in_progress.discard(id(game_segment))
+            self._num_reanalyzed += 1
+
+    def sync_target_model(self, train_iter: int) -> None:
+        """
+        Overview:
+            Take a new snapshot of the target model if ``target_update_freq`` training iterations passed since the \
+            last one, the game segments are then reanalyzed again with it.
+        Arguments:
+            - train_iter (:obj:`int`): The current training iteration of the learner.
+        """
+        if self._error is not None:
+            raise RuntimeError('the reanalyze worker failed') from self._error
+        if train_iter - self._version >= self._target_update_freq:
+            self._target_model = _copy_target_model(self._policy)
+            self._version = train_iter
+
+    def get_metrics(self) -> Dict[str, float]:
+        """
+        Overview:
+            The number of the game segments reanalyzed since the last call, and the ratio of the game segments in the \
+            buffer which are reanalyzed with the current snapshot of the target model.
+        """
+        with self._replay_buffer.index_lock:
+            versions = [game_segment.reanalyze_version for game_segment in self._replay_buffer.game_segment_buffer]
+        metrics = {
+            'reanalyze_segment_num': self._num_reanalyzed,
+            'reanalyze_fresh_ratio': sum(v >= self._version for v in versions) / max(len(versions), 1),
+        }
+        self._num_reanalyzed = 0
+        return metrics
+
+    def close(self) -> None:
+        """
+        Overview:
+            Stop and join the worker threads.
+        """
+        self._stop_event.set()
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
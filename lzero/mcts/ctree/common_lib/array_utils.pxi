@@ -0,0 +1,77 @@
+# The conversions between the NumPy arrays of the search loop and the std::vector of the ctree, shared by the ctree
+# modules with ``include``. The arrays are read through typed memoryviews and copied with ``memcpy``, so that the
+# network outputs of a simulation are passed to C++ without boxing a Python float for every element. Python lists are
+# still accepted, as they are converted to arrays first.
+from libc.string cimport memcpy
+from libcpp cimport bool as cbool
+from libcpp.vector cimport vector
+import numpy as np
+
+
+cdef vector[float] as_float_vector(object values) except *:
+    cdef const float[::1] view = np.ascontiguousarray(values, dtype=np.float32).reshape(-1)
+    cdef vector[float] cvalues = vector[float](view.shape[0])
+    if view.shape[0] > 0:
+        memcpy(cvalues.data(), &view[0], view.shape[0] * sizeof(float))
+    return cvalues
+
+
+cdef vector[int] as_int_vector(object values) except *:
+    cdef const int[::1] view = np.ascontiguousarray(values, dtype=np.intc).reshape(-1)
+    cdef vector[int] cvalues = vector[int](view.shape[0])
+    if view.shape[0] > 0:
+        memcpy(cvalues.data(), &view[0], view.shape[0] * sizeof(int))
+    return cvalues
+
+
+cdef vector[cbool] as_bool_vector(object values) except *:
+    cdef const unsigned char[::1] view = np.ascontiguousarray(values, dtype=np.bool_).reshape(-1).view(np.uint8)
+    cdef vector[cbool] cvalues = vector[cbool](view.shape[0])
+    cdef Py_ssize_t i
+    for i in range(view.shape[0]):
+        cvalues[i] = view[i] != 0
+    return cvalues
+
+
+cdef vector[vector[float]] as_float_matrix(object values) except *:
+    # e.g. the policy logits of shape ``(batch_size, action_space_size)``, an empty batch may be ``[]``.
+    array = np.ascontiguousarray(values, dtype=np.float32)
+    cdef vector[vector[float]] cvalues
+    if array.size == 0:
+        cvalues.resize(array.shape[0] if array.ndim == 2 else 0)
+        return cvalues
+    cdef const float[:, ::1] view = array.reshape(array.shape[0], -1)
+    cdef Py_ssize_t i, num_columns = view.shape[1]
+    cvalues.resize(view.shape[0])
+    for i in range(view.shape[0]):
+        cvalues[i].resize(num_columns)
+        memcpy(cvalues[i].data(), &view[i, 0], num_columns * sizeof(float))
+    return cvalues
+
+
+cdef object int_vector_to_array(const vector[int] &values):
+    array = np.empty(values.size(), dtype=np.intc)
+    cdef int[::1] view = array
+    if values.size() > 0:
+        memcpy(&view[0], values.data(), values.size() * sizeof(int))
+    return array
+
+
+cdef object float_matrix_to_array(const vector[vector[float]] &values):
+    # The rows have the same length, e.g. the sampled actions of a batch.
+    cdef Py_ssize_t i, num_columns = values[0].size() if values.size() > 0 else 0
+    array = np.empty((values.size(), num_columns), dtype=np.float32)
+    cdef float[:, ::1] view = array
+    for i in range(<Py_ssize_t> values.size()):
+        if num_columns > 0:
+            memcpy(&view[i, 0], values[i].data(), num_columns * sizeof(float))
+    return array
+
+
+cdef object bool_vector_to_array(const vector[cbool] &values):
+    array = np.empty(values.size(), dtype=np.uint8)
+    cdef unsigned char[::1] view = array
+    cdef Py_ssize_t i
+    for i in range(<Py_ssize_t> values.size()):
+        view[i] = values[i]
+    return array.view(np.bool_)
@@ -0,0 +1,162 @@
+// C++11
+
+#include "cthread_pool.h"
+#include <algorithm>
+
+#ifdef _WIN32
+#include <process.h>
+#define CTHREAD_POOL_GETPID _getpid
+#else
+#include <unistd.h>
+#define CTHREAD_POOL_GETPID getpid
+#endif
+
+namespace tools{
+
+    CThreadPool::CThreadPool(){
+        this->num_threads = 1;
+        this->pid = CTHREAD_POOL_GETPID();
+        this->state = new CState();
+    }
+
+    CThreadPool::~CThreadPool(){
+        this->check_fork();
+        this->stop_workers();
+        delete this->state;
+    }
+
+    void CThreadPool::set_num_threads(int num_threads){
+        std::lock_guard<std::mutex> call_lock(this->call_mutex);
+        this->check_fork();
+        num_threads = std::max(num_threads, 1);
+        if(num_threads != this->num_threads){
+            this->stop_workers();
+            this->num_threads = num_threads;
+        }
+    }
+
+    int CThreadPool::get_num_threads(){
+        return this->num_threads;
+    }
+
+    void CThreadPool::check_fork(){
+        // The workers of the parent process do not exist in a forked process, and the mutex of the state may be
+        // locked. The state is dropped without joining the workers, new ones are started by the next loop.
+        if(CTHREAD_POOL_GETPID() != this->pid){
+            this->pid = CTHREAD_POOL_GETPID();
+            this->state = new CState();
+        }
+    }
+
+    void CThreadPool::start_workers(){
+        if(int(this->state->workers.size()) == this->num_threads - 1){
+            return;
+        }
+        this->stop_workers();
+        for(int i = 0; i < this->num_threads - 1; ++i){
+            this->state->workers.emplace_back(CThreadPool::worker_loop, this->state, this->state->generation);
+        }
+    }
+
+    void CThreadPool::stop_workers(){
+        CState *state = this->state;
+        {
+            std::lock_guard<std::mutex> lock(state->mutex);
+            state->stopping = true;
+        }
+        state->start_cv.notify_all();
+        for(auto &worker : state->workers){
+            worker.join();
+        }
+        state->workers.clear();
+        state->stopping = false;
+    }
+
+    void CThreadPool::run_chunks(CState *state){
+        int chunk;
+        while((chunk = state->next_chunk.fetch_add(1)) < state->num_chunks){
+            int begin = int((long long)chunk * state->num / state->num_chunks);
+            int end = int((long long)(chunk + 1) * state->num / state->num_chunks);
+            for(int i = begin; i < end; ++i){
+                (*state->func)(i);
+            }
+        }
+    }
+
+    void CThreadPool::worker_loop(CState *state, int generation){
+        while(true){
+            {
+                std::unique_lock<std::mutex> lock(state->mutex);
+                state->start_cv.wait(lock, [&]{ return state->stopping || state->generation != generation; });
+                if(state->stopping){
+                    return;
+                }
+                generation = state->generation;
+            }
+            CThreadPool::run_chunks(state);
+            {
+                std::lock_guard<std::mutex> lock(state->mutex);
+                state->num_running -= 1;
+                if(state->num_running == 0){
+                    state->done_cv.notify_one();
+                }
+            }
+        }
+    }
+
+    void CThreadPool::parallel_for(int num, const std::function<void(int)> &func){
+        /*
+        Overview:
+            Call ``func(i)`` for ``i`` in ``[0, num)`` on the threads of the pool, and return when all the calls are
+            done. The calls of different ``i`` must be independent. The loop is run on the calling thread alone with
+            one thread, or when the pool is busy with the batch of another thread.
+        */
+        std::unique_lock<std::mutex> call_lock(this->call_mutex, std::defer_lock);
+        if(num <= 1 || !call_lock.try_lock() || this->num_threads <= 1){
+            for(int i = 0; i < num; ++i){
+                func(i);
+            }
+            return;
+        }
+        this->check_fork();
+        this->start_workers();
+
+        CState *state = this->state;
+        {
+            std::lock_guard<std::mutex> lock(state->mutex);
+            state->func = &func;
+            state->num = num;
+            // A few chunks per thread, so that the roots of deeper paths are balanced over the threads.
+            state->num_chunks = std::min(num, 4 * this->num_threads);
+            state->next_chunk = 0;
+            state->num_running = int(state->workers.size());
+            state->generation += 1;
+        }
+        state->start_cv.notify_all();
+        CThreadPool::run_chunks(state);
+
+        std::unique_lock<std::mutex> lock(state->mutex);
+        state->done_cv.wait(lock, [&]{ return state->num_running == 0; });
+    }
+
+    //*********************************************************
+
+    CThreadPool &global_thread_pool(){
+        // NOTE: the pool is never destroyed, so that no worker is joined at the exit of the interpreter while a
+        // daemon thread of Python is in a batch function.
+        static CThreadPool *pool = new CThreadPool();
+        return *pool;
+    }
+
+    void set_num_threads(int num_threads){
+        global_thread_pool().set_num_threads(num_threads);
+    }
+
+    int get_num_threads(){
+        return global_thread_pool().get_num_threads();
+    }
+
+    void parallel_for(int num, const std::function<void(int)> &func){
+        global_thread_pool().parallel_for(num, func);
+    }
+}
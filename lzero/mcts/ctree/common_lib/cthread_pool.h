@@ -0,0 +1,60 @@
+// C++11
+
+#ifndef CTHREAD_POOL_H
+#define CTHREAD_POOL_H
+
+#include <atomic>
+#include <condition_variable>
+#include <functional>
+#include <mutex>
+#include <thread>
+#include <vector>
+
+namespace tools {
+
+    class CThreadPool {
+        /*
+        Overview:
+            The worker threads of the batch functions of a tree, which run the per-root work of a batch (the roots are
+            independent trees) in parallel. The calling thread takes part in the loop, so ``num_threads`` threads work
+            on a batch. The workers are started at the first parallel loop, and started again in a forked process.
+        */
+        public:
+            CThreadPool();
+            ~CThreadPool();
+
+            void set_num_threads(int num_threads);
+            int get_num_threads();
+            void parallel_for(int num, const std::function<void(int)> &func);
+
+        private:
+            struct CState {
+                std::mutex mutex;
+                std::condition_variable start_cv, done_cv;
+                std::vector<std::thread> workers;
+                const std::function<void(int)> *func = nullptr;
+                int num = 0, num_chunks = 0, num_running = 0, generation = 0;
+                bool stopping = false;
+                std::atomic<int> next_chunk{0};
+            };
+
+            int num_threads;
+            long pid;
+            CState *state;
+            // Only one batch at a time is run by the workers, e.g. the searches of the threads of Python.
+            std::mutex call_mutex;
+
+            void check_fork();
+            void start_workers();
+            void stop_workers();
+            static void run_chunks(CState *state);
+            static void worker_loop(CState *state, int generation);
+    };
+
+    CThreadPool &global_thread_pool();
+    void set_num_threads(int num_threads);
+    int get_num_threads();
+    void parallel_for(int num, const std::function<void(int)> &func);
+}
+
+#endif
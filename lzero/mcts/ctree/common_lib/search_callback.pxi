@@ -0,0 +1,22 @@
+# The python side of the native search loop ``search_all`` of the ctree modules, shared with ``include``. The cpp loop
+# runs without the GIL and calls ``call_inference`` once per simulation, which takes the GIL to call the python
+# inference function. An exception of the inference stops the loop, and is raised again by ``search_all``.
+
+
+cdef class InferenceCallback:
+    cdef object inference
+    cdef object error
+
+    def __cinit__(self, object inference):
+        self.inference = inference
+        self.error = None
+
+
+cdef int call_inference(void *context, int current_latent_state_index) noexcept with gil:
+    cdef InferenceCallback callback = <InferenceCallback> context
+    try:
+        callback.inference(current_latent_state_index)
+    except BaseException as error:
+        callback.error = error
+        return -1
+    return 0
@@ -0,0 +1,452 @@
+// A native Dark Chess (暗棋) game state used as the ``simulate_env`` of the AlphaZero MCTS.
+// It follows the rules of ``zoo/board_games/darkchess/envs/darkchess_alphazero_env.py`` in ``self_play_mode``,
+// so that selection, stepping, chance sampling of the flipped chess and terminal detection stay in C++.
+// The legal move generation is the table-driven one of ``darkchess_rules_cython.pyx``.
+//
+// Board (square = row * 4 + col):
+//   8 |  0  1  2  3
+//   ...
+//   1 | 28 29 30 31
+// Piece encoding:
+//   0 ~ 6: K G M R N C P (red), 7 ~ 13: k g m r n c p (black), 14: empty, 15: dark.
+
+#ifndef DARKCHESS_STATE_H
+#define DARKCHESS_STATE_H
+
+#include <algorithm>
+#include <cstdint>
+#include <random>
+#include <stdexcept>
+#include <string>
+#include <utility>
+#include <vector>
+
+namespace darkchess {
+
+const int kBoardHeight = 8;
+const int kBoardWidth = 4;
+const int kNumSquares = 32;
+const int kNumActions = 352;
+const int kNumChess = 14;
+const int kEmpty = 14;
+const int kDark = 15;
+// The number of feature layers of ``current_state``: 16 one-hot layers of the board and 1 layer of the current player.
+const int kNumFeatureLayers = 17;
+
+// Player colors, consistent with ``player_color`` ('U', 'R', 'B') of the python env.
+const int kColorUnknown = 0;
+const int kColorRed = 1;
+const int kColorBlack = 2;
+
+// The initial number of every chess, indexed by chess id.
+const int kInitChessCount[kNumChess] = {1, 2, 2, 2, 2, 2, 5, 1, 2, 2, 2, 2, 2, 5};
+
+// The precomputed geometric tables of the board, built once.
+struct Tables {
+    int action_id[kNumSquares][kNumSquares];
+    int action_src[kNumActions];
+    int action_dst[kNumActions];
+    int neighbor[kNumSquares][4];
+    int neighbor_num[kNumSquares];
+    // Cannon rays in the order of up, down, left, right, from the nearest square to the farthest one.
+    int ray[kNumSquares][4][kBoardHeight - 1];
+    int ray_len[kNumSquares][4];
+    // can_capture[attacker][target] for the capture on an adjacent square. Cannons only capture by jumping.
+    bool can_capture[kNumChess][kNumChess];
+
+    Tables() {
+        for (int src = 0; src < kNumSquares; ++src) {
+            for (int dst = 0; dst < kNumSquares; ++dst) {
+                action_id[src][dst] = -1;
+            }
+        }
+        // Same enumeration order as ``DarkchessEnv.all_actions``: for every square (i, j), the flip action first,
+        // then the moves along the column ending at (i, j), then the moves along the row starting from (i, j).
+        int id = 0;
+        for (int i = 0; i < kBoardHeight; ++i) {
+            for (int j = 0; j < kBoardWidth; ++j) {
+                int dst = i * kBoardWidth + j;
+                set_action(dst, dst, id++);
+                for (int k = 0; k < kBoardHeight; ++k) {
+                    if (k != i) {
+                        set_action(k * kBoardWidth + j, dst, id++);
+                    }
+                }
+                for (int k = 0; k < kBoardWidth; ++k) {
+                    if (k != j) {
+                        set_action(dst, i * kBoardWidth + k, id++);
+                    }
+                }
+            }
+        }
+
+        const int drow[4] = {-1, 1, 0, 0};
+        const int dcol[4] = {0, 0, -1, 1};
+        for (int src = 0; src < kNumSquares; ++src) {
+            neighbor_num[src] = 0;
+            for (int d = 0; d < 4; ++d) {
+                ray_len[src][d] = 0;
+                int row = src / kBoardWidth + drow[d];
+                int col = src % kBoardWidth + dcol[d];
+                if (on_board(row, col)) {
+                    neighbor[src][neighbor_num[src]++] = row * kBoardWidth + col;
+                }
+                while (on_board(row, col)) {
+                    ray[src][d][ray_len[src][d]++] = row * kBoardWidth + col;
+                    row += drow[d];
+                    col += dcol[d];
+                }
+            }
+        }
+
+        for (int attacker = 0; attacker < kNumChess; ++attacker) {
+            for (int target = 0; target < kNumChess; ++target) {
+                // The value of K/k is 7 and the value of P/p is 1.
+                int attacker_value = 7 - attacker % 7;
+                int target_value = 7 - target % 7;
+                if ((attacker < 7) == (target < 7) || attacker % 7 == 5) {
+                    can_capture[attacker][target] = false;
+                } else if (attacker % 7 == 0 && target % 7 == 6) {
+                    can_capture[attacker][target] = false;  // 帥不能吃卒
+                } else if (attacker % 7 == 6 && target % 7 == 0) {
+                    can_capture[attacker][target] = true;  // 兵可以吃將
+                } else {
+                    can_capture[attacker][target] = attacker_value >= target_value;
+                }
+            }
+        }
+    }
+
+private:
+    void set_action(int src, int dst, int id) {
+        action_id[src][dst] = id;
+        action_src[id] = src;
+        action_dst[id] = dst;
+    }
+
+    static bool on_board(int row, int col) {
+        return 0 <= row && row < kBoardHeight && 0 <= col && col < kBoardWidth;
+    }
+};
+
+inline const Tables& tables() {
+    static const Tables t;
+    return t;
+}
+
+inline bool is_own(int chess, int color) {
+    if (color == kColorRed) return 0 <= chess && chess <= 6;
+    if (color == kColorBlack) return 7 <= chess && chess <= 13;
+    return false;
+}
+
+inline bool is_opponent(int chess, int color) {
+    if (color == kColorRed) return 7 <= chess && chess <= 13;
+    if (color == kColorBlack) return 0 <= chess && chess <= 6;
+    return false;
+}
+
+// Mark the legal actions of the player with ``color`` in ``mask`` (if not nullptr) and return their number.
+// If ``stop_at_first`` is true, return as soon as one legal action is found.
+inline int gen_legal_actions(const int* board, int color, int8_t* mask, bool stop_at_first) {
+    const Tables& t = tables();
+    int count = 0;
+    for (int src = 0; src < kNumSquares; ++src) {
+        int chess = board[src];
+        if (chess == kDark) {
+            // 翻棋
+            if (mask) mask[t.action_id[src][src]] = 1;
+            ++count;
+            if (stop_at_first) return count;
+        } else if (is_own(chess, color)) {
+            // 移動到相鄰空格或吃相鄰的子
+            for (int n = 0; n < t.neighbor_num[src]; ++n) {
+                int dst = t.neighbor[src][n];
+                int target = board[dst];
+                if (target == kEmpty || (target < kNumChess && t.can_capture[chess][target])) {
+                    if (mask) mask[t.action_id[src][dst]] = 1;
+                    ++count;
+                    if (stop_at_first) return count;
+                }
+            }
+            if (chess % 7 == 5) {
+                // 炮/包必須隔著一顆棋（含暗子）吃子
+                for (int d = 0; d < 4; ++d) {
+                    bool screen = false;
+                    for (int k = 0; k < t.ray_len[src][d]; ++k) {
+                        int dst = t.ray[src][d][k];
+                        int target = board[dst];
+                        if (target == kEmpty) continue;
+                        if (!screen) {
+                            screen = true;
+                            continue;
+                        }
+                        if (is_opponent(target, color)) {
+                            if (mask) mask[t.action_id[src][dst]] = 1;
+                            ++count;
+                            if (stop_at_first) return count;
+                        }
+                        break;
+                    }
+                }
+            }
+        }
+    }
+    return count;
+}
+
+class DarkchessState {
+public:
+    DarkchessState(int long_catch = 3, int no_eat_flip = 180, unsigned int seed = 0)
+        : long_catch(long_catch), no_eat_flip(no_eat_flip),
+          battle_mode("self_play_mode"), battle_mode_in_simulation_env("self_play_mode") {
+        this->seed(seed);
+        reset(0, nullptr, kColorUnknown, kColorUnknown);
+    }
+
+    // Seed the generator of the flipped chess. A seed of 0 draws a random seed.
+    void seed(unsigned int seed) {
+        rng.seed(seed == 0 ? std::random_device()() : seed);
+    }
+
+    // Reset to ``board`` (all dark if nullptr) with ``start_player`` to play. As in the python env, the counts of the
+    // remaining dark chess are ``init_flipped_chess_count`` if given, otherwise those of a new game.
+    void reset(int start_player, const int* init_board, int color_0, int color_1,
+               const int* init_flipped_chess_count = nullptr) {
+        for (int square = 0; square < kNumSquares; ++square) {
+            board[square] = init_board ? init_board[square] : kDark;
+        }
+        chess_count[kEmpty] = 0;
+        chess_count[kDark] = 0;
+        for (int chess = 0; chess < kNumChess; ++chess) {
+            chess_count[chess] = kInitChessCount[chess];
+            flipped_chess_count[chess] = init_flipped_chess_count ? init_flipped_chess_count[chess] : kInitChessCount[chess];
+            chess_count[kDark] += flipped_chess_count[chess];
+        }
+        player_color[0] = color_0;
+        player_color[1] = color_1;
+        current_player = start_player;
+        continuous_move_count = 0;
+        chance = 0;
+        action_history.clear();
+        undo_stack.clear();
+    }
+
+    // Copy the game state of ``other``, but keep the own generator of the flipped chess.
+    void load(const DarkchessState& other) {
+        std::mt19937 own_rng = rng;
+        *this = other;
+        rng = own_rng;
+    }
+
+    int next_player() const {
+        return 1 - current_player;
+    }
+
+    // Whether ``other`` has the same board, player colors and player to play.
+    bool same_position(const DarkchessState& other) const {
+        return std::equal(board, board + kNumSquares, other.board) && current_player == other.current_player &&
+               player_color[0] == other.player_color[0] && player_color[1] == other.player_color[1];
+    }
+
+    int legal_action_mask(int color, int8_t* mask) const {
+        std::fill(mask, mask + kNumActions, 0);
+        return gen_legal_actions(board, color, mask, false);
+    }
+
+    std::vector<int8_t> legal_action_mask() const {
+        std::vector<int8_t> mask(kNumActions);
+        legal_action_mask(player_color[current_player], mask.data());
+        return mask;
+    }
+
+    std::vector<int> legal_actions() const {
+        int8_t mask[kNumActions];
+        legal_action_mask(player_color[current_player], mask);
+        std::vector<int> actions;
+        for (int action = 0; action < kNumActions; ++action) {
+            if (mask[action]) actions.push_back(action);
+        }
+        return actions;
+    }
+
+    // Whether ``action`` is a flip, whose chess is random.
+    bool is_flip(int action) const {
+        return tables().action_src[action] == tables().action_dst[action];
+    }
+
+    // The exact distribution of the chess revealed by a flip, as (chess, probability) pairs computed from the
+    // remaining dark chess.
+    std::vector<std::pair<int, float>> chance_outcomes() const {
+        std::vector<std::pair<int, float>> outcomes;
+        for (int chess = 0; chess < kNumChess; ++chess) {
+            if (flipped_chess_count[chess] > 0) {
+                outcomes.emplace_back(chess, static_cast<float>(flipped_chess_count[chess]) / chess_count[kDark]);
+            }
+        }
+        return outcomes;
+    }
+
+    // Apply ``action`` of the current player and pass the turn. The chess of a flip is ``flip_chess`` if given,
+    // otherwise it is sampled from the remaining ones.
+    void step(int action, int flip_chess = -1) {
+        const Tables& t = tables();
+        int src = t.action_src[action];
+        int dst = t.action_dst[action];
+        action_history.push_back(action);
+        if (src == dst) {
+            if (flip_chess >= 0 && (flip_chess >= kNumChess || flipped_chess_count[flip_chess] == 0)) {
+                throw std::invalid_argument("the flipped chess is not dark");
+            }
+            chance = flip(src, flip_chess >= 0 ? flip_chess : sample_chess());
+        } else {
+            move(src, dst);
+            chance = 0;
+        }
+        current_player = next_player();
+    }
+
+    // Apply ``action`` like ``step`` and record how to undo it with ``pop_action``. The MCTS walks down the tree with
+    // push_action and walks back to the root with pop_action instead of copying the root state.
+    void push_action(int action, int flip_chess = -1) {
+        const Tables& t = tables();
+        Undo undo;
+        undo.action = action;
+        undo.src_chess = board[t.action_src[action]];
+        undo.dst_chess = board[t.action_dst[action]];
+        undo.player_color[0] = player_color[0];
+        undo.player_color[1] = player_color[1];
+        undo.continuous_move_count = continuous_move_count;
+        undo.chance = chance;
+        undo_stack.push_back(undo);
+        step(action, flip_chess);
+    }
+
+    // Undo the last action applied by push_action.
+    void pop_action() {
+        if (undo_stack.empty()) {
+            throw std::out_of_range("pop_action without a pushed action");
+        }
+        const Tables& t = tables();
+        const Undo& undo = undo_stack.back();
+        int src = t.action_src[undo.action];
+        int dst = t.action_dst[undo.action];
+        if (src == dst) {
+            // 把翻開的棋蓋回去
+            ++chess_count[kDark];
+            ++flipped_chess_count[board[src]];
+        } else if (undo.dst_chess != kEmpty) {
+            ++chess_count[undo.dst_chess];
+        }
+        board[src] = undo.src_chess;
+        board[dst] = undo.dst_chess;
+        player_color[0] = undo.player_color[0];
+        player_color[1] = undo.player_color[1];
+        continuous_move_count = undo.continuous_move_count;
+        chance = undo.chance;
+        current_player = next_player();
+        action_history.pop_back();
+        undo_stack.pop_back();
+    }
+
+    // The same as ``DarkchessEnv.get_done_winner``: the current player wins if the opponent has no legal action, and
+    // the game is drawn after ``no_eat_flip`` moves without capture or flip or after a long catch.
+    std::pair<bool, int> get_done_winner() const {
+        if (gen_legal_actions(board, player_color[next_player()], nullptr, true) == 0) {
+            return std::make_pair(true, current_player);
+        }
+        if (continuous_move_count >= no_eat_flip) {
+            return std::make_pair(true, -1);  // 平手
+        }
+        // 長捉（4 步一循環）
+        int window = long_catch * 4;
+        if (continuous_move_count >= window) {
+            size_t begin = action_history.size() - window;
+            for (int i = 4; i < window; ++i) {
+                if (action_history[begin + i] != action_history[begin + i % 4]) {
+                    return std::make_pair(false, -1);
+                }
+            }
+            return std::make_pair(true, -1);
+        }
+        return std::make_pair(false, -1);
+    }
+
+    // Fill ``out`` with the (17, 8, 4) feature planes of ``DarkchessEnv.current_state``.
+    void current_state(float* out) const {
+        std::fill(out, out + kNumFeatureLayers * kNumSquares, 0.0f);
+        for (int square = 0; square < kNumSquares; ++square) {
+            out[board[square] * kNumSquares + square] = 1.0f;
+            out[(kNumFeatureLayers - 1) * kNumSquares + square] = static_cast<float>(current_player);
+        }
+    }
+
+public:
+    int long_catch;
+    int no_eat_flip;
+    std::string battle_mode;
+    std::string battle_mode_in_simulation_env;
+
+    int board[kNumSquares];
+    // The number of every chess on the board (14: empty, 15: dark).
+    int chess_count[16];
+    // The number of every chess still dark.
+    int flipped_chess_count[kNumChess];
+    int player_color[2];
+    int current_player;
+    int continuous_move_count;
+    int chance;
+    std::vector<int> action_history;
+
+private:
+    // The state overwritten by an action of push_action.
+    struct Undo {
+        int action;
+        int src_chess;
+        int dst_chess;
+        int player_color[2];
+        int continuous_move_count;
+        int chance;
+    };
+    std::vector<Undo> undo_stack;
+
+    int sample_chess() {
+        // 從剩餘的暗子隨機挑一個
+        int rand = std::uniform_int_distribution<int>(0, chess_count[kDark] - 1)(rng);
+        for (int chess = 0; chess < kNumChess; ++chess) {
+            rand -= flipped_chess_count[chess];
+            if (rand < 0) return chess;
+        }
+        return kNumChess - 1;
+    }
+
+    int flip(int square, int chess) {
+        // 第一次翻棋後決定雙方顏色
+        if (player_color[current_player] == kColorUnknown) {
+            player_color[current_player] = chess < 7 ? kColorRed : kColorBlack;
+            player_color[next_player()] = chess < 7 ? kColorBlack : kColorRed;
+        }
+        --chess_count[kDark];
+        --flipped_chess_count[chess];
+        board[square] = chess;
+        continuous_move_count = 0;
+        return chess;
+    }
+
+    void move(int src, int dst) {
+        if (board[dst] != kEmpty) {  // 吃子
+            --chess_count[board[dst]];
+            continuous_move_count = 0;
+        } else {
+            ++continuous_move_count;
+        }
+        board[dst] = board[src];
+        board[src] = kEmpty;
+    }
+
+    std::mt19937 rng;
+};
+
+}  // namespace darkchess
+
+#endif  // DARKCHESS_STATE_H
@@ -5,11 +5,13 @@
 
 // The following lines include the necessary headers to facilitate the implementation of the MCTS algorithm.
 #include "node_alphazero.h"
+#include "darkchess_state.h"
 #include <cmath>
 #include <map>
 #include <random>
 #include <vector>
 #include <pybind11/pybind11.h>
+#include <pybind11/numpy.h>
 #include <pybind11/stl.h>
 #include <functional>
 #include <iostream>
@@ -29,18 +31,63 @@ class MCTS {
     double root_dirichlet_alpha;
     double root_noise_weight;
     py::object simulate_env;
+    // The number of leaves selected with virtual loss and evaluated in one forward call by get_next_actions.
+    int leaf_batch_size;
+    // The value penalty of a pending visit in get_next_actions.
+    double virtual_loss;
+    // Set when ``simulate_env`` is a native ``DarkchessState``. The search then runs without python callbacks,
+    // except ``policy_value_func`` for the leaf evaluation.
+    darkchess::DarkchessState* native_env;
+    // Whether the simulations walk down the tree with push_action and undo the actions with pop_action instead of
+    // resetting the simulate env to the root state every time.
+    bool make_unmake;
+    // Whether the actions with a random outcome, i.e. the flips of Dark Chess, are searched with chance nodes.
+    // It requires a native simulate env or a simulate env with make/unmake and chance_outcomes.
+    bool use_chance_node;
+    // Whether chance nodes are used in the current search.
+    bool chance_node;
+    // Whether to keep the subtree reached from the previous root by the played action (and the reply of the
+    // opponent) as the next root of the same tree id. It requires a native simulate env or make/unmake.
+    bool reuse_tree;
+    // Whether to prune the siblings of the played action when the tree is kept. Otherwise the whole tree is kept, so
+    // that it can also be reused if another action is played, at the cost of the memory.
+    bool prune_siblings;
+    // A tree kept from the previous search: the root, the state of the root (the native state, or the arguments of
+    // reset for a python simulate env) and the played action.
+    struct KeptTree {
+        Node* root;
+        darkchess::DarkchessState state;
+        py::tuple reset_args;
+        int action;
+    };
+    std::map<int, KeptTree> trees;
 
 // This part defines the constructor of the MCTS class.
 // The constructor initializes the member variables with the provided arguments or with their default values.
 public:
     MCTS(int max_moves=512, int num_simulations=800,
          double pb_c_base=19652, double pb_c_init=1.25,
-         double root_dirichlet_alpha=0.3, double root_noise_weight=0.25, py::object simulate_env=py::none())
+         double root_dirichlet_alpha=0.3, double root_noise_weight=0.25, py::object simulate_env=py::none(),
+         int leaf_batch_size=8, double virtual_loss=1.0, bool use_chance_node=true,
+         bool reuse_tree=false, bool prune_siblings=true)
         : max_moves(max_moves), num_simulations(num_simulations),
           pb_c_base(pb_c_base), pb_c_init(pb_c_init),
           root_dirichlet_alpha(root_dirichlet_alpha),
           root_noise_weight(root_noise_weight),
-          simulate_env(simulate_env) {}
+          simulate_env(simulate_env),
+          leaf_batch_size(leaf_batch_size), virtual_loss(virtual_loss), native_env(nullptr), make_unmake(false),
+          use_chance_node(use_chance_node), chance_node(false),
+          reuse_tree(reuse_tree), prune_siblings(prune_siblings) {
+        if (py::isinstance<darkchess::DarkchessState>(simulate_env)) {
+            native_env = simulate_env.cast<darkchess::DarkchessState*>();
+        }
+    }
+
+    ~MCTS() {
+        for (auto& kv : trees) {
+            delete kv.second.root;
+        }
+    }
 
     // This function calculates the Upper Confidence Bound (UCB) score for a given node in the MCTS tree based on the parent node's visit count,
     // the child node's visit count, and the child node's prior probability.
@@ -139,9 +186,136 @@ public:
         return leaf_value;
     }
 
+    // The same as ``_select_child`` on the native state, with the legal actions generated once per node.
+    std::pair<int, Node*> _select_child_native(Node* node) {
+        int8_t legal_mask[darkchess::kNumActions];
+        native_env->legal_action_mask(native_env->player_color[native_env->current_player], legal_mask);
+
+        int action = -1;
+        Node* child = nullptr;
+        double best_score = -9999999;
+        for (const auto& kv : node->children) {
+            if (legal_mask[kv.first]) {
+                double score = _ucb_score(node, kv.second);
+                if (score > best_score) {
+                    best_score = score;
+                    action = kv.first;
+                    child = kv.second;
+                }
+            }
+        }
+        if (child == nullptr) {
+            child = node;
+        }
+        return std::make_pair(action, child);
+    }
+
+    // The same as ``_expand_leaf_node`` on the native state. Only ``policy_value_func`` is called in python.
+    double _expand_leaf_node_native(Node* node, py::object policy_value_func) {
+        py::tuple result = policy_value_func(simulate_env);
+        std::map<int, double> action_probs_dict = result[0].cast<std::map<int, double>>();
+        double leaf_value = result[1].cast<double>();
+
+        int8_t legal_mask[darkchess::kNumActions];
+        native_env->legal_action_mask(native_env->player_color[native_env->current_player], legal_mask);
+        for (const auto& kv : action_probs_dict) {
+            if (legal_mask[kv.first]) {
+                node->children[kv.first] = new Node(node, kv.second);
+            }
+        }
+        return leaf_value;
+    }
+
+    // This function selects the outcome of a chance node whose visit count is the most behind its probability, so
+    // that the visits of the outcomes follow the outcome distribution without sampling noise.
+    static std::pair<int, Node*> _select_outcome(Node* node) {
+        int total_visit_count = 0;
+        for (const auto& kv : node->children) {
+            total_visit_count += kv.second->visit_count;
+        }
+        int outcome = -1;
+        Node* child = nullptr;
+        double best_score = -9999999;
+        for (const auto& kv : node->children) {
+            double score = kv.second->prior_p * (total_visit_count + 1) - kv.second->visit_count;
+            if (score > best_score) {
+                best_score = score;
+                outcome = kv.first;
+                child = kv.second;
+            }
+        }
+        return std::make_pair(outcome, child);
+    }
+
+    // This function applies action in the simulate env when walking down the tree. If child is a chance node, it is
+    // expanded with the exact outcome distribution of action the first time, and the outcome is chosen by
+    // _select_outcome instead of being sampled by the simulate env. It returns the chance node, or nullptr, and the
+    // node reached, i.e. the outcome node for a chance node and child otherwise.
+    std::pair<Node*, Node*> _step(int action, Node* child, py::object simulate_env) {
+        if (chance_node && (child->is_chance || child->is_leaf())) {
+            if (!child->is_chance) {
+                py::object outcomes = simulate_env.attr("chance_outcomes")(action);
+                if (!outcomes.is_none()) {
+                    child->is_chance = true;
+                    for (const auto& outcome : outcomes.cast<std::vector<std::pair<int, double>>>()) {
+                        child->children[outcome.first] = new Node(child, outcome.second);
+                    }
+                }
+            }
+            if (child->is_chance) {
+                std::pair<int, Node*> outcome = _select_outcome(child);
+                simulate_env.attr("push_action")(action, outcome.first);
+                return std::make_pair(child, outcome.second);
+            }
+        }
+        if (make_unmake) {
+            simulate_env.attr("push_action")(action);
+        } else {
+            simulate_env.attr("step")(action);
+        }
+        return std::make_pair(static_cast<Node*>(nullptr), child);
+    }
+
+    // The same as ``_step`` on the native state.
+    std::pair<Node*, Node*> _step_native(int action, Node* child) {
+        if (chance_node && native_env->is_flip(action)) {
+            if (!child->is_chance) {
+                child->is_chance = true;
+                for (const auto& outcome : native_env->chance_outcomes()) {
+                    child->children[outcome.first] = new Node(child, outcome.second);
+                }
+            }
+            std::pair<int, Node*> outcome = _select_outcome(child);
+            native_env->push_action(action, outcome.first);
+            return std::make_pair(child, outcome.second);
+        }
+        native_env->push_action(action);
+        return std::make_pair(static_cast<Node*>(nullptr), child);
+    }
+
+    // This function returns whether the search budget is exhausted after n simulations of every root. The visit
+    // counts of the children of the roots are only collected when the budget checks whether the best action is settled.
+    bool _budget_exhausted(py::object search_budget, int n, const std::vector<Node*>& roots) {
+        py::cpp_function get_visit_counts([&roots]() {
+            std::vector<std::vector<int>> visit_counts;
+            for (Node* root : roots) {
+                std::vector<int> counts;
+                for (const auto& kv : root->children) {
+                    counts.push_back(kv.second->visit_count);
+                }
+                visit_counts.push_back(counts);
+            }
+            return visit_counts;
+        });
+        return search_budget.attr("exhausted")(n, get_visit_counts).cast<bool>();
+    }
+
     // This function returns the next action to take and the probabilities of each action based on the current state and the policy-value function.
-    std::pair<int, std::vector<double>> get_next_action(py::object state_config_for_env_reset, py::object policy_value_func, double temperature, bool sample) {
-        Node* root = new Node();
+    // With a search_budget (lzero.mcts.utils.SearchBudget), the search runs until the budget is exhausted instead of num_simulations.
+    std::pair<int, std::vector<double>> get_next_action(py::object state_config_for_env_reset, py::object policy_value_func, double temperature, bool sample, int tree_id=0, py::object search_budget=py::none()) {
+        if (native_env != nullptr) {
+            return _get_next_action_native(state_config_for_env_reset, policy_value_func, temperature, sample, tree_id, search_budget);
+        }
 
         py::object init_state = state_config_for_env_reset["init_state"];
         if (!init_state.is_none()) {
@@ -152,30 +326,355 @@ public:
         // TODO(pu): polish efficiency
             katago_game_state = py::module::import("pickle").attr("dumps")(katago_game_state);
         }
-        simulate_env.attr("reset")(
+        py::tuple reset_args = py::make_tuple(
             state_config_for_env_reset["start_player_index"].cast<int>(),
             init_state,
             state_config_for_env_reset["katago_policy_init"].cast<bool>(),
             katago_game_state
         );
+        // In play_with_bot_mode, step also plays the move of the bot, so the simulations fall back to reset and step.
+        make_unmake = py::hasattr(simulate_env, "push_action") &&
+                      simulate_env.attr("battle_mode_in_simulation_env").cast<std::string>() == "self_play_mode";
+        // The outcome of a chance node is applied by push_action, so chance nodes require make/unmake.
+        chance_node = use_chance_node && make_unmake && py::hasattr(simulate_env, "chance_outcomes");
 
-        _expand_leaf_node(root, simulate_env, policy_value_func);
+        simulate_env.attr("reset")(*reset_args);
+        // Reuse the subtree of the previous search if the current state is reached from its root.
+        Node* root = _get_root(tree_id, reset_args);
+
+        if (root->is_leaf()) {
+            _expand_leaf_node(root, simulate_env, policy_value_func);
+        }
         if (sample) {
             _add_exploration_noise(root);
         }
-        for (int n = 0; n < num_simulations; ++n) {
-            simulate_env.attr("reset")(
-            state_config_for_env_reset["start_player_index"].cast<int>(),
-            init_state,
-            state_config_for_env_reset["katago_policy_init"].cast<bool>(),
-            katago_game_state
-        );
+        // The visits kept from the previous search count.
+        std::vector<Node*> roots{root};
+        int n = search_budget.is_none() ? root->visit_count : 0;
+        // The budget stops the search at its max_num_simulations at the latest.
+        int max_num_simulations = search_budget.is_none() ? num_simulations : search_budget.attr("max_num_simulations").cast<int>() + 1;
+        for (; n < max_num_simulations; ++n) {
+            if (!search_budget.is_none() && _budget_exhausted(search_budget, n, roots)) {
+                break;
+            }
+            // With make/unmake, every simulation undoes its actions, so the simulate env is already at the root.
+            if (!make_unmake) {
+                simulate_env.attr("reset")(
+                state_config_for_env_reset["start_player_index"].cast<int>(),
+                init_state,
+                state_config_for_env_reset["katago_policy_init"].cast<bool>(),
+                katago_game_state
+            );
+            }
             simulate_env.attr("battle_mode") = simulate_env.attr("battle_mode_in_simulation_env");
             _simulate(root, simulate_env, policy_value_func);
         }
 
+        std::pair<int, std::vector<double>> result = _get_action_from_root(root, simulate_env.attr("action_space").attr("n").cast<int>(), temperature, sample);
+        KeptTree kept;
+        kept.reset_args = reset_args;
+        _keep_tree(tree_id, root, kept, result.first);
+        return result;
+    }
+
+    // The same as ``get_next_action`` on the native state. The state config is parsed once by ``reset``, and every
+    // simulation walks back to the root state with pop_action instead of resetting the env.
+    std::pair<int, std::vector<double>> _get_next_action_native(py::object state_config_for_env_reset, py::object policy_value_func, double temperature, bool sample, int tree_id, py::object search_budget) {
+        chance_node = use_chance_node;
+        make_unmake = true;
+        simulate_env.attr("reset")(
+            state_config_for_env_reset["start_player_index"],
+            state_config_for_env_reset["init_state"],
+            state_config_for_env_reset["katago_policy_init"],
+            state_config_for_env_reset["katago_game_state"]
+        );
+        darkchess::DarkchessState root_state = *native_env;
+        Node* root = _get_root_native(tree_id, root_state);
+
+        if (root->is_leaf()) {
+            _expand_leaf_node_native(root, policy_value_func);
+        }
+        if (sample) {
+            _add_exploration_noise(root);
+        }
+        std::vector<Node*> roots{root};
+        int n = search_budget.is_none() ? root->visit_count : 0;
+        // The budget stops the search at its max_num_simulations at the latest.
+        int max_num_simulations = search_budget.is_none() ? num_simulations : search_budget.attr("max_num_simulations").cast<int>() + 1;
+        for (; n < max_num_simulations; ++n) {
+            if (!search_budget.is_none() && _budget_exhausted(search_budget, n, roots)) {
+                break;
+            }
+            native_env->battle_mode = native_env->battle_mode_in_simulation_env;
+            _simulate_native(root, policy_value_func);
+        }
+
+        std::pair<int, std::vector<double>> result = _get_action_from_root(root, darkchess::kNumActions, temperature, sample);
+        KeptTree kept;
+        kept.state = root_state;
+        _keep_tree(tree_id, root, kept, result.first);
+        return result;
+    }
+
+    // The batched version of get_next_action on the native state, which searches the states of several games together.
+    // In every pass, up to leaf_batch_size leaves are selected from each root, with a virtual loss added along each
+    // selected path so that the following selections spread over the tree. The leaves of all the roots are then
+    // evaluated by a single call of policy_value_batch_func, which takes the stacked current_state of the leaves and
+    // returns the action probs of shape (B, 352) and the values of shape (B, ), and backed up together.
+    // tree_ids are the ids of the games for the tree reuse, which default to the indices of the games.
+    // A search_budget is checked once every pass, in which every root runs leaf_batch_size simulations.
+    std::vector<std::pair<int, std::vector<double>>> get_next_actions(py::list state_configs_for_env_reset, py::object policy_value_batch_func, double temperature, bool sample, py::object tree_ids=py::none(), py::object search_budget=py::none()) {
+        if (native_env == nullptr) {
+            throw std::invalid_argument("get_next_actions requires a native simulate_env (DarkchessState)");
+        }
+        chance_node = use_chance_node;
+        make_unmake = true;
+        size_t num_roots = state_configs_for_env_reset.size();
+        std::vector<int> ids;
+        if (tree_ids.is_none()) {
+            for (size_t i = 0; i < num_roots; ++i) {
+                ids.push_back(static_cast<int>(i));
+            }
+        } else {
+            ids = tree_ids.cast<std::vector<int>>();
+        }
+        std::vector<Node*> roots;
+        std::vector<darkchess::DarkchessState> root_states;
+        for (size_t i = 0; i < num_roots; ++i) {
+            py::object state_config = state_configs_for_env_reset[i];
+            simulate_env.attr("reset")(
+                state_config["start_player_index"],
+                state_config["init_state"],
+                state_config["katago_policy_init"],
+                state_config["katago_game_state"]
+            );
+            root_states.push_back(*native_env);
+            roots.push_back(_get_root_native(ids[i], root_states[i]));
+        }
+
+        // Expand all the new roots with one forward call.
+        std::vector<Leaf> leaves;
+        for (size_t i = 0; i < num_roots; ++i) {
+            if (roots[i]->is_leaf()) {
+                native_env->load(root_states[i]);
+                leaves.push_back(_make_leaf(roots[i], std::vector<Node*>{roots[i]}));
+            }
+        }
+        _expand_leaf_nodes_native(leaves, policy_value_batch_func, false);
+        if (sample) {
+            for (Node* root : roots) {
+                _add_exploration_noise(root);
+            }
+        }
+
+        // The visits kept from the previous search count. With a search budget, every root runs until the budget is
+        // exhausted instead.
+        std::vector<int> simulation_counts(num_roots, 0);
+        int max_num_simulations = num_simulations;
+        if (search_budget.is_none()) {
+            for (size_t i = 0; i < num_roots; ++i) {
+                simulation_counts[i] = std::min(roots[i]->visit_count, num_simulations);
+            }
+        } else {
+            max_num_simulations = search_budget.attr("max_num_simulations").cast<int>();
+        }
+        while (!search_budget.is_none() || *std::min_element(simulation_counts.begin(), simulation_counts.end()) < max_num_simulations) {
+            int n = *std::min_element(simulation_counts.begin(), simulation_counts.end());
+            if (!search_budget.is_none() && _budget_exhausted(search_budget, n, roots)) {
+                break;
+            }
+            leaves.clear();
+            for (size_t i = 0; i < num_roots; ++i) {
+                // Every leaf selection walks back to the root state with pop_action.
+                native_env->load(root_states[i]);
+                native_env->battle_mode = native_env->battle_mode_in_simulation_env;
+                int batch = std::min(leaf_batch_size, max_num_simulations - simulation_counts[i]);
+                for (int k = 0; k < batch; ++k) {
+                    simulation_counts[i]++;
+                    _select_leaf_native(roots[i], leaves);
+                }
+            }
+            _expand_leaf_nodes_native(leaves, policy_value_batch_func, true);
+        }
+
+        std::vector<std::pair<int, std::vector<double>>> results;
+        for (size_t i = 0; i < num_roots; ++i) {
+            results.push_back(_get_action_from_root(roots[i], darkchess::kNumActions, temperature, sample));
+            KeptTree kept;
+            kept.state = root_states[i];
+            _keep_tree(ids[i], roots[i], kept, results.back().first);
+        }
+        return results;
+    }
+
+    // This function keeps the tree of root for the next search of tree_id if reuse_tree, otherwise it deletes the tree.
+    // With prune_siblings, only the subtree of the played action is kept.
+    void _keep_tree(int tree_id, Node* root, KeptTree& kept, int action) {
+        auto it = trees.find(tree_id);
+        if (it != trees.end()) {
+            delete it->second.root;
+            trees.erase(it);
+        }
+        if (!(reuse_tree && make_unmake)) {
+            delete root;
+            return;
+        }
+        if (prune_siblings) {
+            for (auto child = root->children.begin(); child != root->children.end();) {
+                if (child->first != action) {
+                    delete child->second;
+                    child = root->children.erase(child);
+                } else {
+                    ++child;
+                }
+            }
+        }
+        kept.root = root;
+        kept.action = action;
+        trees[tree_id] = kept;
+    }
+
+    // This function finds the visited node of the target state below node within depth actions. The simulate env is
+    // at the state of node and walks down with push(action, outcome) and back with pop; is_random(action) tells an
+    // action with random outcome searched without chance node, whose outcomes are merged in one node.
+    Node* _find_state(Node* node, const std::vector<int>& actions, int depth,
+                      const std::function<bool(int)>& is_random, const std::function<void(int, int)>& push,
+                      const std::function<void()>& pop, const std::function<bool()>& is_target) {
+        for (int action : actions) {
+            Node* child = node->children[action];
+            if (child->visit_count == 0) {
+                continue;
+            }
+            std::vector<std::pair<int, Node*>> branches;
+            if (child->is_chance) {
+                for (const auto& kv : child->children) {
+                    branches.push_back(kv);
+                }
+            } else if (!is_random(action)) {
+                branches.emplace_back(-1, child);
+            }
+            for (const auto& branch : branches) {
+                Node* next_node = branch.second;
+                if (next_node->visit_count == 0) {
+                    continue;
+                }
+                push(action, branch.first);
+                Node* found = nullptr;
+                if (is_target()) {
+                    found = next_node;
+                } else if (depth > 1) {
+                    std::vector<int> next_actions;
+                    for (const auto& kv : next_node->children) {
+                        next_actions.push_back(kv.first);
+                    }
+                    found = _find_state(next_node, next_actions, depth - 1, is_random, push, pop, is_target);
+                }
+                pop();
+                if (found != nullptr) {
+                    return found;
+                }
+            }
+        }
+        return nullptr;
+    }
+
+    // This function takes the kept tree of tree_id and returns the node found by find(kept, actions) below its root,
+    // detached as the new root, where actions are the actions of the root with the played action first. The rest of
+    // the kept tree is deleted. A new root is returned if there is no kept tree or the state is not found.
+    Node* _reuse_root(int tree_id, const std::function<Node*(const KeptTree&, const std::vector<int>&)>& find) {
+        auto it = trees.find(tree_id);
+        if (it == trees.end()) {
+            return new Node();
+        }
+        KeptTree kept = it->second;
+        trees.erase(it);
+        std::vector<int> actions;
+        if (kept.root->children.count(kept.action)) {
+            actions.push_back(kept.action);
+        }
+        for (const auto& kv : kept.root->children) {
+            if (kv.first != kept.action) {
+                actions.push_back(kv.first);
+            }
+        }
+        Node* root = find(kept, actions);
+        if (root == nullptr) {
+            delete kept.root;
+            return new Node();
+        }
+        // Detach the subtree from its parent, whose tree is deleted.
+        Node* parent = root->parent;
+        for (auto child = parent->children.begin(); child != parent->children.end(); ++child) {
+            if (child->second == root) {
+                parent->children.erase(child);
+                break;
+            }
+        }
+        root->parent = nullptr;
+        delete kept.root;
+        return root;
+    }
+
+    // This function returns the root of the search of tree_id on the python simulate env, which is at the state reset
+    // by reset_args. The kept tree is reused if the state is reached from its root in at most two actions (the played
+    // action and the reply of the opponent), compared by current_state.
+    Node* _get_root(int tree_id, py::tuple reset_args) {
+        if (!trees.count(tree_id)) {
+            return new Node();
+        }
+        if (!make_unmake) {
+            return _reuse_root(tree_id, [](const KeptTree&, const std::vector<int>&) -> Node* { return nullptr; });
+        }
+        py::object array_equal = py::module::import("numpy").attr("array_equal");
+        py::object target_state = simulate_env.attr("current_state")()[py::int_(0)];
+        bool has_chance_outcomes = py::hasattr(simulate_env, "chance_outcomes");
+        Node* root = _reuse_root(tree_id, [&](const KeptTree& kept, const std::vector<int>& actions) {
+            simulate_env.attr("reset")(*kept.reset_args);
+            return _find_state(
+                kept.root, actions, 2,
+                [&](int action) {
+                    return has_chance_outcomes && !simulate_env.attr("chance_outcomes")(action).is_none();
+                },
+                [&](int action, int outcome) {
+                    if (outcome >= 0) {
+                        simulate_env.attr("push_action")(action, outcome);
+                    } else {
+                        simulate_env.attr("push_action")(action);
+                    }
+                },
+                [&]() { simulate_env.attr("pop_action")(); },
+                [&]() {
+                    return array_equal(simulate_env.attr("current_state")()[py::int_(0)], target_state).cast<bool>();
+                }
+            );
+        });
+        simulate_env.attr("reset")(*reset_args);
+        return root;
+    }
+
+    // The same as _get_root on the native state, which is at root_state.
+    Node* _get_root_native(int tree_id, const darkchess::DarkchessState& root_state) {
+        if (!trees.count(tree_id)) {
+            return new Node();
+        }
+        Node* root = _reuse_root(tree_id, [&](const KeptTree& kept, const std::vector<int>& actions) {
+            native_env->load(kept.state);
+            return _find_state(
+                kept.root, actions, 2,
+                [&](int action) { return native_env->is_flip(action); },
+                [&](int action, int outcome) { native_env->push_action(action, outcome); },
+                [&]() { native_env->pop_action(); },
+                [&]() { return native_env->same_position(root_state); }
+            );
+        });
+        native_env->load(root_state);
+        return root;
+    }
+
+    // This function turns the visit counts of the root children into the action probabilities and picks the action.
+    std::pair<int, std::vector<double>> _get_action_from_root(Node* root, int action_space_n, double temperature, bool sample) {
         std::vector<std::pair<int, int>> action_visits;
-        for (int action = 0; action < simulate_env.attr("action_space").attr("n").cast<int>(); ++action) {
+        for (int action = 0; action < action_space_n; ++action) {
             if (root->children.count(action)) {
                 action_visits.push_back(std::make_pair(action, root->children[action]->visit_count));
             } else {
@@ -208,13 +707,15 @@ public:
 
     // This function performs a simulation from a given node until a leaf node is reached or a terminal state is reached.
     void _simulate(Node* node, py::object simulate_env, py::object policy_value_func) {
+        int num_actions = 0;
         while (!node->is_leaf()) {
             int action;
             std::tie(action, node) = _select_child(node, simulate_env);
             if (action == -1) {
                 break;
             }
-            simulate_env.attr("step")(action);
+            node = _step(action, node, simulate_env).second;
+            num_actions++;
         }
 
         bool done;
@@ -223,39 +724,188 @@ public:
         done = result[0].cast<bool>();
         winner = result[1].cast<int>();
 
+        std::string battle_mode_in_simulation_env = simulate_env.attr("battle_mode_in_simulation_env").cast<std::string>();
         double leaf_value;
         if (!done) {
             leaf_value = _expand_leaf_node(node, simulate_env, policy_value_func);
         }
         else {
-             if (simulate_env.attr("battle_mode_in_simulation_env").cast<std::string>() == "self_play_mode") {
-                if (winner == -1) {
-                    leaf_value = 0;
-                } else {
-                    leaf_value = (simulate_env.attr("current_player").cast<int>() == winner) ? 1 : -1;
-                }
+            leaf_value = _terminal_value(winner, simulate_env.attr("current_player").cast<int>(), battle_mode_in_simulation_env);
+        }
+        _backpropagate(node, leaf_value, battle_mode_in_simulation_env);
+
+        // Walk back to the root for the next simulation.
+        if (make_unmake) {
+            for (int i = 0; i < num_actions; ++i) {
+                simulate_env.attr("pop_action")();
             }
-            else if (simulate_env.attr("battle_mode_in_simulation_env").cast<std::string>() == "play_with_bot_mode") {
-                if (winner == -1) {
-                    leaf_value = 0;
-                } else if (winner == 1) {
-                    leaf_value = 1;
-                } else if (winner == 2) {
-                    leaf_value = -1;
-                }
+        }
+    }
+
+    // The same as ``_simulate`` on the native state: only the leaf evaluation calls into python.
+    void _simulate_native(Node* node, py::object policy_value_func) {
+        int num_actions = 0;
+        while (!node->is_leaf()) {
+            int action;
+            std::tie(action, node) = _select_child_native(node);
+            if (action == -1) {
+                break;
             }
+            node = _step_native(action, node).second;
+            num_actions++;
+        }
+
+        bool done;
+        int winner;
+        std::tie(done, winner) = native_env->get_done_winner();
+
+        double leaf_value;
+        if (!done) {
+            leaf_value = _expand_leaf_node_native(node, policy_value_func);
+        }
+        else {
+            leaf_value = _terminal_value(winner, native_env->current_player, native_env->battle_mode_in_simulation_env);
+        }
+        _backpropagate(node, leaf_value, native_env->battle_mode_in_simulation_env);
+
+        // Walk back to the root for the next simulation.
+        for (int i = 0; i < num_actions; ++i) {
+            native_env->pop_action();
         }
-    if (simulate_env.attr("battle_mode_in_simulation_env").cast<std::string>() == "play_with_bot_mode") {
-        node->update_recursive(leaf_value, simulate_env.attr("battle_mode_in_simulation_env").cast<std::string>());
     }
-    else if (simulate_env.attr("battle_mode_in_simulation_env").cast<std::string>() == "self_play_mode") {
-        node->update_recursive(-leaf_value, simulate_env.attr("battle_mode_in_simulation_env").cast<std::string>());
+
+    // This function returns the value of a terminal state from the view of the player to play.
+    double _terminal_value(int winner, int current_player, const std::string& battle_mode_in_simulation_env) {
+        double leaf_value = 0;
+        if (battle_mode_in_simulation_env == "self_play_mode") {
+            if (winner != -1) {
+                leaf_value = (current_player == winner) ? 1 : -1;
+            }
+        }
+        else if (battle_mode_in_simulation_env == "play_with_bot_mode") {
+            if (winner == 1) {
+                leaf_value = 1;
+            } else if (winner == 2) {
+                leaf_value = -1;
+            }
+        }
+        return leaf_value;
+    }
+
+    // This function backs up the leaf value along the path from the leaf node to the root.
+    void _backpropagate(Node* node, double leaf_value, const std::string& battle_mode_in_simulation_env) {
+        if (battle_mode_in_simulation_env == "play_with_bot_mode") {
+            node->update_recursive(leaf_value, battle_mode_in_simulation_env);
+        }
+        else if (battle_mode_in_simulation_env == "self_play_mode") {
+            node->update_recursive(-leaf_value, battle_mode_in_simulation_env);
+        }
     }
-   }
 
+    // A leaf waiting for the batched evaluation: its node, the search path from the root, the legal action mask and
+    // the current_state of the native state at the leaf.
+    struct Leaf {
+        Node* node;
+        std::vector<Node*> search_path;
+        std::vector<int8_t> legal_mask;
+        std::vector<float> current_state;
+    };
+
+    Leaf _make_leaf(Node* node, std::vector<Node*> search_path) {
+        Leaf leaf;
+        leaf.node = node;
+        leaf.search_path = std::move(search_path);
+        leaf.legal_mask = native_env->legal_action_mask();
+        leaf.current_state.resize(darkchess::kNumFeatureLayers * darkchess::kNumSquares);
+        native_env->current_state(leaf.current_state.data());
+        return leaf;
+    }
+
+    // This function traverses the tree from node to a leaf like _simulate_native, adding a virtual loss to every node
+    // of the path. A terminal leaf is backed up at once, otherwise the leaf is appended to leaves.
+    void _select_leaf_native(Node* node, std::vector<Leaf>& leaves) {
+        std::vector<Node*> search_path{node};
+        node->add_virtual_loss(virtual_loss);
+        size_t num_actions = 0;
+        while (!node->is_leaf()) {
+            int action;
+            std::tie(action, node) = _select_child_native(node);
+            if (action == -1) {
+                break;
+            }
+            Node* chance;
+            std::tie(chance, node) = _step_native(action, node);
+            if (chance != nullptr) {
+                search_path.push_back(chance);
+                chance->add_virtual_loss(virtual_loss);
+            }
+            search_path.push_back(node);
+            node->add_virtual_loss(virtual_loss);
+            num_actions++;
+        }
+
+        bool done;
+        int winner;
+        std::tie(done, winner) = native_env->get_done_winner();
+        if (!done) {
+            leaves.push_back(_make_leaf(node, std::move(search_path)));
+        } else {
+            for (Node* path_node : search_path) {
+                path_node->revert_virtual_loss(virtual_loss);
+            }
+            double leaf_value = _terminal_value(winner, native_env->current_player, native_env->battle_mode_in_simulation_env);
+            _backpropagate(node, leaf_value, native_env->battle_mode_in_simulation_env);
+        }
+
+        // Walk back to the root for the next selection.
+        for (size_t i = 0; i < num_actions; ++i) {
+            native_env->pop_action();
+        }
+    }
 
+    // This function evaluates leaves with one call of policy_value_batch_func, expands them, and backs up their values
+    // after reverting the virtual losses of their paths if backup is true.
+    void _expand_leaf_nodes_native(const std::vector<Leaf>& leaves, py::object policy_value_batch_func, bool backup) {
+        if (leaves.empty()) {
+            return;
+        }
+        const size_t state_size = darkchess::kNumFeatureLayers * darkchess::kNumSquares;
+        py::array_t<float> current_states({static_cast<py::ssize_t>(leaves.size()),
+                                           static_cast<py::ssize_t>(darkchess::kNumFeatureLayers),
+                                           static_cast<py::ssize_t>(darkchess::kBoardHeight),
+                                           static_cast<py::ssize_t>(darkchess::kBoardWidth)});
+        float* states_data = current_states.mutable_data();
+        for (size_t i = 0; i < leaves.size(); ++i) {
+            std::copy(leaves[i].current_state.begin(), leaves[i].current_state.end(), states_data + i * state_size);
+        }
 
+        py::tuple result = policy_value_batch_func(current_states);
+        auto action_probs = py::array_t<float, py::array::c_style | py::array::forcecast>::ensure(result[0]);
+        auto leaf_values = py::array_t<float, py::array::c_style | py::array::forcecast>::ensure(result[1]);
+        if (!action_probs || !leaf_values) {
+            throw std::invalid_argument("policy_value_batch_func must return the action probs and the values as arrays");
+        }
+        const float* probs_data = action_probs.data();
+        const float* values_data = leaf_values.data();
 
+        for (size_t i = 0; i < leaves.size(); ++i) {
+            const Leaf& leaf = leaves[i];
+            // The same leaf may be selected more than once in a batch, it is only expanded the first time.
+            if (leaf.node->is_leaf()) {
+                for (int action = 0; action < darkchess::kNumActions; ++action) {
+                    if (leaf.legal_mask[action]) {
+                        leaf.node->children[action] = new Node(leaf.node, probs_data[i * darkchess::kNumActions + action]);
+                    }
+                }
+            }
+            if (backup) {
+                for (Node* path_node : leaf.search_path) {
+                    path_node->revert_virtual_loss(virtual_loss);
+                }
+                _backpropagate(leaf.node, values_data[i], native_env->battle_mode_in_simulation_env);
+            }
+        }
+    }
 
 private:
     static std::vector<double> visit_count_to_action_distribution(const std::vector<double>& visits, double temperature) {
@@ -316,6 +966,58 @@ private:
 
 };
 
+// This function resets a native ``DarkchessState`` with the same arguments as ``DarkchessEnv.reset``.
+// ``init_state`` is the (8, 4) board or its ``tobytes()``, ``katago_game_state`` is the dict carrying ``player_color``
+// or its pickled bytes.
+void reset_darkchess_state(darkchess::DarkchessState& state, py::object start_player_index, py::object init_state,
+                           py::object katago_policy_init, py::object katago_game_state) {
+    int board[darkchess::kNumSquares];
+    bool has_board = !init_state.is_none();
+    if (has_board) {
+        py::array_t<int64_t> board_array;
+        if (py::isinstance<py::bytes>(init_state)) {
+            board_array = py::module::import("numpy").attr("frombuffer")(init_state, "int64");
+        } else {
+            board_array = py::array_t<int64_t, py::array::c_style | py::array::forcecast>::ensure(init_state);
+        }
+        if (board_array.size() != darkchess::kNumSquares) {
+            throw std::invalid_argument("The board of Dark Chess must have 32 squares");
+        }
+        const int64_t* data = board_array.data();
+        for (int square = 0; square < darkchess::kNumSquares; ++square) {
+            board[square] = static_cast<int>(data[square]);
+        }
+    }
+
+    int color[2] = {darkchess::kColorUnknown, darkchess::kColorUnknown};
+    std::vector<int> flipped_chess_count;
+    if (!katago_game_state.is_none()) {
+        if (py::isinstance<py::bytes>(katago_game_state)) {
+            katago_game_state = py::module::import("pickle").attr("loads")(katago_game_state);
+        }
+        py::object player_color = katago_game_state.attr("get")("player_color", py::none());
+        if (!player_color.is_none()) {
+            std::vector<std::string> player_color_str = player_color.cast<std::vector<std::string>>();
+            for (int i = 0; i < 2; ++i) {
+                color[i] = player_color_str[i] == "R" ? darkchess::kColorRed :
+                           (player_color_str[i] == "B" ? darkchess::kColorBlack : darkchess::kColorUnknown);
+            }
+        }
+        // The counts of the remaining dark chess, from which the probabilities of the flips are computed.
+        py::object flipped_chess_count_obj = katago_game_state.attr("get")("flipped_chess_count", py::none());
+        if (!flipped_chess_count_obj.is_none()) {
+            flipped_chess_count = py::module::import("numpy").attr("asarray")(flipped_chess_count_obj).attr("tolist")().cast<std::vector<int>>();
+            if (flipped_chess_count.size() != darkchess::kNumChess) {
+                throw std::invalid_argument("flipped_chess_count of Dark Chess must have 14 counts");
+            }
+        }
+    }
+
+    int start_player = start_player_index.is_none() ? 0 : start_player_index.cast<int>();
+    state.reset(start_player, has_board ? board : nullptr, color[0], color[1],
+                flipped_chess_count.empty() ? nullptr : flipped_chess_count.data());
+}
+
 // This function uses pybind11 to expose the Node and MCTS classes to Python.
 // This allows Python code to create and manipulate instances of these classes.
 PYBIND11_MODULE(mcts_alphazero, m) {
@@ -326,23 +1028,92 @@ PYBIND11_MODULE(mcts_alphazero, m) {
         .def_property_readonly("value", &Node::get_value)
         .def("update", &Node::update)
         .def("update_recursive", &Node::update_recursive)
+        .def("add_virtual_loss", &Node::add_virtual_loss)
+        .def("revert_virtual_loss", &Node::revert_virtual_loss)
         .def("is_leaf", &Node::is_leaf)
         .def("is_root", &Node::is_root)
         .def("parent", &Node::get_parent)
         .def_readwrite("prior_p", &Node::prior_p)
         .def_readwrite("children", &Node::children)
         .def("add_child", &Node::add_child)
-        .def_readwrite("visit_count", &Node::visit_count);
+        .def_readwrite("visit_count", &Node::visit_count)
+        .def_readwrite("is_chance", &Node::is_chance);
+
+    // A native Dark Chess state with the interface of ``DarkchessEnv`` used by the MCTS, which can be passed to
+    // ``MCTS`` as ``simulate_env``.
+    py::class_<darkchess::DarkchessState>(m, "DarkchessState")
+        .def(py::init<int, int, unsigned int>(),
+             py::arg("long_catch")=3, py::arg("no_eat_flip")=180, py::arg("seed")=0)
+        .def("seed", &darkchess::DarkchessState::seed)
+        .def("reset", &reset_darkchess_state,
+             py::arg("start_player_index")=py::none(), py::arg("init_state")=py::none(),
+             py::arg("katago_policy_init")=false, py::arg("katago_game_state")=py::none())
+        .def("step", &darkchess::DarkchessState::step, py::arg("action"), py::arg("flip_chess")=-1)
+        .def("push_action", &darkchess::DarkchessState::push_action, py::arg("action"), py::arg("flip_chess")=-1)
+        .def("chance_outcomes", [](const darkchess::DarkchessState& state, int action) -> py::object {
+            if (!state.is_flip(action)) {
+                return py::none();
+            }
+            return py::cast(state.chance_outcomes());
+        })
+        .def("pop_action", &darkchess::DarkchessState::pop_action)
+        .def("get_done_winner", &darkchess::DarkchessState::get_done_winner)
+        .def("current_state", [](const darkchess::DarkchessState& state) {
+            py::array_t<float> current_state({darkchess::kNumFeatureLayers, darkchess::kBoardHeight, darkchess::kBoardWidth});
+            state.current_state(current_state.mutable_data());
+            py::array_t<float> current_state_scale({darkchess::kNumFeatureLayers, darkchess::kBoardHeight, darkchess::kBoardWidth});
+            std::copy(current_state.data(), current_state.data() + current_state.size(), current_state_scale.mutable_data());
+            return py::make_tuple(current_state, current_state_scale);
+        })
+        .def("clone", [](const darkchess::DarkchessState& state) {
+            return darkchess::DarkchessState(state);
+        })
+        .def_property_readonly("legal_actions", &darkchess::DarkchessState::legal_actions)
+        .def_property_readonly("legal_action_mask", [](const darkchess::DarkchessState& state) {
+            std::vector<int8_t> mask = state.legal_action_mask();
+            return py::array_t<int8_t>(mask.size(), mask.data());
+        })
+        .def_property_readonly("board", [](const darkchess::DarkchessState& state) {
+            py::array_t<int64_t> board({darkchess::kBoardHeight, darkchess::kBoardWidth});
+            std::copy(state.board, state.board + darkchess::kNumSquares, board.mutable_data());
+            return board;
+        })
+        .def_property_readonly("player_color", [](const darkchess::DarkchessState& state) {
+            const char* names[3] = {"U", "R", "B"};
+            return std::vector<std::string>{names[state.player_color[0]], names[state.player_color[1]]};
+        })
+        .def_readwrite("current_player", &darkchess::DarkchessState::current_player)
+        .def_property_readonly("next_player", &darkchess::DarkchessState::next_player)
+        .def_property_readonly("flipped_chess_count", [](const darkchess::DarkchessState& state) {
+            py::array_t<int64_t> flipped_chess_count(darkchess::kNumChess);
+            std::copy(state.flipped_chess_count, state.flipped_chess_count + darkchess::kNumChess, flipped_chess_count.mutable_data());
+            return flipped_chess_count;
+        })
+        .def_readonly("chance", &darkchess::DarkchessState::chance)
+        .def_readonly("continuous_move_count", &darkchess::DarkchessState::continuous_move_count)
+        .def_readonly("action_history", &darkchess::DarkchessState::action_history)
+        .def_readwrite("long_catch", &darkchess::DarkchessState::long_catch)
+        .def_readwrite("no_eat_flip", &darkchess::DarkchessState::no_eat_flip)
+        .def_readwrite("battle_mode", &darkchess::DarkchessState::battle_mode)
+        .def_readwrite("battle_mode_in_simulation_env", &darkchess::DarkchessState::battle_mode_in_simulation_env)
+        .def_property_readonly_static("total_num_actions", [](py::object) { return darkchess::kNumActions; });
 
     py::class_<MCTS>(m, "MCTS")
-        .def(py::init<int, int, double, double, double, double, py::object>(),
+        .def(py::init<int, int, double, double, double, double, py::object, int, double, bool, bool, bool>(),
              py::arg("max_moves")=512, py::arg("num_simulations")=800,
              py::arg("pb_c_base")=19652, py::arg("pb_c_init")=1.25,
-             py::arg("root_dirichlet_alpha")=0.3, py::arg("root_noise_weight")=0.25, py::arg("simulate_env"))
+             py::arg("root_dirichlet_alpha")=0.3, py::arg("root_noise_weight")=0.25, py::arg("simulate_env"),
+             py::arg("leaf_batch_size")=8, py::arg("virtual_loss")=1.0, py::arg("use_chance_node")=true,
+             py::arg("reuse_tree")=false, py::arg("prune_siblings")=true)
         .def("_ucb_score", &MCTS::_ucb_score)
         .def("_add_exploration_noise", &MCTS::_add_exploration_noise)
         .def("_select_child", &MCTS::_select_child)
         .def("_expand_leaf_node", &MCTS::_expand_leaf_node)
-        .def("get_next_action", &MCTS::get_next_action)
+        .def("get_next_action", &MCTS::get_next_action,
+             py::arg("state_config_for_env_reset"), py::arg("policy_value_func"), py::arg("temperature"),
+             py::arg("sample"), py::arg("tree_id")=0, py::arg("search_budget")=py::none())
+        .def("get_next_actions", &MCTS::get_next_actions,
+             py::arg("state_configs_for_env_reset"), py::arg("policy_value_batch_func"), py::arg("temperature"),
+             py::arg("sample"), py::arg("tree_ids")=py::none(), py::arg("search_budget")=py::none())
         .def("_simulate", &MCTS::_simulate);
 }
\ No newline at end of file
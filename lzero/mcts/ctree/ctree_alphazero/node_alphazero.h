@@ -8,7 +8,8 @@ class Node {
 public:
     // Constructor, initializes a Node with a parent pointer and a prior probability
     Node(Node* parent = nullptr, float prior_p = 1.0)
-        : parent(parent), prior_p(prior_p), visit_count(0), value_sum(0.0) {}
+        : parent(parent), prior_p(prior_p), visit_count(0), value_sum(0.0), virtual_loss_count(0),
+          virtual_loss_sum(0.0), is_chance(false) {}
 
     // Destructor, deletes all child nodes when a node is deleted to prevent memory leaks
     ~Node() {
@@ -17,8 +18,26 @@ public:
         }
     }
 
-    // Returns the average value of the node
+    // Returns the average value of the node. The value of a chance node is the mean of the values of its visited
+    // outcomes weighted by their probabilities, so that an outcome visited more often than its probability does not
+    // bias the value. The outcomes count without their pending visits, which are counted by the chance node itself
+    // with the value -virtual_loss, as for the other nodes.
     float get_value() {
+        if (is_chance) {
+            float weighted_value = 0.0, visited_prob = 0.0;
+            for (const auto& kv : children) {
+                int count = kv.second->visit_count - kv.second->virtual_loss_count;
+                if (count > 0) {
+                    weighted_value += kv.second->prior_p * (kv.second->value_sum + kv.second->virtual_loss_sum) / count;
+                    visited_prob += kv.second->prior_p;
+                }
+            }
+            float value = visited_prob > 0 ? weighted_value / visited_prob : 0.0;
+            if (virtual_loss_count > 0) {
+                value = (value * (visit_count - virtual_loss_count) - virtual_loss_sum) / visit_count;
+            }
+            return value;
+        }
         return visit_count == 0 ? 0.0 : value_sum / visit_count;
     }
 
@@ -28,13 +47,31 @@ public:
         value_sum += value;
     }
 
+    // Counts a pending visit with the value -virtual_loss, so that the other simulations of the same batch
+    // are discouraged from selecting this node before its leaf is evaluated
+    void add_virtual_loss(float virtual_loss) {
+        visit_count++;
+        value_sum -= virtual_loss;
+        virtual_loss_count++;
+        virtual_loss_sum += virtual_loss;
+    }
+
+    // Reverts the pending visit added by add_virtual_loss
+    void revert_virtual_loss(float virtual_loss) {
+        visit_count--;
+        value_sum += virtual_loss;
+        virtual_loss_count--;
+        virtual_loss_sum -= virtual_loss;
+    }
+
     // Recursively updates the value and visit count of the node and its parent nodes
     void update_recursive(float leaf_value, std::string battle_mode_in_simulation_env) {
-        // If the mode is "self_play_mode", the leaf_value is subtracted from the parent's value
+        // If the mode is "self_play_mode", the leaf_value is subtracted from the parent's value, unless the parent is
+        // a chance node, which is evaluated from the view of the same player as its outcomes
         if (battle_mode_in_simulation_env == "self_play_mode") {
             update(leaf_value);
             if (!is_root()) {
-                parent->update_recursive(-leaf_value, battle_mode_in_simulation_env);
+                parent->update_recursive(parent->is_chance ? leaf_value : -leaf_value, battle_mode_in_simulation_env);
             }
         }
         // If the mode is "play_with_bot_mode", the leaf_value is added to the parent's value
@@ -78,8 +115,11 @@ public:
 
 public:
     Node* parent;  // Pointer to the parent node
-    float prior_p;  // Prior probability of the node
+    float prior_p;  // Prior probability of the node, or the probability of the outcome for a child of a chance node
     int visit_count;  // Count of visits to the node
     float value_sum;  // Sum of values of the node
+    int virtual_loss_count;  // Number of the pending visits of the batched search, included in visit_count
+    float virtual_loss_sum;  // Sum of the virtual losses of the pending visits, subtracted from value_sum
     std::map<int, Node*> children;  // Map of child nodes
+    bool is_chance;  // Whether the node is a chance node, whose children are keyed by the outcomes of its action
 };
\ No newline at end of file
@@ -25,6 +25,14 @@ cdef extern from "../common_lib/cminimax.h" namespace "tools":
 
         void set_delta(float value_delta_max)
 
+cdef extern from "../common_lib/cthread_pool.cpp":
+    pass
+
+
+cdef extern from "../common_lib/cthread_pool.h":
+    void cset_num_threads "tools::set_num_threads"(int num_threads)
+    int cget_num_threads "tools::get_num_threads"()
+
 cdef extern from "lib/cnode.cpp":
     pass
 
@@ -78,18 +86,18 @@ cdef extern from "lib/cnode.h" namespace "tree":
     void cbatch_backpropagate(int current_latent_state_index, float discount_factor, vector[float] value_prefixs,
                                vector[float] values, vector[vector[float]] policies,
                                CMinMaxStatsList *min_max_stats_lst, CSearchResults & results,
-                               vector[int] is_reset_list, vector[int] & to_play_batch)
+                               vector[int] is_reset_list, vector[int] & to_play_batch) nogil
     void cbatch_backpropagate_with_reuse(int current_latent_state_index, float discount_factor, vector[float] value_prefixs, 
                                 vector[float] values, vector[vector[float]] policies,
                                CMinMaxStatsList *min_max_stats_lst, CSearchResults &results, 
                                vector[int] is_reset_list, vector[int] &to_play_batch, vector[int] &no_inference_lst, 
-                               vector[int] &reuse_lst, vector[float] &reuse_value_lst)
+                               vector[int] &reuse_lst, vector[float] &reuse_value_lst) nogil
     void cbatch_traverse(CRoots *roots, int pb_c_base, float pb_c_init, float discount_factor,
                          CMinMaxStatsList *min_max_stats_lst, CSearchResults & results,
-                         vector[int] & virtual_to_play_batch)
+                         vector[int] & virtual_to_play_batch) nogil
     void cbatch_traverse_with_reuse(CRoots *roots, int pb_c_base, float pb_c_init, float discount_factor, 
                          CMinMaxStatsList *min_max_stats_lst, CSearchResults &results, 
-                         vector[int] &virtual_to_play_batch, vector[int] &true_action, vector[float] &reuse_value)
+                         vector[int] &virtual_to_play_batch, vector[int] &true_action, vector[float] &reuse_value) nogil
 
 cdef class MinMaxStatsList:
     cdef CMinMaxStatsList *cmin_max_stats_lst
@@ -40,6 +40,20 @@ namespace tree
 
     CSearchResults::~CSearchResults() {}
 
+    void CSearchResults::resize_outputs()
+    {
+        /*
+        Overview:
+            Allocate the per-root outputs of a traversal, which are then written by the index of the root.
+        */
+        this->latent_state_index_in_search_path.assign(this->num, 0);
+        this->latent_state_index_in_batch.assign(this->num, 0);
+        this->last_actions.assign(this->num, -1);
+        this->search_lens.assign(this->num, 0);
+        this->nodes.assign(this->num, nullptr);
+        this->virtual_to_play_batchs.assign(this->num, 0);
+    }
+
     //*********************************************************
 
     CNode::CNode()
@@ -590,14 +604,15 @@ namespace tree
             - is_reset_list: the vector of is_reset nodes along the search path, where is_reset represents for whether the parent value prefix needs to be reset.
             - to_play_batch: the batch of which player is playing on this node.
         */
-        for (int i = 0; i < results.num; ++i)
+        // The roots are independent trees, which are expanded and updated in parallel.
+        tools::parallel_for(results.num, [&](int i)
         {
             results.nodes[i]->expand(to_play_batch[i], current_latent_state_index, i, value_prefixs[i], policies[i]);
             // reset
             results.nodes[i]->is_reset = is_reset_list[i];
 
             cbackpropagate(results.search_paths[i], min_max_stats_lst->stats_lst[i], to_play_batch[i], values[i], discount_factor);
-        }
+        });
     }
 
     void cbatch_backpropagate_with_reuse(int current_latent_state_index, float discount_factor, const std::vector<float> &value_prefixs, const std::vector<float> &values, const std::vector<std::vector<float> > &policies, tools::CMinMaxStatsList *min_max_stats_lst, CSearchResults &results, std::vector<int> is_reset_list, std::vector<int> &to_play_batch, std::vector<int> &no_inference_lst, std::vector<int> &reuse_lst, std::vector<float> &reuse_value_lst)
@@ -618,34 +633,47 @@ namespace tree
             - reuse_lst: the list of the nodes which should use reuse-value to backpropagate.
             - reuse_value_lst: the list of the reuse-value.
         */
+        // The index of the inference output of each root, -1 for the roots without inference, and whether the root
+        // uses the reuse-value, so that the roots can be updated in parallel.
+        std::vector<int> inference_index(results.num, -1);
+        std::vector<char> is_reuse(results.num, 0);
         int count_a = 0;
         int count_b = 0;
         int count_c = 0;
-        float value_propagate = 0;
         for (int i = 0; i < results.num; ++i)
         {
             if (i == no_inference_lst[count_a])
             {
                 count_a = count_a + 1;
-                value_propagate = reuse_value_lst[i];
             }
             else
             {
-                results.nodes[i]->expand(to_play_batch[i], current_latent_state_index, count_b, value_prefixs[count_b], policies[count_b]);
+                inference_index[i] = count_b;
                 if (i == reuse_lst[count_c])
                 {
-                    value_propagate = reuse_value_lst[i];
+                    is_reuse[i] = 1;
                     count_c = count_c + 1;
                 }
-                else
-                {
-                    value_propagate = values[count_b];
-                }
                 count_b = count_b + 1;
             }
+        }
+
+        tools::parallel_for(results.num, [&](int i)
+        {
+            float value_propagate = 0;
+            int index = inference_index[i];
+            if (index == -1)
+            {
+                value_propagate = reuse_value_lst[i];
+            }
+            else
+            {
+                results.nodes[i]->expand(to_play_batch[i], current_latent_state_index, index, value_prefixs[index], policies[index]);
+                value_propagate = is_reuse[i] ? reuse_value_lst[i] : values[index];
+            }
             results.nodes[i]->is_reset = is_reset_list[i];
             cbackpropagate(results.search_paths[i], min_max_stats_lst->stats_lst[i], to_play_batch[i], value_propagate, discount_factor);
-        }
+        });
     }
 
     int cselect_child(CNode *root, tools::CMinMaxStats &min_max_stats, int pb_c_base, float pb_c_init, float discount_factor, float mean_q, int players)
@@ -900,10 +928,6 @@ namespace tree
         // set seed
         get_time_and_set_rand_seed();
 
-        int last_action = -1;
-        float parent_q = 0.0;
-        results.search_lens = std::vector<int>();
-
         int players = 0;
         int largest_element = *max_element(virtual_to_play_batch.begin(), virtual_to_play_batch.end()); // 0 or 2
         if (largest_element == -1)
@@ -915,8 +939,12 @@ namespace tree
             players = 2;
         }
 
-        for (int i = 0; i < results.num; ++i)
+        results.resize_outputs();
+        // The roots are independent trees, which are traversed in parallel.
+        tools::parallel_for(results.num, [&](int i)
         {
+            int last_action = -1;
+            float parent_q = 0.0;
             CNode *node = &(roots->roots[i]);
             int is_root = 1;
             int search_len = 0;
@@ -952,14 +980,14 @@ namespace tree
 
             CNode *parent = results.search_paths[i][results.search_paths[i].size() - 2];
 
-            results.latent_state_index_in_search_path.push_back(parent->current_latent_state_index);
-            results.latent_state_index_in_batch.push_back(parent->batch_index);
+            results.latent_state_index_in_search_path[i] = parent->current_latent_state_index;
+            results.latent_state_index_in_batch[i] = parent->batch_index;
 
-            results.last_actions.push_back(last_action);
-            results.search_lens.push_back(search_len);
-            results.nodes.push_back(node);
-            results.virtual_to_play_batchs.push_back(virtual_to_play_batch[i]);
-        }
+            results.last_actions[i] = last_action;
+            results.search_lens[i] = search_len;
+            results.nodes[i] = node;
+            results.virtual_to_play_batchs[i] = virtual_to_play_batch[i];
+        });
     }
 
     void cbatch_traverse_with_reuse(CRoots *roots, int pb_c_base, float pb_c_init, float discount_factor, tools::CMinMaxStatsList *min_max_stats_lst, CSearchResults &results, std::vector<int> &virtual_to_play_batch, std::vector<int> &true_action, std::vector<float> &reuse_value)
@@ -981,10 +1009,6 @@ namespace tree
         // set seed
         get_time_and_set_rand_seed();
 
-        int last_action = -1;
-        float parent_q = 0.0;
-        results.search_lens = std::vector<int>();
-
         int players = 0;
         int largest_element = *max_element(virtual_to_play_batch.begin(), virtual_to_play_batch.end()); // 0 or 2
         if (largest_element == -1)
@@ -996,8 +1020,12 @@ namespace tree
             players = 2;
         }
 
-        for (int i = 0; i < results.num; ++i)
+        results.resize_outputs();
+        // The roots are independent trees, which are traversed in parallel.
+        tools::parallel_for(results.num, [&](int i)
         {
+            int last_action = -1;
+            float parent_q = 0.0;
             CNode *node = &(roots->roots[i]);
             int is_root = 1;
             int search_len = 0;
@@ -1048,26 +1076,26 @@ namespace tree
 
             if (node->expanded())
             {
-                results.latent_state_index_in_search_path.push_back(-1);
-                results.latent_state_index_in_batch.push_back(i);
+                results.latent_state_index_in_search_path[i] = -1;
+                results.latent_state_index_in_batch[i] = i;
 
-                results.last_actions.push_back(last_action);
-                results.search_lens.push_back(search_len);
-                results.nodes.push_back(node);
-                results.virtual_to_play_batchs.push_back(virtual_to_play_batch[i]);
+                results.last_actions[i] = last_action;
+                results.search_lens[i] = search_len;
+                results.nodes[i] = node;
+                results.virtual_to_play_batchs[i] = virtual_to_play_batch[i];
             }
             else
             {
                 CNode *parent = results.search_paths[i][results.search_paths[i].size() - 2];
 
-                results.latent_state_index_in_search_path.push_back(parent->current_latent_state_index);
-                results.latent_state_index_in_batch.push_back(parent->batch_index);
+                results.latent_state_index_in_search_path[i] = parent->current_latent_state_index;
+                results.latent_state_index_in_batch[i] = parent->batch_index;
 
-                results.last_actions.push_back(last_action);
-                results.search_lens.push_back(search_len);
-                results.nodes.push_back(node);
-                results.virtual_to_play_batchs.push_back(virtual_to_play_batch[i]);
+                results.last_actions[i] = last_action;
+                results.search_lens[i] = search_len;
+                results.nodes[i] = node;
+                results.virtual_to_play_batchs[i] = virtual_to_play_batch[i];
             }
-        }
+        });
     }
 }
\ No newline at end of file
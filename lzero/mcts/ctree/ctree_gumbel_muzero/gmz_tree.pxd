@@ -26,6 +26,14 @@ cdef extern from "../common_lib/cminimax.h" namespace "tools":
 
         void set_delta(float value_delta_max)
 
+cdef extern from "../common_lib/cthread_pool.cpp":
+    pass
+
+
+cdef extern from "../common_lib/cthread_pool.h":
+    void cset_num_threads "tools::set_num_threads"(int num_threads)
+    int cget_num_threads "tools::get_num_threads"()
+
 cdef extern from "lib/cnode.cpp":
     pass
 
@@ -75,8 +83,8 @@ cdef extern from "lib/cnode.h" namespace "tree":
 
     cdef void cback_propagate(vector[CNode*] &search_path, CMinMaxStats &min_max_stats, int to_play, float value, float discount)
     void cbatch_back_propagate(int current_latent_state_index, float discount, vector[float] value_prefixs, vector[float] values, vector[vector[float]] policies,
-                               CMinMaxStatsList *min_max_stats_lst, CSearchResults &results, vector[int] &to_play_batch)
-    void cbatch_traverse(CRoots *roots, int num_simulations, int max_num_considered_actions, float discount, CSearchResults &results, vector[int] &virtual_to_play_batch)
+                               CMinMaxStatsList *min_max_stats_lst, CSearchResults &results, vector[int] &to_play_batch) nogil
+    void cbatch_traverse(CRoots *roots, int num_simulations, int max_num_considered_actions, float discount, CSearchResults &results, vector[int] &virtual_to_play_batch) nogil
     
     cdef int cselect_root_child(CNode* root, float discount, int num_simulations, int max_num_considered_actions)
     cdef int cselect_interior_child(CNode* root, float discount)
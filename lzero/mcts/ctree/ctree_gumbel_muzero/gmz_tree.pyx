@@ -2,6 +2,18 @@
 # cython:language_level=3
 from libcpp.vector cimport vector
 
+include "../common_lib/array_utils.pxi"
+
+def set_num_threads(int num_threads):
+    """
+    Overview:
+        Set the number of the threads which run the per-root work of the batch functions in parallel, without the GIL.
+    """
+    cset_num_threads(num_threads)
+
+def get_num_threads():
+    return cget_num_threads()
+
 cdef class MinMaxStatsList:
     cdef CMinMaxStatsList *cmin_max_stats_lst
 
@@ -78,21 +90,26 @@ cdef class Node:
         cdef vector[float] cpolicy = policy_logits
         self.cnode.expand(to_play, current_latent_state_index, batch_index, value_prefix, value, cpolicy)        
 
-def batch_back_propagate(int current_latent_state_index, float discount, list value_prefixs, list values, list policies, MinMaxStatsList min_max_stats_lst, ResultsWrapper results, list to_play_batch):
-    cdef int i
-    cdef vector[float] cvalue_prefixs = value_prefixs
-    cdef vector[float] cvalues = values
-    cdef vector[vector[float]] cpolicies = policies
-
-    cbatch_back_propagate(current_latent_state_index, discount, cvalue_prefixs, cvalues, cpolicies,
-                          min_max_stats_lst.cmin_max_stats_lst, results.cresults, to_play_batch)
+def batch_back_propagate(int current_latent_state_index, float discount, object value_prefixs, object values, object policies, MinMaxStatsList min_max_stats_lst, ResultsWrapper results, object to_play_batch):
+    cdef vector[float] cvalue_prefixs = as_float_vector(value_prefixs)
+    cdef vector[float] cvalues = as_float_vector(values)
+    cdef vector[vector[float]] cpolicies = as_float_matrix(policies)
+    cdef vector[int] cto_play_batch = as_int_vector(to_play_batch)
 
+    with nogil:
+        cbatch_back_propagate(current_latent_state_index, discount, cvalue_prefixs, cvalues, cpolicies,
+                              min_max_stats_lst.cmin_max_stats_lst, results.cresults, cto_play_batch)
 
-def batch_traverse(Roots roots, int num_simulations, int max_num_considered_actions, float discount, ResultsWrapper results, list virtual_to_play_batch):
 
-    cbatch_traverse(roots.roots, num_simulations, max_num_considered_actions, discount, results.cresults, virtual_to_play_batch)
+def batch_traverse(Roots roots, int num_simulations, int max_num_considered_actions, float discount, ResultsWrapper results, object virtual_to_play_batch):
+    cdef vector[int] cvirtual_to_play_batch = as_int_vector(virtual_to_play_batch)
+    with nogil:
+        cbatch_traverse(roots.roots, num_simulations, max_num_considered_actions, discount, results.cresults, cvirtual_to_play_batch)
 
-    return results.cresults.latent_state_index_in_search_path, results.cresults.latent_state_index_in_batch, results.cresults.last_actions, results.cresults.virtual_to_play_batchs
+    return (int_vector_to_array(results.cresults.latent_state_index_in_search_path),
+            int_vector_to_array(results.cresults.latent_state_index_in_batch),
+            int_vector_to_array(results.cresults.last_actions),
+            int_vector_to_array(results.cresults.virtual_to_play_batchs))
 
 def select_root_child(Node roots, float discount, int num_simulations, int max_num_considered_actions):
 
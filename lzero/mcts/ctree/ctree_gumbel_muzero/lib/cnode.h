@@ -4,6 +4,7 @@
 #define CNODE_H
 
 #include "./../common_lib/cminimax.h"
+#include "./../common_lib/cthread_pool.h"
 #include <math.h>
 #include <vector>
 #include <stack>
@@ -82,6 +83,8 @@ namespace tree {
             CSearchResults(int num);
             ~CSearchResults();
 
+            void resize_outputs();
+
     };
 
 
@@ -40,6 +40,20 @@ namespace tree
 
     CSearchResults::~CSearchResults() {}
 
+    void CSearchResults::resize_outputs()
+    {
+        /*
+        Overview:
+            Allocate the per-root outputs of a traversal, which are then written by the index of the root.
+        */
+        this->latent_state_index_in_search_path.assign(this->num, 0);
+        this->latent_state_index_in_batch.assign(this->num, 0);
+        this->last_actions.assign(this->num, -1);
+        this->search_lens.assign(this->num, 0);
+        this->nodes.assign(this->num, nullptr);
+        this->virtual_to_play_batchs.assign(this->num, 0);
+    }
+
     //*********************************************************
 
     CNode::CNode()
@@ -492,11 +506,12 @@ namespace tree
             - results: the search results.
             - to_play_batch: the batch of which player is playing on this node.
         */
-        for (int i = 0; i < results.num; ++i)
+        // The roots are independent trees, which are expanded and updated in parallel.
+        tools::parallel_for(results.num, [&](int i)
         {
             results.nodes[i]->expand(to_play_batch[i], current_latent_state_index, i, rewards[i], policies[i]);
             cbackpropagate(results.search_paths[i], min_max_stats_lst->stats_lst[i], to_play_batch[i], values[i], discount_factor);
-        }
+        });
     }
 
     void cbatch_backpropagate_with_reuse(int current_latent_state_index, float discount_factor, const std::vector<float> &value_prefixs, const std::vector<float> &values, const std::vector<std::vector<float> > &policies, tools::CMinMaxStatsList *min_max_stats_lst, CSearchResults &results, std::vector<int> &to_play_batch, std::vector<int> &no_inference_lst, std::vector<int> &reuse_lst, std::vector<float> &reuse_value_lst)
@@ -518,34 +533,47 @@ namespace tree
             - reuse_lst: the list of the nodes which should use reuse-value to backpropagate.
             - reuse_value_lst: the list of the reuse-value.
         */
+        // The index of the inference output of each root, -1 for the roots without inference, and whether the root
+        // uses the reuse-value, so that the roots can be updated in parallel.
+        std::vector<int> inference_index(results.num, -1);
+        std::vector<char> is_reuse(results.num, 0);
         int count_a = 0;
         int count_b = 0;
         int count_c = 0;
-        float value_propagate = 0;
         for (int i = 0; i < results.num; ++i)
         {
             if (i == no_inference_lst[count_a])
             {
                 count_a = count_a + 1;
-                value_propagate = reuse_value_lst[i];
             }
             else
             {
-                results.nodes[i]->expand(to_play_batch[i], current_latent_state_index, count_b, value_prefixs[count_b], policies[count_b]);
+                inference_index[i] = count_b;
                 if (i == reuse_lst[count_c])
                 {
-                    value_propagate = reuse_value_lst[i];
+                    is_reuse[i] = 1;
                     count_c = count_c + 1;
                 }
-                else
-                {
-                    value_propagate = values[count_b];
-                }
                 count_b = count_b + 1;
             }
+        }
+
+        tools::parallel_for(results.num, [&](int i)
+        {
+            float value_propagate = 0;
+            int index = inference_index[i];
+            if (index == -1)
+            {
+                value_propagate = reuse_value_lst[i];
+            }
+            else
+            {
+                results.nodes[i]->expand(to_play_batch[i], current_latent_state_index, index, value_prefixs[index], policies[index]);
+                value_propagate = is_reuse[i] ? reuse_value_lst[i] : values[index];
+            }
 
             cbackpropagate(results.search_paths[i], min_max_stats_lst->stats_lst[i], to_play_batch[i], value_propagate, discount_factor);
-        }
+        });
     }
 
     int cselect_child(CNode *root, tools::CMinMaxStats &min_max_stats, int pb_c_base, float pb_c_init, float discount_factor, float mean_q, int players)
@@ -769,10 +797,6 @@ namespace tree
         // set seed
         get_time_and_set_rand_seed();
 
-        int last_action = -1;
-        float parent_q = 0.0;
-        results.search_lens = std::vector<int>();
-
         int players = 0;
         int largest_element = *max_element(virtual_to_play_batch.begin(), virtual_to_play_batch.end()); // 0 or 2
         if (largest_element == -1)
@@ -780,8 +804,12 @@ namespace tree
         else
             players = 2;
 
-        for (int i = 0; i < results.num; ++i)
+        results.resize_outputs();
+        // The roots are independent trees, which are traversed in parallel.
+        tools::parallel_for(results.num, [&](int i)
         {
+            int last_action = -1;
+            float parent_q = 0.0;
             CNode *node = &(roots->roots[i]);
             int is_root = 1;
             int search_len = 0;
@@ -813,14 +841,14 @@ namespace tree
 
             CNode *parent = results.search_paths[i][results.search_paths[i].size() - 2];
 
-            results.latent_state_index_in_search_path.push_back(parent->current_latent_state_index);
-            results.latent_state_index_in_batch.push_back(parent->batch_index);
+            results.latent_state_index_in_search_path[i] = parent->current_latent_state_index;
+            results.latent_state_index_in_batch[i] = parent->batch_index;
 
-            results.last_actions.push_back(last_action);
-            results.search_lens.push_back(search_len);
-            results.nodes.push_back(node);
-            results.virtual_to_play_batchs.push_back(virtual_to_play_batch[i]);
-        }
+            results.last_actions[i] = last_action;
+            results.search_lens[i] = search_len;
+            results.nodes[i] = node;
+            results.virtual_to_play_batchs[i] = virtual_to_play_batch[i];
+        });
     }
 
 
@@ -844,10 +872,6 @@ namespace tree
         // set seed
         get_time_and_set_rand_seed();
 
-        int last_action = -1;
-        float parent_q = 0.0;
-        results.search_lens = std::vector<int>();
-
         int players = 0;
         int largest_element = *max_element(virtual_to_play_batch.begin(), virtual_to_play_batch.end()); // 0 or 2
         if (largest_element == -1)
@@ -855,8 +879,11 @@ namespace tree
         else
             players = 2;
 
-        for (int i = 0; i < results.num; ++i)
+        results.resize_outputs();
+        tools::parallel_for(results.num, [&](int i)
         {
+            int last_action = -1;
+            float parent_q = 0.0;
             CNode *node = &(roots->roots[i]);
             int is_root = 1;
             int search_len = 0;
@@ -904,27 +931,76 @@ namespace tree
 
             if (node->expanded())
             {
-                results.latent_state_index_in_search_path.push_back(-1);
-                results.latent_state_index_in_batch.push_back(i);
-
-                results.last_actions.push_back(last_action);
-                results.search_lens.push_back(search_len);
-                results.nodes.push_back(node);
-                results.virtual_to_play_batchs.push_back(virtual_to_play_batch[i]);
+                results.latent_state_index_in_search_path[i] = -1;
+                results.latent_state_index_in_batch[i] = i;
             }
             else
             {
                 CNode *parent = results.search_paths[i][results.search_paths[i].size() - 2];
 
-                results.latent_state_index_in_search_path.push_back(parent->current_latent_state_index);
-                results.latent_state_index_in_batch.push_back(parent->batch_index);
+                results.latent_state_index_in_search_path[i] = parent->current_latent_state_index;
+                results.latent_state_index_in_batch[i] = parent->batch_index;
+            }
+            results.last_actions[i] = last_action;
+            results.search_lens[i] = search_len;
+            results.nodes[i] = node;
+            results.virtual_to_play_batchs[i] = virtual_to_play_batch[i];
+        });
+    }
+
+    int csearch_all(CRoots *roots, int num_simulations, int pb_c_base, float pb_c_init, float discount_factor, tools::CMinMaxStatsList *min_max_stats_lst, std::vector<int> &to_play_batch, CSearchBuffers &buffers, CInferenceCallback inference, void *context)
+    {
+        /*
+        Overview:
+            Run all the simulations of a batch search, i.e. the traversal, the batched recurrent inference and the
+            backpropagation of every simulation, without going back to python between the simulations.
+        Arguments:
+            - roots: the roots that search from.
+            - num_simulations: the number of simulations.
+            - pb_c_base: constants c2 in muzero.
+            - pb_c_init: constants c1 in muzero.
+            - disount_factor: the discount factor of reward.
+            - min_max_stats: a tool used to min-max normalize the score.
+            - to_play_batch: the batch of which player is playing on the roots.
+            - buffers: the preallocated input and output buffers of the inference.
+            - inference: the batched recurrent inference, called once per simulation.
+            - context: the context passed to the inference.
+        Returns:
+            - status: 0 if all the simulations are run, else the non-zero status returned by the inference.
+        */
+        int num = roots->root_num;
+        int action_space_size = buffers.action_space_size;
+        std::vector<float> rewards(num), values(num);
+        std::vector<std::vector<float> > policies(num, std::vector<float>(action_space_size));
+
+        for (int simulation_index = 0; simulation_index < num_simulations; ++simulation_index)
+        {
+            CSearchResults results(num);
+            // The players of the roots are copied, as the traversal switches them along the search path.
+            std::vector<int> virtual_to_play_batch(to_play_batch);
+            cbatch_traverse(roots, pb_c_base, pb_c_init, discount_factor, min_max_stats_lst, results, virtual_to_play_batch);
+
+            std::copy(results.latent_state_index_in_search_path.begin(), results.latent_state_index_in_search_path.end(), buffers.latent_state_index_in_search_path);
+            std::copy(results.latent_state_index_in_batch.begin(), results.latent_state_index_in_batch.end(), buffers.latent_state_index_in_batch);
+            std::copy(results.last_actions.begin(), results.last_actions.end(), buffers.last_actions);
+
+            // NOTE: simulation_index + 1 is the depth of the current leaf node.
+            int current_latent_state_index = simulation_index + 1;
+            int status = inference(context, current_latent_state_index);
+            if (status != 0)
+            {
+                return status;
+            }
 
-                results.last_actions.push_back(last_action);
-                results.search_lens.push_back(search_len);
-                results.nodes.push_back(node);
-                results.virtual_to_play_batchs.push_back(virtual_to_play_batch[i]);
+            std::copy(buffers.rewards, buffers.rewards + num, rewards.begin());
+            std::copy(buffers.values, buffers.values + num, values.begin());
+            for (int i = 0; i < num; ++i)
+            {
+                std::copy(buffers.policy_logits + i * action_space_size, buffers.policy_logits + (i + 1) * action_space_size, policies[i].begin());
             }
+            cbatch_backpropagate(current_latent_state_index, discount_factor, rewards, values, policies, min_max_stats_lst, results, results.virtual_to_play_batchs);
         }
+        return 0;
     }
 
 }
\ No newline at end of file
@@ -4,6 +4,7 @@
 #define CNODE_H
 
 #include "./../common_lib/cminimax.h"
+#include "./../common_lib/cthread_pool.h"
 #include <math.h>
 #include <vector>
 #include <stack>
@@ -76,6 +77,22 @@ namespace tree {
             CSearchResults(int num);
             ~CSearchResults();
 
+            void resize_outputs();
+
+    };
+
+    // The batched recurrent inference of the native search loop, called once per simulation. It reads the leaf nodes
+    // from the input buffers of CSearchBuffers, writes the network outputs to its output buffers and returns 0, or a
+    // non-zero status which stops the search.
+    typedef int (*CInferenceCallback)(void *context, int current_latent_state_index);
+
+    class CSearchBuffers{
+        public:
+            // The inputs of the inference, of size root_num.
+            int *latent_state_index_in_search_path, *latent_state_index_in_batch, *last_actions;
+            // The outputs of the inference, of size root_num, and root_num * action_space_size for the policy logits.
+            float *rewards, *values, *policy_logits;
+            int action_space_size;
     };
 
 
@@ -90,6 +107,7 @@ namespace tree {
     float carm_score(CNode *child, tools::CMinMaxStats &min_max_stats, float parent_mean_q, float reuse_value, float total_children_visit_counts, float pb_c_base, float pb_c_init, float discount_factor, int players);
     void cbatch_traverse(CRoots *roots, int pb_c_base, float pb_c_init, float discount_factor, tools::CMinMaxStatsList *min_max_stats_lst, CSearchResults &results, std::vector<int> &virtual_to_play_batch);
     void cbatch_traverse_with_reuse(CRoots *roots, int pb_c_base, float pb_c_init, float discount_factor, tools::CMinMaxStatsList *min_max_stats_lst, CSearchResults &results, std::vector<int> &virtual_to_play_batch, std::vector<int> &true_action, std::vector<float> &reuse_value);
+    int csearch_all(CRoots *roots, int num_simulations, int pb_c_base, float pb_c_init, float discount_factor, tools::CMinMaxStatsList *min_max_stats_lst, std::vector<int> &to_play_batch, CSearchBuffers &buffers, CInferenceCallback inference, void *context);
 }
 
 #endif
\ No newline at end of file
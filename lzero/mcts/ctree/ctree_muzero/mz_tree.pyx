@@ -2,6 +2,19 @@
 # cython:language_level=3
 from libcpp.vector cimport vector
 
+include "../common_lib/array_utils.pxi"
+include "../common_lib/search_callback.pxi"
+
+def set_num_threads(int num_threads):
+    """
+    Overview:
+        Set the number of the threads which run the per-root work of the batch functions in parallel, without the GIL.
+    """
+    cset_num_threads(num_threads)
+
+def get_num_threads():
+    return cget_num_threads()
+
 cdef class MinMaxStatsList:
     cdef CMinMaxStatsList *cmin_max_stats_lst
 
@@ -71,37 +84,90 @@ cdef class Node:
         cdef vector[float] cpolicy = policy_logits
         self.cnode.expand(to_play, current_latent_state_index, batch_index, value_prefix, cpolicy)
 
-def batch_backpropagate(int current_latent_state_index, float discount_factor, list value_prefixs, list values, list policies,
-                         MinMaxStatsList min_max_stats_lst, ResultsWrapper results, list to_play_batch):
-    cdef int i
-    cdef vector[float] cvalue_prefixs = value_prefixs
-    cdef vector[float] cvalues = values
-    cdef vector[vector[float]] cpolicies = policies
-
-    cbatch_backpropagate(current_latent_state_index, discount_factor, cvalue_prefixs, cvalues, cpolicies,
-                          min_max_stats_lst.cmin_max_stats_lst, results.cresults, to_play_batch)
-
-def batch_backpropagate_with_reuse(int current_latent_state_index, float discount_factor, list value_prefixs, list values, list policies,
-                         MinMaxStatsList min_max_stats_lst, ResultsWrapper results, list to_play_batch, list no_inference_lst, list reuse_lst, list reuse_value_lst):
-    cdef int i
-    cdef vector[float] cvalue_prefixs = value_prefixs
-    cdef vector[float] cvalues = values
-    cdef vector[vector[float]] cpolicies = policies
-    cdef vector[float] creuse_value_lst = reuse_value_lst
- 
-    cbatch_backpropagate_with_reuse(current_latent_state_index, discount_factor, cvalue_prefixs, cvalues, cpolicies,
-                          min_max_stats_lst.cmin_max_stats_lst, results.cresults, to_play_batch, no_inference_lst, reuse_lst, creuse_value_lst)
+def batch_backpropagate(int current_latent_state_index, float discount_factor, object value_prefixs, object values, object policies,
+                         MinMaxStatsList min_max_stats_lst, ResultsWrapper results, object to_play_batch):
+    cdef vector[float] cvalue_prefixs = as_float_vector(value_prefixs)
+    cdef vector[float] cvalues = as_float_vector(values)
+    cdef vector[vector[float]] cpolicies = as_float_matrix(policies)
+    cdef vector[int] cto_play_batch = as_int_vector(to_play_batch)
+
+    with nogil:
+        cbatch_backpropagate(current_latent_state_index, discount_factor, cvalue_prefixs, cvalues, cpolicies,
+                              min_max_stats_lst.cmin_max_stats_lst, results.cresults, cto_play_batch)
+
+def batch_backpropagate_with_reuse(int current_latent_state_index, float discount_factor, object value_prefixs, object values, object policies,
+                         MinMaxStatsList min_max_stats_lst, ResultsWrapper results, object to_play_batch, object no_inference_lst, object reuse_lst, object reuse_value_lst):
+    cdef vector[float] cvalue_prefixs = as_float_vector(value_prefixs)
+    cdef vector[float] cvalues = as_float_vector(values)
+    cdef vector[vector[float]] cpolicies = as_float_matrix(policies)
+    cdef vector[int] cto_play_batch = as_int_vector(to_play_batch)
+    cdef vector[int] cno_inference_lst = as_int_vector(no_inference_lst)
+    cdef vector[int] creuse_lst = as_int_vector(reuse_lst)
+    cdef vector[float] creuse_value_lst = as_float_vector(reuse_value_lst)
+
+    with nogil:
+        cbatch_backpropagate_with_reuse(current_latent_state_index, discount_factor, cvalue_prefixs, cvalues, cpolicies,
+                              min_max_stats_lst.cmin_max_stats_lst, results.cresults, cto_play_batch, cno_inference_lst, creuse_lst, creuse_value_lst)
+
+cdef tuple traverse_results(ResultsWrapper results):
+    return (int_vector_to_array(results.cresults.latent_state_index_in_search_path),
+            int_vector_to_array(results.cresults.latent_state_index_in_batch),
+            int_vector_to_array(results.cresults.last_actions),
+            int_vector_to_array(results.cresults.virtual_to_play_batchs))
 
 def batch_traverse(Roots roots, int pb_c_base, float pb_c_init, float discount_factor, MinMaxStatsList min_max_stats_lst,
-                   ResultsWrapper results, list virtual_to_play_batch):
-    cbatch_traverse(roots.roots, pb_c_base, pb_c_init, discount_factor, min_max_stats_lst.cmin_max_stats_lst, results.cresults,
-                    virtual_to_play_batch)
+                   ResultsWrapper results, object virtual_to_play_batch):
+    cdef vector[int] cvirtual_to_play_batch = as_int_vector(virtual_to_play_batch)
+    with nogil:
+        cbatch_traverse(roots.roots, pb_c_base, pb_c_init, discount_factor, min_max_stats_lst.cmin_max_stats_lst, results.cresults,
+                        cvirtual_to_play_batch)
 
-    return results.cresults.latent_state_index_in_search_path, results.cresults.latent_state_index_in_batch, results.cresults.last_actions, results.cresults.virtual_to_play_batchs
+    return traverse_results(results)
 
 def batch_traverse_with_reuse(Roots roots, int pb_c_base, float pb_c_init, float discount_factor, MinMaxStatsList min_max_stats_lst,
-                   ResultsWrapper results, list virtual_to_play_batch, list true_action, list reuse_value):
-    cbatch_traverse_with_reuse(roots.roots, pb_c_base, pb_c_init, discount_factor, min_max_stats_lst.cmin_max_stats_lst, results.cresults,
-                    virtual_to_play_batch, true_action, reuse_value)
-
-    return results.cresults.latent_state_index_in_search_path, results.cresults.latent_state_index_in_batch, results.cresults.last_actions, results.cresults.virtual_to_play_batchs
+                   ResultsWrapper results, object virtual_to_play_batch, object true_action, object reuse_value):
+    cdef vector[int] cvirtual_to_play_batch = as_int_vector(virtual_to_play_batch)
+    cdef vector[int] ctrue_action = as_int_vector(true_action)
+    cdef vector[float] creuse_value = as_float_vector(reuse_value)
+    with nogil:
+        cbatch_traverse_with_reuse(roots.roots, pb_c_base, pb_c_init, discount_factor, min_max_stats_lst.cmin_max_stats_lst, results.cresults,
+                        cvirtual_to_play_batch, ctrue_action, creuse_value)
+
+    return traverse_results(results)
+
+def search_all(Roots roots, int num_simulations, int pb_c_base, float pb_c_init, float discount_factor,
+               MinMaxStatsList min_max_stats_lst, object to_play_batch, object inference,
+               int[::1] latent_state_index_in_search_path, int[::1] latent_state_index_in_batch, int[::1] last_actions,
+               float[::1] rewards, float[::1] values, float[:, ::1] policy_logits):
+    """
+    Overview:
+        Run all the simulations of the search in the cpp tree. In each simulation, the leaf nodes are written to the \
+        input buffers ``latent_state_index_in_search_path``, ``latent_state_index_in_batch`` and ``last_actions``, \
+        then ``inference(current_latent_state_index)`` is called, which must write the network outputs of the leaf \
+        nodes to the output buffers ``rewards``, ``values`` and ``policy_logits`` in place.
+    """
+    cdef int num = roots.root_num
+    if not (latent_state_index_in_search_path.shape[0] == latent_state_index_in_batch.shape[0] == last_actions.shape[0]
+            == rewards.shape[0] == values.shape[0] == policy_logits.shape[0] == num):
+        raise ValueError("The buffers of search_all should have {} rows, one per root.".format(num))
+    if num == 0:
+        return
+    cdef vector[int] cto_play_batch = as_int_vector(to_play_batch)
+    if cto_play_batch.size() != <size_t> num:
+        raise ValueError("The to_play_batch of search_all should have {} players, one per root.".format(num))
+    cdef CSearchBuffers buffers
+    buffers.latent_state_index_in_search_path = &latent_state_index_in_search_path[0]
+    buffers.latent_state_index_in_batch = &latent_state_index_in_batch[0]
+    buffers.last_actions = &last_actions[0]
+    buffers.rewards = &rewards[0]
+    buffers.values = &values[0]
+    buffers.policy_logits = &policy_logits[0, 0]
+    buffers.action_space_size = policy_logits.shape[1]
+
+    cdef InferenceCallback callback = InferenceCallback(inference)
+    cdef int status
+    with nogil:
+        status = csearch_all(roots.roots, num_simulations, pb_c_base, pb_c_init, discount_factor,
+                             min_max_stats_lst.cmin_max_stats_lst, cto_play_batch, buffers, call_inference, <void *> callback)
+    if status != 0:
+        raise callback.error
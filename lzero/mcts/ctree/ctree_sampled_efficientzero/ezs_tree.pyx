@@ -2,6 +2,18 @@
 # cython:language_level=3
 from libcpp.vector cimport vector
 
+include "../common_lib/array_utils.pxi"
+
+def set_num_threads(int num_threads):
+    """
+    Overview:
+        Set the number of the threads which run the per-root work of the batch functions in parallel, without the GIL.
+    """
+    cset_num_threads(num_threads)
+
+def get_num_threads():
+    return cget_num_threads()
+
 cdef class MinMaxStatsList:
     cdef CMinMaxStatsList *cmin_max_stats_lst
 
@@ -100,20 +112,27 @@ cdef class Node:
         cdef vector[float] cpolicy = policy_logits
         self.cnode.expand(to_play, current_latent_state_index, batch_index, value_prefix, cpolicy)
 
-def batch_backpropagate(int current_latent_state_index, float discount_factor, list value_prefixs, list values, list policies,
-                         MinMaxStatsList min_max_stats_lst, ResultsWrapper results, list is_reset_list,
-                         list to_play_batch):
-    cdef int i
-    cdef vector[float] cvalue_prefixs = value_prefixs
-    cdef vector[float] cvalues = values
-    cdef vector[vector[float]] cpolicies = policies
+def batch_backpropagate(int current_latent_state_index, float discount_factor, object value_prefixs, object values, object policies,
+                         MinMaxStatsList min_max_stats_lst, ResultsWrapper results, object is_reset_list,
+                         object to_play_batch):
+    cdef vector[float] cvalue_prefixs = as_float_vector(value_prefixs)
+    cdef vector[float] cvalues = as_float_vector(values)
+    cdef vector[vector[float]] cpolicies = as_float_matrix(policies)
+    cdef vector[int] cis_reset_list = as_int_vector(is_reset_list)
+    cdef vector[int] cto_play_batch = as_int_vector(to_play_batch)
 
-    cbatch_backpropagate(current_latent_state_index, discount_factor, cvalue_prefixs, cvalues, cpolicies,
-                          min_max_stats_lst.cmin_max_stats_lst, results.cresults, is_reset_list, to_play_batch)
+    with nogil:
+        cbatch_backpropagate(current_latent_state_index, discount_factor, cvalue_prefixs, cvalues, cpolicies,
+                              min_max_stats_lst.cmin_max_stats_lst, results.cresults, cis_reset_list, cto_play_batch)
 
 def batch_traverse(Roots roots, int pb_c_base, float pb_c_init, float discount_factor, MinMaxStatsList min_max_stats_lst,
-                   ResultsWrapper results, list virtual_to_play_batch, bool continuous_action_space):
-    cbatch_traverse(roots.roots, pb_c_base, pb_c_init, discount_factor, min_max_stats_lst.cmin_max_stats_lst, results.cresults,
-                    virtual_to_play_batch, continuous_action_space)
-
-    return results.cresults.latent_state_index_in_search_path, results.cresults.latent_state_index_in_batch, results.cresults.last_actions, results.cresults.virtual_to_play_batchs
+                   ResultsWrapper results, object virtual_to_play_batch, bool continuous_action_space):
+    cdef vector[int] cvirtual_to_play_batch = as_int_vector(virtual_to_play_batch)
+    with nogil:
+        cbatch_traverse(roots.roots, pb_c_base, pb_c_init, discount_factor, min_max_stats_lst.cmin_max_stats_lst, results.cresults,
+                        cvirtual_to_play_batch, continuous_action_space)
+
+    return (int_vector_to_array(results.cresults.latent_state_index_in_search_path),
+            int_vector_to_array(results.cresults.latent_state_index_in_batch),
+            float_matrix_to_array(results.cresults.last_actions),
+            int_vector_to_array(results.cresults.virtual_to_play_batchs))
@@ -136,6 +136,20 @@ namespace tree
 
     CSearchResults::~CSearchResults() {}
 
+    void CSearchResults::resize_outputs()
+    {
+        /*
+        Overview:
+            Allocate the per-root outputs of a traversal, which are then written by the index of the root.
+        */
+        this->latent_state_index_in_search_path.assign(this->num, 0);
+        this->latent_state_index_in_batch.assign(this->num, 0);
+        this->last_actions.assign(this->num, std::vector<float>());
+        this->search_lens.assign(this->num, 0);
+        this->nodes.assign(this->num, nullptr);
+        this->virtual_to_play_batchs.assign(this->num, 0);
+    }
+
     //*********************************************************
 
     CNode::CNode()
@@ -960,14 +974,15 @@ namespace tree
             - is_reset_list: the vector of is_reset nodes along the search path, where is_reset represents for whether the parent value prefix needs to be reset.
             - to_play_batch: the batch of which player is playing on this node.
         */
-        for (int i = 0; i < results.num; ++i)
+        // The roots are independent trees, which are expanded and updated in parallel.
+        tools::parallel_for(results.num, [&](int i)
         {
             results.nodes[i]->expand(to_play_batch[i], current_latent_state_index, i, value_prefixs[i], policies[i]);
             // reset
             results.nodes[i]->is_reset = is_reset_list[i];
 
             cbackpropagate(results.search_paths[i], min_max_stats_lst->stats_lst[i], to_play_batch[i], values[i], discount_factor);
-        }
+        });
     }
 
     CAction cselect_child(CNode *root, tools::CMinMaxStats &min_max_stats, int pb_c_base, float pb_c_init, float discount_factor, float mean_q, int players, bool continuous_action_space)
@@ -1131,9 +1146,6 @@ namespace tree
             null_value.push_back(i + 0.1);
         }
         // CAction last_action = CAction(null_value, 1);
-        std::vector<float> last_action;
-        float parent_q = 0.0;
-        results.search_lens = std::vector<int>();
 
         int players = 0;
         int largest_element = *max_element(virtual_to_play_batch.begin(), virtual_to_play_batch.end()); // 0 or 2
@@ -1142,8 +1154,12 @@ namespace tree
         else
             players = 2;
 
-        for (int i = 0; i < results.num; ++i)
+        results.resize_outputs();
+        // The roots are independent trees, which are traversed in parallel.
+        tools::parallel_for(results.num, [&](int i)
         {
+            std::vector<float> last_action;
+            float parent_q = 0.0;
             CNode *node = &(roots->roots[i]);
             int is_root = 1;
             int search_len = 0;
@@ -1176,14 +1192,14 @@ namespace tree
 
             CNode *parent = results.search_paths[i][results.search_paths[i].size() - 2];
 
-            results.latent_state_index_in_search_path.push_back(parent->current_latent_state_index);
-            results.latent_state_index_in_batch.push_back(parent->batch_index);
+            results.latent_state_index_in_search_path[i] = parent->current_latent_state_index;
+            results.latent_state_index_in_batch[i] = parent->batch_index;
 
-            results.last_actions.push_back(last_action);
-            results.search_lens.push_back(search_len);
-            results.nodes.push_back(node);
-            results.virtual_to_play_batchs.push_back(virtual_to_play_batch[i]);
-        }
+            results.last_actions[i] = last_action;
+            results.search_lens[i] = search_len;
+            results.nodes[i] = node;
+            results.virtual_to_play_batchs[i] = virtual_to_play_batch[i];
+        });
     }
 
 }
@@ -4,6 +4,7 @@
 #define CNODE_H
 
 #include "../../common_lib/cminimax.h"
+#include "../../common_lib/cthread_pool.h"
 #include <math.h>
 #include <vector>
 #include <stack>
@@ -109,6 +110,8 @@ namespace tree
         CSearchResults();
         CSearchResults(int num);
         ~CSearchResults();
+
+        void resize_outputs();
     };
 
     //*********************************************************
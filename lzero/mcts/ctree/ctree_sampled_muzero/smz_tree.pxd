@@ -26,6 +26,14 @@ cdef extern from "../common_lib/cminimax.h" namespace "tools":
 
         void set_delta(float value_delta_max)
 
+cdef extern from "../common_lib/cthread_pool.cpp":
+    pass
+
+
+cdef extern from "../common_lib/cthread_pool.h":
+    void cset_num_threads "tools::set_num_threads"(int num_threads)
+    int cget_num_threads "tools::get_num_threads"()
+
 cdef extern from "lib/cnode.cpp":
     pass
 
@@ -86,5 +94,5 @@ cdef extern from "lib/cnode.h" namespace "tree":
 
     cdef void cbackpropagate(vector[CNode*] &search_path, CMinMaxStats &min_max_stats, int to_play, float value, float discount_factor)
     void cbatch_backpropagate(int current_latent_state_index, float discount_factor, vector[float] rewards, vector[float] values, vector[vector[float]] policies,
-                               CMinMaxStatsList *min_max_stats_lst, CSearchResults &results, vector[int] &to_play_batch)
-    void cbatch_traverse(CRoots *roots, int pb_c_base, float pb_c_init, float discount_factor, CMinMaxStatsList *min_max_stats_lst, CSearchResults &results, vector[int] &virtual_to_play_batch, bool continuous_action_space)
+                               CMinMaxStatsList *min_max_stats_lst, CSearchResults &results, vector[int] &to_play_batch) nogil
+    void cbatch_traverse(CRoots *roots, int pb_c_base, float pb_c_init, float discount_factor, CMinMaxStatsList *min_max_stats_lst, CSearchResults &results, vector[int] &virtual_to_play_batch, bool continuous_action_space) nogil
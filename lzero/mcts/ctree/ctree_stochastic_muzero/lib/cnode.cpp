@@ -47,6 +47,20 @@ namespace tree
 
     CSearchResults::~CSearchResults() {}
 
+    void CSearchResults::resize_outputs()
+    {
+        /*
+        Overview:
+            Allocate the per-root outputs of a traversal, which are then written by the index of the root.
+        */
+        this->latent_state_index_in_search_path.assign(this->num, 0);
+        this->latent_state_index_in_batch.assign(this->num, 0);
+        this->last_actions.assign(this->num, -1);
+        this->search_lens.assign(this->num, 0);
+        this->nodes.assign(this->num, nullptr);
+        this->virtual_to_play_batchs.assign(this->num, 0);
+    }
+
     //*********************************************************
 
     CNode::CNode()
@@ -582,12 +596,13 @@ namespace tree
         for (auto leaf_order = 0; leaf_order < leaf_idx_list.size(); ++leaf_order) {
             int i = leaf_idx_list[leaf_order];
         }
-        for (int leaf_order = 0; leaf_order < leaf_idx_list.size(); ++leaf_order)
+        // The roots are independent trees, which are expanded and updated in parallel.
+        tools::parallel_for(leaf_idx_list.size(), [&](int leaf_order)
         {
             int i = leaf_idx_list[leaf_order];
             results.nodes[i]->expand(to_play_batch[i], current_latent_state_index, i, value_prefixs[leaf_order], policies[leaf_order], is_chance_list[i]);
             cbackpropagate(results.search_paths[i], min_max_stats_lst->stats_lst[i], to_play_batch[i], values[leaf_order], discount_factor);
-        }
+        });
 
     }
 
@@ -725,10 +740,6 @@ namespace tree
         // set seed
         get_time_and_set_rand_seed();
 
-        int last_action = -1;
-        float parent_q = 0.0;
-        results.search_lens = std::vector<int>();
-
         int players = 0;
         int largest_element = *max_element(virtual_to_play_batch.begin(), virtual_to_play_batch.end()); // 0 or 2
         if (largest_element == -1)
@@ -736,8 +747,12 @@ namespace tree
         else
             players = 2;
 
-        for (int i = 0; i < results.num; ++i)
+        results.resize_outputs();
+        // The roots are independent trees, which are traversed in parallel.
+        tools::parallel_for(results.num, [&](int i)
         {
+            int last_action = -1;
+            float parent_q = 0.0;
             CNode *node = &(roots->roots[i]);
             int is_root = 1;
             int search_len = 0;
@@ -773,16 +788,81 @@ namespace tree
 
             CNode *parent = results.search_paths[i][results.search_paths[i].size() - 2];
 
-            results.latent_state_index_in_search_path.push_back(parent->current_latent_state_index);
-            results.latent_state_index_in_batch.push_back(parent->batch_index);
+            results.latent_state_index_in_search_path[i] = parent->current_latent_state_index;
+            results.latent_state_index_in_batch[i] = parent->batch_index;
 
-            results.last_actions.push_back(last_action);
-            results.search_lens.push_back(search_len);
-            results.nodes.push_back(node);
-            results.leaf_node_is_chance.push_back(node->is_chance);
-            results.virtual_to_play_batchs.push_back(virtual_to_play_batch[i]);
+            results.last_actions[i] = last_action;
+            results.search_lens[i] = search_len;
+            results.nodes[i] = node;
+            results.virtual_to_play_batchs[i] = virtual_to_play_batch[i];
 
+        });
+
+        // The bits of std::vector<bool> can not be written by several threads, so they are filled afterwards.
+        results.leaf_node_is_chance.resize(results.num);
+        for (int i = 0; i < results.num; ++i)
+        {
+            results.leaf_node_is_chance[i] = results.nodes[i]->is_chance;
+        }
+    }
+
+    int csearch_all(CRoots *roots, int num_simulations, int pb_c_base, float pb_c_init, float discount_factor, tools::CMinMaxStatsList *min_max_stats_lst, std::vector<int> &to_play_batch, CSearchBuffers &buffers, CInferenceCallback inference, void *context)
+    {
+        /*
+        Overview:
+            Run all the simulations of a batch search, i.e. the traversal, the batched recurrent inference and the
+            backpropagation of every simulation, without going back to python between the simulations.
+        Arguments:
+            - roots: the roots that search from.
+            - num_simulations: the number of simulations.
+            - pb_c_base: constants c2 in muzero.
+            - pb_c_init: constants c1 in muzero.
+            - disount_factor: the discount factor of reward.
+            - min_max_stats: a tool used to min-max normalize the score.
+            - to_play_batch: the batch of which player is playing on the roots.
+            - buffers: the preallocated input and output buffers of the inference.
+            - inference: the batched recurrent inference, called once per simulation.
+            - context: the context passed to the inference.
+        Returns:
+            - status: 0 if all the simulations are run, else the non-zero status returned by the inference.
+        */
+        int num = roots->root_num;
+        std::vector<float> value_prefixs(num), values(num);
+        std::vector<std::vector<float> > policies(num);
+
+        for (int simulation_index = 0; simulation_index < num_simulations; ++simulation_index)
+        {
+            CSearchResults results(num);
+            // The players of the roots are copied, as the traversal switches them along the search path.
+            std::vector<int> virtual_to_play_batch(to_play_batch);
+            cbatch_traverse(roots, pb_c_base, pb_c_init, discount_factor, min_max_stats_lst, results, virtual_to_play_batch);
+
+            std::copy(results.latent_state_index_in_search_path.begin(), results.latent_state_index_in_search_path.end(), buffers.latent_state_index_in_search_path);
+            std::copy(results.latent_state_index_in_batch.begin(), results.latent_state_index_in_batch.end(), buffers.latent_state_index_in_batch);
+            std::copy(results.last_actions.begin(), results.last_actions.end(), buffers.last_actions);
+            std::copy(results.leaf_node_is_chance.begin(), results.leaf_node_is_chance.end(), buffers.leaf_node_is_chance);
+
+            // NOTE: simulation_index + 1 is the depth of the current leaf node.
+            int current_latent_state_index = simulation_index + 1;
+            int status = inference(context, current_latent_state_index);
+            if (status != 0)
+            {
+                return status;
+            }
+
+            std::copy(buffers.rewards, buffers.rewards + num, value_prefixs.begin());
+            std::copy(buffers.values, buffers.values + num, values.begin());
+            for (int i = 0; i < num; ++i)
+            {
+                float *policy_logits = buffers.policy_logits + i * buffers.policy_size;
+                int policy_size = results.leaf_node_is_chance[i] ? buffers.chance_space_size : buffers.action_space_size;
+                policies[i].assign(policy_logits, policy_logits + policy_size);
+            }
+            // All the leaf nodes are expanded at once, in the order of the roots.
+            std::vector<int> leaf_idx_list;
+            cbatch_backpropagate(current_latent_state_index, discount_factor, value_prefixs, values, policies, min_max_stats_lst, results, results.virtual_to_play_batchs, results.leaf_node_is_chance, leaf_idx_list);
         }
+        return 0;
     }
 
 }
\ No newline at end of file
@@ -4,6 +4,7 @@
 #define CNODE_H
 
 #include "./../common_lib/cminimax.h"
+#include "./../common_lib/cthread_pool.h"
 #include <math.h>
 #include <vector>
 #include <stack>
@@ -80,6 +81,24 @@ namespace tree {
             CSearchResults(int num);
             ~CSearchResults();
 
+            void resize_outputs();
+
+    };
+
+    // The batched recurrent inference of the native search loop, called once per simulation. It reads the leaf nodes
+    // from the input buffers of CSearchBuffers, writes the network outputs to its output buffers and returns 0, or a
+    // non-zero status which stops the search.
+    typedef int (*CInferenceCallback)(void *context, int current_latent_state_index);
+
+    class CSearchBuffers{
+        public:
+            // The inputs of the inference, of size root_num.
+            int *latent_state_index_in_search_path, *latent_state_index_in_batch, *last_actions;
+            unsigned char *leaf_node_is_chance;
+            // The outputs of the inference, of size root_num, and root_num * policy_size for the policy logits, whose
+            // rows hold chance_space_size logits for the chance nodes and action_space_size logits for the others.
+            float *rewards, *values, *policy_logits;
+            int policy_size, action_space_size, chance_space_size;
     };
 
 
@@ -90,6 +109,7 @@ namespace tree {
     int cselect_child(CNode* root, tools::CMinMaxStats &min_max_stats, int pb_c_base, float pb_c_init, float discount_factor, float mean_q, int players);
     float cucb_score(CNode *child, tools::CMinMaxStats &min_max_stats, float parent_mean_q, float total_children_visit_counts, float pb_c_base, float pb_c_init, float discount_factor, int players);
     void cbatch_traverse(CRoots *roots, int pb_c_base, float pb_c_init, float discount_factor, tools::CMinMaxStatsList *min_max_stats_lst, CSearchResults &results, std::vector<int> &virtual_to_play_batch);
+    int csearch_all(CRoots *roots, int num_simulations, int pb_c_base, float pb_c_init, float discount_factor, tools::CMinMaxStatsList *min_max_stats_lst, std::vector<int> &to_play_batch, CSearchBuffers &buffers, CInferenceCallback inference, void *context);
 }
 
 #endif
\ No newline at end of file
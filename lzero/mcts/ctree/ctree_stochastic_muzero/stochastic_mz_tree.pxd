@@ -25,6 +25,14 @@ cdef extern from "../common_lib/cminimax.h" namespace "tools":
 
         void set_delta(float value_delta_max)
 
+cdef extern from "../common_lib/cthread_pool.cpp":
+    pass
+
+
+cdef extern from "../common_lib/cthread_pool.h":
+    void cset_num_threads "tools::set_num_threads"(int num_threads)
+    int cget_num_threads "tools::get_num_threads"()
+
 cdef extern from "lib/cnode.cpp":
     pass
 
@@ -68,7 +76,21 @@ cdef extern from "lib/cnode.h" namespace "tree":
         vector[bool] leaf_node_is_chance
         vector[CNode*] nodes
 
+    ctypedef int (*CInferenceCallback)(void *context, int current_latent_state_index) noexcept with gil
+
+    cdef cppclass CSearchBuffers:
+        int *latent_state_index_in_search_path
+        int *latent_state_index_in_batch
+        int *last_actions
+        unsigned char *leaf_node_is_chance
+        float *rewards
+        float *values
+        float *policy_logits
+        int policy_size, action_space_size, chance_space_size
+
     cdef void cbackpropagate(vector[CNode*] &search_path, CMinMaxStats &min_max_stats, int to_play, float value, float discount_factor)
     void cbatch_backpropagate(int current_latent_state_index, float discount_factor, vector[float] value_prefixs, vector[float] values, vector[vector[float]] policies,
-                               CMinMaxStatsList *min_max_stats_lst, CSearchResults &results, vector[int] &to_play_batch, vector[bool] &is_chance_list, vector[int] &leaf_idx_list)
-    void cbatch_traverse(CRoots *roots, int pb_c_base, float pb_c_init, float discount_factor, CMinMaxStatsList *min_max_stats_lst, CSearchResults &results, vector[int] &virtual_to_play_batch)
+                               CMinMaxStatsList *min_max_stats_lst, CSearchResults &results, vector[int] &to_play_batch, vector[bool] &is_chance_list, vector[int] &leaf_idx_list) nogil
+    void cbatch_traverse(CRoots *roots, int pb_c_base, float pb_c_init, float discount_factor, CMinMaxStatsList *min_max_stats_lst, CSearchResults &results, vector[int] &virtual_to_play_batch) nogil
+    int csearch_all(CRoots *roots, int num_simulations, int pb_c_base, float pb_c_init, float discount_factor, CMinMaxStatsList *min_max_stats_lst, vector[int] &to_play_batch,
+                    CSearchBuffers &buffers, CInferenceCallback inference, void *context) nogil
@@ -11,8 +11,9 @@ Overview:
 """
 
 import copy
+import inspect
 import math
-from typing import List, Tuple, Union, Callable, Type, Dict, Any
+from typing import TYPE_CHECKING, List, Tuple, Union, Callable, Type, Dict, Any, Optional, Hashable
 
 import numpy as np
 import torch
@@ -20,6 +21,9 @@ import torch.nn as nn
 from ding.envs import BaseEnv
 from easydict import EasyDict
 
+if TYPE_CHECKING:
+    from lzero.mcts.utils import SearchBudget
+
 
 class Node(object):
     """
@@ -47,17 +51,40 @@ class Node(object):
         self._visit_count = 0
         # The sum of the values of all child nodes of this node.
         self._value_sum = 0
-        # The prior probability of selecting this node.
+        # The number and the sum of the virtual losses of the pending visits, which are included in ``_visit_count``
+        # and ``_value_sum``.
+        self._virtual_loss_count = 0
+        self._virtual_loss_sum = 0
+        # The prior probability of selecting this node. For the child of a chance node, it is the probability of
+        # the outcome.
         self.prior_p = prior_p
+        # Whether the node is a chance node, i.e. the node of an action with a random outcome, whose children are
+        # keyed by the outcomes instead of the actions.
+        self.is_chance = False
 
     @property
     def value(self) -> float:
         """
         Overview:
-            The value of the current node.
+            The value of the current node. The value of a chance node is the mean of the values of its visited \
+            outcomes weighted by their probabilities, so that an outcome sampled more often than its probability \
+            does not bias the value. The outcomes count without their pending visits, which are counted by the \
+            chance node itself with the value ``-virtual_loss``, as for the other nodes.
         Returns:
             - output (:obj:`Int`): Current value, used to compute ucb score.
         """
+        if self.is_chance:
+            weighted_value, visited_prob = 0., 0.
+            for child in self._children.values():
+                visit_count = child._visit_count - child._virtual_loss_count
+                if visit_count > 0:
+                    weighted_value += child.prior_p * (child._value_sum + child._virtual_loss_sum) / visit_count
+                    visited_prob += child.prior_p
+            value = weighted_value / visited_prob if visited_prob > 0 else 0
+            if self._virtual_loss_count > 0:
+                visit_count = self._visit_count - self._virtual_loss_count
+                value = (value * visit_count - self._virtual_loss_sum) / self._visit_count
+            return value
         # Computes the average value of the current node.
         if self._visit_count == 0:
             return 0
@@ -75,6 +102,31 @@ class Node(object):
         # Updates the sum of the values of all child nodes of this node.
         self._value_sum += value
 
+    def add_virtual_loss(self, virtual_loss: float) -> None:
+        """
+        Overview:
+            Count a pending visit with the value ``-virtual_loss``, so that the other simulations of the same batch
+            are discouraged from selecting this node before its leaf is evaluated.
+        Arguments:
+            - virtual_loss (:obj:`Float`): The value subtracted from the value sum of the node.
+        """
+        self._visit_count += 1
+        self._value_sum -= virtual_loss
+        self._virtual_loss_count += 1
+        self._virtual_loss_sum += virtual_loss
+
+    def revert_virtual_loss(self, virtual_loss: float) -> None:
+        """
+        Overview:
+            Revert the pending visit added by ``add_virtual_loss``.
+        Arguments:
+            - virtual_loss (:obj:`Float`): The value subtracted from the value sum of the node.
+        """
+        self._visit_count -= 1
+        self._value_sum += virtual_loss
+        self._virtual_loss_count -= 1
+        self._virtual_loss_sum -= virtual_loss
+
     def update_recursive(self, leaf_value: float, battle_mode_in_simulation_env: str) -> None:
         """
         Overview:
@@ -96,8 +148,12 @@ class Node(object):
             if self.is_root():
                 return
             # Update the parent node's information recursively. When propagating the value back to the parent node,
-            # the value needs to be negated once because the perspective of evaluation has changed.
-            self._parent.update_recursive(-leaf_value, battle_mode_in_simulation_env)
+            # the value needs to be negated once because the perspective of evaluation has changed. A chance node
+            # and its outcomes are evaluated from the perspective of the same player.
+            if self._parent.is_chance:
+                self._parent.update_recursive(leaf_value, battle_mode_in_simulation_env)
+            else:
+                self._parent.update_recursive(-leaf_value, battle_mode_in_simulation_env)
         if battle_mode_in_simulation_env == 'play_with_bot_mode':
             # Update the current node's information.
             self.update(leaf_value)
@@ -193,15 +249,37 @@ class MCTS(object):
             'root_dirichlet_alpha', 0.3
         )  # 0.3  # for chess, 0.03 for Go and 0.15 for shogi.
         self._root_noise_weight = self._cfg.get('root_noise_weight', 0.25)
+        # The number of leaves selected with virtual loss and evaluated in one forward call by ``get_next_actions``.
+        self._leaf_batch_size = self._cfg.get('leaf_batch_size', 8)
+        # The value penalty of a pending visit in ``get_next_actions``.
+        self._virtual_loss = self._cfg.get('virtual_loss', 1.0)
+        # Whether the actions with a random outcome, e.g. the flips of Dark Chess, are searched with chance nodes.
+        # It requires the simulate env to support make/unmake and ``chance_outcomes``.
+        self._use_chance_node = self._cfg.get('use_chance_node', True)
+        # Whether to keep the subtree reached from the previous root by the played action (and the reply of the
+        # opponent) as the next root of the same ``tree_id``. It requires the simulate env to support make/unmake.
+        self._reuse_tree = self._cfg.get('reuse_tree', False)
+        # Whether to prune the siblings of the played action when the tree is kept. Otherwise the whole tree is kept,
+        # so that it can also be reused if another action is played, at the cost of the memory.
+        self._prune_siblings = self._cfg.get('prune_siblings', True)
+        # The kept trees of the previous searches: tree_id -> (root, state config of the root, played action).
+        self._trees = {}
 
         self.simulate_env = simulate_env
+        # Whether the simulations walk down the tree with ``push_action`` and undo the actions with ``pop_action``
+        # instead of resetting the simulate env to the root state every time.
+        self._make_unmake = False
+        # Whether chance nodes are used in the current search.
+        self._chance_node = False
 
     def get_next_action(
             self,
             state_config_for_simulate_env_reset: Dict[str, Any],
             policy_forward_fn: Callable,
             temperature: int = 1.0,
-            sample: bool = True
+            sample: bool = True,
+            tree_id: Hashable = 0,
+            search_budget: Optional["SearchBudget"] = None
     ) -> Tuple[int, List[float]]:
         """
         Overview:
@@ -211,32 +289,42 @@ class MCTS(object):
             - policy_forward_fn (:obj:`Function`): The Callable to compute the action probs and state value.
             - temperature (:obj:`Float`): The exploration temperature.
             - sample (:obj:`Bool`): Whether to sample an action from the probabilities or choose the most probable action.
+            - tree_id (:obj:`Hashable`): The id of the game, whose tree is kept for the next search if ``reuse_tree``.
+            - search_budget (:obj:`SearchBudget`): The budget of an anytime search, which replaces ``num_simulations``.
         Returns:
             - action (:obj:`Int`): The selected action to take.
             - action_probs (:obj:`List`): The output probability of each action.
         """
+        self._make_unmake = self._support_make_unmake()
+        self._chance_node = self._support_chance_node()
 
-        # Create a new root node for the MCTS search.
-        root = Node()
+        # Reuse the subtree of the previous search if the current state is reached from its root, otherwise create a
+        # new root node for the MCTS search.
+        root = self._get_root(tree_id, state_config_for_simulate_env_reset)
 
-        self.simulate_env.reset(
-                start_player_index=state_config_for_simulate_env_reset.start_player_index,
-                init_state=state_config_for_simulate_env_reset.init_state,
-            )
+        self.simulate_env.reset(**self._get_reset_kwargs(state_config_for_simulate_env_reset))
         # Expand the root node by adding children to it.
-        self._expand_leaf_node(root, self.simulate_env, policy_forward_fn)
+        if root.is_leaf():
+            self._expand_leaf_node(root, self.simulate_env, policy_forward_fn)
 
         # Add Dirichlet noise to the root node's prior probabilities to encourage exploration.
         if sample:
             self._add_exploration_noise(root)
 
-        # Perform MCTS search for a fixed number of iterations.
-        for n in range(self._num_simulations):
-            # Initialize the simulated environment and reset it to the root node.
-            self.simulate_env.reset(
-                start_player_index=state_config_for_simulate_env_reset.start_player_index,
-                init_state=state_config_for_simulate_env_reset.init_state,
-            )
+        # Perform MCTS search for a fixed number of iterations. The visits kept from the previous search count.
+        # With a search budget, the search runs until the budget is exhausted (at ``max_num_simulations`` at the latest)
+        # instead.
+        if search_budget is None:
+            num_simulations = max(self._num_simulations - root.visit_count, 0)
+        else:
+            num_simulations = search_budget.max_num_simulations + 1
+        for n in range(num_simulations):
+            if search_budget is not None and search_budget.exhausted(n, lambda: self._get_visit_counts([root])):
+                break
+            # Initialize the simulated environment and reset it to the root node. With make/unmake, every simulation
+            # undoes its actions, so the simulate env is already at the root node.
+            if not self._make_unmake:
+                self.simulate_env.reset(**self._get_reset_kwargs(state_config_for_simulate_env_reset))
             # Set the battle mode adopted by the environment during the MCTS process.
             # In ``self_play_mode``, when the environment calls the step function once, it will play one move based on the incoming action.
             # In ``play_with_bot_mode``, when the step function is called, it will play one move based on the incoming action,
@@ -247,6 +335,375 @@ class MCTS(object):
             # Run the simulation from the root to a leaf node and update the node values along the way.
             self._simulate(root, self.simulate_env, policy_forward_fn)
 
+        action, action_probs = self._get_action_from_root(root, temperature, sample)
+        self._keep_tree(tree_id, root, state_config_for_simulate_env_reset, action)
+        return action, action_probs
+
+    def get_next_actions(
+            self,
+            state_configs_for_simulate_env_reset: List[Dict[str, Any]],
+            policy_forward_batch_fn: Callable,
+            temperature: int = 1.0,
+            sample: bool = True,
+            tree_ids: Optional[List[Hashable]] = None,
+            search_budget: Optional["SearchBudget"] = None
+    ) -> List[Tuple[int, List[float]]]:
+        """
+        Overview:
+            The batched version of ``get_next_action``, which searches the states of several games together.
+            In every pass, up to ``leaf_batch_size`` leaves are selected from each root, with a virtual loss added
+            along each selected path so that the following selections spread over the tree. The leaves of all the
+            roots are then evaluated by a single call of ``policy_forward_batch_fn`` and backed up together.
+        Arguments:
+            - state_configs_for_simulate_env_reset (:obj:`List[Dict]`): The configs of the states of the games.
+            - policy_forward_batch_fn (:obj:`Function`): The Callable which takes the stacked ``current_state`` \
+                of the leaves and returns the action probs of shape (B, action_space_size) and the values of shape (B, ).
+            - temperature (:obj:`Float`): The exploration temperature.
+            - sample (:obj:`Bool`): Whether to sample an action from the probabilities or choose the most probable action.
+            - tree_ids (:obj:`Optional[List[Hashable]]`): The ids of the games, whose trees are kept for the next \
+                search if ``reuse_tree``. Defaults to the indices of the games.
+            - search_budget (:obj:`SearchBudget`): The budget of an anytime search, which replaces ``num_simulations``. \
+                It is checked once every pass, in which every root runs ``leaf_batch_size`` simulations.
+        Returns:
+            - actions_and_probs (:obj:`List[Tuple[int, List[float]]]`): The selected action and the output probability \
+                of each action of every game.
+        """
+        if tree_ids is None:
+            tree_ids = list(range(len(state_configs_for_simulate_env_reset)))
+        self._make_unmake = self._support_make_unmake()
+        self._chance_node = self._support_chance_node()
+        roots = [
+            self._get_root(tree_id, state_config)
+            for tree_id, state_config in zip(tree_ids, state_configs_for_simulate_env_reset)
+        ]
+
+        # Expand all the new roots with one forward call.
+        leaves = []
+        for root, state_config in zip(roots, state_configs_for_simulate_env_reset):
+            if root.is_leaf():
+                self._reset_simulate_env(state_config)
+                leaves.append((root, [root], self.simulate_env.legal_actions, self.simulate_env.current_state()[1]))
+        self._expand_leaf_nodes(leaves, policy_forward_batch_fn, backup=False)
+        if sample:
+            for root in roots:
+                self._add_exploration_noise(root)
+
+        # The visits kept from the previous search count. With a search budget, every root runs until the budget is
+        # exhausted instead.
+        if search_budget is None:
+            num_simulations = [min(root.visit_count, self._num_simulations) for root in roots]
+            max_num_simulations = self._num_simulations
+        else:
+            num_simulations = [0 for _ in roots]
+            max_num_simulations = search_budget.max_num_simulations
+        while search_budget is not None or min(num_simulations) < max_num_simulations:
+            if search_budget is not None and search_budget.exhausted(
+                    min(num_simulations), lambda: self._get_visit_counts(roots)):
+                break
+            leaves = []
+            for i, (root, state_config) in enumerate(zip(roots, state_configs_for_simulate_env_reset)):
+                if self._make_unmake:
+                    self._reset_simulate_env(state_config)
+                for _ in range(min(self._leaf_batch_size, max_num_simulations - num_simulations[i])):
+                    num_simulations[i] += 1
+                    if not self._make_unmake:
+                        self._reset_simulate_env(state_config)
+                    leaf = self._select_leaf(root, self.simulate_env)
+                    if leaf is not None:
+                        leaves.append(leaf)
+            self._expand_leaf_nodes(leaves, policy_forward_batch_fn, backup=True)
+
+        results = []
+        for tree_id, root, state_config in zip(tree_ids, roots, state_configs_for_simulate_env_reset):
+            action, action_probs = self._get_action_from_root(root, temperature, sample)
+            self._keep_tree(tree_id, root, state_config, action)
+            results.append((action, action_probs))
+        return results
+
+    @staticmethod
+    def _get_visit_counts(roots: List[Node]) -> List[List[int]]:
+        """
+        Overview:
+            Get the visit counts of the children of every root, which are checked by the search budget.
+        """
+        return [[child.visit_count for child in root.children.values()] for root in roots]
+
+    def _keep_tree(self, tree_id: Hashable, root: Node, state_config: Dict[str, Any], action: int) -> None:
+        """
+        Overview:
+            Keep the tree of ``root`` for the next search of ``tree_id`` if ``reuse_tree``. With ``prune_siblings``, \
+            only the subtree of the played ``action`` is kept.
+        Arguments:
+            - tree_id (:obj:`Hashable`): The id of the game.
+            - root (:obj:`Class Node`): The root node of the search.
+            - state_config (:obj:`Dict`): The config of the state of the root.
+            - action (:obj:`Int`): The action played from the root.
+        """
+        if not (self._reuse_tree and self._make_unmake):
+            self._trees.pop(tree_id, None)
+            return
+        if self._prune_siblings:
+            root._children = {action: root.children[action]} if action in root.children else {}
+        # The state config is copied since the caller may modify the board in place.
+        self._trees[tree_id] = (root, copy.deepcopy(state_config), action)
+
+    def _get_root(self, tree_id: Hashable, state_config: Dict[str, Any]) -> Node:
+        """
+        Overview:
+            Get the root node of the search of ``tree_id``. If the state of ``state_config`` is reached from the kept \
+            root in at most two actions (the played action and the reply of the opponent, with the outcomes of chance \
+            nodes), the node of the state becomes the root with its statistics. Otherwise a new root is created.
+        Arguments:
+            - tree_id (:obj:`Hashable`): The id of the game.
+            - state_config (:obj:`Dict`): The config of the state of the search.
+        Returns:
+            - root (:obj:`Class Node`): The root node.
+        """
+        if tree_id not in self._trees:
+            return Node()
+        old_root, old_state_config, action = self._trees.pop(tree_id)
+        if not self._make_unmake:
+            return Node()
+        self._reset_simulate_env(state_config)
+        target_state = self.simulate_env.current_state()[0]
+        self._reset_simulate_env(old_state_config)
+        # The played action is tried first.
+        actions = sorted(old_root.children, key=lambda a: a != action)
+        root = self._find_state(old_root, actions, target_state, depth=2)
+        if root is None:
+            return Node()
+        # Detach the subtree, the rest of the old tree is released.
+        root._parent = None
+        return root
+
+    def _find_state(self, node: Node, actions: List[int], target_state: np.ndarray, depth: int) -> Optional[Node]:
+        """
+        Overview:
+            Find the visited node of ``target_state`` below ``node`` within ``depth`` actions, walking the simulate \
+            env with ``push_action`` and ``pop_action`` from the state of ``node``.
+        Arguments:
+            - node (:obj:`Class Node`): The node of the current state of the simulate env.
+            - actions (:obj:`List[int]`): The actions of the children of ``node`` to search.
+            - target_state (:obj:`np.ndarray`): The ``current_state`` of the state to find.
+            - depth (:obj:`Int`): The maximum number of actions.
+        Returns:
+            - node (:obj:`Optional[Node]`): The node of ``target_state``, or None if it is not found.
+        """
+        for action in actions:
+            child = node.children[action]
+            if child.visit_count == 0:
+                continue
+            if child.is_chance:
+                branches = [((action, outcome), outcome_node) for outcome, outcome_node in child.children.items()]
+            elif getattr(self.simulate_env, 'chance_outcomes', lambda _: None)(action) is None:
+                branches = [((action, ), child)]
+            else:
+                # The outcomes of a random action searched without chance node are merged in one node.
+                continue
+            for push_args, next_node in branches:
+                if next_node.visit_count == 0:
+                    continue
+                self.simulate_env.push_action(*push_args)
+                if np.array_equal(self.simulate_env.current_state()[0], target_state):
+                    found = next_node
+                elif depth > 1:
+                    found = self._find_state(next_node, list(next_node.children), target_state, depth - 1)
+                else:
+                    found = None
+                self.simulate_env.pop_action()
+                if found is not None:
+                    return found
+        return None
+
+    def _support_make_unmake(self) -> bool:
+        """
+        Overview:
+            Whether the simulate env supports ``push_action`` and ``pop_action``. In ``play_with_bot_mode``, ``step``
+            also plays the move of the bot, so the simulations fall back to ``reset`` and ``step``.
+        """
+        return hasattr(self.simulate_env, 'push_action') and \
+            self.simulate_env.battle_mode_in_simulation_env == 'self_play_mode'
+
+    def _support_chance_node(self) -> bool:
+        """
+        Overview:
+            Whether the search uses chance nodes. The outcome of a chance node is applied by ``push_action``, so it \
+            requires make/unmake.
+        """
+        return self._use_chance_node and self._make_unmake and hasattr(self.simulate_env, 'chance_outcomes')
+
+    def _step_simulate_env(self, simulate_env: Type[BaseEnv], action: int, child: Node) -> List[Node]:
+        """
+        Overview:
+            Apply ``action`` in the simulate env when walking down the tree. If ``child`` is a chance node, it is \
+            expanded with the exact outcome distribution of ``action`` the first time, and the outcome is chosen by \
+            ``_select_outcome`` instead of being sampled by the simulate env.
+        Arguments:
+            - simulate_env (:obj:`Class BaseGameEnv`): The class of simulate env.
+            - action (:obj:`Int`): The action selected by ``_select_child``.
+            - child (:obj:`Class Node`): The child node of ``action``.
+        Returns:
+            - nodes (:obj:`List[Node]`): The nodes entered, i.e. ``child``, followed by the outcome node if ``child`` \
+                is a chance node.
+        """
+        if self._chance_node and (child.is_chance or child.is_leaf()):
+            if not child.is_chance:
+                outcomes = simulate_env.chance_outcomes(action)
+                if outcomes is not None:
+                    child.is_chance = True
+                    for outcome, prob in outcomes:
+                        child.children[outcome] = Node(parent=child, prior_p=prob)
+            if child.is_chance:
+                outcome, outcome_node = self._select_outcome(child)
+                simulate_env.push_action(action, outcome)
+                return [child, outcome_node]
+        if self._make_unmake:
+            simulate_env.push_action(action)
+        else:
+            simulate_env.step(action)
+        return [child]
+
+    @staticmethod
+    def _select_outcome(node: Node) -> Tuple[int, Node]:
+        """
+        Overview:
+            Select the outcome of the chance node whose visit count is the most behind its probability, so that the \
+            visits of the outcomes follow the outcome distribution without sampling noise.
+        Arguments:
+            - node (:obj:`Class Node`): A chance node.
+        Returns:
+            - outcome (:obj:`Int`): The selected outcome.
+            - child (:obj:`Node`): The child node of the outcome.
+        """
+        total_visit_count = sum(child.visit_count for child in node.children.values())
+        return max(
+            node.children.items(), key=lambda item: item[1].prior_p * (total_visit_count + 1) - item[1].visit_count
+        )
+
+    def _undo_simulate_env(self, simulate_env: Type[BaseEnv], num_actions: int) -> None:
+        """
+        Overview:
+            Undo the last ``num_actions`` actions of the simulate env, which brings it back to the root node with
+            make/unmake. Without make/unmake, the simulate env is reset before the next simulation instead.
+        """
+        if self._make_unmake:
+            for _ in range(num_actions):
+                simulate_env.pop_action()
+
+    def _get_reset_kwargs(self, state_config_for_simulate_env_reset: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Overview:
+            Get the keyword arguments of the simulate env reset to the state of the config. The ``katago_game_state`` \
+            of the config (the state apart from the board, e.g. the remaining chess of Dark Chess, which give the \
+            outcomes of its chance nodes) is passed to the envs whose ``reset`` takes it.
+        """
+        kwargs = dict(
+            start_player_index=state_config_for_simulate_env_reset.start_player_index,
+            init_state=state_config_for_simulate_env_reset.init_state,
+        )
+        katago_game_state = state_config_for_simulate_env_reset.get('katago_game_state')
+        if katago_game_state is not None and 'katago_game_state' in inspect.signature(
+                self.simulate_env.reset).parameters:
+            kwargs['katago_game_state'] = katago_game_state
+        return kwargs
+
+    def _reset_simulate_env(self, state_config_for_simulate_env_reset: Dict[str, Any]) -> None:
+        """
+        Overview:
+            Reset the simulate env to the root state, in the same way as ``get_next_action``.
+        """
+        self.simulate_env.reset(**self._get_reset_kwargs(state_config_for_simulate_env_reset))
+        self.simulate_env.battle_mode = self.simulate_env.battle_mode_in_simulation_env
+        self.simulate_env.render_mode = None
+
+    def _select_leaf(self, node: Node, simulate_env: Type[BaseEnv]) -> Union[Tuple, None]:
+        """
+        Overview:
+            Traverse the tree from ``node`` to a leaf like ``_simulate``, adding a virtual loss to every node of the
+            path. A terminal leaf is backed up at once; otherwise the leaf is returned for the batched evaluation.
+        Returns:
+            - leaf (:obj:`Union[Tuple, None]`): The leaf node, the search path, the legal actions and the \
+                ``current_state`` of the leaf, or None if the leaf is terminal.
+        """
+        search_path = [node]
+        node.add_virtual_loss(self._virtual_loss)
+        num_actions = 0
+        while not node.is_leaf():
+            action, node = self._select_child(node, simulate_env)
+            if action is None:
+                break
+            for node in self._step_simulate_env(simulate_env, action, node):
+                search_path.append(node)
+                node.add_virtual_loss(self._virtual_loss)
+            num_actions += 1
+
+        done, winner = simulate_env.get_done_winner()
+        if not done:
+            leaf = node, search_path, simulate_env.legal_actions, simulate_env.current_state()[1]
+        else:
+            leaf = None
+            for path_node in search_path:
+                path_node.revert_virtual_loss(self._virtual_loss)
+            leaf_value = self._get_terminal_value(simulate_env, winner)
+            self._backpropagate(node, leaf_value, simulate_env.battle_mode_in_simulation_env)
+        self._undo_simulate_env(simulate_env, num_actions)
+        return leaf
+
+    def _expand_leaf_nodes(self, leaves: List[Tuple], policy_forward_batch_fn: Callable, backup: bool) -> None:
+        """
+        Overview:
+            Evaluate ``leaves`` with one call of ``policy_forward_batch_fn``, expand them, and back up their values
+            after reverting the virtual losses of their paths if ``backup`` is True.
+        Arguments:
+            - leaves (:obj:`List[Tuple]`): The leaves returned by ``_select_leaf``.
+            - policy_forward_batch_fn (:obj:`Function`): The Callable to compute the batched action probs and values.
+            - backup (:obj:`Bool`): Whether to back up the values of the leaves.
+        """
+        if len(leaves) == 0:
+            return
+        action_probs, leaf_values = policy_forward_batch_fn(np.stack([leaf[3] for leaf in leaves]))
+        for (node, search_path, legal_actions, _), probs, leaf_value in zip(leaves, action_probs, leaf_values):
+            # The same leaf may be selected more than once in a batch, it is only expanded the first time.
+            if node.is_leaf():
+                for action in legal_actions:
+                    node.children[action] = Node(parent=node, prior_p=probs[action])
+            if backup:
+                for path_node in search_path:
+                    path_node.revert_virtual_loss(self._virtual_loss)
+                self._backpropagate(node, float(leaf_value), self.simulate_env.battle_mode_in_simulation_env)
+
+    def _get_terminal_value(self, simulate_env: Type[BaseEnv], winner: int) -> float:
+        """
+        Overview:
+            The value of a terminal state, with the same perspective as the value of ``_expand_leaf_node``.
+        """
+        leaf_value = 0
+        if simulate_env.battle_mode_in_simulation_env == 'self_play_mode':
+            if winner != -1:
+                leaf_value = 1 if simulate_env.current_player == winner else -1
+        elif simulate_env.battle_mode_in_simulation_env == 'play_with_bot_mode':
+            if winner == 1:
+                leaf_value = 1
+            elif winner == 2:
+                leaf_value = -1
+        return leaf_value
+
+    @staticmethod
+    def _backpropagate(node: Node, leaf_value: float, battle_mode_in_simulation_env: str) -> None:
+        """
+        Overview:
+            Update the value and visit count of the nodes from ``node`` to the root, the same as ``_simulate``.
+        """
+        if battle_mode_in_simulation_env == 'play_with_bot_mode':
+            node.update_recursive(leaf_value, battle_mode_in_simulation_env)
+        elif battle_mode_in_simulation_env == 'self_play_mode':
+            node.update_recursive(-leaf_value, battle_mode_in_simulation_env)
+
+    def _get_action_from_root(self, root: Node, temperature: float, sample: bool) -> Tuple[int, List[float]]:
+        """
+        Overview:
+            Compute the action probabilities from the visit counts of the children of ``root`` and choose the action.
+        """
         # Get the visit count for each possible action at the root node.
         action_visits = []
         for action in range(self.simulate_env.action_space.n):
@@ -285,13 +742,15 @@ class MCTS(object):
             - simulate_env (:obj:`Class BaseGameEnv`): The class of simulate env.
             - policy_forward_fn (:obj:`Function`): The Callable to compute the action probs and state value.
         """
+        num_actions = 0
         while not node.is_leaf():
             # Traverse the tree until the leaf node.
             action, node = self._select_child(node, simulate_env)
             # When there are no common elements in ``node.children`` and ``simulate_env.legal_actions``, action would be None, and we set the node to be a leaf node.
             if action is None:
                 break
-            simulate_env.step(action)
+            node = self._step_simulate_env(simulate_env, action, node)[-1]
+            num_actions += 1
 
         done, winner = simulate_env.get_done_winner()
         """
@@ -339,6 +798,9 @@ class MCTS(object):
             # thus we add the negative when call update_recursive().
             node.update_recursive(-leaf_value, simulate_env.battle_mode_in_simulation_env)
 
+        # Walk back to the root node for the next simulation.
+        self._undo_simulate_env(simulate_env, num_actions)
+
     def _select_child(self, node: Node, simulate_env: Type[BaseEnv]) -> Tuple[Union[int, float], Node]:
         """
         Overview:
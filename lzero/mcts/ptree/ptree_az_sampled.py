@@ -11,7 +11,7 @@ Overview:
 """
 
 import math
-from typing import List, Tuple, Union, Callable, Type, Dict, Any
+from typing import TYPE_CHECKING, List, Tuple, Union, Callable, Type, Dict, Any, Hashable, Optional
 
 import numpy as np
 import torch
@@ -21,6 +21,9 @@ from numpy import ndarray
 
 from lzero.mcts.ptree.ptree_sez import Action
 
+if TYPE_CHECKING:
+    from lzero.mcts.utils import SearchBudget
+
 
 class Node(object):
     """
@@ -211,7 +214,9 @@ class MCTS(object):
             state_config_for_env_reset: Dict[str, Any],
             policy_value_func: Callable,
             temperature: float = 1.0,
-            sample: bool = True
+            sample: bool = True,
+            tree_id: Hashable = 0,
+            search_budget: Optional["SearchBudget"] = None
     ) -> Tuple[int, List[float]]:
         """
         Overview:
@@ -221,6 +226,9 @@ class MCTS(object):
             - policy_value_func (:obj:`Function`): The Callable to compute the action probs and state value.
             - temperature (:obj:`Float`): The exploration temperature.
             - sample (:obj:`Bool`): Whether to sample an action from the probabilities or choose the most probable action.
+            - tree_id (:obj:`Hashable`): The id of the game, for the interface of ``ptree_az.MCTS``. The sampled \
+                MCTS does not reuse the tree, a new root is created for every search.
+            - search_budget (:obj:`SearchBudget`): The budget of an anytime search, which replaces ``num_simulations``.
         Returns:
             - action (:obj:`Int`): The selected action to take.
             - action_probs (:obj:`List`): The output probability of each action.
@@ -237,7 +245,11 @@ class MCTS(object):
         if sample:
             self._add_exploration_noise(self.root)
 
-        for n in range(self._num_simulations):
+        num_simulations = self._num_simulations if search_budget is None else search_budget.max_num_simulations + 1
+        for n in range(num_simulations):
+            if search_budget is not None and search_budget.exhausted(
+                    n, lambda: [[child.visit_count for child in self.root.children.values()]]):
+                break
             self.simulate_env.reset(
                 start_player_index=state_config_for_env_reset.start_player_index,
                 init_state=state_config_for_env_reset.init_state,
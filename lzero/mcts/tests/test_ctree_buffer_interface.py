@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from lzero.mcts.ctree.ctree_muzero import mz_tree
+
+
+def _simulate(to_array: bool, batch_size: int = 4, action_space_size: int = 5):
+    rng = np.random.RandomState(0)
+    legal_actions = [list(range(action_space_size)) for _ in range(batch_size)]
+    roots = mz_tree.Roots(batch_size, legal_actions)
+    roots.prepare_no_noise([0. for _ in range(batch_size)], rng.randn(batch_size, action_space_size).tolist(),
+                           [-1 for _ in range(batch_size)])
+    min_max_stats_lst = mz_tree.MinMaxStatsList(batch_size)
+    min_max_stats_lst.set_delta(0.01)
+    results = mz_tree.ResultsWrapper(num=batch_size)
+    traverse_output = mz_tree.batch_traverse(
+        roots, 19652, 1.25, 0.997, min_max_stats_lst, results, [-1 for _ in range(batch_size)]
+    )
+    reward = rng.randn(batch_size).astype(np.float32)
+    value = rng.randn(batch_size, 1).astype(np.float32)
+    policy_logits = rng.randn(batch_size, action_space_size).astype(np.float32)
+    if not to_array:
+        reward, value, policy_logits = reward.tolist(), value.reshape(-1).tolist(), policy_logits.tolist()
+    mz_tree.batch_backpropagate(1, 0.997, reward, value, policy_logits, min_max_stats_lst, results, traverse_output[3])
+    return traverse_output, roots.get_values()
+
+
+@pytest.mark.unittest
+def test_ctree_buffer_interface():
+    traverse_output, values = _simulate(to_array=True)
+    latent_state_index_in_search_path, latent_state_index_in_batch, last_actions, virtual_to_play_batch = traverse_output
+    for array in traverse_output:
+        assert isinstance(array, np.ndarray) and array.dtype == np.intc and array.shape == (4, )
+    assert np.array_equal(latent_state_index_in_search_path, np.zeros(4))
+    assert np.array_equal(latent_state_index_in_batch, np.arange(4))
+    assert np.all((0 <= last_actions) & (last_actions < 5))
+    assert np.array_equal(virtual_to_play_batch, -np.ones(4))
+    # The lists of the network outputs are still accepted, and lead to the same backup. The leaf node chosen in the
+    # first simulation is random, but the root value does not depend on it.
+    _, list_values = _simulate(to_array=False)
+    assert values == list_values
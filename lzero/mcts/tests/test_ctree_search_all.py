@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from lzero.mcts.ctree.ctree_muzero import mz_tree
+
+
+def _prepare_roots(batch_size: int, action_space_size: int, rng: np.random.RandomState):
+    legal_actions = [list(range(action_space_size)) for _ in range(batch_size)]
+    roots = mz_tree.Roots(batch_size, legal_actions)
+    roots.prepare_no_noise(
+        [0. for _ in range(batch_size)],
+        rng.randn(batch_size, action_space_size).tolist(), [-1 for _ in range(batch_size)]
+    )
+    min_max_stats_lst = mz_tree.MinMaxStatsList(batch_size)
+    min_max_stats_lst.set_delta(0.01)
+    return roots, min_max_stats_lst
+
+
+def _buffers(batch_size: int, action_space_size: int):
+    return (
+        np.zeros(batch_size, dtype=np.intc), np.zeros(batch_size, dtype=np.intc), np.zeros(batch_size, dtype=np.intc),
+        np.zeros(batch_size, dtype=np.float32), np.zeros(batch_size, dtype=np.float32),
+        np.zeros((batch_size, action_space_size), dtype=np.float32)
+    )
+
+
+@pytest.mark.unittest
+def test_search_all():
+    batch_size, action_space_size, num_simulations = 8, 4, 10
+    rng = np.random.RandomState(0)
+    roots, min_max_stats_lst = _prepare_roots(batch_size, action_space_size, rng)
+    buffers = _buffers(batch_size, action_space_size)
+    latent_state_index_in_search_path, latent_state_index_in_batch, last_actions, rewards, values, policy_logits = buffers
+    simulation_indices = []
+
+    def inference(current_latent_state_index):
+        # The leaf nodes of the simulation are in the input buffers when the inference is called.
+        assert np.all(latent_state_index_in_search_path < current_latent_state_index)
+        assert np.all((0 <= latent_state_index_in_batch) & (latent_state_index_in_batch < batch_size))
+        assert np.all((0 <= last_actions) & (last_actions < action_space_size))
+        simulation_indices.append(current_latent_state_index)
+        rewards[:] = rng.randn(batch_size)
+        values[:] = rng.randn(batch_size)
+        policy_logits[:] = rng.randn(batch_size, action_space_size)
+
+    mz_tree.search_all(
+        roots, num_simulations, 19652, 1.25, 0.997, min_max_stats_lst, [-1] * batch_size, inference, *buffers
+    )
+    assert simulation_indices == list(range(1, num_simulations + 1))
+    for distribution in roots.get_distributions():
+        assert sum(distribution) == num_simulations
+
+
+@pytest.mark.unittest
+def test_search_all_error():
+    batch_size, action_space_size = 4, 3
+    roots, min_max_stats_lst = _prepare_roots(batch_size, action_space_size, np.random.RandomState(0))
+    simulation_indices = []
+
+    def inference(current_latent_state_index):
+        simulation_indices.append(current_latent_state_index)
+        raise RuntimeError('inference failed')
+
+    # An exception of the inference stops the search and is raised again.
+    with pytest.raises(RuntimeError, match='inference failed'):
+        mz_tree.search_all(
+            roots, 5, 19652, 1.25, 0.997, min_max_stats_lst, [-1] * batch_size, inference,
+            *_buffers(batch_size, action_space_size)
+        )
+    assert simulation_indices == [1]
+    with pytest.raises(ValueError):
+        mz_tree.search_all(
+            roots, 5, 19652, 1.25, 0.997, min_max_stats_lst, [-1] * batch_size, inference,
+            *_buffers(batch_size + 1, action_space_size)
+        )
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from lzero.mcts.ctree.ctree_muzero import mz_tree
+
+
+def _search(batch_size: int = 64, action_space_size: int = 6, num_simulations: int = 20):
+    rng = np.random.RandomState(0)
+    legal_actions = [list(range(action_space_size)) for _ in range(batch_size)]
+    roots = mz_tree.Roots(batch_size, legal_actions)
+    roots.prepare_no_noise(
+        [0. for _ in range(batch_size)],
+        rng.randn(batch_size, action_space_size).tolist(), [-1 for _ in range(batch_size)]
+    )
+    min_max_stats_lst = mz_tree.MinMaxStatsList(batch_size)
+    min_max_stats_lst.set_delta(0.01)
+    for simulation_index in range(num_simulations):
+        results = mz_tree.ResultsWrapper(num=batch_size)
+        latent_state_index_in_search_path, latent_state_index_in_batch, last_actions, virtual_to_play_batch = \
+            mz_tree.batch_traverse(roots, 19652, 1.25, 0.997, min_max_stats_lst, results, [-1] * batch_size)
+        # The outputs are written by the index of the root, whichever thread traversed it.
+        assert np.all(latent_state_index_in_search_path <= simulation_index)
+        assert np.array_equal(latent_state_index_in_batch[latent_state_index_in_search_path == 0],
+                              np.flatnonzero(latent_state_index_in_search_path == 0))
+        assert np.all((0 <= last_actions) & (last_actions < action_space_size))
+        reward = rng.randn(batch_size).astype(np.float32)
+        value = rng.randn(batch_size).astype(np.float32)
+        policy_logits = rng.randn(batch_size, action_space_size).astype(np.float32)
+        mz_tree.batch_backpropagate(
+            simulation_index + 1, 0.997, reward, value, policy_logits, min_max_stats_lst, results,
+            virtual_to_play_batch
+        )
+    return roots
+
+
+@pytest.mark.unittest
+def test_ctree_thread_pool():
+    num_threads = mz_tree.get_num_threads()
+    try:
+        mz_tree.set_num_threads(4)
+        assert mz_tree.get_num_threads() == 4
+        roots = _search()
+        for distribution in roots.get_distributions():
+            assert sum(distribution) == 20
+    finally:
+        mz_tree.set_num_threads(num_threads)
+    assert mz_tree.get_num_threads() == num_threads
+
+
+@pytest.mark.unittest
+def test_set_ctree_num_threads_once_per_process(monkeypatch):
+    import lzero.mcts.utils as mcts_utils
+    monkeypatch.setattr(mcts_utils, '_CTREE_NUM_THREADS', {})
+    num_threads = mz_tree.get_num_threads()
+    try:
+        mcts_utils.set_ctree_num_threads(mz_tree, 2)
+        assert mz_tree.get_num_threads() == 2
+        # A second search of the process, e.g. the reanalysis search of the buffer, keeps the pool of the first one.
+        mcts_utils.set_ctree_num_threads(mz_tree, 4)
+        assert mz_tree.get_num_threads() == 2
+    finally:
+        mz_tree.set_num_threads(num_threads)
@@ -87,3 +87,48 @@ def test_sample_orig_data():
     context = buffer._sample_orig_data(batch_size=2)
     # context = (game_lst, game_pos_lst, indices_lst, weights, make_time)
     print(context)
+
+
+@pytest.mark.unittest
+def test_remove_oldest_data_to_fit():
+    buffer = EfficientZeroGameBuffer(EasyDict(config, replay_buffer_size=25))
+    data = [[1, 1, 1] for _ in range(10)]  # (s,a,r)
+    meta = {'done': True, 'unroll_plus_td_steps': 5, 'priorities': np.array([0.9 for i in range(10)])}
+
+    for i in range(3):
+        buffer._push_game_segment(to_list(np.multiply(i, data)), meta)
+    buffer.update_priority([[[], [], [], [29], [], [999]], []], [0.5])
+    buffer.remove_oldest_data_to_fit()
+    # The oldest game segment is removed, and the indices of the transitions are shifted.
+    assert buffer.get_num_of_game_segments() == 2
+    assert buffer.get_num_of_transitions() == 20
+    assert buffer.game_segment_game_pos_look_up[0] == (1, 0)
+    assert buffer.game_pos_priorities[19] == 0.5
+    game_segment_list, pos_in_game_segment_list, _, _, _ = buffer._sample_orig_data(batch_size=20)
+    for game_segment, pos in zip(game_segment_list, pos_in_game_segment_list):
+        assert game_segment[pos] in ([1, 1, 1], [2, 2, 2])
+
+
+@pytest.mark.unittest
+def test_compute_n_step_targets():
+    from lzero.mcts.buffer.game_buffer_muzero import MuZeroGameBuffer
+    buffer = MuZeroGameBuffer(
+        EasyDict(
+            config, env_type='board_games', action_type='varied_action_space', num_unroll_steps=3, td_steps=2,
+            discount_factor=0.9, model=EasyDict(frame_stack_num=1)
+        )
+    )
+    rewards_list = [np.arange(1., 7.), np.arange(1., 4.)]
+    to_play_segment = [np.array([1, 2, 1, 2, 1]), np.array([1, 2, 1])]
+    pos_in_game_segment_list = [1, 1]
+    game_segment_lens = [5, 3]
+    td_steps_list = np.repeat([2, 2], 4)
+    value_list = np.arange(8.)
+
+    batch_rewards, batch_target_values = buffer._compute_n_step_targets(
+        value_list, rewards_list, pos_in_game_segment_list, game_segment_lens, td_steps_list, to_play_segment
+    )
+    # the i-th reward of a target is negated when to_play_segment[i] differs from to_play at the sample position
+    expected_values = [[0 - 2 + 0.9 * 3, 1 - 3 + 0.9 * 4, 2 - 4 + 0.9 * 5, 3 - 5 + 0.9 * 6], [4 - 2 + 0.9 * 3, 5 - 3, 0, 0]]
+    assert np.allclose(batch_target_values, expected_values)
+    assert np.allclose(batch_rewards, [[2, 3, 4, 5], [2, 3, 0, 0]])
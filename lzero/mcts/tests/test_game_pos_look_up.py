@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from lzero.mcts.buffer.game_pos_look_up import GamePosLookUp
+
+
+@pytest.mark.unittest
+def test_game_pos_look_up():
+    look_up = GamePosLookUp(capacity=8, segment_capacity=2)
+    expected = []
+    np.random.seed(0)
+    num_segments = 0
+    # The pushes and removals wrap the rings around and grow them.
+    for _ in range(30):
+        for _ in range(np.random.randint(1, 4)):
+            length = np.random.randint(1, 6)
+            look_up.append(num_segments, length)
+            expected += [(num_segments, pos) for pos in range(length)]
+            num_segments += 1
+        num_removed = np.random.randint(0, 3)
+        removed_segments = sorted({idx for idx, _ in expected})[:num_removed]
+        num_transitions = sum(idx in removed_segments for idx, _ in expected)
+        assert look_up.pop_front(num_removed) == num_transitions
+        expected = expected[num_transitions:]
+
+        assert len(look_up) == len(expected)
+        assert look_up.num_segments == len({idx for idx, _ in expected})
+        assert [look_up[i] for i in range(len(look_up))] == expected
+        segment_idx, pos = look_up[np.arange(len(look_up))]
+        assert list(zip(segment_idx.tolist(), pos.tolist())) == expected
+
+    with pytest.raises(IndexError):
+        look_up[len(look_up)]
+
+
+@pytest.mark.unittest
+def test_num_segments_to_remove():
+    look_up = GamePosLookUp()
+    for idx, length in enumerate([3, 5, 2, 4]):
+        look_up.append(idx, length)
+    assert look_up.num_segments_to_remove(14) == (1, 11)
+    assert look_up.num_segments_to_remove(11) == (1, 11)
+    assert look_up.num_segments_to_remove(10) == (2, 6)
+    assert look_up.num_segments_to_remove(4) == (3, 4)
+    assert look_up.num_segments_to_remove(0) == (4, 0)
@@ -1,3 +1,5 @@
+import copy
+
 import numpy as np
 import pytest
 import torch
@@ -136,3 +138,46 @@ def test_game_segment(test_algo):
 
         for env in envs:
             env.close()
+
+
+@pytest.mark.unittest
+def test_columnar_game_segment():
+    from lzero.mcts.tests.config.tictactoe_muzero_bot_mode_config_for_test import tictactoe_muzero_config as config
+    config = copy.deepcopy(config)
+    config.policy.game_segment_length = 3
+    config.policy.num_unroll_steps = 2
+    config.policy.td_steps = 2
+    config.policy.gumbel_algo = True
+    np.random.seed(0)
+
+    segments = []
+    for columnar in [False, True]:
+        config.policy.columnar_game_segment = columnar
+        game_segment = GameSegment(None, game_segment_length=3, config=config.policy)
+        game_segment.reset([np.zeros((3, 3, 3), dtype=np.float32) for _ in range(config.policy.model.frame_stack_num)])
+        segments.append(game_segment)
+    rng = np.random.RandomState(0)
+    for step in range(5):
+        obs = rng.rand(3, 3, 3).astype(np.float32)
+        # the number of legal actions of board games varies, and the column grows beyond its capacity
+        visit_counts = list(rng.randint(1, 10, size=9 - step))
+        improved_policy = rng.rand(9).astype(np.float32)
+        for game_segment in segments:
+            game_segment.store_search_stats(visit_counts, float(step), improved_policy=improved_policy)
+            game_segment.append(step, obs, float(step % 2), np.ones(9, dtype=np.int8), -1)
+    for game_segment in segments:
+        # the reanalyze-style in-place updates of the search statistics
+        game_segment.store_search_stats([1, 3], 10., improved_policy=np.ones(9, dtype=np.float32), idx=1)
+        assert np.allclose(game_segment.child_visit_segment[1], [0.25, 0.75])
+        assert np.allclose(game_segment.child_visit_segment[-1], segments[0].child_visit_segment[-1])
+        assert len(game_segment.get_obs()) == config.policy.model.frame_stack_num
+        game_segment.game_segment_to_array()
+
+    expected, columnar = segments
+    for name in ['obs_segment', 'action_segment', 'reward_segment', 'root_value_segment', 'improved_policy_probs',
+                 'action_mask_segment', 'to_play_segment']:
+        assert getattr(columnar, name).dtype == getattr(expected, name).dtype, name
+        assert np.array_equal(getattr(columnar, name), getattr(expected, name)), name
+    assert columnar.child_visit_segment.dtype == object
+    for row, expected_row in zip(columnar.child_visit_segment, expected.child_visit_segment):
+        assert np.allclose(row, expected_row)
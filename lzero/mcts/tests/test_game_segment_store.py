@@ -0,0 +1,82 @@
+import copy
+
+import numpy as np
+import pytest
+
+from lzero.mcts.buffer.game_buffer_muzero import MuZeroGameBuffer
+from lzero.mcts.buffer.game_segment import GameSegment
+from lzero.mcts.tests.config.tictactoe_muzero_bot_mode_config_for_test import tictactoe_muzero_config
+
+
+def make_game_segment(config, rng, length):
+    game_segment = GameSegment(None, game_segment_length=5, config=config)
+    game_segment.reset([np.zeros((3, 3, 3), dtype=np.float32) for _ in range(config.model.frame_stack_num)])
+    for step in range(length):
+        # the number of legal actions of board games varies
+        visit_counts = list(rng.randint(1, 10, size=9 - step))
+        game_segment.store_search_stats(visit_counts, rng.rand())
+        game_segment.append(step, rng.rand(3, 3, 3).astype(np.float32), 0., np.ones(9, dtype=np.int8), 1 + step % 2)
+    game_segment.game_segment_to_array()
+    return game_segment
+
+
+def assert_same_segment(game_segment, expected):
+    assert len(game_segment) == len(expected)
+    for name in ['obs_segment', 'action_segment', 'reward_segment', 'root_value_segment', 'action_mask_segment',
+                 'to_play_segment']:
+        assert np.array_equal(getattr(game_segment, name), getattr(expected, name)), name
+    for row, expected_row in zip(game_segment.child_visit_segment, expected.child_visit_segment):
+        assert np.allclose(row, expected_row)
+
+
+@pytest.mark.unittest
+def test_disk_replay_buffer(tmp_path):
+    config = copy.deepcopy(tictactoe_muzero_config.policy)
+    config.batch_size = 2
+    config.priority_prob_alpha = 0.6
+    config.priority_prob_beta = 0.4
+    rng = np.random.RandomState(0)
+    buffer = MuZeroGameBuffer(config)
+    buffer.open_disk_storage(str(tmp_path), shard_size=3)
+
+    game_segments = [make_game_segment(config, rng, rng.randint(1, 6)) for _ in range(8)]
+    expected = copy.deepcopy(game_segments)
+    for game_segment in game_segments:
+        buffer._push_game_segment(game_segment, {'done': True, 'priorities': rng.rand(len(game_segment))})
+    # The segments of the written shards are memory-mapped, the others are still in memory.
+    assert all(isinstance(game_segment.obs_segment, np.memmap) for game_segment in game_segments[:6])
+    assert not isinstance(game_segments[6].obs_segment, np.memmap)
+    assert_same_segment(game_segments[0], expected[0])
+
+    # The in-place updates are written to the files.
+    game_segments[4].root_value_segment[0] = 10.
+    expected[4].root_value_segment[0] = 10.
+    buffer.game_pos_priorities[len(game_segments[0])] = 5.
+    buffer.save_disk_priorities()
+    buffer._remove(4)
+    # The shard whose segments are all removed is deleted, the priorities are not saved again by the removal.
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['priorities.npz', 'shard_000001', 'state.npz']
+    with np.load(tmp_path / 'priorities.npz') as saved:
+        assert saved['start'] == 0 and len(saved['priorities']) == sum(len(s) for s in game_segments[:6])
+
+    priorities = buffer.game_pos_priorities[np.arange(buffer.get_num_of_transitions())]
+    reopened = MuZeroGameBuffer(config)
+    reopened.open_disk_storage(str(tmp_path), shard_size=3)
+    # The segments of the last shard which is not full are lost without ``flush_disk_storage``.
+    assert reopened.get_num_of_game_segments() == 2
+    for game_segment, expected_segment in zip(reopened.game_segment_buffer, expected[4:6]):
+        assert_same_segment(game_segment, expected_segment)
+    num_transitions = reopened.get_num_of_transitions()
+    assert np.array_equal(reopened.game_pos_priorities[np.arange(num_transitions)], priorities[:num_transitions])
+
+    # The priorities updated after the last save are saved by ``flush_disk_storage``.
+    buffer.game_pos_priorities[num_transitions] = 7.
+    buffer.flush_disk_storage()
+    priorities = buffer.game_pos_priorities[np.arange(buffer.get_num_of_transitions())]
+    reopened = MuZeroGameBuffer(config)
+    reopened.open_disk_storage(str(tmp_path), shard_size=3)
+    assert reopened.get_num_of_game_segments() == 4
+    for game_segment, expected_segment in zip(reopened.game_segment_buffer, expected[4:]):
+        assert_same_segment(game_segment, expected_segment)
+    assert reopened.game_segment_game_pos_look_up[num_transitions] == (2, 0)
+    assert np.array_equal(reopened.game_pos_priorities[np.arange(reopened.get_num_of_transitions())], priorities)
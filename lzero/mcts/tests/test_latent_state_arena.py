@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+import torch
+
+from lzero.mcts.tree_search.latent_state_arena import LatentStateArena
+
+
+@pytest.mark.unittest
+def test_latent_state_arena():
+    batch_size, num_simulations = 4, 3
+    latent_state_roots = np.random.randn(batch_size, 2, 3).astype(np.float32)
+    arena = LatentStateArena(latent_state_roots, num_simulations, 'cpu')
+
+    # The list storage of the latent states which the arena replaces.
+    latent_state_batch_in_search_path = [latent_state_roots]
+    for simulation_index in range(1, num_simulations + 1):
+        latent_states = torch.randn(batch_size, 2, 3)
+        arena.write(simulation_index, latent_states)
+        latent_state_batch_in_search_path.append(latent_states.numpy())
+
+    index_in_search_path, index_in_batch = [0, 3, 1, 2, 3], [1, 0, 3, 3, 2]
+    latent_states = arena.gather(index_in_search_path, index_in_batch)
+    assert latent_states.dtype == torch.float32 and latent_states.shape == (5, 2, 3)
+    expected = np.asarray([latent_state_batch_in_search_path[ix][iy] for ix, iy in zip(index_in_search_path, index_in_batch)])
+    assert np.array_equal(latent_states.numpy(), expected)
+    assert arena.gather([], []).shape == (0, 2, 3)
+
+    # The nodes expanded for a part of the batch are written in the slots of their batch indices.
+    latent_states = torch.ones(2, 2, 3)
+    arena.write(1, latent_states, [2, 0])
+    assert np.array_equal(arena.gather([1, 1], [0, 2]).numpy(), np.ones((2, 2, 3)))
+    assert np.array_equal(arena.gather([1], [1]).numpy()[0], latent_state_batch_in_search_path[1][1])
+
+
+@pytest.mark.unittest
+def test_latent_state_arena_grow(monkeypatch):
+    monkeypatch.setattr('lzero.mcts.tree_search.latent_state_arena._INITIAL_CAPACITY', 2)
+    batch_size, num_simulations = 3, 10
+    latent_state_batch_in_search_path = [np.random.randn(batch_size, 4).astype(np.float32)]
+    arena = LatentStateArena(latent_state_batch_in_search_path[0], num_simulations, 'cpu')
+    # A search bounded by a large num_simulations only allocates the first rows.
+    assert arena._latent_states.shape == (2, batch_size, 4)
+    capacities = []
+    for simulation_index in range(1, num_simulations + 1):
+        latent_states = torch.randn(batch_size, 4)
+        arena.write(simulation_index, latent_states)
+        latent_state_batch_in_search_path.append(latent_states.numpy())
+        capacities.append(arena._latent_states.shape[0])
+    # The arena is doubled when it is full, up to ``num_simulations + 1`` rows, and keeps the written latent states.
+    assert capacities == [2, 4, 4, 8, 8, 8, 8, 11, 11, 11]
+    index_in_search_path = [i for i in range(num_simulations + 1) for _ in range(batch_size)]
+    index_in_batch = list(range(batch_size)) * (num_simulations + 1)
+    assert np.array_equal(
+        arena.gather(index_in_search_path, index_in_batch).numpy(),
+        np.concatenate(latent_state_batch_in_search_path)
+    )
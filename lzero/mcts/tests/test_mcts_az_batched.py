@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+import torch
+from easydict import EasyDict
+
+from lzero.mcts.ptree.ptree_az import MCTS
+from lzero.model.alphazero_model import AlphaZeroModel
+from zoo.board_games.tictactoe.envs.tictactoe_env import TicTacToeEnv
+
+model = AlphaZeroModel(observation_shape=(3, 3, 3), action_space_size=9, num_res_blocks=1, num_channels=16).eval()
+
+
+@torch.no_grad()
+def policy_value_fn(env):
+    legal_actions = env.legal_actions
+    action_probs, value = model.compute_policy_value(torch.from_numpy(env.current_state()[1]).float().unsqueeze(0))
+    return dict(zip(legal_actions, action_probs.squeeze(0)[legal_actions].numpy())), value.item()
+
+
+@torch.no_grad()
+def policy_value_batch_fn(current_states):
+    action_probs, values = model.compute_policy_value(torch.from_numpy(current_states).float())
+    return action_probs.numpy(), values.reshape(-1).numpy()
+
+
+def get_state_config(board, start_player_index):
+    return EasyDict(
+        dict(start_player_index=start_player_index, init_state=board, katago_policy_init=False, katago_game_state=None)
+    )
+
+
+def create_mcts(leaf_batch_size):
+    env_cfg = TicTacToeEnv.default_config()
+    env_cfg.battle_mode = 'self_play_mode'
+    mcts_cfg = EasyDict(dict(num_simulations=40, leaf_batch_size=leaf_batch_size, virtual_loss=1.0))
+    return MCTS(mcts_cfg, TicTacToeEnv(env_cfg))
+
+
+@pytest.mark.unittest
+def test_batched_search_equals_sequential_search():
+    # With one leaf per pass, the batched search visits the same nodes as the sequential one.
+    board = np.array([[1, 0, 0], [0, 2, 0], [0, 0, 0]], dtype=np.int32)
+    _, expected_probs = create_mcts(1).get_next_action(get_state_config(board, 0), policy_value_fn, 1.0, False)
+    [(_, probs)] = create_mcts(1).get_next_actions([get_state_config(board, 0)], policy_value_batch_fn, 1.0, False)
+    assert np.allclose(probs, expected_probs)
+
+
+@pytest.mark.unittest
+def test_batched_search_with_virtual_loss():
+    boards = [
+        np.zeros((3, 3), dtype=np.int32),
+        np.array([[1, 1, 0], [2, 2, 0], [0, 0, 0]], dtype=np.int32),
+    ]
+    calls = []
+
+    def counting_batch_fn(current_states):
+        calls.append(len(current_states))
+        return policy_value_batch_fn(current_states)
+
+    mcts = create_mcts(8)
+    results = mcts.get_next_actions([get_state_config(board, 0) for board in boards], counting_batch_fn, 1.0, False)
+    # 1 call to expand the roots and 40 / 8 calls for the simulations.
+    assert len(calls) == 6 and max(calls) <= 16
+    for board, (action, probs) in zip(boards, results):
+        assert board.reshape(-1)[action] == 0
+        assert np.isclose(probs.sum(), 1)
+    # Player 1 wins at once by completing the first row.
+    assert results[1][0] == 2
@@ -0,0 +1,106 @@
+import importlib
+
+import numpy as np
+import pytest
+from ding.utils import ENV_REGISTRY
+from easydict import EasyDict
+
+from lzero.mcts.ptree.ptree_az import MCTS, Node
+
+
+def _import_darkchess_alphazero_env():
+    # The AlphaZero and the MuZero Dark Chess envs both register the ``darkchess`` env, so that the registry is left
+    # as it is for the tests of the other env in the same process.
+    registered = ENV_REGISTRY.pop('darkchess', None)
+    try:
+        return importlib.import_module('zoo.board_games.darkchess.envs.darkchess_alphazero_env').DarkchessEnv
+    finally:
+        ENV_REGISTRY.pop('darkchess', None)
+        if registered is not None:
+            ENV_REGISTRY['darkchess'] = registered
+
+
+DarkchessEnv = _import_darkchess_alphazero_env()
+
+
+def policy_value_fn(env):
+    legal_actions = env.legal_actions
+    return {action: 1 / len(legal_actions) for action in legal_actions}, np.tanh(env.encode_board()[:7].sum() - 3)
+
+
+@pytest.mark.unittest
+def test_chance_node_value():
+    root = Node()
+    chance = Node(parent=root, prior_p=0.5)
+    chance.is_chance = True
+    chance.children[0] = Node(parent=chance, prior_p=0.75)
+    chance.children[1] = Node(parent=chance, prior_p=0.25)
+    chance.children[0].update_recursive(1, 'self_play_mode')
+    for _ in range(3):
+        chance.children[1].update_recursive(-1, 'self_play_mode')
+    # The outcomes are weighted by their probabilities instead of their visit counts.
+    assert chance.value == pytest.approx(0.75 * 1 + 0.25 * -1)
+    assert chance.visit_count == 4
+    # The chance node and its outcomes share the perspective, the value is negated for the root only.
+    assert root.visit_count == 4 and root.value == pytest.approx(0.5)
+
+    # A pending visit of the batched search counts with the value -virtual_loss in the chance node, and its outcome
+    # does not count twice.
+    chance.add_virtual_loss(1.)
+    chance.children[0].add_virtual_loss(1.)
+    assert chance.value == pytest.approx((0.5 * 4 - 1) / 5)
+    chance.children[0].revert_virtual_loss(1.)
+    chance.revert_virtual_loss(1.)
+    assert chance.value == pytest.approx(0.5)
+
+
+@pytest.mark.unittest
+def test_select_outcome():
+    chance = Node()
+    chance.is_chance = True
+    for outcome, prob in enumerate([0.5, 0.25, 0.125, 0.125]):
+        chance.children[outcome] = Node(parent=chance, prior_p=prob)
+    for _ in range(8):
+        outcome, child = MCTS._select_outcome(chance)
+        child.update(0)
+    assert [child.visit_count for child in chance.children.values()] == [4, 2, 1, 1]
+
+
+@pytest.mark.unittest
+def test_chance_node_search():
+    roots = []
+    mcts = MCTS(EasyDict(dict(num_simulations=100)), DarkchessEnv(DarkchessEnv.default_config()))
+    get_action_from_root = mcts._get_action_from_root
+    mcts._get_action_from_root = lambda root, *args: roots.append(root) or get_action_from_root(root, *args)
+    state_config = EasyDict(dict(start_player_index=0, init_state=None, katago_policy_init=False))
+    action, probs = mcts.get_next_action(state_config, policy_value_fn, 1.0, False)
+    assert np.isclose(probs.sum(), 1) and probs[action] > 0
+    # The simulate env is back to the root state after the search.
+    assert (mcts.simulate_env.board == 15).all() and len(mcts.simulate_env.action_history) == 0
+
+    # Every action of the first move is a flip, whose outcomes are the 14 chess.
+    for child in roots[0].children.values():
+        if child.visit_count > 1:
+            assert child.is_chance and len(child.children) == 14
+            assert sum(outcome.visit_count for outcome in child.children.values()) == child.visit_count
+            for outcome in child.children.values():
+                assert abs(outcome.visit_count - outcome.prior_p * child.visit_count) <= 1
+
+
+@pytest.mark.unittest
+def test_chance_node_search_game_state():
+    roots = []
+    mcts = MCTS(EasyDict(dict(num_simulations=50)), DarkchessEnv(DarkchessEnv.default_config()))
+    get_action_from_root = mcts._get_action_from_root
+    mcts._get_action_from_root = lambda root, *args: roots.append(root) or get_action_from_root(root, *args)
+    # Only pawns are left to flip, the flip outcomes follow the remaining chess of ``katago_game_state``.
+    flipped_chess_count = np.zeros(14, dtype=np.int64)
+    flipped_chess_count[[6, 13]] = 16
+    game_state = dict(player_color=['U', 'U'], flipped_chess_count=flipped_chess_count)
+    state_config = EasyDict(
+        dict(start_player_index=0, init_state=None, katago_policy_init=False, katago_game_state=game_state)
+    )
+    mcts.get_next_action(state_config, policy_value_fn, 1.0, False)
+    for child in roots[0].children.values():
+        if child.is_chance:
+            assert {outcome: node.prior_p for outcome, node in child.children.items()} == {6: 0.5, 13: 0.5}
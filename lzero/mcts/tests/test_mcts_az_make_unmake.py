@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+import torch
+from easydict import EasyDict
+
+from lzero.mcts.ptree.ptree_az import MCTS
+from lzero.model.alphazero_model import AlphaZeroModel
+from zoo.board_games.tictactoe.envs.tictactoe_env import TicTacToeEnv
+
+model = AlphaZeroModel(observation_shape=(3, 3, 3), action_space_size=9, num_res_blocks=1, num_channels=16).eval()
+
+
+@torch.no_grad()
+def policy_value_fn(env):
+    legal_actions = env.legal_actions
+    action_probs, value = model.compute_policy_value(torch.from_numpy(env.current_state()[1]).float().unsqueeze(0))
+    return dict(zip(legal_actions, action_probs.squeeze(0)[legal_actions].numpy())), value.item()
+
+
+@pytest.mark.unittest
+def test_make_unmake_equals_reset():
+    env_cfg = TicTacToeEnv.default_config()
+    env_cfg.battle_mode = 'self_play_mode'
+    board = np.array([[1, 0, 0], [0, 2, 0], [0, 0, 0]], dtype=np.int32)
+    state_config = EasyDict(dict(start_player_index=0, init_state=board, katago_policy_init=False))
+
+    probs = []
+    for make_unmake in [True, False]:
+        mcts = MCTS(EasyDict(dict(num_simulations=50)), TicTacToeEnv(env_cfg))
+        # Without make/unmake, the simulate env is reset to the root state before every simulation.
+        mcts._support_make_unmake = lambda: make_unmake
+        probs.append(mcts.get_next_action(state_config, policy_value_fn, 1.0, False)[1])
+        if make_unmake:
+            # The simulate env is back to the root state after the search.
+            assert (mcts.simulate_env.board == board).all()
+    assert np.allclose(probs[0], probs[1])
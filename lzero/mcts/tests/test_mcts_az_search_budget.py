@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+import torch
+from easydict import EasyDict
+
+from lzero.mcts.ptree.ptree_az import MCTS
+from lzero.mcts.utils import SearchBudget
+from lzero.model.alphazero_model import AlphaZeroModel
+from zoo.board_games.tictactoe.envs.tictactoe_env import TicTacToeEnv
+
+model = AlphaZeroModel(observation_shape=(3, 3, 3), action_space_size=9, num_res_blocks=1, num_channels=16).eval()
+calls = []
+
+
+@torch.no_grad()
+def policy_value_fn(env):
+    calls.append(1)
+    legal_actions = env.legal_actions
+    action_probs, value = model.compute_policy_value(torch.from_numpy(env.current_state()[1]).float().unsqueeze(0))
+    return dict(zip(legal_actions, action_probs.squeeze(0)[legal_actions].numpy())), value.item()
+
+
+@torch.no_grad()
+def policy_value_batch_fn(current_states):
+    calls.append(len(current_states))
+    action_probs, values = model.compute_policy_value(torch.from_numpy(current_states).float())
+    return action_probs.numpy(), values.reshape(-1).numpy()
+
+
+def get_state_config(board):
+    return EasyDict(dict(start_player_index=0, init_state=board, katago_policy_init=False, katago_game_state=None))
+
+
+def create_mcts():
+    env_cfg = TicTacToeEnv.default_config()
+    env_cfg.battle_mode = 'self_play_mode'
+    return MCTS(EasyDict(dict(num_simulations=10, leaf_batch_size=8)), TicTacToeEnv(env_cfg))
+
+
+@pytest.mark.unittest
+def test_search_budget_replaces_num_simulations():
+    roots = []
+    mcts = create_mcts()
+    get_action_from_root = mcts._get_action_from_root
+    mcts._get_action_from_root = lambda root, *args: roots.append(root) or get_action_from_root(root, *args)
+    board = np.zeros((3, 3), dtype=np.int32)
+
+    # With a large time budget, the search runs past ``num_simulations`` until the best action is settled.
+    budget = SearchBudget(time_budget=100., max_num_simulations=200)
+    _, probs = mcts.get_next_action(get_state_config(board), policy_value_fn, 1.0, False, search_budget=budget)
+    assert 10 < budget.num_simulations <= 200 and roots[-1].visit_count == budget.num_simulations
+    assert np.isclose(probs.sum(), 1)
+    visit_counts = sorted((child.visit_count for child in roots[-1].children.values()), reverse=True)
+    assert budget.num_simulations == 200 or visit_counts[0] - visit_counts[1] > 200 - budget.num_simulations
+
+    # With no time left, the search stops after the minimum number of simulations.
+    budget = SearchBudget(time_budget=0., min_num_simulations=3)
+    mcts.get_next_action(get_state_config(board), policy_value_fn, 1.0, False, search_budget=budget)
+    assert roots[-1].visit_count == 3
+
+
+@pytest.mark.unittest
+def test_search_budget_forced_move():
+    board = np.array([[1, 2, 1], [1, 2, 2], [2, 1, 0]], dtype=np.int32)
+    calls.clear()
+    budget = SearchBudget(time_budget=100.)
+    action, _ = create_mcts().get_next_action(get_state_config(board), policy_value_fn, 1.0, False, search_budget=budget)
+    # The only legal action is settled after one simulation.
+    assert action == 8 and budget.num_simulations == 1
+
+
+@pytest.mark.unittest
+def test_batched_search_budget():
+    boards = [np.zeros((3, 3), dtype=np.int32), np.array([[1, 1, 0], [2, 2, 0], [0, 0, 0]], dtype=np.int32)]
+    calls.clear()
+    budget = SearchBudget(time_budget=100., max_num_simulations=40)
+    results = create_mcts().get_next_actions(
+        [get_state_config(board) for board in boards], policy_value_batch_fn, 1.0, False, search_budget=budget
+    )
+    # The budget is checked once every pass of ``leaf_batch_size`` simulations of every root.
+    assert len(calls) <= 1 + 40 // 8 and budget.num_simulations % 8 == 0
+    assert results[1][0] == 2
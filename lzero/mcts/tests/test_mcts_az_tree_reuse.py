@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+import torch
+from easydict import EasyDict
+
+from lzero.mcts.ptree.ptree_az import MCTS
+from lzero.model.alphazero_model import AlphaZeroModel
+from zoo.board_games.tictactoe.envs.tictactoe_env import TicTacToeEnv
+
+model = AlphaZeroModel(observation_shape=(3, 3, 3), action_space_size=9, num_res_blocks=1, num_channels=16).eval()
+calls = []
+
+
+@torch.no_grad()
+def policy_value_fn(env):
+    calls.append(1)
+    legal_actions = env.legal_actions
+    action_probs, value = model.compute_policy_value(torch.from_numpy(env.current_state()[1]).float().unsqueeze(0))
+    return dict(zip(legal_actions, action_probs.squeeze(0)[legal_actions].numpy())), value.item()
+
+
+def get_state_config(board, start_player_index):
+    return EasyDict(dict(start_player_index=start_player_index, init_state=board, katago_policy_init=False))
+
+
+def create_mcts(prune_siblings):
+    env_cfg = TicTacToeEnv.default_config()
+    env_cfg.battle_mode = 'self_play_mode'
+    mcts_cfg = EasyDict(dict(num_simulations=100, reuse_tree=True, prune_siblings=prune_siblings))
+    return MCTS(mcts_cfg, TicTacToeEnv(env_cfg))
+
+
+def most_visited(node):
+    return max(node.children.items(), key=lambda item: item[1].visit_count)
+
+
+@pytest.mark.unittest
+@pytest.mark.parametrize('prune_siblings', [True, False])
+def test_tree_reuse(prune_siblings):
+    mcts = create_mcts(prune_siblings)
+    board = np.zeros((3, 3), dtype=np.int32)
+    action, _ = mcts.get_next_action(get_state_config(board, 0), policy_value_fn, 1.0, False, tree_id=1)
+    old_root = mcts._trees[1][0]
+    assert prune_siblings == (list(old_root.children) == [action])
+
+    # The subtree of the played action and the most visited reply becomes the next root.
+    reply, node = most_visited(old_root.children[action])
+    board.reshape(-1)[action], board.reshape(-1)[reply] = 1, 2
+    kept_visit_count = node.visit_count
+    calls.clear()
+    _, probs = mcts.get_next_action(get_state_config(board, 0), policy_value_fn, 1.0, False, tree_id=1)
+    assert kept_visit_count > 1 and len(calls) <= 100 - kept_visit_count
+    assert np.isclose(probs.sum(), 1) and probs[action] == probs[reply] == 0
+    new_root = mcts._trees[1][0]
+    assert new_root is node and new_root.is_root() and new_root.visit_count >= 100
+
+    # Without pruning, the tree is also reused if another action is played.
+    action = mcts._trees[1][2]
+    other_action = next(
+        a for a in np.flatnonzero(board.reshape(-1) == 0)
+        if a != action and (prune_siblings or new_root.children[a].visit_count > 0)
+    )
+    node = new_root.children.get(other_action)
+    board.reshape(-1)[other_action] = 1
+    mcts.get_next_action(get_state_config(board, 1), policy_value_fn, 1.0, False, tree_id=1)
+    assert (node is None) == prune_siblings and (mcts._trees[1][0] is node) != prune_siblings
+
+
+@pytest.mark.unittest
+def test_tree_reuse_with_unknown_state():
+    mcts = create_mcts(True)
+    board = np.zeros((3, 3), dtype=np.int32)
+    mcts.get_next_action(get_state_config(board, 0), policy_value_fn, 1.0, False, tree_id=1)
+    # A state which is not reached from the kept root gets a new root.
+    board[0] = [1, 2, 1]
+    old_root = mcts._trees[1][0]
+    mcts.get_next_action(get_state_config(board, 1), policy_value_fn, 1.0, False, tree_id=1)
+    new_root = mcts._trees[1][0]
+    assert new_root.visit_count == 100 and all(node is not new_root for node in old_root.children.values())
@@ -0,0 +1,67 @@
+import copy
+
+import numpy as np
+import pytest
+
+from lzero.mcts.buffer.game_segment import GameSegment
+from lzero.mcts.buffer.obs_codec import BoardCodec, ObsCodec, ZlibCodec, create_obs_codec
+from lzero.mcts.tests.config.tictactoe_muzero_bot_mode_config_for_test import tictactoe_muzero_config
+
+
+@pytest.mark.unittest
+def test_obs_codec():
+    rng = np.random.RandomState(0)
+    boards = rng.randint(0, 16, size=(5, 8, 4))
+    planes = (boards[:, None] == np.arange(16).reshape(-1, 1, 1)).astype(np.float32)
+    codec = create_obs_codec('board', (16, 8, 4))
+    assert isinstance(codec, BoardCodec)
+    encoded = [codec.encode(obs) for obs in planes]
+    assert encoded[0].dtype == np.int8 and np.array_equal(encoded, boards)
+    assert np.array_equal(codec.decode(encoded), planes)
+    with pytest.raises(ValueError):
+        codec.encode(np.zeros((16, 8, 4), dtype=np.float32))
+
+    codec = create_obs_codec('zlib', (1, 6, 6))
+    assert isinstance(codec, ZlibCodec)
+    # The trailing zero bytes of the compressed frames are kept.
+    frames = [np.zeros((1, 6, 6), dtype=np.uint8), rng.randint(0, 255, size=(1, 6, 6)).astype(np.uint8)]
+    encoded = codec.to_array([codec.encode(obs) for obs in frames])
+    assert encoded.dtype == object
+    assert np.array_equal(codec.decode(encoded), frames)
+
+    assert create_obs_codec(None, (1, 6, 6)) is None
+    with pytest.raises(ValueError):
+        create_obs_codec('png', (1, 6, 6))
+    # A codec implements both encode and decode.
+    with pytest.raises(TypeError):
+        ObsCodec((1, 6, 6))
+
+
+@pytest.mark.unittest
+@pytest.mark.parametrize('columnar', [False, True])
+def test_game_segment_obs_codec(columnar):
+    config = copy.deepcopy(tictactoe_muzero_config.policy)
+    config.columnar_game_segment = columnar
+    rng = np.random.RandomState(0)
+    segments = []
+    for obs_codec in [None, 'zlib']:
+        config.obs_codec = obs_codec
+        game_segment = GameSegment(None, game_segment_length=6, config=config)
+        game_segment.reset([np.zeros((3, 3, 3), dtype=np.float32) for _ in range(config.model.frame_stack_num)])
+        segments.append(game_segment)
+    for step in range(6):
+        obs = rng.rand(3, 3, 3).astype(np.float32)
+        for game_segment in segments:
+            game_segment.store_search_stats([1, 2], 0.)
+            game_segment.append(step, obs, 0., np.ones(9, dtype=np.int8), -1)
+            assert np.array_equal(game_segment.get_obs(), segments[0].get_obs())
+    for game_segment in segments:
+        game_segment.game_segment_to_array()
+
+    expected, encoded = segments
+    assert encoded.obs_segment.dtype == object
+    for timestep in range(6):
+        assert np.array_equal(encoded.get_unroll_obs(timestep, 2), expected.get_unroll_obs(timestep, 2))
+        assert np.array_equal(encoded.get_unroll_obs(timestep, 2, padding=True),
+                              expected.get_unroll_obs(timestep, 2, padding=True))
+    assert isinstance(encoded.get_unroll_obs(0, 2, decode=False)[0], bytes)
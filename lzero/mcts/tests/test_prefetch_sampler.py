@@ -0,0 +1,70 @@
+import pytest
+import torch
+
+from lzero.mcts.buffer.prefetch_sampler import PrefetchSampler
+
+
+class FakeBuffer(object):
+
+    def __init__(self, num_of_transitions=100):
+        self.num_of_transitions = num_of_transitions
+        self.num_samples = 0
+
+    def get_num_of_transitions(self):
+        return self.num_of_transitions
+
+    def sample(self, batch_size, policy):
+        self.num_samples += 1
+        if self.num_samples > 5:
+            raise ValueError('out of data')
+        # The batch records the target weights it is computed with.
+        return [batch_size, policy._target_model.weight.item()]
+
+
+class FakePolicy(object):
+
+    def __init__(self):
+        self._model = torch.nn.Linear(1, 1, bias=False)
+        self._target_model = torch.nn.Linear(1, 1, bias=False)
+        self._target_model.weight.data.fill_(1.)
+
+
+@pytest.mark.unittest
+def test_prefetch_sampler():
+    policy = FakePolicy()
+    sampler = PrefetchSampler(FakeBuffer(), policy, batch_size=8, prefetch_batch_num=2, target_update_freq=10)
+    with pytest.raises(RuntimeError):
+        sampler.sample()
+    sampler.start()
+
+    assert sampler.sample() == [8, 1.]
+    # The target model is copied, the batches use the new weights only after a snapshot.
+    policy._target_model.weight.data.fill_(2.)
+    sampler.sync_target_model(train_iter=9)
+    assert sampler._snapshot._target_model.weight.item() == 1.
+    sampler.sync_target_model(train_iter=10)
+    assert sampler._snapshot._target_model.weight.item() == 2.
+    assert policy._model.weight.item() != 2.
+
+    for _ in range(4):
+        batch_size, weight = sampler.sample()
+        assert batch_size == 8 and weight in (1., 2.)
+    metrics = sampler.get_metrics()
+    assert metrics['prefetch_wait_time'] >= 0 and 0 <= metrics['prefetch_queue_depth'] <= 2
+    # The error of a worker is raised by sample once the prepared batches are used.
+    with pytest.raises(RuntimeError):
+        sampler.sample()
+    sampler.close()
+
+
+@pytest.mark.unittest
+def test_prefetch_sampler_waits_for_data():
+    buffer = FakeBuffer(num_of_transitions=4)
+    sampler = PrefetchSampler(buffer, FakePolicy(), batch_size=8)
+    sampler.start()
+    # No batch is sampled before the buffer has more transitions than the batch size.
+    assert sampler._queue.empty() and buffer.num_samples == 0
+    buffer.num_of_transitions = 100
+    assert sampler.sample() == [8, 1.]
+    sampler.close()
+    assert sampler._queue.empty()
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from lzero.mcts.buffer.priority_tree import PriorityTree
+
+
+def brute_force_probs(priorities, alpha):
+    probs = np.asarray(priorities) ** alpha + 1e-6
+    return probs / probs.sum()
+
+
+@pytest.mark.unittest
+def test_priority_tree_fifo():
+    alpha = 0.6
+    tree = PriorityTree(alpha, capacity=4)
+    priorities = []
+    np.random.seed(0)
+    # The pushes and removals wrap the ring around and grow it.
+    for step in range(50):
+        new = np.random.rand(np.random.randint(1, 7))
+        tree.append(new)
+        priorities.extend(new)
+        num = np.random.randint(0, 5)
+        tree.pop_front(num)
+        del priorities[:num]
+        if priorities:
+            index = np.random.randint(len(priorities))
+            tree[index] = step
+            priorities[index] = step
+
+        assert len(tree) == len(priorities)
+        assert np.allclose(tree[np.arange(len(tree))], priorities)
+        assert tree.max() == pytest.approx(max(priorities, default=0.))
+        assert tree.total() == pytest.approx(np.sum(np.asarray(priorities) ** alpha + 1e-6))
+        if priorities:
+            assert np.allclose(tree.probs(np.arange(len(tree))), brute_force_probs(priorities, alpha))
+
+    with pytest.raises(IndexError):
+        tree[len(tree)]
+
+
+@pytest.mark.unittest
+def test_priority_tree_sample():
+    alpha = 1.
+    priorities = np.array([8., 4., 2., 1., 1., 0.])
+    tree = PriorityTree(alpha)
+    tree.append(priorities)
+    np.random.seed(0)
+
+    index, probs = tree.sample(3)
+    assert len(np.unique(index)) == 3
+    assert np.allclose(probs, brute_force_probs(priorities, alpha)[index])
+    # The excluded transitions are restored after the sample.
+    assert tree.total() == pytest.approx(np.sum(priorities ** alpha + 1e-6))
+
+    counts = np.zeros(len(priorities))
+    for _ in range(4000):
+        index, _ = tree.sample(1)
+        counts[index] += 1
+    assert np.allclose(counts / counts.sum(), brute_force_probs(priorities, alpha), atol=0.03)
+    # The transition with priority 0 is almost never sampled.
+    assert counts[-1] == 0
+
+    assert np.array_equal(np.sort(tree.sample(len(priorities))[0]), np.arange(len(priorities)))
+    with pytest.raises(ValueError):
+        tree.sample(len(priorities) + 1)
@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pytest
+import torch
+
+from lzero.mcts.buffer.reanalyze_worker import ReanalyzeWorkerPool
+
+
+class FakeGameSegment(object):
+
+    def __init__(self):
+        self.reanalyze_version = -1
+        self.weights = []
+
+
+class FakeBuffer(object):
+
+    def __init__(self, num_of_game_segments=5):
+        self.index_lock = threading.Lock()
+        self.game_segment_buffer = [FakeGameSegment() for _ in range(num_of_game_segments)]
+        self.base_idx = 0
+
+    def reanalyze_game_segment(self, game_segment, model, version):
+        # The segment records the target weights it is reanalyzed with.
+        game_segment.weights.append(model.weight.item())
+        game_segment.reanalyze_version = version
+
+
+class FakePolicy(object):
+
+    def __init__(self):
+        self._model = torch.nn.Linear(1, 1, bias=False)
+        self._target_model = torch.nn.Linear(1, 1, bias=False)
+        self._target_model.weight.data.fill_(1.)
+
+
+def wait_for(condition, timeout=5.):
+    start = time.time()
+    while not condition():
+        assert time.time() - start < timeout
+        time.sleep(0.01)
+
+
+@pytest.mark.unittest
+def test_reanalyze_worker_pool():
+    buffer = FakeBuffer()
+    policy = FakePolicy()
+    pool = ReanalyzeWorkerPool(buffer, policy, reanalyze_worker_num=2, target_update_freq=10)
+    pool.start()
+    wait_for(lambda: all(g.reanalyze_version == 0 for g in buffer.game_segment_buffer))
+    # The segments are reanalyzed once per snapshot.
+    assert all(g.weights == [1.] for g in buffer.game_segment_buffer)
+    assert pool.get_metrics() == {'reanalyze_segment_num': 5, 'reanalyze_fresh_ratio': 1.}
+
+    policy._target_model.weight.data.fill_(2.)
+    pool.sync_target_model(train_iter=9)
+    time.sleep(0.05)
+    assert all(g.weights == [1.] for g in buffer.game_segment_buffer)
+    pool.sync_target_model(train_iter=10)
+    assert pool.get_metrics()['reanalyze_fresh_ratio'] < 1.
+
+    # The oldest segments are removed and new ones pushed while the workers walk the buffer.
+    with buffer.index_lock:
+        del buffer.game_segment_buffer[:2]
+        buffer.base_idx += 2
+        buffer.game_segment_buffer.append(FakeGameSegment())
+    wait_for(lambda: all(g.reanalyze_version == 10 for g in buffer.game_segment_buffer))
+    assert [g.weights for g in buffer.game_segment_buffer] == [[1., 2.]] * 3 + [[2.]]
+    pool.close()
+
+
+@pytest.mark.unittest
+def test_reanalyze_worker_pool_error():
+    buffer = FakeBuffer()
+    buffer.reanalyze_game_segment = None
+    pool = ReanalyzeWorkerPool(buffer, FakePolicy())
+    pool.start()
+    wait_for(lambda: pool._error is not None)
+    with pytest.raises(RuntimeError):
+        pool.sync_target_model(train_iter=0)
+    pool.close()
+
+
+@pytest.mark.unittest
+def test_reanalyze_worker_pool_is_supported():
+    from lzero.mcts.buffer import EfficientZeroGameBuffer, GumbelMuZeroGameBuffer, MuZeroGameBuffer, \
+        SampledEfficientZeroGameBuffer, SampledMuZeroGameBuffer, StochasticMuZeroGameBuffer
+    # Only the buffers which read the targets stored by the workers in ``sample`` start the pool.
+    for buffer_class in [MuZeroGameBuffer, GumbelMuZeroGameBuffer, StochasticMuZeroGameBuffer]:
+        assert ReanalyzeWorkerPool.is_supported(buffer_class.__new__(buffer_class))
+    for buffer_class in [EfficientZeroGameBuffer, SampledEfficientZeroGameBuffer, SampledMuZeroGameBuffer]:
+        assert not ReanalyzeWorkerPool.is_supported(buffer_class.__new__(buffer_class))
+    assert not ReanalyzeWorkerPool.is_supported(FakeBuffer())
@@ -1,7 +1,7 @@
 import numpy as np
 import pytest
 
-from lzero.mcts.utils import get_augmented_data
+from lzero.mcts.utils import SearchBudget, get_augmented_data
 
 
 @pytest.mark.unittest
@@ -22,3 +22,32 @@ class TestUtils():
         assert augmented_data[0]['state'].flatten().shape == state.flatten().shape
         assert augmented_data[0]['mcts_prob'].shape == mcts_prob.flatten().shape
         assert augmented_data[0]['winner'].shape == winner.shape
+
+
+@pytest.mark.unittest
+class TestSearchBudget():
+
+    def test_max_and_min_num_simulations(self):
+        budget = SearchBudget(time_budget=0., max_num_simulations=10, min_num_simulations=4)
+        # The time is over, but the minimum number of simulations is run.
+        assert not budget.exhausted(3, lambda: [[3, 0]])
+        assert budget.exhausted(4, lambda: [[4, 0]])
+        budget = SearchBudget(time_budget=100., max_num_simulations=10)
+        assert budget.exhausted(10, lambda: [[5, 5]])
+
+    def test_settled_action(self):
+        budget = SearchBudget(time_budget=100., check_interval=1)
+        # A close race is not settled with the time left, a single legal action is settled at once.
+        assert not budget.exhausted(10, lambda: [[6, 4], [1]])
+        assert budget.exhausted(11, lambda: [[1]])
+        # The lead can not be overtaken with the simulations left before the maximum.
+        budget = SearchBudget(time_budget=100., max_num_simulations=20, check_interval=1)
+        assert budget.exhausted(15, lambda: [[10, 4, 1]])
+        assert budget.num_simulations == 15 and budget.simulations_per_second > 0
+
+    def test_check_interval(self):
+        calls = []
+        budget = SearchBudget(time_budget=100., check_interval=8)
+        for n in range(17):
+            budget.exhausted(n, lambda: calls.append(n) or [[n, 0]])
+        assert calls == [1, 9]
@@ -0,0 +1,87 @@
+from typing import Any, List, Union
+
+import numpy as np
+import torch
+
+# The number of rows allocated at first, so that a search budgeted by time, whose ``num_simulations`` is only a bound,
+# does not allocate the latent states of all the simulations it may run.
+_INITIAL_CAPACITY = 1024
+
+
+class LatentStateArena(object):
+    """
+    Overview:
+        The storage of the latent states of the nodes of a batch search, i.e. a preallocated tensor of shape
+        ``(num_simulations + 1, batch_size, *latent_shape)`` on the inference device, where the row ``0`` holds the
+        latent states of the roots and the row ``i`` those of the nodes expanded in the ``i``-th simulation. The latent
+        state of the leaf node ``(latent_state_index_in_search_path, latent_state_index_in_batch)`` returned by
+        ``batch_traverse`` is thus gathered for the whole batch by one indexing of the tensor, and the outputs of the
+        model are written in place, so that the latent states never leave the device during the search. At most
+        ``_INITIAL_CAPACITY`` rows are allocated at first, and the tensor is doubled by ``write`` when it is full.
+    Interfaces:
+        ``__init__``, ``gather``, ``write``
+    """
+
+    def __init__(self, latent_state_roots: Union[np.ndarray, torch.Tensor], num_simulations: int,
+                 device: Union[str, torch.device]) -> None:
+        """
+        Overview:
+            Allocate the arena and store the latent states of the roots in it.
+        Arguments:
+            - latent_state_roots (:obj:`Union[np.ndarray, torch.Tensor]`): The latent states of the roots, of shape \
+                ``(batch_size, *latent_shape)``.
+            - num_simulations (:obj:`int`): The maximum number of the simulations of the search.
+            - device (:obj:`Union[str, torch.device]`): The device of the model.
+        """
+        latent_state_roots = torch.as_tensor(latent_state_roots, device=device)
+        self._device = latent_state_roots.device
+        self._max_rows = num_simulations + 1
+        self._latent_states = latent_state_roots.new_empty(
+            (min(self._max_rows, _INITIAL_CAPACITY), ) + tuple(latent_state_roots.shape)
+        )
+        self._latent_states[0] = latent_state_roots
+        self._num_rows = 1
+
+    def gather(self, latent_state_index_in_search_path: List[int], latent_state_index_in_batch: List[int]) -> torch.Tensor:
+        """
+        Overview:
+            Gather the latent states of the leaf nodes selected by ``batch_traverse``.
+        Arguments:
+            - latent_state_index_in_search_path (:obj:`List[int]`): The simulation indices of the leaf nodes.
+            - latent_state_index_in_batch (:obj:`List[int]`): The batch indices of the leaf nodes.
+        Returns:
+            - latent_states (:obj:`torch.Tensor`): The latent states of shape ``(len(indices), *latent_shape)``.
+        """
+        index_in_search_path = torch.as_tensor(latent_state_index_in_search_path, dtype=torch.long, device=self._device)
+        index_in_batch = torch.as_tensor(latent_state_index_in_batch, dtype=torch.long, device=self._device)
+        return self._latent_states[index_in_search_path, index_in_batch]
+
+    def write(self, simulation_index: int, latent_states: torch.Tensor, index_in_batch: Any = None) -> None:
+        """
+        Overview:
+            Store the latent states of the nodes expanded in a simulation.
+        Arguments:
+            - simulation_index (:obj:`int`): The index of the simulation, ``current_latent_state_index`` of the search.
+            - latent_states (:obj:`torch.Tensor`): The latent states output by the model.
+            - index_in_batch (:obj:`Any`): The batch indices of the nodes, the first ``len(latent_states)`` ones \
+                if None.
+        """
+        if simulation_index >= self._latent_states.shape[0]:
+            self._grow(simulation_index + 1)
+        if index_in_batch is None:
+            index_in_batch = slice(0, latent_states.shape[0])
+        elif not isinstance(index_in_batch, torch.Tensor):
+            index_in_batch = torch.as_tensor(index_in_batch, dtype=torch.long, device=self._device)
+        self._latent_states[simulation_index, index_in_batch] = latent_states
+        self._num_rows = max(self._num_rows, simulation_index + 1)
+
+    def _grow(self, num_rows: int) -> None:
+        # Double the rows until ``num_rows`` fit, the written rows are copied to the new tensor.
+        capacity = self._latent_states.shape[0]
+        while capacity < num_rows:
+            capacity *= 2
+        capacity = min(capacity, self._max_rows)
+        assert num_rows <= capacity, (num_rows, self._max_rows)
+        latent_states = self._latent_states.new_empty((capacity, ) + tuple(self._latent_states.shape[1:]))
+        latent_states[:self._num_rows] = self._latent_states[:self._num_rows]
+        self._latent_states = latent_states
@@ -1,5 +1,5 @@
 import copy
-from typing import TYPE_CHECKING, List, Any, Union
+from typing import TYPE_CHECKING, List, Any, Optional, Union
 
 import numpy as np
 import torch
@@ -8,9 +8,12 @@ from easydict import EasyDict
 from lzero.mcts.ctree.ctree_efficientzero import ez_tree as tree_efficientzero
 from lzero.mcts.ctree.ctree_gumbel_muzero import gmz_tree as tree_gumbel_muzero
 from lzero.mcts.ctree.ctree_muzero import mz_tree as tree_muzero
+from lzero.mcts.tree_search.latent_state_arena import LatentStateArena
+from lzero.mcts.utils import set_ctree_num_threads
 from lzero.policy import InverseScalarTransform, to_detach_cpu_numpy
 
 if TYPE_CHECKING:
+    from lzero.mcts.utils import SearchBudget
     from lzero.mcts.ctree.ctree_efficientzero import ez_tree as ez_ctree
     from lzero.mcts.ctree.ctree_muzero import mz_tree as mz_ctree
     from lzero.mcts.ctree.ctree_gumbel_muzero import gmz_tree as gmz_ctree
@@ -131,7 +134,7 @@ class UniZeroMCTSCtree(object):
 
                 latent_states = torch.from_numpy(np.asarray(latent_states)).to(self._cfg.device)
                 # TODO: .long() is only for discrete action
-                last_actions = torch.from_numpy(np.asarray(last_actions)).to(self._cfg.device).long()
+                last_actions = torch.from_numpy(last_actions).to(self._cfg.device).long()
 
                 # Update state_action_history after each simulation
                 state_action_history.append((latent_states.detach().cpu().numpy(), last_actions))
@@ -153,10 +156,10 @@ class UniZeroMCTSCtree(object):
 
                 latent_state_batch_in_search_path.append(network_output.latent_state)
 
-                # tolist() is to be compatible with cpp datatype.
-                reward_batch = network_output.reward.reshape(-1).tolist()
-                value_batch = network_output.value.reshape(-1).tolist()
-                policy_logits_batch = network_output.policy_logits.tolist()
+                # The arrays are read by the cpp tree through the buffer interface, without being converted to lists.
+                reward_batch = network_output.reward.reshape(-1)
+                value_batch = network_output.value.reshape(-1)
+                policy_logits_batch = network_output.policy_logits
 
                 # In ``batch_backpropagate()``, we first expand the leaf node using ``the policy_logits`` and
                 # ``reward`` predicted by the model, then perform backpropagation along the search path to update the
@@ -190,6 +193,12 @@ class MuZeroMCTSCtree(object):
         pb_c_init=1.25,
         # (float) The maximum change in value allowed during the backup step of the search tree update.
         value_delta_max=0.01,
+        # (int) The number of the threads which traverse and backpropagate the roots of a batch in parallel in the cpp tree.
+        # The thread pool is shared by the whole process, so it is set by the first MCTSCtree of the process.
+        ctree_num_threads=1,
+        # (bool) Whether to run the simulation loop of ``search`` in the cpp tree, which calls back into the batched
+        # ``recurrent_inference`` once per simulation. It is not used by a search with a ``search_budget``.
+        native_search_loop=False,
         env_type='not_board_games',
     )
 
@@ -209,6 +218,7 @@ class MuZeroMCTSCtree(object):
         default_config = self.default_config()
         default_config.update(cfg)
         self._cfg = default_config
+        set_ctree_num_threads(tree_muzero, self._cfg.ctree_num_threads)
         self.inverse_scalar_transform_handle = InverseScalarTransform(
             self._cfg.model.support_scale, self._cfg.device, self._cfg.model.categorical_distribution
         )
@@ -228,7 +238,7 @@ class MuZeroMCTSCtree(object):
     # @profile
     def search(
             self, roots: Any, model: torch.nn.Module, latent_state_roots: List[Any], to_play_batch: Union[int,
-            List[Any]]
+            List[Any]], search_budget: Optional["SearchBudget"] = None
     ) -> None:
         """
         Overview:
@@ -238,6 +248,7 @@ class MuZeroMCTSCtree(object):
             - roots (:obj:`Any`): a batch of expanded root nodes
             - latent_state_roots (:obj:`list`): the hidden states of the roots
             - to_play_batch (:obj:`list`): the to_play_batch list used in in self-play-mode board games
+            - search_budget (:obj:`SearchBudget`): The budget of an anytime search, which replaces ``num_simulations``.
         """
         with torch.no_grad():
             model.eval()
@@ -245,25 +256,30 @@ class MuZeroMCTSCtree(object):
             # preparation some constant
             batch_size = roots.num
             pb_c_base, pb_c_init, discount_factor = self._cfg.pb_c_base, self._cfg.pb_c_init, self._cfg.discount_factor
-            # the data storage of latent states: storing the latent state of all the nodes in the search.
-            latent_state_batch_in_search_path = [latent_state_roots]
 
             # minimax value storage
             min_max_stats_lst = tree_muzero.MinMaxStatsList(batch_size)
             min_max_stats_lst.set_delta(self._cfg.value_delta_max)
 
-            last_latent_state = latent_state_roots
-            for simulation_index in range(self._cfg.num_simulations):
+            # With a search budget, the search runs until the budget is exhausted (at ``max_num_simulations`` at the
+            # latest) instead of ``num_simulations``.
+            num_simulations = self._cfg.num_simulations if search_budget is None else search_budget.max_num_simulations + 1
+            # the data storage of latent states: storing the latent state of all the nodes in the search on the device.
+            latent_state_arena = LatentStateArena(latent_state_roots, num_simulations, self._cfg.device)
+            if search_budget is None and self._cfg.native_search_loop:
+                self._search_all(roots, model, latent_state_arena, min_max_stats_lst, num_simulations, to_play_batch)
+                return
+            for simulation_index in range(num_simulations):
+                if search_budget is not None and search_budget.exhausted(simulation_index, roots.get_distributions):
+                    break
                 # In each simulation, we expanded a new node, so in one search, we have ``num_simulations`` num of nodes at most.
 
-                latent_states = []
-
                 # prepare a result wrapper to transport results between python and c++ parts
                 results = tree_muzero.ResultsWrapper(num=batch_size)
 
-                # latent_state_index_in_search_path: the first index of leaf node states in latent_state_batch_in_search_path, i.e. is current_latent_state_index in one the search.
-                # latent_state_index_in_batch: the second index of leaf node states in latent_state_batch_in_search_path, i.e. the index in the batch, whose maximum is ``batch_size``.
-                # e.g. the latent state of the leaf node in (x, y) is latent_state_batch_in_search_path[x, y], where x is current_latent_state_index, y is batch_index.
+                # latent_state_index_in_search_path: the first index of leaf node states in latent_state_arena, i.e. is current_latent_state_index in one the search.
+                # latent_state_index_in_batch: the second index of leaf node states in latent_state_arena, i.e. the index in the batch, whose maximum is ``batch_size``.
+                # e.g. the latent state of the leaf node in (x, y) is latent_state_arena[x, y], where x is current_latent_state_index, y is batch_index.
                 # The index of value prefix hidden state of the leaf node are in the same manner.
                 """
                 MCTS stage 1: Selection
@@ -281,13 +297,9 @@ class MuZeroMCTSCtree(object):
                     )
 
                 # obtain the latent state for leaf node
-                for ix, iy in zip(latent_state_index_in_search_path, latent_state_index_in_batch):
-                    latent_states.append(latent_state_batch_in_search_path[ix][iy])
-
-                latent_states = torch.from_numpy(np.asarray(latent_states)).to(self._cfg.device)
-                # latent_states = torch.from_numpy(np.asarray(latent_states)).to(self._cfg.device).float()
+                latent_states = latent_state_arena.gather(latent_state_index_in_search_path, latent_state_index_in_batch)
                 # TODO: .long() is only for discrete action
-                last_actions = torch.from_numpy(np.asarray(last_actions)).to(self._cfg.device).long()
+                last_actions = torch.from_numpy(last_actions).to(self._cfg.device).long()
 
                 """
                 MCTS stage 2: Expansion
@@ -298,29 +310,70 @@ class MuZeroMCTSCtree(object):
                 """
                 network_output = model.recurrent_inference(latent_states, last_actions)  # for classic muzero
 
-                network_output.latent_state = to_detach_cpu_numpy(network_output.latent_state)
                 network_output.policy_logits = to_detach_cpu_numpy(network_output.policy_logits)
                 network_output.value = to_detach_cpu_numpy(self.inverse_scalar_transform_handle(network_output.value))
                 network_output.reward = to_detach_cpu_numpy(self.inverse_scalar_transform_handle(network_output.reward))
 
-                latent_state_batch_in_search_path.append(network_output.latent_state)
+                # NOTE: simulation_index + 1 is very important, which is the depth of the current leaf node.
+                current_latent_state_index = simulation_index + 1
+                latent_state_arena.write(current_latent_state_index, network_output.latent_state)
 
-                # tolist() is to be compatible with cpp datatype.
-                reward_batch = network_output.reward.reshape(-1).tolist()
-                value_batch = network_output.value.reshape(-1).tolist()
-                policy_logits_batch = network_output.policy_logits.tolist()
+                # The arrays are read by the cpp tree through the buffer interface, without being converted to lists.
+                reward_batch = network_output.reward.reshape(-1)
+                value_batch = network_output.value.reshape(-1)
+                policy_logits_batch = network_output.policy_logits
 
                 # In ``batch_backpropagate()``, we first expand the leaf node using ``the policy_logits`` and
                 # ``reward`` predicted by the model, then perform backpropagation along the search path to update the
                 # statistics.
-
-                # NOTE: simulation_index + 1 is very important, which is the depth of the current leaf node.
-                current_latent_state_index = simulation_index + 1
                 tree_muzero.batch_backpropagate(
                     current_latent_state_index, discount_factor, reward_batch, value_batch, policy_logits_batch,
                     min_max_stats_lst, results, virtual_to_play_batch
                 )
 
+    def _search_all(
+            self, roots: Any, model: torch.nn.Module, latent_state_arena: LatentStateArena, min_max_stats_lst: Any,
+            num_simulations: int, to_play_batch: List[Any]
+    ) -> None:
+        """
+        Overview:
+            Run the simulations of ``search`` with ``search_all`` of the cpp tree, which traverses and backpropagates
+            the roots without going back to python between the simulations. The leaf nodes and the network outputs of
+            a simulation are exchanged through buffers which are allocated once per search.
+        Arguments:
+            - roots (:obj:`Any`): a batch of expanded root nodes
+            - model (:obj:`torch.nn.Module`): The model used for inference.
+            - latent_state_arena (:obj:`LatentStateArena`): The latent states of the nodes of the search.
+            - min_max_stats_lst (:obj:`Any`): The min-max statistics of the roots.
+            - num_simulations (:obj:`int`): The number of simulations.
+            - to_play_batch (:obj:`list`): the to_play_batch list used in in self-play-mode board games
+        """
+        batch_size = roots.num
+        latent_state_index_in_search_path = np.zeros(batch_size, dtype=np.intc)
+        latent_state_index_in_batch = np.zeros(batch_size, dtype=np.intc)
+        last_actions = np.zeros(batch_size, dtype=np.intc)
+        reward_batch = np.zeros(batch_size, dtype=np.float32)
+        value_batch = np.zeros(batch_size, dtype=np.float32)
+        policy_logits_batch = np.zeros((batch_size, self._cfg.model.action_space_size), dtype=np.float32)
+
+        def recurrent_inference(current_latent_state_index: int) -> None:
+            latent_states = latent_state_arena.gather(latent_state_index_in_search_path, latent_state_index_in_batch)
+            # TODO: .long() is only for discrete action
+            network_output = model.recurrent_inference(
+                latent_states,
+                torch.from_numpy(last_actions).to(self._cfg.device).long()
+            )
+            latent_state_arena.write(current_latent_state_index, network_output.latent_state)
+            reward_batch[:] = to_detach_cpu_numpy(self.inverse_scalar_transform_handle(network_output.reward)).reshape(-1)
+            value_batch[:] = to_detach_cpu_numpy(self.inverse_scalar_transform_handle(network_output.value)).reshape(-1)
+            policy_logits_batch[:] = to_detach_cpu_numpy(network_output.policy_logits)
+
+        tree_muzero.search_all(
+            roots, num_simulations, self._cfg.pb_c_base, self._cfg.pb_c_init, self._cfg.discount_factor,
+            min_max_stats_lst, to_play_batch, recurrent_inference, latent_state_index_in_search_path,
+            latent_state_index_in_batch, last_actions, reward_batch, value_batch, policy_logits_batch
+        )
+
     def search_with_reuse(
             self,
             roots: Any,
@@ -349,16 +402,12 @@ class MuZeroMCTSCtree(object):
             # Initialize constants and variables
             batch_size = roots.num
             pb_c_base, pb_c_init, discount_factor = self._cfg.pb_c_base, self._cfg.pb_c_init, self._cfg.discount_factor
-            latent_state_batch_in_search_path = [latent_state_roots]
+            latent_state_arena = LatentStateArena(latent_state_roots, self._cfg.num_simulations, self._cfg.device)
             min_max_stats_lst = tree_muzero.MinMaxStatsList(batch_size)
             min_max_stats_lst.set_delta(self._cfg.value_delta_max)
             infer_sum = 0
 
             for simulation_index in range(self._cfg.num_simulations):
-                latent_states = []
-                temp_actions = []
-                no_inference_lst = []
-                reuse_lst = []
                 results = tree_muzero.ResultsWrapper(num=batch_size)
 
                 # Selection phase: traverse the tree to select a leaf node
@@ -373,44 +422,42 @@ class MuZeroMCTSCtree(object):
                         copy.deepcopy(to_play_batch), true_action_list, reuse_value_list
                     )
 
-                # Collect latent states and actions for expansion
-                for count, (ix, iy) in enumerate(zip(latent_state_index_in_search_path, latent_state_index_in_batch)):
-                    if ix != -1:
-                        latent_states.append(latent_state_batch_in_search_path[ix][iy])
-                        temp_actions.append(last_actions[count])
-                    else:
-                        no_inference_lst.append(iy)
-                    if ix == 0 and last_actions[count] == true_action_list[count]:
-                        reuse_lst.append(count)
+                # Collect latent states and actions for expansion, the leaf nodes of ``ix == -1`` need no inference.
+                need_inference = latent_state_index_in_search_path != -1
+                index_in_search_path = latent_state_index_in_search_path[need_inference]
+                index_in_batch = latent_state_index_in_batch[need_inference]
+                temp_actions = last_actions[need_inference]
+                no_inference_lst = latent_state_index_in_batch[~need_inference]
+                reuse_lst = np.flatnonzero(
+                    (latent_state_index_in_search_path == 0) & (last_actions == np.asarray(true_action_list))
+                )
 
                 length = len(temp_actions)
-                latent_states = torch.from_numpy(np.asarray(latent_states)).to(self._cfg.device)
-                temp_actions = torch.from_numpy(np.asarray(temp_actions)).to(self._cfg.device).long()
+                latent_states = latent_state_arena.gather(index_in_search_path, index_in_batch)
+                temp_actions = torch.from_numpy(temp_actions).to(self._cfg.device).long()
 
                 # Expansion phase: expand the leaf node and evaluate the new node
                 if length != 0:
                     network_output = model.recurrent_inference(latent_states, temp_actions)
-                    network_output.latent_state = to_detach_cpu_numpy(network_output.latent_state)
                     network_output.policy_logits = to_detach_cpu_numpy(network_output.policy_logits)
                     network_output.value = to_detach_cpu_numpy(
                         self.inverse_scalar_transform_handle(network_output.value))
                     network_output.reward = to_detach_cpu_numpy(
                         self.inverse_scalar_transform_handle(network_output.reward))
 
-                    latent_state_batch_in_search_path.append(network_output.latent_state)
-                    reward_batch = network_output.reward.reshape(-1).tolist()
-                    value_batch = network_output.value.reshape(-1).tolist()
-                    policy_logits_batch = network_output.policy_logits.tolist()
+                    latent_state_arena.write(simulation_index + 1, network_output.latent_state)
+                    reward_batch = network_output.reward.reshape(-1)
+                    value_batch = network_output.value.reshape(-1)
+                    policy_logits_batch = network_output.policy_logits
                 else:
-                    latent_state_batch_in_search_path.append([])
                     reward_batch = []
                     value_batch = []
                     policy_logits_batch = []
 
                 # Backup phase: propagate the evaluation results back through the tree
                 current_latent_state_index = simulation_index + 1
-                no_inference_lst.append(-1)
-                reuse_lst.append(-1)
+                no_inference_lst = np.append(no_inference_lst, -1)
+                reuse_lst = np.append(reuse_lst, -1)
                 tree_muzero.batch_backpropagate_with_reuse(
                     current_latent_state_index, discount_factor, reward_batch, value_batch, policy_logits_batch,
                     min_max_stats_lst, results, virtual_to_play_batch, no_inference_lst, reuse_lst, reuse_value_list
@@ -572,7 +619,7 @@ class MuZeroRNNFullObsMCTSCtree(object):
                     self._cfg.device).unsqueeze(0)
 
                 # TODO: .long() is only for discrete action
-                last_actions = torch.from_numpy(np.asarray(last_actions)).to(self._cfg.device).long()
+                last_actions = torch.from_numpy(last_actions).to(self._cfg.device).long()
 
                 # NOTE
                 state_action_history.append((latent_states.detach().cpu().numpy(), last_actions))
@@ -602,10 +649,10 @@ class MuZeroRNNFullObsMCTSCtree(object):
                 network_output.reward_hidden_state = network_output.reward_hidden_state.detach().cpu().numpy()
                 latent_state_batch_in_search_path.append(network_output.predict_next_latent_state)
 
-                # tolist() is to be compatible with cpp datatype.
-                reward_batch = network_output.value_prefix.reshape(-1).tolist()
-                value_batch = network_output.value.reshape(-1).tolist()
-                policy_logits_batch = network_output.policy_logits.tolist()
+                # The arrays are read by the cpp tree through the buffer interface, without being converted to lists.
+                reward_batch = network_output.value_prefix.reshape(-1)
+                value_batch = network_output.value.reshape(-1)
+                policy_logits_batch = network_output.policy_logits
 
                 world_model_latent_history = network_output.reward_hidden_state
                 world_model_latent_history_batch.append(world_model_latent_history)
@@ -647,6 +694,9 @@ class EfficientZeroMCTSCtree(object):
         pb_c_init=1.25,
         # (float) The maximum change in value allowed during the backup step of the search tree update.
         value_delta_max=0.01,
+        # (int) The number of the threads which traverse and backpropagate the roots of a batch in parallel in the cpp tree.
+        # The thread pool is shared by the whole process, so it is set by the first MCTSCtree of the process.
+        ctree_num_threads=1,
     )
 
     @classmethod
@@ -677,6 +727,7 @@ class EfficientZeroMCTSCtree(object):
         # Update the default configuration with the values provided by the user in ``cfg``.
         default_config.update(cfg)
         self._cfg = default_config
+        set_ctree_num_threads(tree_efficientzero, self._cfg.ctree_num_threads)
         self.inverse_scalar_transform_handle = InverseScalarTransform(
             self._cfg.model.support_scale, self._cfg.device, self._cfg.model.categorical_distribution
         )
@@ -720,13 +771,15 @@ class EfficientZeroMCTSCtree(object):
             batch_size = roots.num
             pb_c_base, pb_c_init, discount_factor = self._cfg.pb_c_base, self._cfg.pb_c_init, self._cfg.discount_factor
 
-            # the data storage of latent states: storing the latent state of all the nodes in one search.
-            latent_state_batch_in_search_path = [latent_state_roots]
-            # the data storage of value prefix hidden states in LSTM
-            # print(f"reward_hidden_state_roots[0]={reward_hidden_state_roots[0]}")
-            # print(f"reward_hidden_state_roots[1]={reward_hidden_state_roots[1]}")
-            reward_hidden_state_c_batch = [reward_hidden_state_roots[0]]
-            reward_hidden_state_h_batch = [reward_hidden_state_roots[1]]
+            # the data storage of latent states: storing the latent state of all the nodes in one search on the device.
+            latent_state_arena = LatentStateArena(latent_state_roots, self._cfg.num_simulations, self._cfg.device)
+            # the data storage of value prefix hidden states in LSTM, whose shape is (1, batch_size, lstm_hidden_size)
+            reward_hidden_state_c_arena = LatentStateArena(
+                reward_hidden_state_roots[0][0], self._cfg.num_simulations, self._cfg.device
+            )
+            reward_hidden_state_h_arena = LatentStateArena(
+                reward_hidden_state_roots[1][0], self._cfg.num_simulations, self._cfg.device
+            )
 
             # minimax value storage
             min_max_stats_lst = tree_efficientzero.MinMaxStatsList(batch_size)
@@ -735,16 +788,12 @@ class EfficientZeroMCTSCtree(object):
             for simulation_index in range(self._cfg.num_simulations):
                 # In each simulation, we expanded a new node, so in one search, we have ``num_simulations`` num of nodes at most.
 
-                latent_states = []
-                hidden_states_c_reward = []
-                hidden_states_h_reward = []
-
                 # prepare a result wrapper to transport results between python and c++ parts
                 results = tree_efficientzero.ResultsWrapper(num=batch_size)
 
-                # latent_state_index_in_search_path: the first index of leaf node states in latent_state_batch_in_search_path, i.e. is current_latent_state_index in one the search.
-                # latent_state_index_in_batch: the second index of leaf node states in latent_state_batch_in_search_path, i.e. the index in the batch, whose maximum is ``batch_size``.
-                # e.g. the latent state of the leaf node in (x, y) is latent_state_batch_in_search_path[x, y], where x is current_latent_state_index, y is batch_index.
+                # latent_state_index_in_search_path: the first index of leaf node states in latent_state_arena, i.e. is current_latent_state_index in one the search.
+                # latent_state_index_in_batch: the second index of leaf node states in latent_state_arena, i.e. the index in the batch, whose maximum is ``batch_size``.
+                # e.g. the latent state of the leaf node in (x, y) is latent_state_arena[x, y], where x is current_latent_state_index, y is batch_index.
                 # The index of value prefix hidden state of the leaf node is in the same manner.
                 """
                 MCTS stage 1: Selection
@@ -765,18 +814,15 @@ class EfficientZeroMCTSCtree(object):
                 search_lens = results.get_search_len()
 
                 # obtain the latent state for leaf node
-                for ix, iy in zip(latent_state_index_in_search_path, latent_state_index_in_batch):
-                    latent_states.append(latent_state_batch_in_search_path[ix][iy])
-                    hidden_states_c_reward.append(reward_hidden_state_c_batch[ix][0][iy])
-                    hidden_states_h_reward.append(reward_hidden_state_h_batch[ix][0][iy])
-
-                latent_states = torch.from_numpy(np.asarray(latent_states)).to(self._cfg.device)
-                hidden_states_c_reward = torch.from_numpy(np.asarray(hidden_states_c_reward)).to(self._cfg.device
-                                                                                                 ).unsqueeze(0)
-                hidden_states_h_reward = torch.from_numpy(np.asarray(hidden_states_h_reward)).to(self._cfg.device
-                                                                                                 ).unsqueeze(0)
+                latent_states = latent_state_arena.gather(latent_state_index_in_search_path, latent_state_index_in_batch)
+                hidden_states_c_reward = reward_hidden_state_c_arena.gather(
+                    latent_state_index_in_search_path, latent_state_index_in_batch
+                ).unsqueeze(0)
+                hidden_states_h_reward = reward_hidden_state_h_arena.gather(
+                    latent_state_index_in_search_path, latent_state_index_in_batch
+                ).unsqueeze(0)
                 # .long() is only for discrete action
-                last_actions = torch.from_numpy(np.asarray(last_actions)).to(self._cfg.device).long()
+                last_actions = torch.from_numpy(last_actions).to(self._cfg.device).long()
                 """
                 MCTS stage 2: Expansion
                     At the final time-step l of the simulation, the next_latent_state and reward/value_prefix are computed by the dynamics function.
@@ -788,41 +834,36 @@ class EfficientZeroMCTSCtree(object):
                     latent_states, (hidden_states_c_reward, hidden_states_h_reward), last_actions
                 )
 
-                network_output.latent_state = to_detach_cpu_numpy(network_output.latent_state)
                 network_output.policy_logits = to_detach_cpu_numpy(network_output.policy_logits)
                 network_output.value = to_detach_cpu_numpy(self.inverse_scalar_transform_handle(network_output.value))
                 network_output.value_prefix = to_detach_cpu_numpy(
                     self.inverse_scalar_transform_handle(network_output.value_prefix))
 
-                network_output.reward_hidden_state = (
-                    network_output.reward_hidden_state[0].detach().cpu().numpy(),
-                    network_output.reward_hidden_state[1].detach().cpu().numpy()
-                )
-
-                latent_state_batch_in_search_path.append(network_output.latent_state)
-                # tolist() is to be compatible with cpp datatype.
-                value_prefix_batch = network_output.value_prefix.reshape(-1).tolist()
-                value_batch = network_output.value.reshape(-1).tolist()
-                policy_logits_batch = network_output.policy_logits.tolist()
+                # NOTE: simulation_index + 1 is very important, which is the depth of the current leaf node.
+                current_latent_state_index = simulation_index + 1
+                latent_state_arena.write(current_latent_state_index, network_output.latent_state)
+                # The arrays are read by the cpp tree through the buffer interface, without being converted to lists.
+                value_prefix_batch = network_output.value_prefix.reshape(-1)
+                value_batch = network_output.value.reshape(-1)
+                policy_logits_batch = network_output.policy_logits
 
-                reward_latent_state_batch = network_output.reward_hidden_state
                 # reset the hidden states in LSTM every ``lstm_horizon_len`` steps in one search.
                 # which enable the model only need to predict the value prefix in a range (e.g.: [s0,...,s5])
                 assert self._cfg.lstm_horizon_len > 0
                 reset_idx = (np.array(search_lens) % self._cfg.lstm_horizon_len == 0)
                 assert len(reset_idx) == batch_size
-                reward_latent_state_batch[0][:, reset_idx, :] = 0
-                reward_latent_state_batch[1][:, reset_idx, :] = 0
-                is_reset_list = reset_idx.astype(np.int32).tolist()
-                reward_hidden_state_c_batch.append(reward_latent_state_batch[0])
-                reward_hidden_state_h_batch.append(reward_latent_state_batch[1])
+                reset_mask = torch.from_numpy(reset_idx).to(self._cfg.device).unsqueeze(-1)
+                reward_hidden_state_c_arena.write(
+                    current_latent_state_index, network_output.reward_hidden_state[0][0].masked_fill(reset_mask, 0)
+                )
+                reward_hidden_state_h_arena.write(
+                    current_latent_state_index, network_output.reward_hidden_state[1][0].masked_fill(reset_mask, 0)
+                )
+                is_reset_list = reset_idx.astype(np.int32)
 
                 # In ``batch_backpropagate()``, we first expand the leaf node using ``the policy_logits`` and
                 # ``reward`` predicted by the model, then perform backpropagation along the search path to update the
                 # statistics.
-
-                # NOTE: simulation_index + 1 is very important, which is the depth of the current leaf node.
-                current_latent_state_index = simulation_index + 1
                 tree_efficientzero.batch_backpropagate(
                     current_latent_state_index, discount_factor, value_prefix_batch, value_batch, policy_logits_batch,
                     min_max_stats_lst, results, is_reset_list, virtual_to_play_batch
@@ -855,9 +896,13 @@ class EfficientZeroMCTSCtree(object):
             batch_size = roots.num
             pb_c_base, pb_c_init, discount_factor = self._cfg.pb_c_base, self._cfg.pb_c_init, self._cfg.discount_factor
 
-            latent_state_batch_in_search_path = [latent_state_roots]
-            reward_hidden_state_c_batch = [reward_hidden_state_roots[0]]
-            reward_hidden_state_h_batch = [reward_hidden_state_roots[1]]
+            latent_state_arena = LatentStateArena(latent_state_roots, self._cfg.num_simulations, self._cfg.device)
+            reward_hidden_state_c_arena = LatentStateArena(
+                reward_hidden_state_roots[0][0], self._cfg.num_simulations, self._cfg.device
+            )
+            reward_hidden_state_h_arena = LatentStateArena(
+                reward_hidden_state_roots[1][0], self._cfg.num_simulations, self._cfg.device
+            )
 
             min_max_stats_lst = tree_efficientzero.MinMaxStatsList(batch_size)
             min_max_stats_lst.set_delta(self._cfg.value_delta_max)
@@ -865,9 +910,6 @@ class EfficientZeroMCTSCtree(object):
             infer_sum = 0
 
             for simulation_index in range(self._cfg.num_simulations):
-                latent_states, hidden_states_c_reward, hidden_states_h_reward = [], [], []
-                temp_actions, temp_search_lens, no_inference_lst, reuse_lst = [], [], [], []
-
                 results = tree_efficientzero.ResultsWrapper(num=batch_size)
 
                 if self._cfg.env_type == 'not_board_games':
@@ -883,67 +925,59 @@ class EfficientZeroMCTSCtree(object):
 
                 search_lens = results.get_search_len()
 
-                for count, (ix, iy) in enumerate(zip(latent_state_index_in_search_path, latent_state_index_in_batch)):
-                    if ix != -1:
-                        latent_states.append(latent_state_batch_in_search_path[ix][iy])
-                        hidden_states_c_reward.append(reward_hidden_state_c_batch[ix][0][iy])
-                        hidden_states_h_reward.append(reward_hidden_state_h_batch[ix][0][iy])
-                        temp_actions.append(last_actions[count])
-                        temp_search_lens.append(search_lens[count])
-                    else:
-                        no_inference_lst.append(iy)
-                    if ix == 0 and last_actions[count] == true_action_list[count]:
-                        reuse_lst.append(count)
+                # The leaf nodes of ``ix == -1`` need no inference.
+                need_inference = latent_state_index_in_search_path != -1
+                index_in_search_path = latent_state_index_in_search_path[need_inference]
+                index_in_batch = latent_state_index_in_batch[need_inference]
+                temp_actions = last_actions[need_inference]
+                temp_search_lens = np.asarray(search_lens)[need_inference]
+                no_inference_lst = latent_state_index_in_batch[~need_inference]
+                reuse_lst = np.flatnonzero(
+                    (latent_state_index_in_search_path == 0) & (last_actions == np.asarray(true_action_list))
+                )
 
                 length = len(temp_actions)
-                latent_states = torch.tensor(latent_states, device=self._cfg.device)
-                hidden_states_c_reward = torch.tensor(hidden_states_c_reward, device=self._cfg.device).unsqueeze(0)
-                hidden_states_h_reward = torch.tensor(hidden_states_h_reward, device=self._cfg.device).unsqueeze(0)
-                temp_actions = torch.tensor(temp_actions, device=self._cfg.device).long()
+                latent_states = latent_state_arena.gather(index_in_search_path, index_in_batch)
+                hidden_states_c_reward = reward_hidden_state_c_arena.gather(index_in_search_path, index_in_batch).unsqueeze(0)
+                hidden_states_h_reward = reward_hidden_state_h_arena.gather(index_in_search_path, index_in_batch).unsqueeze(0)
+                temp_actions = torch.from_numpy(temp_actions).to(self._cfg.device).long()
 
                 if length != 0:
                     network_output = model.recurrent_inference(
                         latent_states, (hidden_states_c_reward, hidden_states_h_reward), temp_actions
                     )
 
-                    network_output.latent_state = to_detach_cpu_numpy(network_output.latent_state)
                     network_output.policy_logits = to_detach_cpu_numpy(network_output.policy_logits)
                     network_output.value = to_detach_cpu_numpy(
                         self.inverse_scalar_transform_handle(network_output.value))
                     network_output.value_prefix = to_detach_cpu_numpy(
                         self.inverse_scalar_transform_handle(network_output.value_prefix))
 
-                    network_output.reward_hidden_state = (
-                        network_output.reward_hidden_state[0].detach().cpu().numpy(),
-                        network_output.reward_hidden_state[1].detach().cpu().numpy()
-                    )
+                    latent_state_arena.write(simulation_index + 1, network_output.latent_state)
+                    value_prefix_batch = network_output.value_prefix.reshape(-1)
+                    value_batch = network_output.value.reshape(-1)
+                    policy_logits_batch = network_output.policy_logits
 
-                    latent_state_batch_in_search_path.append(network_output.latent_state)
-                    value_prefix_batch = network_output.value_prefix.reshape(-1).tolist()
-                    value_batch = network_output.value.reshape(-1).tolist()
-                    policy_logits_batch = network_output.policy_logits.tolist()
-
-                    reward_latent_state_batch = network_output.reward_hidden_state
                     assert self._cfg.lstm_horizon_len > 0
-                    reset_idx = (np.array(temp_search_lens) % self._cfg.lstm_horizon_len == 0)
-                    reward_latent_state_batch[0][:, reset_idx, :] = 0
-                    reward_latent_state_batch[1][:, reset_idx, :] = 0
-                    is_reset_list = reset_idx.astype(np.int32).tolist()
-                    reward_hidden_state_c_batch.append(reward_latent_state_batch[0])
-                    reward_hidden_state_h_batch.append(reward_latent_state_batch[1])
+                    reset_idx = (temp_search_lens % self._cfg.lstm_horizon_len == 0)
+                    reset_mask = torch.from_numpy(reset_idx).to(self._cfg.device).unsqueeze(-1)
+                    reward_hidden_state_c_arena.write(
+                        simulation_index + 1, network_output.reward_hidden_state[0][0].masked_fill(reset_mask, 0)
+                    )
+                    reward_hidden_state_h_arena.write(
+                        simulation_index + 1, network_output.reward_hidden_state[1][0].masked_fill(reset_mask, 0)
+                    )
+                    is_reset_list = reset_idx.astype(np.int32)
                 else:
-                    latent_state_batch_in_search_path.append([])
                     value_batch, policy_logits_batch, value_prefix_batch = [], [], []
-                    reward_hidden_state_c_batch.append([])
-                    reward_hidden_state_h_batch.append([])
                     assert self._cfg.lstm_horizon_len > 0
                     reset_idx = (np.array(search_lens) % self._cfg.lstm_horizon_len == 0)
                     assert len(reset_idx) == batch_size
-                    is_reset_list = reset_idx.astype(np.int32).tolist()
+                    is_reset_list = reset_idx.astype(np.int32)
 
                 current_latent_state_index = simulation_index + 1
-                no_inference_lst.append(-1)
-                reuse_lst.append(-1)
+                no_inference_lst = np.append(no_inference_lst, -1)
+                reuse_lst = np.append(reuse_lst, -1)
                 tree_efficientzero.batch_backpropagate_with_reuse(
                     current_latent_state_index, discount_factor, value_prefix_batch, value_batch, policy_logits_batch,
                     min_max_stats_lst, results, is_reset_list, virtual_to_play_batch, no_inference_lst, reuse_lst,
@@ -977,6 +1011,9 @@ class GumbelMuZeroMCTSCtree(object):
         root_noise_weight=0.25,
         # (float) The maximum change in value allowed during the backup step of the search tree update.
         value_delta_max=0.01,
+        # (int) The number of the threads which traverse and backpropagate the roots of a batch in parallel in the cpp tree.
+        # The thread pool is shared by the whole process, so it is set by the first MCTSCtree of the process.
+        ctree_num_threads=1,
     )
 
     @classmethod
@@ -1007,6 +1044,7 @@ class GumbelMuZeroMCTSCtree(object):
         # Update the default configuration with the values provided by the user in ``cfg``.
         default_config.update(cfg)
         self._cfg = default_config
+        set_ctree_num_threads(tree_gumbel_muzero, self._cfg.ctree_num_threads)
         self.inverse_scalar_transform_handle = InverseScalarTransform(
             self._cfg.model.support_scale, self._cfg.device, self._cfg.model.categorical_distribution
         )
@@ -1046,8 +1084,8 @@ class GumbelMuZeroMCTSCtree(object):
             batch_size = roots.num
             device = self._cfg.device
             discount_factor = self._cfg.discount_factor
-            # the data storage of hidden states: storing the states of all the tree nodes
-            latent_state_batch_in_search_path = [latent_state_roots]
+            # the data storage of hidden states: storing the states of all the tree nodes on the device
+            latent_state_arena = LatentStateArena(latent_state_roots, self._cfg.num_simulations, device)
 
             # minimax value storage
             min_max_stats_lst = tree_gumbel_muzero.MinMaxStatsList(batch_size)
@@ -1056,8 +1094,6 @@ class GumbelMuZeroMCTSCtree(object):
             for simulation_index in range(self._cfg.num_simulations):
                 # In each simulation, we expanded a new node, so in one search, we have ``num_simulations`` num of nodes at most.
 
-                latent_states = []
-
                 # prepare a result wrapper to transport results between python and c++ parts
                 results = tree_gumbel_muzero.ResultsWrapper(num=batch_size)
 
@@ -1084,12 +1120,9 @@ class GumbelMuZeroMCTSCtree(object):
                     )
 
                 # obtain the states for leaf nodes
-                for ix, iy in zip(latent_state_index_in_search_path, latent_state_index_in_batch):
-                    latent_states.append(latent_state_batch_in_search_path[ix][iy])
-
-                latent_states = torch.from_numpy(np.asarray(latent_states)).to(device)
+                latent_states = latent_state_arena.gather(latent_state_index_in_search_path, latent_state_index_in_batch)
                 # .long() is only for discrete action
-                last_actions = torch.from_numpy(np.asarray(last_actions)).to(device).unsqueeze(1).long()
+                last_actions = torch.from_numpy(last_actions).to(device).unsqueeze(1).long()
                 """
                 MCTS stage 2: Expansion
                     At the final time-step l of the simulation, the next_latent_state and reward/value_prefix are computed by the dynamics function.
@@ -1099,24 +1132,22 @@ class GumbelMuZeroMCTSCtree(object):
                 """
                 network_output = model.recurrent_inference(latent_states, last_actions)
 
-                network_output.latent_state = to_detach_cpu_numpy(network_output.latent_state)
                 network_output.policy_logits = to_detach_cpu_numpy(network_output.policy_logits)
                 network_output.value = to_detach_cpu_numpy(self.inverse_scalar_transform_handle(network_output.value))
                 network_output.reward = to_detach_cpu_numpy(self.inverse_scalar_transform_handle(network_output.reward))
 
-                latent_state_batch_in_search_path.append(network_output.latent_state)
-                # tolist() is to be compatible with cpp datatype.
-                reward_batch = network_output.reward.reshape(-1).tolist()
-                value_batch = network_output.value.reshape(-1).tolist()
-                policy_logits_batch = network_output.policy_logits.tolist()
+                # NOTE: simulation_index + 1 is very important, which is the depth of the current leaf node.
+                current_latent_state_index = simulation_index + 1
+                latent_state_arena.write(current_latent_state_index, network_output.latent_state)
+                # The arrays are read by the cpp tree through the buffer interface, without being converted to lists.
+                reward_batch = network_output.reward.reshape(-1)
+                value_batch = network_output.value.reshape(-1)
+                policy_logits_batch = network_output.policy_logits
 
                 # In ``batch_backpropagate()``, we first expand the leaf node using ``the policy_logits`` and
                 # ``reward`` predicted by the model, then perform backpropagation along the search path to update the
                 # statistics.
 
-                # NOTE: simulation_index + 1 is very important, which is the depth of the current leaf node.
-                current_latent_state_index = simulation_index + 1
-
                 # backpropagation along the search path to update the attributes
                 tree_gumbel_muzero.batch_back_propagate(
                     current_latent_state_index, discount_factor, reward_batch, value_batch, policy_logits_batch,
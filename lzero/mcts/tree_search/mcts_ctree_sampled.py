@@ -7,6 +7,8 @@ from easydict import EasyDict
 
 from lzero.mcts.ctree.ctree_sampled_efficientzero import ezs_tree as tree_sampled_efficientzero
 from lzero.mcts.ctree.ctree_sampled_muzero import smz_tree as tree_sampled_muzero
+from lzero.mcts.tree_search.latent_state_arena import LatentStateArena
+from lzero.mcts.utils import set_ctree_num_threads
 from lzero.policy import InverseScalarTransform, to_detach_cpu_numpy
 
 if TYPE_CHECKING:
@@ -140,10 +142,10 @@ class SampledUniZeroMCTSCtree(object):
                 latent_states = torch.from_numpy(np.asarray(latent_states)).to(self._cfg.device)
                 if self._cfg.model.continuous_action_space is True:
                     # continuous action
-                    last_actions = torch.from_numpy(np.asarray(last_actions)).to(self._cfg.device)
+                    last_actions = torch.from_numpy(last_actions).to(self._cfg.device)
                 else:
                     # discrete action
-                    last_actions = torch.from_numpy(np.asarray(last_actions)).to(self._cfg.device).long()
+                    last_actions = torch.from_numpy(last_actions).to(self._cfg.device).long()
 
                 # Update state_action_history after each simulation
                 state_action_history.append((latent_states.detach().cpu().numpy(), last_actions))
@@ -166,10 +168,10 @@ class SampledUniZeroMCTSCtree(object):
 
                 latent_state_batch_in_search_path.append(network_output.latent_state)
 
-                # tolist() is to be compatible with cpp datatype.
-                reward_batch = network_output.reward.reshape(-1).tolist()
-                value_batch = network_output.value.reshape(-1).tolist()
-                policy_logits_batch = network_output.policy_logits.tolist()
+                # The arrays are read by the cpp tree through the buffer interface, without being converted to lists.
+                reward_batch = network_output.reward.reshape(-1)
+                value_batch = network_output.value.reshape(-1)
+                policy_logits_batch = network_output.policy_logits
 
                 # In ``batch_backpropagate()``, we first expand the leaf node using ``the policy_logits`` and
                 # ``reward`` predicted by the model, then perform backpropagation along the search path to update the
@@ -209,6 +211,9 @@ class SampledMuZeroMCTSCtree(object):
         pb_c_init=1.25,
         # (float) The maximum change in value allowed during the backup step of the search tree update.
         value_delta_max=0.01,
+        # (int) The number of the threads which traverse and backpropagate the roots of a batch in parallel in the cpp tree.
+        # The thread pool is shared by the whole process, so it is set by the first MCTSCtree of the process.
+        ctree_num_threads=1,
     )
 
     @classmethod
@@ -239,6 +244,7 @@ class SampledMuZeroMCTSCtree(object):
         # Update the default configuration with the values provided by the user in ``cfg``.
         default_config.update(cfg)
         self._cfg = default_config
+        set_ctree_num_threads(tree_sampled_muzero, self._cfg.ctree_num_threads)
         self.inverse_scalar_transform_handle = InverseScalarTransform(
             self._cfg.model.support_scale, self._cfg.device, self._cfg.model.categorical_distribution
         )
@@ -290,8 +296,8 @@ class SampledMuZeroMCTSCtree(object):
             device = self._cfg.device
             pb_c_base, pb_c_init, discount_factor = self._cfg.pb_c_base, self._cfg.pb_c_init, self._cfg.discount_factor
 
-            # the data storage of latent states: storing the latent state of all the nodes in one search.
-            latent_state_batch_in_search_path = [latent_state_roots]
+            # the data storage of latent states: storing the latent state of all the nodes in one search on the device.
+            latent_state_arena = LatentStateArena(latent_state_roots, self._cfg.num_simulations, device)
 
             # minimax value storage
             min_max_stats_lst = tree_sampled_muzero.MinMaxStatsList(batch_size)
@@ -299,14 +305,13 @@ class SampledMuZeroMCTSCtree(object):
 
             for simulation_index in range(self._cfg.num_simulations):
                 # In each simulation, we expanded a new node, so in one search, we have ``num_simulations`` num of nodes at most.
-                latent_states = []
 
                 # prepare a result wrapper to transport results between python and c++ parts
                 results = tree_sampled_muzero.ResultsWrapper(num=batch_size)
 
-                # latent_state_index_in_search_path: the first index of leaf node states in latent_state_batch_in_search_path, i.e. is current_latent_state_index in one the search.
-                # latent_state_index_in_batch: the second index of leaf node states in latent_state_batch_in_search_path, i.e. the index in the batch, whose maximum is ``batch_size``.
-                # e.g. the latent state of the leaf node in (x, y) is latent_state_batch_in_search_path[x, y], where x is current_latent_state_index, y is batch_index.
+                # latent_state_index_in_search_path: the first index of leaf node states in latent_state_arena, i.e. is current_latent_state_index in one the search.
+                # latent_state_index_in_batch: the second index of leaf node states in latent_state_arena, i.e. the index in the batch, whose maximum is ``batch_size``.
+                # e.g. the latent state of the leaf node in (x, y) is latent_state_arena[x, y], where x is current_latent_state_index, y is batch_index.
                 # The index of value prefix hidden state of the leaf node are in the same manner.
                 """
                 MCTS stage 1: Selection
@@ -327,16 +332,14 @@ class SampledMuZeroMCTSCtree(object):
                 # obtain the search horizon for leaf nodes
                 search_lens = results.get_search_len()
                 # obtain the latent state for leaf node
-                for ix, iy in zip(latent_state_index_in_search_path, latent_state_index_in_batch):
-                    latent_states.append(latent_state_batch_in_search_path[ix][iy])
-                latent_states = torch.from_numpy(np.asarray(latent_states)).to(device)
+                latent_states = latent_state_arena.gather(latent_state_index_in_search_path, latent_state_index_in_batch)
 
                 if self._cfg.model.continuous_action_space is True:
                     # continuous action
-                    last_actions = torch.from_numpy(np.asarray(last_actions)).to(device)
+                    last_actions = torch.from_numpy(last_actions).to(device)
                 else:
                     # discrete action
-                    last_actions = torch.from_numpy(np.asarray(last_actions)).to(device).long()
+                    last_actions = torch.from_numpy(last_actions).to(device).long()
                 """
                 MCTS stage 2: Expansion
                     At the final time-step l of the simulation, the next_latent_state and reward/value_prefix are computed by the dynamics function.
@@ -348,29 +351,24 @@ class SampledMuZeroMCTSCtree(object):
                     latent_states, last_actions
                 )
 
-                [
-                    network_output.latent_state, network_output.policy_logits, network_output.value,
-                    network_output.reward
-                ] = to_detach_cpu_numpy(
+                [network_output.policy_logits, network_output.value, network_output.reward] = to_detach_cpu_numpy(
                     [
-                        network_output.latent_state,
                         network_output.policy_logits,
                         self.inverse_scalar_transform_handle(network_output.value),
                         self.inverse_scalar_transform_handle(network_output.reward),
                     ]
                 )
-                latent_state_batch_in_search_path.append(network_output.latent_state)
-                # tolist() is to be compatible with cpp datatype.
-                reward_pool = network_output.reward.reshape(-1).tolist()
-                value_pool = network_output.value.reshape(-1).tolist()
-                policy_logits_pool = network_output.policy_logits.tolist()
+                # NOTE: simulation_index + 1 is very important, which is the depth of the current leaf node.
+                current_latent_state_index = simulation_index + 1
+                latent_state_arena.write(current_latent_state_index, network_output.latent_state)
+                # The arrays are read by the cpp tree through the buffer interface, without being converted to lists.
+                reward_pool = network_output.reward.reshape(-1)
+                value_pool = network_output.value.reshape(-1)
+                policy_logits_pool = network_output.policy_logits
 
                 # In ``batch_backpropagate()``, we first expand the leaf node using ``the policy_logits`` and
                 # ``reward`` predicted by the model, then perform backpropagation along the search path to update the
                 # statistics.
-
-                # NOTE: simulation_index + 1 is very important, which is the depth of the current leaf node.
-                current_latent_state_index = simulation_index + 1
                 tree_sampled_muzero.batch_backpropagate(
                     current_latent_state_index, discount_factor, reward_pool, value_pool, policy_logits_pool,
                     min_max_stats_lst, results, virtual_to_play_batch
@@ -403,6 +401,9 @@ class SampledEfficientZeroMCTSCtree(object):
         pb_c_init=1.25,
         # (float) The maximum change in value allowed during the backup step of the search tree update.
         value_delta_max=0.01,
+        # (int) The number of the threads which traverse and backpropagate the roots of a batch in parallel in the cpp tree.
+        # The thread pool is shared by the whole process, so it is set by the first MCTSCtree of the process.
+        ctree_num_threads=1,
     )
 
     @classmethod
@@ -433,6 +434,7 @@ class SampledEfficientZeroMCTSCtree(object):
         # Update the default configuration with the values provided by the user in ``cfg``.
         default_config.update(cfg)
         self._cfg = default_config
+        set_ctree_num_threads(tree_sampled_efficientzero, self._cfg.ctree_num_threads)
         self.inverse_scalar_transform_handle = InverseScalarTransform(
             self._cfg.model.support_scale, self._cfg.device, self._cfg.model.categorical_distribution
         )
@@ -485,11 +487,11 @@ class SampledEfficientZeroMCTSCtree(object):
             device = self._cfg.device
             pb_c_base, pb_c_init, discount_factor = self._cfg.pb_c_base, self._cfg.pb_c_init, self._cfg.discount_factor
 
-            # the data storage of latent states: storing the latent state of all the nodes in one search.
-            latent_state_batch_in_search_path = [latent_state_roots]
-            # the data storage of value prefix hidden states in LSTM
-            reward_hidden_state_c_pool = [reward_hidden_state_roots[0]]
-            reward_hidden_state_h_pool = [reward_hidden_state_roots[1]]
+            # the data storage of latent states: storing the latent state of all the nodes in one search on the device.
+            latent_state_arena = LatentStateArena(latent_state_roots, self._cfg.num_simulations, device)
+            # the data storage of value prefix hidden states in LSTM, whose shape is (1, batch_size, lstm_hidden_size)
+            reward_hidden_state_c_arena = LatentStateArena(reward_hidden_state_roots[0][0], self._cfg.num_simulations, device)
+            reward_hidden_state_h_arena = LatentStateArena(reward_hidden_state_roots[1][0], self._cfg.num_simulations, device)
 
             # minimax value storage
             min_max_stats_lst = tree_sampled_efficientzero.MinMaxStatsList(batch_size)
@@ -497,16 +499,13 @@ class SampledEfficientZeroMCTSCtree(object):
 
             for simulation_index in range(self._cfg.num_simulations):
                 # In each simulation, we expanded a new node, so in one search, we have ``num_simulations`` num of nodes at most.
-                latent_states = []
-                hidden_states_c_reward = []
-                hidden_states_h_reward = []
 
                 # prepare a result wrapper to transport results between python and c++ parts
                 results = tree_sampled_efficientzero.ResultsWrapper(num=batch_size)
 
-                # latent_state_index_in_search_path: the first index of leaf node states in latent_state_batch_in_search_path, i.e. is current_latent_state_index in one the search.
-                # latent_state_index_in_batch: the second index of leaf node states in latent_state_batch_in_search_path, i.e. the index in the batch, whose maximum is ``batch_size``.
-                # e.g. the latent state of the leaf node in (x, y) is latent_state_batch_in_search_path[x, y], where x is current_latent_state_index, y is batch_index.
+                # latent_state_index_in_search_path: the first index of leaf node states in latent_state_arena, i.e. is current_latent_state_index in one the search.
+                # latent_state_index_in_batch: the second index of leaf node states in latent_state_arena, i.e. the index in the batch, whose maximum is ``batch_size``.
+                # e.g. the latent state of the leaf node in (x, y) is latent_state_arena[x, y], where x is current_latent_state_index, y is batch_index.
                 # The index of value prefix hidden state of the leaf node are in the same manner.
                 """
                 MCTS stage 1: Selection
@@ -527,20 +526,20 @@ class SampledEfficientZeroMCTSCtree(object):
                 # obtain the search horizon for leaf nodes
                 search_lens = results.get_search_len()
                 # obtain the latent state for leaf node
-                for ix, iy in zip(latent_state_index_in_search_path, latent_state_index_in_batch):
-                    latent_states.append(latent_state_batch_in_search_path[ix][iy])
-                    hidden_states_c_reward.append(reward_hidden_state_c_pool[ix][0][iy])
-                    hidden_states_h_reward.append(reward_hidden_state_h_pool[ix][0][iy])
-                latent_states = torch.from_numpy(np.asarray(latent_states)).to(device)
-                hidden_states_c_reward = torch.from_numpy(np.asarray(hidden_states_c_reward)).to(device).unsqueeze(0)
-                hidden_states_h_reward = torch.from_numpy(np.asarray(hidden_states_h_reward)).to(device).unsqueeze(0)
+                latent_states = latent_state_arena.gather(latent_state_index_in_search_path, latent_state_index_in_batch)
+                hidden_states_c_reward = reward_hidden_state_c_arena.gather(
+                    latent_state_index_in_search_path, latent_state_index_in_batch
+                ).unsqueeze(0)
+                hidden_states_h_reward = reward_hidden_state_h_arena.gather(
+                    latent_state_index_in_search_path, latent_state_index_in_batch
+                ).unsqueeze(0)
 
                 if self._cfg.model.continuous_action_space is True:
                     # continuous action
-                    last_actions = torch.from_numpy(np.asarray(last_actions)).to(device)
+                    last_actions = torch.from_numpy(last_actions).to(device)
                 else:
                     # discrete action
-                    last_actions = torch.from_numpy(np.asarray(last_actions)).to(device).long()
+                    last_actions = torch.from_numpy(last_actions).to(device).long()
                 """
                 MCTS stage 2: Expansion
                     At the final time-step l of the simulation, the next_latent_state and reward/value_prefix are computed by the dynamics function.
@@ -552,45 +551,38 @@ class SampledEfficientZeroMCTSCtree(object):
                     latent_states, (hidden_states_c_reward, hidden_states_h_reward), last_actions
                 )
 
-                [
-                    network_output.latent_state, network_output.policy_logits, network_output.value,
-                    network_output.value_prefix
-                ] = to_detach_cpu_numpy(
+                [network_output.policy_logits, network_output.value, network_output.value_prefix] = to_detach_cpu_numpy(
                     [
-                        network_output.latent_state,
                         network_output.policy_logits,
                         self.inverse_scalar_transform_handle(network_output.value),
                         self.inverse_scalar_transform_handle(network_output.value_prefix),
                     ]
                 )
-                network_output.reward_hidden_state = (
-                    network_output.reward_hidden_state[0].detach().cpu().numpy(),
-                    network_output.reward_hidden_state[1].detach().cpu().numpy()
-                )
-                latent_state_batch_in_search_path.append(network_output.latent_state)
-                # tolist() is to be compatible with cpp datatype.
-                value_prefix_pool = network_output.value_prefix.reshape(-1).tolist()
-                value_pool = network_output.value.reshape(-1).tolist()
-                policy_logits_pool = network_output.policy_logits.tolist()
-                reward_latent_state_batch = network_output.reward_hidden_state
+                # NOTE: simulation_index + 1 is very important, which is the depth of the current leaf node.
+                current_latent_state_index = simulation_index + 1
+                latent_state_arena.write(current_latent_state_index, network_output.latent_state)
+                # The arrays are read by the cpp tree through the buffer interface, without being converted to lists.
+                value_prefix_pool = network_output.value_prefix.reshape(-1)
+                value_pool = network_output.value.reshape(-1)
+                policy_logits_pool = network_output.policy_logits
 
                 # reset the hidden states in LSTM every ``lstm_horizon_len`` steps in one search.
                 # which enable the model only need to predict the value prefix in a range (e.g.: [s0,...,s5]).
                 assert self._cfg.lstm_horizon_len > 0
                 reset_idx = (np.array(search_lens) % self._cfg.lstm_horizon_len == 0)
                 assert len(reset_idx) == batch_size
-                reward_latent_state_batch[0][:, reset_idx, :] = 0
-                reward_latent_state_batch[1][:, reset_idx, :] = 0
-                is_reset_list = reset_idx.astype(np.int32).tolist()
-                reward_hidden_state_c_pool.append(reward_latent_state_batch[0])
-                reward_hidden_state_h_pool.append(reward_latent_state_batch[1])
+                reset_mask = torch.from_numpy(reset_idx).to(device).unsqueeze(-1)
+                reward_hidden_state_c_arena.write(
+                    current_latent_state_index, network_output.reward_hidden_state[0][0].masked_fill(reset_mask, 0)
+                )
+                reward_hidden_state_h_arena.write(
+                    current_latent_state_index, network_output.reward_hidden_state[1][0].masked_fill(reset_mask, 0)
+                )
+                is_reset_list = reset_idx.astype(np.int32)
 
                 # In ``batch_backpropagate()``, we first expand the leaf node using ``the policy_logits`` and
                 # ``reward`` predicted by the model, then perform backpropagation along the search path to update the
                 # statistics.
-
-                # NOTE: simulation_index + 1 is very important, which is the depth of the current leaf node.
-                current_latent_state_index = simulation_index + 1
                 tree_sampled_efficientzero.batch_backpropagate(
                     current_latent_state_index, discount_factor, value_prefix_pool, value_pool, policy_logits_pool,
                     min_max_stats_lst, results, is_reset_list, virtual_to_play_batch
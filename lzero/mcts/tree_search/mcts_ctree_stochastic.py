@@ -1,13 +1,18 @@
 import copy
-from typing import TYPE_CHECKING, List, Any, Union
+from typing import TYPE_CHECKING, List, Any, Optional, Tuple, Union
 
 import numpy as np
 import torch
 from easydict import EasyDict
 
+from lzero.mcts.tree_search.latent_state_arena import LatentStateArena
+from lzero.mcts.utils import set_ctree_num_threads
 from lzero.policy import InverseScalarTransform
 from lzero.mcts.ctree.ctree_stochastic_muzero import stochastic_mz_tree
 
+if TYPE_CHECKING:
+    from lzero.mcts.utils import SearchBudget
+
 
 class StochasticMuZeroMCTSCtree(object):
     """
@@ -34,6 +39,12 @@ class StochasticMuZeroMCTSCtree(object):
         pb_c_init=1.25,
         # (float) The maximum change in value allowed during the backup step of the search tree update.
         value_delta_max=0.01,
+        # (int) The number of the threads which traverse and backpropagate the roots of a batch in parallel in the cpp tree.
+        # The thread pool is shared by the whole process, so it is set by the first MCTSCtree of the process.
+        ctree_num_threads=1,
+        # (bool) Whether to run the simulation loop of ``search`` in the cpp tree, which calls back into the batched
+        # ``recurrent_inference`` once per simulation. It is not used by a search with a ``search_budget``.
+        native_search_loop=False,
     )
 
     @classmethod
@@ -64,6 +75,7 @@ class StochasticMuZeroMCTSCtree(object):
         # Update the default configuration with the values provided by the user in ``cfg``.
         default_config.update(cfg)
         self._cfg = default_config
+        set_ctree_num_threads(stochastic_mz_tree, self._cfg.ctree_num_threads)
         self.inverse_scalar_transform_handle = InverseScalarTransform(
             self._cfg.model.support_scale, self._cfg.device, self._cfg.model.categorical_distribution
         )
@@ -85,7 +97,7 @@ class StochasticMuZeroMCTSCtree(object):
 
     def search(
             self, roots: Any, model: torch.nn.Module, latent_state_roots: List[Any], to_play_batch: Union[int,
-            List[Any]]
+            List[Any]], search_budget: Optional["SearchBudget"] = None
     ) -> None:
         """
         Overview:
@@ -96,6 +108,7 @@ class StochasticMuZeroMCTSCtree(object):
             - latent_state_roots (:obj:`list`): the hidden states of the roots.
             - model (:obj:`torch.nn.Module`): The model used for inference.
             - to_play (:obj:`list`): the to_play list used in in self-play-mode board games.
+            - search_budget (:obj:`SearchBudget`): The budget of an anytime search, which replaces ``num_simulations``.
         
         .. note::
             The core functions ``batch_traverse`` and ``batch_backpropagate`` are implemented in C++.
@@ -106,24 +119,30 @@ class StochasticMuZeroMCTSCtree(object):
             # preparation some constant
             batch_size = roots.num
             pb_c_base, pb_c_init, discount_factor = self._cfg.pb_c_base, self._cfg.pb_c_init, self._cfg.discount_factor
-            # the data storage of latent states: storing the latent state of all the nodes in the search.
-            latent_state_batch_in_search_path = [latent_state_roots]
 
             # minimax value storage
             min_max_stats_lst = stochastic_mz_tree.MinMaxStatsList(batch_size)
             min_max_stats_lst.set_delta(self._cfg.value_delta_max)
 
-            for simulation_index in range(self._cfg.num_simulations):
+            # With a search budget, the search runs until the budget is exhausted (at ``max_num_simulations`` at the
+            # latest) instead of ``num_simulations``.
+            num_simulations = self._cfg.num_simulations if search_budget is None else search_budget.max_num_simulations + 1
+            # the data storage of latent states: storing the latent state of all the nodes in the search on the device.
+            latent_state_arena = LatentStateArena(latent_state_roots, num_simulations, self._cfg.device)
+            if search_budget is None and self._cfg.native_search_loop:
+                self._search_all(roots, model, latent_state_arena, min_max_stats_lst, num_simulations, to_play_batch)
+                return
+            for simulation_index in range(num_simulations):
+                if search_budget is not None and search_budget.exhausted(simulation_index, roots.get_distributions):
+                    break
                 # In each simulation, we expanded a new node, so in one search, we have ``num_simulations`` num of nodes at most.
 
-                latent_states = []
-
                 # prepare a result wrapper to transport results between python and c++ parts
                 results = stochastic_mz_tree.ResultsWrapper(num=batch_size)
 
-                # latent_state_index_in_search_path: the first index of leaf node states in latent_state_batch_in_search_path, i.e. is current_latent_state_index in one the search.
-                # latent_state_index_in_batch: the second index of leaf node states in latent_state_batch_in_search_path, i.e. the index in the batch, whose maximum is ``batch_size``.
-                # e.g. the latent state of the leaf node in (x, y) is latent_state_batch_in_search_path[x, y], where x is current_latent_state_index, y is batch_index.
+                # latent_state_index_in_search_path: the first index of leaf node states in latent_state_arena, i.e. is current_latent_state_index in one the search.
+                # latent_state_index_in_batch: the second index of leaf node states in latent_state_arena, i.e. the index in the batch, whose maximum is ``batch_size``.
+                # e.g. the latent state of the leaf node in (x, y) is latent_state_arena[x, y], where x is current_latent_state_index, y is batch_index.
                 # The index of value prefix hidden state of the leaf node are in the same manner.
                 """
                 MCTS stage 1: Selection
@@ -142,12 +161,9 @@ class StochasticMuZeroMCTSCtree(object):
                     )
 
                 # obtain the latent state for leaf node
-                for ix, iy in zip(latent_state_index_in_search_path, latent_state_index_in_batch):
-                    latent_states.append(latent_state_batch_in_search_path[ix][iy])
-
-                latent_states = torch.from_numpy(np.asarray(latent_states)).to(self._cfg.device)
+                latent_states = latent_state_arena.gather(latent_state_index_in_search_path, latent_state_index_in_batch)
                 # .long() is only for discrete action
-                last_actions = torch.from_numpy(np.asarray(last_actions)).to(self._cfg.device).long()
+                last_actions = torch.from_numpy(last_actions).to(self._cfg.device).long()
                 """
                 MCTS stage 2: Expansion
                     At the final time-step l of the simulation, the next_latent_state and reward/value_prefix are computed by the dynamics function.
@@ -157,95 +173,114 @@ class StochasticMuZeroMCTSCtree(object):
                 """
                 # network_output = model.recurrent_inference(latent_states, last_actions)
 
-                num = len(leaf_node_is_chance)
-                leaf_idx_list = list(range(num))
-                latent_state_batch = [None] * num
-                value_batch = [None] * num
-                reward_batch = [None] * num
-                policy_logits_batch = [None] * num
-                child_is_chance_batch = [None] * num
-                chance_nodes_index = []
-                decision_nodes_index = []
-
-                for i, leaf_node_is_chance_ in enumerate(leaf_node_is_chance):
-                    if leaf_node_is_chance_:
-                        chance_nodes_index.append(i)
-                    else:
-                        decision_nodes_index.append(i)
-
-                def process_nodes(nodes_index, is_chance):
-                    # Return early if nodes_index is empty
-                    if not nodes_index:
-                        return
-
-                    # Slice and stack latent_states and last_actions based on nodes_index
-                    latent_states_stack = torch.stack([latent_states[i] for i in nodes_index], dim=0)
-                    last_actions_stack = torch.stack([last_actions[i] for i in nodes_index], dim=0)
-
-                    # Pass the stacked batch through the recurrent_inference function
-                    network_output_batch = model.recurrent_inference(latent_states_stack,
-                                                                     last_actions_stack,
-                                                                     afterstate=not is_chance)
-
-                    # Split the batch output into separate nodes
-                    latent_state_splits = torch.split(network_output_batch.latent_state, 1, dim=0)
-                    value_splits = torch.split(network_output_batch.value, 1, dim=0)
-                    reward_splits = torch.split(network_output_batch.reward, 1, dim=0)
-                    policy_logits_splits = torch.split(network_output_batch.policy_logits, 1, dim=0)
-
-                    for i, (latent_state, value, reward, policy_logits) in zip(nodes_index,
-                                                                               zip(latent_state_splits, value_splits,
-                                                                                   reward_splits,
-                                                                                   policy_logits_splits)):
-                        if not model.training:
-                            value = self.inverse_scalar_transform_handle(value).detach().cpu().numpy()
-                            reward = self.inverse_scalar_transform_handle(reward).detach().cpu().numpy()
-                            latent_state = latent_state.detach().cpu().numpy()
-                            policy_logits = policy_logits.detach().cpu().numpy()
-
-                        latent_state_batch[i] = latent_state
-                        value_batch[i] = value.reshape(-1).tolist()
-                        reward_batch[i] = reward.reshape(-1).tolist()
-                        policy_logits_batch[i] = policy_logits.tolist()
-                        child_is_chance_batch[i] = is_chance
-
-                process_nodes(chance_nodes_index, True)
-                process_nodes(decision_nodes_index, False)
-                chance_nodes = chance_nodes_index
-                decision_nodes = decision_nodes_index
-
-                value_batch_chance = [value_batch[leaf_idx] for leaf_idx in chance_nodes]
-                value_batch_decision = [value_batch[leaf_idx] for leaf_idx in decision_nodes]
-                reward_batch_chance = [reward_batch[leaf_idx] for leaf_idx in chance_nodes]
-                reward_batch_decision = [reward_batch[leaf_idx] for leaf_idx in decision_nodes]
-                policy_logits_batch_chance = [policy_logits_batch[leaf_idx] for leaf_idx in chance_nodes]
-                policy_logits_batch_decision = [policy_logits_batch[leaf_idx] for leaf_idx in decision_nodes]
-
-                latent_state_batch = np.concatenate(latent_state_batch, axis=0)
-                latent_state_batch_in_search_path.append(latent_state_batch)
-
-                # In ``batch_backpropagate()``, we first expand the leaf node using ``the policy_logits`` and
-                # ``reward`` predicted by the model, then perform backpropagation along the search path to update the
-                # statistics.
-
                 # NOTE: simulation_index + 1 is very important, which is the depth of the current leaf node.
                 current_latent_state_index = simulation_index + 1
 
-                if (len(chance_nodes) > 0):
-                    value_batch_chance = np.concatenate(value_batch_chance, axis=0).reshape(-1).tolist()
-                    reward_batch_chance = np.concatenate(reward_batch_chance, axis=0).reshape(-1).tolist()
-                    policy_logits_batch_chance = np.concatenate(policy_logits_batch_chance, axis=0).tolist()
-                    stochastic_mz_tree.batch_backpropagate(
-                        current_latent_state_index, discount_factor, reward_batch_chance, value_batch_chance,
-                        policy_logits_batch_chance,
-                        min_max_stats_lst, results, virtual_to_play_batch, child_is_chance_batch, chance_nodes
-                    )
-                if (len(decision_nodes) > 0):
-                    value_batch_decision = np.concatenate(value_batch_decision, axis=0).reshape(-1).tolist()
-                    reward_batch_decision = np.concatenate(reward_batch_decision, axis=0).reshape(-1).tolist()
-                    policy_logits_batch_decision = np.concatenate(policy_logits_batch_decision, axis=0).tolist()
+                chance_nodes = np.flatnonzero(leaf_node_is_chance)
+                decision_nodes = np.flatnonzero(~leaf_node_is_chance)
+
+                nodes_outputs = [
+                    (
+                        nodes_index,
+                        self._process_nodes(
+                            model, latent_state_arena, current_latent_state_index, latent_states, last_actions,
+                            nodes_index, is_chance
+                        )
+                    ) for nodes_index, is_chance in ((chance_nodes, True), (decision_nodes, False)) if len(nodes_index) > 0
+                ]
+
+                # In ``batch_backpropagate()``, we first expand the leaf node using ``the policy_logits`` and
+                # ``reward`` predicted by the model, then perform backpropagation along the search path to update the
+                # statistics. The leaf nodes are expanded as chance nodes or decision nodes by ``leaf_node_is_chance``.
+                for nodes_index, (reward_batch, value_batch, policy_logits_batch) in nodes_outputs:
                     stochastic_mz_tree.batch_backpropagate(
-                        current_latent_state_index, discount_factor, reward_batch_decision, value_batch_decision,
-                        policy_logits_batch_decision,
-                        min_max_stats_lst, results, virtual_to_play_batch, child_is_chance_batch, decision_nodes
+                        current_latent_state_index, discount_factor, reward_batch, value_batch, policy_logits_batch,
+                        min_max_stats_lst, results, virtual_to_play_batch, leaf_node_is_chance, nodes_index
                     )
+
+    def _process_nodes(
+            self, model: torch.nn.Module, latent_state_arena: LatentStateArena, current_latent_state_index: int,
+            latent_states: torch.Tensor, last_actions: torch.Tensor, nodes_index: np.ndarray, is_chance: bool
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Overview:
+            Run the recurrent inference of the chance nodes or of the decision nodes among the leaf nodes of a
+            simulation, and store the latent states of the new nodes in the arena.
+        Arguments:
+            - model (:obj:`torch.nn.Module`): The model used for inference.
+            - latent_state_arena (:obj:`LatentStateArena`): The latent states of the nodes of the search.
+            - current_latent_state_index (:obj:`int`): The index of the simulation.
+            - latent_states (:obj:`torch.Tensor`): The latent states of all the leaf nodes.
+            - last_actions (:obj:`torch.Tensor`): The last actions of all the leaf nodes.
+            - nodes_index (:obj:`np.ndarray`): The indices of the leaf nodes to run.
+            - is_chance (:obj:`bool`): Whether the leaf nodes are chance nodes.
+        Returns:
+            - reward (:obj:`np.ndarray`): The rewards of the leaf nodes, in the order of ``nodes_index``.
+            - value (:obj:`np.ndarray`): The values of the leaf nodes.
+            - policy_logits (:obj:`np.ndarray`): The policy logits of the leaf nodes.
+        """
+        # Slice latent_states and last_actions based on nodes_index
+        index = torch.from_numpy(nodes_index).to(latent_states.device)
+
+        # Pass the sliced batch through the recurrent_inference function
+        network_output_batch = model.recurrent_inference(
+            latent_states[index], last_actions[index], afterstate=not is_chance
+        )
+        # The latent states of the new nodes stay on the device, in the slots of their leaf nodes.
+        latent_state_arena.write(current_latent_state_index, network_output_batch.latent_state, index)
+
+        # The arrays are read by the cpp tree through the buffer interface, in the order of nodes_index.
+        value = self.inverse_scalar_transform_handle(network_output_batch.value).detach().cpu().numpy()
+        reward = self.inverse_scalar_transform_handle(network_output_batch.reward).detach().cpu().numpy()
+        policy_logits = network_output_batch.policy_logits.detach().cpu().numpy()
+        return reward.reshape(-1), value.reshape(-1), policy_logits
+
+    def _search_all(
+            self, roots: Any, model: torch.nn.Module, latent_state_arena: LatentStateArena, min_max_stats_lst: Any,
+            num_simulations: int, to_play_batch: List[Any]
+    ) -> None:
+        """
+        Overview:
+            Run the simulations of ``search`` with ``search_all`` of the cpp tree, which traverses and backpropagates
+            the roots without going back to python between the simulations. The leaf nodes and the network outputs of
+            a simulation are exchanged through buffers which are allocated once per search.
+        Arguments:
+            - roots (:obj:`Any`): a batch of expanded root nodes.
+            - model (:obj:`torch.nn.Module`): The model used for inference.
+            - latent_state_arena (:obj:`LatentStateArena`): The latent states of the nodes of the search.
+            - min_max_stats_lst (:obj:`Any`): The min-max statistics of the roots.
+            - num_simulations (:obj:`int`): The number of simulations.
+            - to_play_batch (:obj:`list`): the to_play list used in in self-play-mode board games.
+        """
+        batch_size = roots.num
+        action_space_size, chance_space_size = self._cfg.model.action_space_size, self._cfg.model.chance_space_size
+        latent_state_index_in_search_path = np.zeros(batch_size, dtype=np.intc)
+        latent_state_index_in_batch = np.zeros(batch_size, dtype=np.intc)
+        last_actions = np.zeros(batch_size, dtype=np.intc)
+        leaf_node_is_chance = np.zeros(batch_size, dtype=bool)
+        reward_batch = np.zeros(batch_size, dtype=np.float32)
+        value_batch = np.zeros(batch_size, dtype=np.float32)
+        policy_logits_batch = np.zeros((batch_size, max(action_space_size, chance_space_size)), dtype=np.float32)
+
+        def recurrent_inference(current_latent_state_index: int) -> None:
+            latent_states = latent_state_arena.gather(latent_state_index_in_search_path, latent_state_index_in_batch)
+            # .long() is only for discrete action
+            last_actions_batch = torch.from_numpy(last_actions).to(self._cfg.device).long()
+            for nodes_index, is_chance in ((np.flatnonzero(leaf_node_is_chance), True),
+                                           (np.flatnonzero(~leaf_node_is_chance), False)):
+                if len(nodes_index) == 0:
+                    continue
+                reward, value, policy_logits = self._process_nodes(
+                    model, latent_state_arena, current_latent_state_index, latent_states, last_actions_batch,
+                    nodes_index, is_chance
+                )
+                reward_batch[nodes_index] = reward
+                value_batch[nodes_index] = value
+                policy_logits_batch[nodes_index, :policy_logits.shape[1]] = policy_logits
+
+        stochastic_mz_tree.search_all(
+            roots, num_simulations, self._cfg.pb_c_base, self._cfg.pb_c_init, self._cfg.discount_factor,
+            min_max_stats_lst, to_play_batch, recurrent_inference, latent_state_index_in_search_path,
+            latent_state_index_in_batch, last_actions, leaf_node_is_chance, reward_batch, value_batch,
+            policy_logits_batch, action_space_size, chance_space_size
+        )
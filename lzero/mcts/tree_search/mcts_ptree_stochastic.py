@@ -1,5 +1,5 @@
 import copy
-from typing import TYPE_CHECKING, List, Any, Union
+from typing import TYPE_CHECKING, List, Any, Optional, Union
 
 import numpy as np
 import torch
@@ -10,6 +10,7 @@ from lzero.mcts.ptree import MinMaxStatsList
 from lzero.policy import InverseScalarTransform
 
 if TYPE_CHECKING:
+    from lzero.mcts.utils import SearchBudget
     import lzero.mcts.ptree.ptree_stochastic_mz as stochastic_mz_ptree
 
 
@@ -92,7 +93,8 @@ class StochasticMuZeroMCTSPtree(object):
             roots: Any,
             model: torch.nn.Module,
             latent_state_roots: List[Any],
-            to_play_batch: Union[int, List[Any]] = -1
+            to_play_batch: Union[int, List[Any]] = -1,
+            search_budget: Optional["SearchBudget"] = None
     ) -> None:
         """
         Overview:
@@ -103,6 +105,7 @@ class StochasticMuZeroMCTSPtree(object):
             - latent_state_roots (:obj:`list`): the hidden states of the roots.
             - model (:obj:`torch.nn.Module`): The model used for inference.
             - to_play_batch (:obj:`list`): the to_play_batch list used in in self-play-mode board games.
+            - search_budget (:obj:`SearchBudget`): The budget of an anytime search, which replaces ``num_simulations``.
         
         .. note::
             The core functions ``batch_traverse`` and ``batch_backpropagate`` are implemented in Python.
@@ -123,7 +126,12 @@ class StochasticMuZeroMCTSPtree(object):
             # minimax value storage
             min_max_stats_lst = MinMaxStatsList(num)
 
-            for simulation_index in range(self._cfg.num_simulations):
+            # With a search budget, the search runs until the budget is exhausted (at ``max_num_simulations`` at the
+            # latest) instead of ``num_simulations``.
+            num_simulations = self._cfg.num_simulations if search_budget is None else search_budget.max_num_simulations + 1
+            for simulation_index in range(num_simulations):
+                if search_budget is not None and search_budget.exhausted(simulation_index, roots.get_distributions):
+                    break
                 # In each simulation, we expanded a new node, so in one search, we have ``num_simulations`` num of nodes at most.
 
                 latent_states = []
@@ -1,6 +1,8 @@
+import logging
 import os
+import time
 from dataclasses import dataclass
-from typing import Any
+from typing import Any, Callable, List
 
 import numpy as np
 from graphviz import Digraph
@@ -42,6 +44,115 @@ class BufferedData:
     meta: dict
 
 
+class SearchBudget:
+    """
+    Overview:
+        The budget of an anytime MCTS search, which replaces the fixed ``num_simulations``. The search runs simulations
+        until ``time_budget`` seconds have passed since the budget was created, or until the most visited action of
+        every root is settled, i.e. its lead over the second most visited action can not be overtaken by the
+        simulations expected in the remaining time. A root with a single legal action is settled at once.
+    Interfaces:
+        __init__, exhausted, elapsed, simulations_per_second
+    """
+
+    def __init__(
+            self,
+            time_budget: float,
+            max_num_simulations: int = 100000,
+            min_num_simulations: int = 1,
+            check_interval: int = 16
+    ) -> None:
+        """
+        Overview:
+            Start the clock of the budget.
+        Arguments:
+            - time_budget (:obj:`float`): The time of the search in seconds.
+            - max_num_simulations (:obj:`int`): The maximum number of simulations of the search.
+            - min_num_simulations (:obj:`int`): The number of simulations run before the search may stop.
+            - check_interval (:obj:`int`): The number of simulations between two checks of the visit counts.
+        """
+        self.time_budget = time_budget
+        self.max_num_simulations = max_num_simulations
+        self.min_num_simulations = min_num_simulations
+        self.check_interval = check_interval
+        self.num_simulations = 0
+        self._start_time = time.perf_counter()
+        self._next_check = min_num_simulations
+
+    def exhausted(self, num_simulations: int, get_visit_counts: Callable[[], List[List[int]]]) -> bool:
+        """
+        Overview:
+            Called by the search before every simulation (or every pass of a batched search).
+        Arguments:
+            - num_simulations (:obj:`int`): The number of simulations run so far by this search for each root.
+            - get_visit_counts (:obj:`Callable`): Returns the visit counts of the children of every root. It is only \
+                called every ``check_interval`` simulations.
+        Returns:
+            - exhausted (:obj:`bool`): Whether the search should stop.
+        """
+        self.num_simulations = num_simulations
+        if num_simulations >= self.max_num_simulations:
+            return True
+        if num_simulations < self.min_num_simulations:
+            return False
+        elapsed = self.elapsed
+        if elapsed >= self.time_budget:
+            return True
+        if num_simulations < self._next_check:
+            return False
+        self._next_check = num_simulations + self.check_interval
+        # The simulations expected in the remaining time at the speed so far.
+        remaining = (self.time_budget - elapsed) * num_simulations / max(elapsed, 1e-6)
+        remaining = min(remaining, self.max_num_simulations - num_simulations)
+        for visit_counts in get_visit_counts():
+            visit_counts = sorted(visit_counts, reverse=True)
+            if len(visit_counts) > 1 and visit_counts[0] - visit_counts[1] <= remaining:
+                return False
+        return True
+
+    @property
+    def elapsed(self) -> float:
+        """
+        Overview:
+            The time in seconds since the budget was created.
+        """
+        return time.perf_counter() - self._start_time
+
+    @property
+    def simulations_per_second(self) -> float:
+        """
+        Overview:
+            The speed of the search so far.
+        """
+        return self.num_simulations / max(self.elapsed, 1e-6)
+
+
+# The number of threads of the pool of each ctree module, set by the first ``MCTSCtree`` of the process.
+_CTREE_NUM_THREADS = {}
+
+
+def set_ctree_num_threads(tree: Any, num_threads: int) -> None:
+    """
+    Overview:
+        Set the number of threads of the thread pool of a ctree module once per process. The pool is global to the \
+        module, so all the ``MCTSCtree`` instances of a process which use it (e.g. the policy's and the buffer's \
+        reanalysis search) share it. The first instance sets it, and a later instance which asks for a different \
+        number keeps the pool as it is and logs a warning.
+    Arguments:
+        - tree (:obj:`Any`): The ctree module, e.g. ``mz_tree``.
+        - num_threads (:obj:`int`): The number of threads, i.e. ``ctree_num_threads`` of the config.
+    """
+    name = tree.__name__
+    if name not in _CTREE_NUM_THREADS:
+        _CTREE_NUM_THREADS[name] = num_threads
+        tree.set_num_threads(num_threads)
+    elif _CTREE_NUM_THREADS[name] != num_threads:
+        logging.warning(
+            f'The thread pool of {name} already has {_CTREE_NUM_THREADS[name]} threads in this process, '
+            f'ignore ctree_num_threads={num_threads}.'
+        )
+
+
 def get_augmented_data(board_size, play_data):
     """
     Overview:
@@ -98,7 +209,7 @@ def prepare_observation(observation_list, model_type='conv'):
         - np.ndarray: Reshaped array of observations.
     """
     assert model_type in ['conv', 'mlp', 'conv_context', 'mlp_context'], "model_type must be either 'conv' or 'mlp'"
-    observation_array = np.array(observation_list)
+    observation_array = np.asarray(observation_list)
     batch_size = observation_array.shape[0]
 
     if model_type in ['conv', 'conv_context']:
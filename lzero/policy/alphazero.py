@@ -1,6 +1,6 @@
 import copy
 from collections import namedtuple
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional
 
 import numpy as np
 import torch.distributions
@@ -12,6 +12,7 @@ from ding.utils import POLICY_REGISTRY
 from ding.utils.data import default_collate
 from easydict import EasyDict
 
+from lzero.mcts.utils import SearchBudget
 from lzero.policy import configure_optimizers
 
 
@@ -98,6 +99,22 @@ class AlphaZeroPolicy(Policy):
             pb_c_base=19652,
             # (float) The initialization constant used in the PUCT formula for balancing exploration and exploitation during tree search.
             pb_c_init=1.25,
+            # (bool) Whether to search the states of all the ready envs together, evaluating the leaves of all the
+            # search trees in one forward call of the model instead of one leaf per call.
+            batched_search=False,
+            # (int) The number of leaves selected from each search tree per forward call in the batched search.
+            leaf_batch_size=8,
+            # (float) The virtual loss added to the nodes of a selected path in the batched search, which makes the
+            # following selections of the same forward call explore other paths.
+            virtual_loss=1.0,
+            # (bool) Whether to search the actions with a random outcome, e.g. the flips of Dark Chess, with chance
+            # nodes expanded with the exact outcome distribution, instead of one sampled outcome per simulation.
+            use_chance_node=True,
+            # (bool) Whether to keep the subtree of the played move as the root of the next search of the same env.
+            # The visits kept from the previous search count in ``num_simulations``.
+            reuse_tree=False,
+            # (bool) Whether to prune the siblings of the played move when the tree is kept.
+            prune_siblings=True,
         ),
         other=dict(replay_buffer=dict(
             replay_buffer_size=int(1e6),
@@ -226,7 +243,10 @@ class AlphaZeroPolicy(Policy):
             self._collect_mcts = mcts_alphazero.MCTS(self._cfg.mcts.max_moves, self._cfg.mcts.num_simulations,
                                                      self._cfg.mcts.pb_c_base,
                                                      self._cfg.mcts.pb_c_init, self._cfg.mcts.root_dirichlet_alpha,
-                                                     self._cfg.mcts.root_noise_weight, self.simulate_env)
+                                                     self._cfg.mcts.root_noise_weight, self.simulate_env,
+                                                     self._cfg.mcts.leaf_batch_size, self._cfg.mcts.virtual_loss,
+                                                     self._cfg.mcts.use_chance_node, self._cfg.mcts.reuse_tree,
+                                                     self._cfg.mcts.prune_siblings)
         else:
             if self._cfg.sampled_algo:
                 from lzero.mcts.ptree.ptree_az_sampled import MCTS
@@ -253,6 +273,7 @@ class AlphaZeroPolicy(Policy):
         ready_env_id = list(obs.keys())
         init_state = {env_id: obs[env_id]['board'] for env_id in ready_env_id}
         player_colors = {env_id: obs[env_id].get('player_color', ['U', 'U']) for env_id in ready_env_id}
+        flipped_chess_counts = {env_id: obs[env_id].get('flipped_chess_count') for env_id in ready_env_id}
         # If 'katago_game_state' is in the observation of the given environment ID, it's value is used.
         # If it's not present (which will raise a KeyError), None is used instead.
         # This approach is taken to maintain compatibility with the handling of 'katago' related parts of 'alphazero_mcts_ctree' in Go.
@@ -260,6 +281,18 @@ class AlphaZeroPolicy(Policy):
         start_player_index = {env_id: obs[env_id]['current_player_index'] for env_id in ready_env_id}
         output = {}
         self._policy_model = self._collect_model
+        if self._cfg.mcts.batched_search:
+            state_configs = self._get_state_configs(ready_env_id, init_state, player_colors, flipped_chess_counts,
+                                                    katago_game_state, start_player_index)
+            results = self._collect_mcts.get_next_actions(
+                state_configs, self._policy_value_batch_fn, self.collect_mcts_temperature, True, ready_env_id
+            )
+            for env_id, (action, mcts_probs) in zip(ready_env_id, results):
+                output[env_id] = {
+                    'action': action,
+                    'probs': mcts_probs,
+                }
+            return output
         for env_id in ready_env_id:
             # --- DEBUG START ---
             print(f"\n[DEBUG COLLECT MCTS] Env ID: {env_id}")
@@ -267,13 +300,14 @@ class AlphaZeroPolicy(Policy):
             print(f"player_color: {player_colors[env_id]}")
             print(f"Board State:\n{init_state[env_id]}")
             # --- DEBUG END ---
-            # 用 katago_game_state 參數攜帶盤面之外的狀態資訊(player_color)
+            # 用 katago_game_state 參數攜帶盤面之外的狀態資訊(player_color, flipped_chess_count)
             katago_game_state[env_id]['player_color'] = player_colors[env_id]
+            katago_game_state[env_id]['flipped_chess_count'] = flipped_chess_counts[env_id]
             state_config_for_simulation_env_reset = EasyDict(dict(start_player_index=start_player_index[env_id],
                                                                   init_state=init_state[env_id],
                                                                   katago_policy_init=False,
                                                                   katago_game_state=katago_game_state[env_id]))
-            action, mcts_probs = self._collect_mcts.get_next_action(state_config_for_simulation_env_reset, self._policy_value_fn, self.collect_mcts_temperature, True)
+            action, mcts_probs = self._collect_mcts.get_next_action(state_config_for_simulation_env_reset, self._policy_value_fn, self.collect_mcts_temperature, True, env_id)
 
             output[env_id] = {
                 'action': action,
@@ -297,7 +331,10 @@ class AlphaZeroPolicy(Policy):
                                                   min(800, self._cfg.mcts.num_simulations * 4),
                                                   self._cfg.mcts.pb_c_base,
                                                   self._cfg.mcts.pb_c_init, self._cfg.mcts.root_dirichlet_alpha,
-                                                  self._cfg.mcts.root_noise_weight, self.simulate_env)
+                                                  self._cfg.mcts.root_noise_weight, self.simulate_env,
+                                                  self._cfg.mcts.leaf_batch_size, self._cfg.mcts.virtual_loss,
+                                                  self._cfg.mcts.use_chance_node, self._cfg.mcts.reuse_tree,
+                                                  self._cfg.mcts.prune_siblings)
         else:
             if self._cfg.sampled_algo:
                 from lzero.mcts.ptree.ptree_az_sampled import MCTS
@@ -310,13 +347,14 @@ class AlphaZeroPolicy(Policy):
 
         self._eval_model = self._model
 
-    def _forward_eval(self, obs: Dict) -> Dict[str, torch.Tensor]:
+    def _forward_eval(self, obs: Dict, search_budget: Optional[SearchBudget] = None) -> Dict[str, torch.Tensor]:
         """
         Overview:
             The forward function for evaluating the current policy in eval mode, similar to ``self._forward_collect``.
         Arguments:
             - obs (:obj:`Dict`): The dict of obs, the key is env_id and the value is the \
                 corresponding obs in this timestep.
+            - search_budget (:obj:`SearchBudget`): The budget of an anytime search, which replaces ``num_simulations``.
         Returns:
             - output (:obj:`Dict[str, torch.Tensor]`): The dict of output, the key is env_id and the value is the \
                 the corresponding policy output in this timestep, including action, probs and so on.
@@ -324,6 +362,7 @@ class AlphaZeroPolicy(Policy):
         ready_env_id = list(obs.keys())
         init_state = {env_id: obs[env_id]['board'] for env_id in ready_env_id}
         player_colors = {env_id: obs[env_id].get('player_color', ['U', 'U']) for env_id in ready_env_id}
+        flipped_chess_counts = {env_id: obs[env_id].get('flipped_chess_count') for env_id in ready_env_id}
         # If 'katago_game_state' is in the observation of the given environment ID, it's value is used.
         # If it's not present (which will raise a KeyError), None is used instead.
         # This approach is taken to maintain compatibility with the handling of 'katago' related parts of 'alphazero_mcts_ctree' in Go.
@@ -331,6 +370,18 @@ class AlphaZeroPolicy(Policy):
         start_player_index = {env_id: obs[env_id]['current_player_index'] for env_id in ready_env_id}
         output = {}
         self._policy_model = self._eval_model
+        if self._cfg.mcts.batched_search:
+            state_configs = self._get_state_configs(ready_env_id, init_state, player_colors, flipped_chess_counts,
+                                                    katago_game_state, start_player_index)
+            results = self._eval_mcts.get_next_actions(
+                state_configs, self._policy_value_batch_fn, 1.0, False, ready_env_id, search_budget
+            )
+            for env_id, (action, mcts_probs) in zip(ready_env_id, results):
+                output[env_id] = {
+                    'action': action,
+                    'probs': mcts_probs,
+                }
+            return output
         for env_id in ready_env_id:
             # --- DEBUG START ---
             # print(f"\n[DEBUG EVAL MCTS] Env ID: {env_id}")
@@ -338,14 +389,15 @@ class AlphaZeroPolicy(Policy):
             # print(f"player_color: {player_colors[env_id]}")
             # print(f"Board State:\n{init_state[env_id]}")
             # --- DEBUG END ---
-            # 用 katago_game_state 參數攜帶盤面之外的狀態資訊(player_color)
+            # 用 katago_game_state 參數攜帶盤面之外的狀態資訊(player_color, flipped_chess_count)
             katago_game_state[env_id]['player_color'] = player_colors[env_id]
+            katago_game_state[env_id]['flipped_chess_count'] = flipped_chess_counts[env_id]
             state_config_for_simulation_env_reset = EasyDict(dict(start_player_index=start_player_index[env_id],
                                                                   init_state=init_state[env_id],
                                                                   katago_policy_init=False,
                                                                   katago_game_state=katago_game_state[env_id]))
             action, mcts_probs = self._eval_mcts.get_next_action(
-                state_config_for_simulation_env_reset, self._policy_value_fn, 1.0, False
+                state_config_for_simulation_env_reset, self._policy_value_fn, 1.0, False, env_id, search_budget
             )
             output[env_id] = {
                 'action': action,
@@ -353,6 +405,31 @@ class AlphaZeroPolicy(Policy):
             }
         return output
 
+    @staticmethod
+    def _get_state_configs(ready_env_id: List[int], init_state: Dict, player_colors: Dict, flipped_chess_counts: Dict,
+                           katago_game_state: Dict, start_player_index: Dict) -> List[EasyDict]:
+        """
+        Overview:
+            Build the state configs used to reset the simulate env of the MCTS for the ready envs, in the order of
+            ``ready_env_id``.
+        """
+        state_configs = []
+        for env_id in ready_env_id:
+            # 用 katago_game_state 參數攜帶盤面之外的狀態資訊(player_color, flipped_chess_count)
+            katago_game_state[env_id]['player_color'] = player_colors[env_id]
+            katago_game_state[env_id]['flipped_chess_count'] = flipped_chess_counts[env_id]
+            state_configs.append(
+                EasyDict(
+                    dict(
+                        start_player_index=start_player_index[env_id],
+                        init_state=init_state[env_id],
+                        katago_policy_init=False,
+                        katago_game_state=katago_game_state[env_id]
+                    )
+                )
+            )
+        return state_configs
+
     def _get_simulation_env(self):
         if self._cfg.simulation_env_id == 'tictactoe':
             from zoo.board_games.tictactoe.envs.tictactoe_env import TicTacToeEnv
@@ -393,7 +470,19 @@ class AlphaZeroPolicy(Policy):
                 from zoo.board_games.darkchess.config.alphazero_darkchess_config import darkchess_alphazero_config
             else:
                 raise NotImplementedError
-            self.simulate_env = DarkchessEnv(darkchess_alphazero_config.env)
+            if self._cfg.mcts_ctree:
+                # The native Dark Chess state keeps the whole search in C++, only the leaf evaluation calls back
+                # into ``_policy_value_fn``.
+                import sys
+                sys.path.append('/home/ntcucsk201/DarkChess/LightZero/lzero/mcts/ctree/ctree_alphazero/build')
+                import mcts_alphazero
+                self.simulate_env = mcts_alphazero.DarkchessState(
+                    darkchess_alphazero_config.env.long_catch, darkchess_alphazero_config.env.no_eat_flip
+                )
+                self.simulate_env.battle_mode_in_simulation_env = \
+                    darkchess_alphazero_config.env.battle_mode_in_simulation_env
+            else:
+                self.simulate_env = DarkchessEnv(darkchess_alphazero_config.env)
             
         else:
             raise NotImplementedError
@@ -410,6 +499,22 @@ class AlphaZeroPolicy(Policy):
         action_probs_dict = dict(zip(legal_actions, action_probs.squeeze(0)[legal_actions].detach().cpu().numpy()))
         return action_probs_dict, value.item()
 
+    @torch.no_grad()
+    def _policy_value_batch_fn(self, current_states: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Overview:
+            The batched version of ``_policy_value_fn`` used by the batched search, which evaluates the stacked
+            ``current_state`` of the leaves in one forward call.
+        Arguments:
+            - current_states (:obj:`np.ndarray`): The stacked states of shape (B, C, H, W).
+        Returns:
+            - action_probs (:obj:`np.ndarray`): The probs of all the actions of shape (B, action_space_size).
+            - values (:obj:`np.ndarray`): The values of shape (B, ).
+        """
+        current_states = torch.from_numpy(current_states).to(device=self._device, dtype=torch.float)
+        action_probs, values = self._policy_model.compute_policy_value(current_states)
+        return action_probs.cpu().numpy(), values.reshape(-1).cpu().numpy()
+
     def _monitor_vars_learn(self) -> List[str]:
         """
         Overview:
@@ -11,6 +11,7 @@ from ding.utils import POLICY_REGISTRY
 from lzero.entry.utils import initialize_zeros_batch
 from lzero.mcts import MuZeroMCTSCtree as MCTSCtree
 from lzero.mcts import MuZeroMCTSPtree as MCTSPtree
+from lzero.mcts.utils import SearchBudget
 from lzero.model import ImageTransforms
 from lzero.model.utils import cal_dormant_ratio
 from lzero.policy import scalar_transform, InverseScalarTransform, cross_entropy_loss, phi_transform, \
@@ -102,6 +103,9 @@ class MuZeroPolicy(Policy):
         monitor_extra_statistics=True,
         # (int) The transition number of one ``GameSegment``.
         game_segment_length=200,
+        # (bool) Whether to store the ``GameSegment`` in preallocated arrays instead of Python lists which are converted
+        # to arrays when the segment is full.
+        columnar_game_segment=False,
         # (bool): Indicates whether to perform an offline evaluation of the checkpoint (ckpt).
         # If set to True, the checkpoint will be evaluated after the training process is complete.
         # IMPORTANT: Setting eval_offline to True requires configuring the saving of checkpoints to align with the evaluation frequency.
@@ -117,6 +121,10 @@ class MuZeroPolicy(Policy):
         # ****** observation ******
         # (bool) Whether to transform image to string to save memory.
         transform2string=False,
+        # (str) The codec of the observations stored in the game segments, to save memory. None stores them as they
+        # are, 'board' stores the one-hot planes of board games (e.g. Dark Chess) as an int8 board, and 'zlib' stores
+        # the losslessly compressed frames (e.g. Atari). Please refer to ``lzero.mcts.buffer.obs_codec``.
+        obs_codec=None,
         # (bool) Whether to use gray scale image.
         gray_scale=False,
         # (bool) Whether to use data augmentation.
@@ -140,6 +148,11 @@ class MuZeroPolicy(Policy):
         replay_ratio=0.25,
         # (int) Minibatch size for one gradient descent.
         batch_size=256,
+        # (int) The number of minibatches prepared in advance by the background threads of ``PrefetchSampler`` in
+        # ``train_muzero``. 0 means the minibatches are sampled synchronously before each gradient descent.
+        prefetch_batch_num=0,
+        # (int) The number of the background threads of ``PrefetchSampler``.
+        prefetch_worker_num=1,
         # (str) Optimizer for training policy network. ['SGD', 'Adam']
         optim_type='SGD',
         # (float) Learning rate for training policy network. Initial lr for manually decay schedule.
@@ -194,6 +207,10 @@ class MuZeroPolicy(Policy):
         reuse_search=False,
         # (bool) whether to use the pure policy to collect data. If False, use the MCTS guided with policy.
         collect_with_pure_policy=False,
+        # (bool) Whether to keep a game in flight in every collector env, instead of waiting for all the envs to reset
+        # and finishing each collection with all the started episodes. The unfinished games continue in the next
+        # collection, so that the searched batch keeps ``collector_env_num`` envs. See ``MuZeroCollector._collect_async``.
+        collect_async=False,
 
         # ****** Priority ******
         # (bool) Whether to use priority when sampling training data from the buffer.
@@ -833,7 +850,7 @@ class MuZeroPolicy(Policy):
         #     self.last_batch_action = [-1 for _ in range(3)]
 
     def _forward_eval(self, data: torch.Tensor, action_mask: list, to_play: int = -1,
-                      ready_env_id: np.array = None, ) -> Dict:
+                      ready_env_id: np.array = None, search_budget: Optional[SearchBudget] = None) -> Dict:
         """
         Overview:
             The forward function for evaluating the current policy in eval mode. Use model to execute MCTS search.
@@ -843,6 +860,7 @@ class MuZeroPolicy(Policy):
             - action_mask (:obj:`list`): The action mask, i.e. the action that cannot be selected.
             - to_play (:obj:`int`): The player to play.
             - ready_env_id (:obj:`list`): The id of the env that is ready to collect.
+            - search_budget (:obj:`SearchBudget`): The budget of an anytime search, which replaces ``num_simulations``.
         Shape:
             - data (:obj:`torch.Tensor`):
                 - For Atari, :math:`(N, C*S, H, W)`, where N is the number of collect_env, C is the number of channels, \
@@ -881,7 +899,7 @@ class MuZeroPolicy(Policy):
                 # python mcts_tree
                 roots = MCTSPtree.roots(active_eval_env_num, legal_actions)
             roots.prepare_no_noise(reward_roots, policy_logits, to_play)
-            self._mcts_eval.search(roots, self._eval_model, latent_state_roots, to_play)
+            self._mcts_eval.search(roots, self._eval_model, latent_state_roots, to_play, search_budget)
 
             # list of list, shape: ``{list: batch_size} -> {list: action_space_size}``
             roots_visit_count_distributions = roots.get_distributions()
@@ -2,3 +2,4 @@ from .alphazero_collector import AlphaZeroCollector
 from .alphazero_evaluator import AlphaZeroEvaluator
 from .muzero_collector import MuZeroCollector
 from .muzero_evaluator import MuZeroEvaluator
+from .inference_server import InferenceClient, InferenceServer, use_inference_client
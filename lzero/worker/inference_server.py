@@ -0,0 +1,387 @@
+import dataclasses
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+
+# The arrays packed in a shared buffer start at multiples of ``_ALIGNMENT`` bytes.
+_ALIGNMENT = 64
+
+
+def _pack(buffer: np.ndarray, arrays: Sequence[np.ndarray]) -> List[Tuple[int, Tuple[int, ...], str]]:
+    # Copy the arrays into the uint8 ``buffer`` one after the other, and return their (offset, shape, dtype).
+    metas, offset = [], 0
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        end = offset + array.nbytes
+        if end > buffer.size:
+            raise ValueError(
+                'the arrays of {} bytes exceed the shared buffer of {} bytes, increase the buffer_size of '
+                'InferenceServer'.format(end, buffer.size)
+            )
+        buffer[offset:end] = array.reshape(-1).view(np.uint8)
+        metas.append((offset, array.shape, array.dtype.str))
+        offset = (end + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+    return metas
+
+
+def _unpack(buffer: np.ndarray, metas: Sequence[Tuple[int, Tuple[int, ...], str]]) -> List[np.ndarray]:
+    # The views of the arrays packed by ``_pack``, which are only valid until the buffer is written again.
+    arrays = []
+    for offset, shape, dtype in metas:
+        dtype = np.dtype(dtype)
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        arrays.append(buffer[offset:offset + nbytes].view(dtype).reshape(shape))
+    return arrays
+
+
+def _to_numpy(x: Any) -> np.ndarray:
+    if isinstance(x, torch.Tensor):
+        return x.detach().cpu().numpy()
+    return np.asarray(x)
+
+
+def _flatten(output: Any, leaves: List[np.ndarray]) -> Any:
+    # Flatten the output of a model into ``leaves`` and return its structure for ``_unflatten``. The tensors, arrays
+    # and lists are leaves, the tuples and dataclasses (``MZNetworkOutput``) are kept. The lists (e.g. the zero reward
+    # of ``initial_inference``, which is passed to ``Roots.prepare``) are returned as lists.
+    if output is None:
+        return None
+    if dataclasses.is_dataclass(output):
+        return type(output), [(f.name, _flatten(getattr(output, f.name), leaves)) for f in dataclasses.fields(output)]
+    if isinstance(output, tuple):
+        return tuple, [(None, _flatten(x, leaves)) for x in output]
+    if isinstance(output, list):
+        return list, _flatten(np.asarray(output), leaves)
+    leaves.append(_to_numpy(output))
+    return len(leaves) - 1
+
+
+def _remote_error(e: Exception) -> RuntimeError:
+    # The errors are sent to the clients as a RuntimeError with their repr, since the exceptions raised by a model
+    # may not be picklable.
+    return RuntimeError(repr(e))
+
+
+def _unflatten(structure: Any, leaves: List[torch.Tensor]) -> Any:
+    if structure is None:
+        return None
+    if isinstance(structure, int):
+        return leaves[structure]
+    container, fields = structure
+    if container is list:
+        return leaves[fields].tolist()
+    if container is tuple:
+        return tuple(_unflatten(x, leaves) for _, x in fields)
+    return container(**{name: _unflatten(x, leaves) for name, x in fields})
+
+
+class InferenceClient(object):
+    """
+    Overview:
+        The stand-in of the model in a collector or an evaluator, created by ``InferenceServer.create_client``. It \
+        has the inference methods of the models, ``initial_inference`` and ``recurrent_inference`` of the \
+        MuZero-family models and ``compute_policy_value`` of the AlphaZero models, which send the inputs to the \
+        server through a shared buffer, wait for the batched inference, and return the outputs read from another \
+        shared buffer. The client is picklable, so it can be passed to a spawned process as the model of its policy \
+        (see ``use_inference_client``). A client has one request in flight, each searching thread or process needs \
+        its own client.
+    Interfaces:
+        ``initial_inference``, ``recurrent_inference``, ``compute_policy_value``, ``eval``, ``train``
+    """
+
+    def __init__(
+            self,
+            client_id: int,
+            request_queue: 'mp.Queue',  # noqa
+            response_queue: 'mp.Queue',  # noqa
+            request_buffer: torch.Tensor,
+            response_buffer: torch.Tensor,
+            stop_event: 'mp.Event',  # noqa
+            device: str = 'cpu',
+    ) -> None:
+        """
+        Overview:
+            Initialize the client with the queues and the shared buffers of the server.
+        Arguments:
+            - client_id (:obj:`int`): The index of the client in the server.
+            - request_queue (:obj:`mp.Queue`): The queue of the requests of all the clients.
+            - response_queue (:obj:`mp.Queue`): The queue of the responses to this client.
+            - request_buffer (:obj:`torch.Tensor`): The uint8 shared tensor of the inputs.
+            - response_buffer (:obj:`torch.Tensor`): The uint8 shared tensor of the outputs.
+            - stop_event (:obj:`mp.Event`): Set when the server is closed.
+            - device (:obj:`str`): The device of the returned tensors.
+        """
+        self._client_id = client_id
+        self._request_queue = request_queue
+        self._response_queue = response_queue
+        self._request_buffer = request_buffer
+        self._response_buffer = response_buffer
+        self._stop_event = stop_event
+        self._device = device
+        # The clients replace models in eval mode, see ``_forward_eval`` of the MuZero policy.
+        self.training = False
+
+    def _call(self, method: str, *args, **kwargs) -> Any:
+        arrays = [_to_numpy(x) for x in args]
+        if not arrays or any(x.ndim == 0 or x.shape[0] != arrays[0].shape[0] for x in arrays):
+            raise ValueError(
+                'the inputs of {} are batched along their first dimension, got the shapes {}'.format(
+                    method, [x.shape for x in arrays]
+                )
+            )
+        metas = _pack(self._request_buffer.numpy(), arrays)
+        self._request_queue.put((self._client_id, method, kwargs, metas))
+        while True:
+            try:
+                error, structure, metas = self._response_queue.get(timeout=1.)
+                break
+            except queue.Empty:
+                if self._stop_event.is_set():
+                    raise RuntimeError('the inference server is closed')
+        if error is not None:
+            raise RuntimeError('the inference of {} failed'.format(method)) from error
+        # Copy the outputs out of the response buffer, which is written again by the next request.
+        leaves = [torch.from_numpy(x.copy()).to(self._device) for x in _unpack(self._response_buffer.numpy(), metas)]
+        return _unflatten(structure, leaves)
+
+    def initial_inference(self, *args, **kwargs) -> Any:
+        return self._call('initial_inference', *args, **kwargs)
+
+    def recurrent_inference(self, *args, **kwargs) -> Any:
+        return self._call('recurrent_inference', *args, **kwargs)
+
+    def compute_policy_value(self, *args, **kwargs) -> Any:
+        return self._call('compute_policy_value', *args, **kwargs)
+
+    def eval(self) -> 'InferenceClient':
+        return self
+
+    def train(self, mode: bool = True) -> 'InferenceClient':
+        return self
+
+
+class InferenceServer(object):
+    """
+    Overview:
+        Run the inference requests of many collectors, evaluators or searching threads on one shared model, instead \
+        of a copy of the model in each of them. The requests of the clients (``create_client``) arrive on one queue, \
+        and a background thread gathers them into dynamic batches: a batch is run once it has ``max_batch_size`` \
+        rows, once every client has a request in it, or ``max_latency`` seconds after its first request arrived. \
+        The requests of a batch which call the same method with the same keyword arguments and input shapes are \
+        concatenated along the first dimension and run together, and each client reads its rows of the outputs \
+        from its shared buffer. The clients can live in other processes of ``mp_context`` (e.g. the collector \
+        processes of ``train_muzero_async``), the inputs and outputs are exchanged over shared memory and only the \
+        shapes go through the queues.
+    Interfaces:
+        ``__init__``, ``create_client``, ``start``, ``load_state_dict``, ``get_metrics``, ``close``
+
+    .. note::
+        All the inputs and outputs of the model are batched along their first dimension, so the models with other \
+        layouts, such as the LSTM hidden state of EfficientZero, can not be served.
+    """
+
+    def __init__(
+            self,
+            model: torch.nn.Module,
+            device: str = 'cpu',
+            max_batch_size: int = 256,
+            max_latency: float = 0.002,
+            buffer_size: int = 32 * 1024 * 1024,
+            mp_context: Optional[Any] = None,
+    ) -> None:
+        """
+        Overview:
+            Initialize the server, the batching thread is started by ``start``.
+        Arguments:
+            - model (:obj:`torch.nn.Module`): The shared model, which should not be trained meanwhile, the new \
+                weights are loaded by ``load_state_dict``.
+            - device (:obj:`str`): The device of the model.
+            - max_batch_size (:obj:`int`): The number of rows at which a batch is run without waiting.
+            - max_latency (:obj:`float`): The maximum time in seconds a request waits for the other requests of \
+                its batch.
+            - buffer_size (:obj:`int`): The size in bytes of each shared buffer of a client, which bounds the size \
+                of the inputs and the outputs of one request.
+            - mp_context (:obj:`Optional[Any]`): The context of ``torch.multiprocessing`` of the client processes, \
+                defaults to 'spawn'.
+        """
+        self._model = model.to(device)
+        self._model.eval()
+        self._device = device
+        self._max_batch_size = max_batch_size
+        self._max_latency = max_latency
+        self._buffer_size = buffer_size
+        self._ctx = mp_context or mp.get_context('spawn')
+
+        self._request_queue = self._ctx.Queue()
+        self._stop_event = self._ctx.Event()
+        self._clients = []
+        self._model_lock = threading.Lock()
+        self._thread = None
+        self._error = None
+
+        self._num_requests = 0
+        self._num_calls = 0
+        self._num_rows = 0
+
+    def create_client(self, device: str = 'cpu') -> InferenceClient:
+        """
+        Overview:
+            Create a client with its own shared buffers and response queue.
+        Arguments:
+            - device (:obj:`str`): The device of the tensors returned by the client.
+        Returns:
+            - client (:obj:`InferenceClient`): The client, which can be used in this process or passed to a process \
+                of ``mp_context``.
+        """
+        if self._error is not None:
+            raise RuntimeError('the inference server failed') from self._error
+        request_buffer = torch.zeros(self._buffer_size, dtype=torch.uint8).share_memory_()
+        response_buffer = torch.zeros(self._buffer_size, dtype=torch.uint8).share_memory_()
+        response_queue = self._ctx.Queue()
+        self._clients.append((request_buffer.numpy(), response_buffer.numpy(), response_queue))
+        return InferenceClient(
+            len(self._clients) - 1, self._request_queue, response_queue, request_buffer, response_buffer,
+            self._stop_event, device
+        )
+
+    def start(self) -> None:
+        """
+        Overview:
+            Start the batching thread.
+        """
+        self._thread = threading.Thread(target=self._serve_loop, name='inference_server', daemon=True)
+        self._thread.start()
+
+    def load_state_dict(self, state_dict: Dict[str, Any]) -> None:
+        """
+        Overview:
+            Load new weights into the shared model between two batches.
+        Arguments:
+            - state_dict (:obj:`Dict[str, Any]`): The state_dict of the model.
+        """
+        with self._model_lock:
+            self._model.load_state_dict(state_dict)
+
+    def _gather(self) -> List[tuple]:
+        # Wait for a request, then for the others of its batch.
+        try:
+            requests = [self._request_queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        num_rows = requests[0][3][0][1][0]
+        deadline = time.monotonic() + self._max_latency
+        while num_rows < self._max_batch_size and len(requests) < len(self._clients):
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                requests.append(self._request_queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+            num_rows += requests[-1][3][0][1][0]
+        return requests
+
+    def _run(self, requests: List[tuple]) -> None:
+        groups = {}
+        for request in requests:
+            client_id, method, kwargs, metas = request
+            try:
+                key = (method, tuple(sorted(kwargs.items())), tuple((shape[1:], dtype) for _, shape, dtype in metas))
+                groups.setdefault(key, []).append(request)
+            except Exception as e:
+                # E.g. keyword arguments which are not hashable, only this request fails.
+                self._clients[client_id][2].put((_remote_error(e), None, None))
+        for (method, _, _), group in groups.items():
+            try:
+                inputs = [_unpack(self._clients[client_id][0], metas) for client_id, _, _, metas in group]
+                inputs = [
+                    torch.from_numpy(np.concatenate([x[i] for x in inputs])).to(self._device)
+                    for i in range(len(inputs[0]))
+                ]
+                with self._model_lock, torch.no_grad():
+                    output = getattr(self._model, method)(*inputs, **group[0][2])
+                leaves = []
+                structure = _flatten(output, leaves)
+            except Exception as e:
+                # The error of a batch is raised by its clients, the server keeps serving the others.
+                for client_id, _, _, _ in group:
+                    self._clients[client_id][2].put((_remote_error(e), None, None))
+                continue
+            num_rows = inputs[0].shape[0]
+            start = 0
+            for client_id, _, _, metas in group:
+                end = start + metas[0][1][0]
+                _, response_buffer, response_queue = self._clients[client_id]
+                try:
+                    if any(x.shape[:1] != (num_rows, ) for x in leaves):
+                        raise ValueError(
+                            'the outputs of {} are not batched along their first dimension, got the shapes {}'.format(
+                                method, [x.shape for x in leaves]
+                            )
+                        )
+                    response = (None, structure, _pack(response_buffer, [x[start:end] for x in leaves]))
+                except ValueError as e:
+                    response = (_remote_error(e), None, None)
+                response_queue.put(response)
+                start = end
+            self._num_calls += 1
+            self._num_rows += num_rows
+        self._num_requests += len(requests)
+
+    def _serve_loop(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                requests = self._gather()
+                if requests:
+                    self._run(requests)
+            except Exception as e:
+                self._error = e
+                self._stop_event.set()
+                return
+
+    def get_metrics(self) -> Dict[str, float]:
+        """
+        Overview:
+            The number of the requests served since the last call, and the mean number of the rows and of the \
+            requests in a model call.
+        """
+        if self._error is not None:
+            raise RuntimeError('the inference server failed') from self._error
+        metrics = {
+            'inference_request_num': self._num_requests,
+            'inference_batch_size_mean': self._num_rows / max(self._num_calls, 1),
+            'inference_requests_per_call': self._num_requests / max(self._num_calls, 1),
+        }
+        self._num_requests, self._num_calls, self._num_rows = 0, 0, 0
+        return metrics
+
+    def close(self) -> None:
+        """
+        Overview:
+            Stop and join the batching thread, the waiting clients raise a RuntimeError.
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def use_inference_client(policy: Any, client: InferenceClient, enable_field: Sequence[str] = ('collect', )) -> None:
+    """
+    Overview:
+        Replace the collect and/or the eval model of a policy by a client of an ``InferenceServer``, so that its \
+        searches run on the shared model of the server. The policy should not load weights into the replaced \
+        models, the weights of the server are updated by ``InferenceServer.load_state_dict``.
+    Arguments:
+        - policy (:obj:`Any`): A MuZero-family or AlphaZero policy, initialized with the ``enable_field``.
+        - client (:obj:`InferenceClient`): The client of the server.
+        - enable_field (:obj:`Sequence[str]`): The modes of the policy to serve, in ['collect', 'eval'].
+    """
+    for field in enable_field:
+        assert field in ['collect', 'eval'], field
+        setattr(policy, '_{}_model'.format(field), client)
@@ -4,11 +4,12 @@ from typing import Optional, Any, List
 
 import numpy as np
 import torch
-from ding.envs import BaseEnvManager
+from ding.envs import BaseEnvManager, BaseEnvTimestep
 from ding.torch_utils import to_ndarray
 from ding.utils import build_logger, EasyTimer, SERIAL_COLLECTOR_REGISTRY, get_rank, get_world_size, \
     allreduce_data
 from ding.worker.collector.base_serial_collector import ISerialCollector
+from easydict import EasyDict
 from torch.nn import L1Loss
 
 from lzero.mcts.buffer.game_segment import GameSegment
@@ -23,7 +24,7 @@ class MuZeroCollector(ISerialCollector):
         It manages the data collection process for training these algorithms using a serial mechanism.
     Interfaces:
         ``__init__``, ``reset``, ``reset_env``, ``reset_policy``, ``_reset_stat``, ``envstep``, ``__del__``, ``_compute_priorities``,
-        ``pad_and_save_last_trajectory``, ``collect``, ``_output_log``, ``close``
+        ``pad_and_save_last_trajectory``, ``collect``, ``_collect_async``, ``_output_log``, ``close``
     Properties:
         ``envstep``
     """
@@ -100,6 +101,8 @@ class MuZeroCollector(ISerialCollector):
             self._env_num = self._env.env_num
         else:
             self._env.reset()
+        # The in-flight games of ``collect_async`` are lost with the reset envs.
+        self._async_games = None
 
     def reset_policy(self, _policy: Optional[namedtuple] = None) -> None:
         """
@@ -146,6 +149,10 @@ class MuZeroCollector(ISerialCollector):
         self._total_duration = 0
         self._last_train_iter = 0
         self._end_flag = False
+        self._async_games = None
+        # The time of the phases of the collection loop and the searched batch sizes, since the last log.
+        self._phase_time = {'search_time': 0., 'env_step_time': 0., 'bookkeeping_time': 0.}
+        self._search_batch_sizes = []
 
         # A game_segment_pool implementation based on the deque structure.
         self.game_segment_pool = deque(maxlen=int(1e6))
@@ -329,6 +336,8 @@ class MuZeroCollector(ISerialCollector):
             policy_kwargs = {}
         temperature = policy_kwargs['temperature']
         epsilon = policy_kwargs['epsilon']
+        if self.policy_config.get('collect_async', False):
+            return self._collect_async(n_episode, train_iter, temperature, epsilon, collect_with_pure_policy)
 
         collected_episode = 0
         collected_step = 0
@@ -350,53 +359,15 @@ class MuZeroCollector(ISerialCollector):
             )
             init_obs = self._env.ready_obs
 
-        action_mask_dict = {i: to_ndarray(init_obs[i]['action_mask']) for i in range(env_nums)}
-        to_play_dict = {i: to_ndarray(init_obs[i]['to_play']) for i in range(env_nums)}
-        if self.policy_config.use_ture_chance_label_in_chance_encoder:
-            chance_dict = {i: to_ndarray(init_obs[i]['chance']) for i in range(env_nums)}
-
-        game_segments = [
-            GameSegment(
-                self._env.action_space,
-                game_segment_length=self.policy_config.game_segment_length,
-                config=self.policy_config
-            ) for _ in range(env_nums)
-        ]
-        # stacked observation windows in reset stage for init game_segments
-        observation_window_stack = [[] for _ in range(env_nums)]
+        games = self._init_games()
         for env_id in range(env_nums):
-            observation_window_stack[env_id] = deque(
-                [to_ndarray(init_obs[env_id]['observation']) for _ in range(self.policy_config.model.frame_stack_num)],
-                maxlen=self.policy_config.model.frame_stack_num
-            )
-
-            game_segments[env_id].reset(observation_window_stack[env_id])
-
-        dones = np.array([False for _ in range(env_nums)])
-        last_game_segments = [None for _ in range(env_nums)]
-        last_game_priorities = [None for _ in range(env_nums)]
-        # for priorities in self-play
-        search_values_lst = [[] for _ in range(env_nums)]
-        pred_values_lst = [[] for _ in range(env_nums)]
-        if self.policy_config.gumbel_algo:
-            improved_policy_lst = [[] for _ in range(env_nums)]
-
-        # some logs
-        eps_steps_lst, visit_entropies_lst = np.zeros(env_nums), np.zeros(env_nums)
-        if self.policy_config.gumbel_algo:
-            completed_value_lst = np.zeros(env_nums)
-        self_play_moves = 0.
-        self_play_episodes = 0.
-        self_play_moves_max = 0
-        self_play_visit_entropy = []
-        total_transitions = 0
+            self._start_game(games, env_id, init_obs[env_id])
 
         ready_env_id = set()
         remain_episode = n_episode
-        if collect_with_pure_policy:
-            temp_visit_list = [0.0 for i in range(self._env.action_space.n)]
 
         while True:
+            iteration_start = time.time()
             with self._timer:
                 # Get current ready env obs.
                 obs = self._env.ready_obs
@@ -404,15 +375,9 @@ class MuZeroCollector(ISerialCollector):
                 ready_env_id = ready_env_id.union(set(list(new_available_env_id)[:remain_episode]))
                 remain_episode -= min(len(new_available_env_id), remain_episode)
 
-                stack_obs = {env_id: game_segments[env_id].get_obs() for env_id in ready_env_id}
-                stack_obs = list(stack_obs.values())
-
-                action_mask_dict = {env_id: action_mask_dict[env_id] for env_id in ready_env_id}
-                to_play_dict = {env_id: to_play_dict[env_id] for env_id in ready_env_id}
-                action_mask = [action_mask_dict[env_id] for env_id in ready_env_id]
-                to_play = [to_play_dict[env_id] for env_id in ready_env_id]
-                if self.policy_config.use_ture_chance_label_in_chance_encoder:
-                    chance_dict = {env_id: chance_dict[env_id] for env_id in ready_env_id}
+                stack_obs = [games.game_segments[env_id].get_obs() for env_id in ready_env_id]
+                action_mask = [games.action_mask[env_id] for env_id in ready_env_id]
+                to_play = [games.to_play[env_id] for env_id in ready_env_id]
 
                 stack_obs = to_ndarray(stack_obs)
                 # return stack_obs shape: [B, S*C, W, H] e.g. [8, 4*1, 96, 96]
@@ -423,68 +388,18 @@ class MuZeroCollector(ISerialCollector):
                 # Key policy forward step
                 # ==============================================================
                 # print(f'ready_env_id:{ready_env_id}')
-                
+                search_start = time.time()
                 policy_output = self._policy.forward(stack_obs, action_mask, temperature, to_play, epsilon, ready_env_id=ready_env_id)
+                search_time = time.time() - search_start
 
-                # Extract relevant policy outputs
-                actions_with_env_id = {k: v['action'] for k, v in policy_output.items()}
-                value_dict_with_env_id = {k: v['searched_value'] for k, v in policy_output.items()}
-                pred_value_dict_with_env_id = {k: v['predicted_value'] for k, v in policy_output.items()}
-
-                if self.policy_config.sampled_algo:
-                    root_sampled_actions_dict_with_env_id = {
-                        k: v['root_sampled_actions'] for k, v in policy_output.items()
-                    }
-
-                if not collect_with_pure_policy:
-                    distributions_dict_with_env_id = {k: v['visit_count_distributions'] for k, v in
-                                                      policy_output.items()}
-                    visit_entropy_dict_with_env_id = {k: v['visit_count_distribution_entropy'] for k, v in
-                                                      policy_output.items()}
-
-                    if self.policy_config.gumbel_algo:
-                        improved_policy_dict_with_env_id = {k: v['improved_policy_probs'] for k, v in
-                                                            policy_output.items()}
-                        completed_value_with_env_id = {k: v['roots_completed_value'] for k, v in policy_output.items()}
-
-                # Initialize dictionaries to store results
-                actions = {}
-                value_dict = {}
-                pred_value_dict = {}
-
-                if not collect_with_pure_policy:
-                    distributions_dict = {}
-                    visit_entropy_dict = {}
-
-                    if self.policy_config.sampled_algo:
-                        root_sampled_actions_dict = {}
-
-                    if self.policy_config.gumbel_algo:
-                        improved_policy_dict = {}
-                        completed_value_dict = {}
-
-                # Populate the result dictionaries
-                for env_id in ready_env_id:
-                    actions[env_id] = actions_with_env_id.pop(env_id)
-                    value_dict[env_id] = value_dict_with_env_id.pop(env_id)
-                    pred_value_dict[env_id] = pred_value_dict_with_env_id.pop(env_id)
-
-                    if not collect_with_pure_policy:
-                        distributions_dict[env_id] = distributions_dict_with_env_id.pop(env_id)
-
-                        if self.policy_config.sampled_algo:
-                            root_sampled_actions_dict[env_id] = root_sampled_actions_dict_with_env_id.pop(env_id)
-
-                        visit_entropy_dict[env_id] = visit_entropy_dict_with_env_id.pop(env_id)
-
-                        if self.policy_config.gumbel_algo:
-                            improved_policy_dict[env_id] = improved_policy_dict_with_env_id.pop(env_id)
-                            completed_value_dict[env_id] = completed_value_with_env_id.pop(env_id)
+                actions = {env_id: policy_output[env_id]['action'] for env_id in ready_env_id}
 
                 # ==============================================================
                 # Interact with the environment
                 # ==============================================================
+                env_step_start = time.time()
                 timesteps = self._env.step(actions)
+                env_step_time = time.time() - env_step_start
 
             interaction_duration = self._timer.value / len(timesteps)
 
@@ -498,141 +413,17 @@ class MuZeroCollector(ISerialCollector):
                         self._reset_stat(env_id)
                         self._logger.info('Env{} returns a abnormal step, its info is {}'.format(env_id, timestep.info))
                         continue
-                    obs, reward, done, info = timestep.obs, timestep.reward, timestep.done, timestep.info
-
-                    if collect_with_pure_policy:
-                        game_segments[env_id].store_search_stats(temp_visit_list, 0)
-                    else:
-                        if self.policy_config.sampled_algo:
-                            game_segments[env_id].store_search_stats(
-                                distributions_dict[env_id], value_dict[env_id], root_sampled_actions_dict[env_id]
-                            )
-                        elif self.policy_config.gumbel_algo:
-                            game_segments[env_id].store_search_stats(distributions_dict[env_id], value_dict[env_id],
-                                                                     improved_policy=improved_policy_dict[env_id])
-                        else:
-                            game_segments[env_id].store_search_stats(distributions_dict[env_id], value_dict[env_id])
-
-                    # append a transition tuple, including a_t, o_{t+1}, r_{t}, action_mask_{t}, to_play_{t}
-                    # in ``game_segments[env_id].init``, we have appended o_{t} in ``self.obs_segment``
-                    if self.policy_config.use_ture_chance_label_in_chance_encoder:
-                        game_segments[env_id].append(
-                            actions[env_id], to_ndarray(obs['observation']), reward, action_mask_dict[env_id],
-                            to_play_dict[env_id], chance_dict[env_id]
-                        )
-                    else:
-                        game_segments[env_id].append(
-                            actions[env_id], to_ndarray(obs['observation']), reward, action_mask_dict[env_id],
-                            to_play_dict[env_id]
-                        )
-
-                    # NOTE: the position of code snippet is very important.
-                    # the obs['action_mask'] and obs['to_play'] are corresponding to the next action
-                    action_mask_dict[env_id] = to_ndarray(obs['action_mask'])
-                    to_play_dict[env_id] = to_ndarray(obs['to_play'])
-                    if self.policy_config.use_ture_chance_label_in_chance_encoder:
-                        chance_dict[env_id] = to_ndarray(obs['chance'])
-
-                    if self.policy_config.ignore_done:
-                        dones[env_id] = False
-                    else:
-                        dones[env_id] = done
-
-                    if not collect_with_pure_policy:
-                        visit_entropies_lst[env_id] += visit_entropy_dict[env_id]
-                        if self.policy_config.gumbel_algo:
-                            completed_value_lst[env_id] += np.mean(np.array(completed_value_dict[env_id]))
-
-                    eps_steps_lst[env_id] += 1
-                    if self._policy.get_attribute('cfg').type == 'unizero':
-                        # only for UniZero now
-                        self._policy.reset(env_id=env_id, current_steps=eps_steps_lst[env_id], reset_init_data=False)
-
-                    total_transitions += 1
-
-                    if self.policy_config.use_priority:
-                        pred_values_lst[env_id].append(pred_value_dict[env_id])
-                        search_values_lst[env_id].append(value_dict[env_id])
-                        if self.policy_config.gumbel_algo and not collect_with_pure_policy:
-                            improved_policy_lst[env_id].append(improved_policy_dict[env_id])
-
-                    # append the newest obs
-                    observation_window_stack[env_id].append(to_ndarray(obs['observation']))
-
-                    # ==============================================================
-                    # we will save a game segment if it is the end of the game or the next game segment is finished.
-                    # ==============================================================
-
-                    # if game segment is full, we will save the last game segment
-                    if game_segments[env_id].is_full():
-                        # pad over last segment trajectory
-                        if last_game_segments[env_id] is not None:
-                            # TODO(pu): return the one game segment
-                            self.pad_and_save_last_trajectory(
-                                env_id, last_game_segments, last_game_priorities, game_segments, dones
-                            )
-
-                        # calculate priority
-                        priorities = self._compute_priorities(env_id, pred_values_lst, search_values_lst)
-                        pred_values_lst[env_id] = []
-                        search_values_lst[env_id] = []
-                        if self.policy_config.gumbel_algo and not collect_with_pure_policy:
-                            improved_policy_lst[env_id] = []
-
-                        # the current game_segments become last_game_segment
-                        last_game_segments[env_id] = game_segments[env_id]
-                        last_game_priorities[env_id] = priorities
-
-                        # create new GameSegment
-                        game_segments[env_id] = GameSegment(
-                            self._env.action_space,
-                            game_segment_length=self.policy_config.game_segment_length,
-                            config=self.policy_config
-                        )
-                        game_segments[env_id].reset(observation_window_stack[env_id])
-
+                    self._process_timestep(
+                        games, env_id, timestep, actions[env_id], policy_output[env_id], collect_with_pure_policy
+                    )
                     self._env_info[env_id]['step'] += 1
                     collected_step += 1
 
                 self._env_info[env_id]['time'] += self._timer.value + interaction_duration
                 if timestep.done:
-                    reward = timestep.info['eval_episode_return']
-                    info = {
-                        'reward': reward,
-                        'time': self._env_info[env_id]['time'],
-                        'step': self._env_info[env_id]['step'],
-                    }
-                    if not collect_with_pure_policy:
-                        info['visit_entropy'] = visit_entropies_lst[env_id] / eps_steps_lst[env_id]
-                        if self.policy_config.gumbel_algo:
-                            info['completed_value'] = completed_value_lst[env_id] / eps_steps_lst[env_id]
-
+                    self._finish_episode(games, env_id, timestep, collect_with_pure_policy)
                     collected_episode += 1
-                    self._episode_info.append(info)
 
-                    # ==============================================================
-                    # if it is the end of the game, we will save the game segment
-                    # ==============================================================
-
-                    # NOTE: put the penultimate game segment in one episode into the trajectory_pool
-                    # pad over 2th last game_segment using the last game_segment
-                    if last_game_segments[env_id] is not None:
-                        self.pad_and_save_last_trajectory(
-                            env_id, last_game_segments, last_game_priorities, game_segments, dones
-                        )
-
-                    # store current segment trajectory
-                    priorities = self._compute_priorities(env_id, pred_values_lst, search_values_lst)
-
-                    # NOTE: put the last game segment in one episode into the trajectory_pool
-                    game_segments[env_id].game_segment_to_array()
-
-                    # assert len(game_segments[env_id]) == len(priorities)
-                    # NOTE: save the last game segment in one episode into the trajectory_pool if it's not null
-                    if len(game_segments[env_id].reward_segment) != 0:
-                        self.game_segment_pool.append((game_segments[env_id], priorities, dones[env_id]))
-
-                    # print(game_segments[env_id].reward_segment)
                     # reset the finished env and init game_segments
                     if n_episode > self._env_num:
                         # Get current ready env obs.
@@ -658,53 +449,44 @@ class MuZeroCollector(ISerialCollector):
                         ready_env_id = ready_env_id.union(set(list(new_available_env_id)[:remain_episode]))
                         remain_episode -= min(len(new_available_env_id), remain_episode)
 
-                        action_mask_dict[env_id] = to_ndarray(init_obs[env_id]['action_mask'])
-                        to_play_dict[env_id] = to_ndarray(init_obs[env_id]['to_play'])
-                        if self.policy_config.use_ture_chance_label_in_chance_encoder:
-                            chance_dict[env_id] = to_ndarray(init_obs[env_id]['chance'])
-
-                        game_segments[env_id] = GameSegment(
-                            self._env.action_space,
-                            game_segment_length=self.policy_config.game_segment_length,
-                            config=self.policy_config
-                        )
-                        observation_window_stack[env_id] = deque(
-                            [init_obs[env_id]['observation'] for _ in range(self.policy_config.model.frame_stack_num)],
-                            maxlen=self.policy_config.model.frame_stack_num
-                        )
-                        game_segments[env_id].reset(observation_window_stack[env_id])
-                        last_game_segments[env_id] = None
-                        last_game_priorities[env_id] = None
-
-                    # log
-                    self_play_moves_max = max(self_play_moves_max, eps_steps_lst[env_id])
-                    if not collect_with_pure_policy:
-                        self_play_visit_entropy.append(visit_entropies_lst[env_id] / eps_steps_lst[env_id])
-                    self_play_moves += eps_steps_lst[env_id]
-                    self_play_episodes += 1
-
-                    pred_values_lst[env_id] = []
-                    search_values_lst[env_id] = []
-                    eps_steps_lst[env_id] = 0
-                    visit_entropies_lst[env_id] = 0
+                        self._start_game(games, env_id, init_obs[env_id])
 
                     # Env reset is done by env_manager automatically
-                    self._policy.reset([env_id])  # NOTE: reset the policy for the env_id. Default reset_init_data=True.
-                    self._reset_stat(env_id)
                     ready_env_id.remove(env_id)
 
+            self._record_phase_time(time.time() - iteration_start, search_time, env_step_time, len(actions))
             if collected_episode >= n_episode:
-                # [data, meta_data]
-                return_data = [self.game_segment_pool[i][0] for i in range(len(self.game_segment_pool))], [
-                    {
-                        'priorities': self.game_segment_pool[i][1],
-                        'done': self.game_segment_pool[i][2],
-                        'unroll_plus_td_steps': self.unroll_plus_td_steps
-                    } for i in range(len(self.game_segment_pool))
-                ]
-                self.game_segment_pool.clear()
+                return_data = self._pop_game_segment_pool()
                 break
 
+        self._update_collect_count(collected_step, collected_episode)
+        # log
+        self._output_log(train_iter)
+        return return_data
+
+    def _pop_game_segment_pool(self) -> List[Any]:
+        """
+        Overview:
+            Take the game segments saved in the pool as the collected data.
+        Returns:
+            - return_data (:obj:`List[Any]`): The game segments and their meta data.
+        """
+        # [data, meta_data]
+        return_data = [self.game_segment_pool[i][0] for i in range(len(self.game_segment_pool))], [
+            {
+                'priorities': self.game_segment_pool[i][1],
+                'done': self.game_segment_pool[i][2],
+                'unroll_plus_td_steps': self.unroll_plus_td_steps
+            } for i in range(len(self.game_segment_pool))
+        ]
+        self.game_segment_pool.clear()
+        return return_data
+
+    def _update_collect_count(self, collected_step: int, collected_episode: int) -> None:
+        """
+        Overview:
+            Add the env steps, episodes and duration of a collection to the total counts.
+        """
         collected_duration = sum([d['time'] for d in self._episode_info])
         # reduce data when enables DDP
         if self._world_size > 1:
@@ -715,7 +497,290 @@ class MuZeroCollector(ISerialCollector):
         self._total_episode_count += collected_episode
         self._total_duration += collected_duration
 
-        # log
+    def _record_phase_time(self, iteration_time: float, search_time: float, env_step_time: float,
+                           batch_size: int) -> None:
+        """
+        Overview:
+            Accumulate the time of an iteration of the collection loop by phase, the bookkeeping of the game segments \
+            is the rest of the iteration after the search and the env step.
+        """
+        self._phase_time['search_time'] += search_time
+        self._phase_time['env_step_time'] += env_step_time
+        self._phase_time['bookkeeping_time'] += iteration_time - search_time - env_step_time
+        self._search_batch_sizes.append(batch_size)
+
+    def _init_games(self) -> EasyDict:
+        """
+        Overview:
+            Create the state of the games played in the envs, with a list or array indexed by env id per field. The \
+            game segment of an env is None until its game is started by ``_start_game``.
+        Returns:
+            - games (:obj:`EasyDict`): The state of the games.
+        """
+        env_nums = self._env_num
+        games = EasyDict(
+            {
+                key: [None for _ in range(env_nums)]
+                for key in [
+                    'game_segments', 'last_game_segments', 'last_game_priorities', 'observation_window_stack',
+                    'action_mask', 'to_play', 'chance', 'search_values', 'pred_values', 'improved_policy'
+                ]
+            }
+        )
+        games.dones = np.zeros(env_nums, dtype=bool)
+        games.eps_steps = np.zeros(env_nums)
+        games.visit_entropies = np.zeros(env_nums)
+        games.completed_value = np.zeros(env_nums)
+        return games
+
+    def _start_game(self, games: EasyDict, env_id: int, init_obs: dict) -> None:
+        """
+        Overview:
+            Start a new game in the env ``env_id`` from its reset observation.
+        Arguments:
+            - games (:obj:`EasyDict`): The state of the games, created by ``_init_games``.
+            - env_id (:obj:`int`): The id of the env.
+            - init_obs (:obj:`dict`): The reset observation of the env.
+        """
+        games.action_mask[env_id] = to_ndarray(init_obs['action_mask'])
+        games.to_play[env_id] = to_ndarray(init_obs['to_play'])
+        if self.policy_config.use_ture_chance_label_in_chance_encoder:
+            games.chance[env_id] = to_ndarray(init_obs['chance'])
+        # stacked observation windows in reset stage for init game_segments
+        games.observation_window_stack[env_id] = deque(
+            [to_ndarray(init_obs['observation']) for _ in range(self.policy_config.model.frame_stack_num)],
+            maxlen=self.policy_config.model.frame_stack_num
+        )
+        games.game_segments[env_id] = GameSegment(
+            self._env.action_space, game_segment_length=self.policy_config.game_segment_length, config=self.policy_config
+        )
+        games.game_segments[env_id].reset(games.observation_window_stack[env_id])
+        games.last_game_segments[env_id] = None
+        games.last_game_priorities[env_id] = None
+        games.dones[env_id] = False
+        games.search_values[env_id] = []
+        games.pred_values[env_id] = []
+        games.improved_policy[env_id] = []
+        games.eps_steps[env_id] = 0
+        games.visit_entropies[env_id] = 0
+        games.completed_value[env_id] = 0
+
+    def _process_timestep(
+            self, games: EasyDict, env_id: int, timestep: BaseEnvTimestep, action: Any, output: dict,
+            collect_with_pure_policy: bool
+    ) -> None:
+        """
+        Overview:
+            Append the transition of a (non abnormal) env step to the game of ``env_id``, with the search statistics \
+            of the step. A full game segment becomes the last game segment of the env, the penultimate one is padded \
+            with it and saved in ``game_segment_pool``.
+        Arguments:
+            - games (:obj:`EasyDict`): The state of the games, created by ``_init_games``.
+            - env_id (:obj:`int`): The id of the env.
+            - timestep (:obj:`BaseEnvTimestep`): The timestep returned by the env.
+            - action (:obj:`Any`): The action of the step.
+            - output (:obj:`dict`): The output of the policy forward for the env.
+            - collect_with_pure_policy (:obj:`bool`): Whether the data is collected using pure policy without MCTS.
+        """
+        obs, reward, done = timestep.obs, timestep.reward, timestep.done
+        game_segment = games.game_segments[env_id]
+
+        if collect_with_pure_policy:
+            game_segment.store_search_stats([0.0 for _ in range(self._env.action_space.n)], 0)
+        elif self.policy_config.sampled_algo:
+            game_segment.store_search_stats(
+                output['visit_count_distributions'], output['searched_value'], output['root_sampled_actions']
+            )
+        elif self.policy_config.gumbel_algo:
+            game_segment.store_search_stats(
+                output['visit_count_distributions'],
+                output['searched_value'],
+                improved_policy=output['improved_policy_probs']
+            )
+        else:
+            game_segment.store_search_stats(output['visit_count_distributions'], output['searched_value'])
+
+        # append a transition tuple, including a_t, o_{t+1}, r_{t}, action_mask_{t}, to_play_{t}
+        # in ``game_segment.reset``, we have appended o_{t} in ``self.obs_segment``
+        if self.policy_config.use_ture_chance_label_in_chance_encoder:
+            game_segment.append(
+                action, to_ndarray(obs['observation']), reward, games.action_mask[env_id], games.to_play[env_id],
+                games.chance[env_id]
+            )
+            games.chance[env_id] = to_ndarray(obs['chance'])
+        else:
+            game_segment.append(
+                action, to_ndarray(obs['observation']), reward, games.action_mask[env_id], games.to_play[env_id]
+            )
+        # NOTE: the position of code snippet is very important.
+        # the obs['action_mask'] and obs['to_play'] are corresponding to the next action
+        games.action_mask[env_id] = to_ndarray(obs['action_mask'])
+        games.to_play[env_id] = to_ndarray(obs['to_play'])
+        games.dones[env_id] = False if self.policy_config.ignore_done else done
+
+        if not collect_with_pure_policy:
+            games.visit_entropies[env_id] += output['visit_count_distribution_entropy']
+            if self.policy_config.gumbel_algo:
+                games.completed_value[env_id] += np.mean(np.array(output['roots_completed_value']))
+        games.eps_steps[env_id] += 1
+        if self._policy.get_attribute('cfg').type == 'unizero':
+            # only for UniZero now
+            self._policy.reset(env_id=env_id, current_steps=games.eps_steps[env_id], reset_init_data=False)
+
+        if self.policy_config.use_priority:
+            games.pred_values[env_id].append(output['predicted_value'])
+            games.search_values[env_id].append(output['searched_value'])
+            if self.policy_config.gumbel_algo and not collect_with_pure_policy:
+                games.improved_policy[env_id].append(output['improved_policy_probs'])
+        # append the newest obs
+        games.observation_window_stack[env_id].append(to_ndarray(obs['observation']))
+
+        # if game segment is full, we will save the last game segment
+        if game_segment.is_full():
+            # pad over last segment trajectory
+            if games.last_game_segments[env_id] is not None:
+                self.pad_and_save_last_trajectory(
+                    env_id, games.last_game_segments, games.last_game_priorities, games.game_segments, games.dones
+                )
+            # the current game segment becomes the last game segment
+            games.last_game_priorities[env_id] = self._compute_priorities(
+                env_id, games.pred_values, games.search_values
+            )
+            games.last_game_segments[env_id] = game_segment
+            games.pred_values[env_id] = []
+            games.search_values[env_id] = []
+            games.improved_policy[env_id] = []
+            games.game_segments[env_id] = GameSegment(
+                self._env.action_space,
+                game_segment_length=self.policy_config.game_segment_length,
+                config=self.policy_config
+            )
+            games.game_segments[env_id].reset(games.observation_window_stack[env_id])
+
+    def _finish_episode(
+            self, games: EasyDict, env_id: int, timestep: BaseEnvTimestep, collect_with_pure_policy: bool
+    ) -> None:
+        """
+        Overview:
+            Log the finished episode of ``env_id`` and save its last game segments in ``game_segment_pool``. The game \
+            of the env is left finished, its next game is started by ``_start_game``.
+        Arguments:
+            - games (:obj:`EasyDict`): The state of the games, created by ``_init_games``.
+            - env_id (:obj:`int`): The id of the env.
+            - timestep (:obj:`BaseEnvTimestep`): The last timestep of the episode.
+            - collect_with_pure_policy (:obj:`bool`): Whether the data is collected using pure policy without MCTS.
+        """
+        info = {
+            'reward': timestep.info['eval_episode_return'],
+            'time': self._env_info[env_id]['time'],
+            'step': self._env_info[env_id]['step'],
+        }
+        if not collect_with_pure_policy:
+            info['visit_entropy'] = games.visit_entropies[env_id] / games.eps_steps[env_id]
+            if self.policy_config.gumbel_algo:
+                info['completed_value'] = games.completed_value[env_id] / games.eps_steps[env_id]
+        self._episode_info.append(info)
+
+        # NOTE: put the penultimate game segment in one episode into the trajectory_pool
+        # pad over 2th last game_segment using the last game_segment
+        if games.last_game_segments[env_id] is not None:
+            self.pad_and_save_last_trajectory(
+                env_id, games.last_game_segments, games.last_game_priorities, games.game_segments, games.dones
+            )
+        # NOTE: save the last game segment in one episode into the trajectory_pool if it's not null
+        priorities = self._compute_priorities(env_id, games.pred_values, games.search_values)
+        games.game_segments[env_id].game_segment_to_array()
+        if len(games.game_segments[env_id].reward_segment) != 0:
+            self.game_segment_pool.append((games.game_segments[env_id], priorities, games.dones[env_id]))
+
+        # NOTE: reset the policy for the env_id. Default reset_init_data=True.
+        self._policy.reset([env_id])
+        self._reset_stat(env_id)
+
+    def _collect_async(self, n_episode: int, train_iter: int, temperature: float, epsilon: float,
+                       collect_with_pure_policy: bool) -> List[Any]:
+        """
+        Overview:
+            The ``collect`` of ``collect_async=True``, which keeps a game in flight in every env instead of waiting \
+            for all the envs to reset. Each iteration searches the envs whose observations are ready, so that the \
+            envs which are still stepping in an asynchronous env manager do not block the search of the others, and \
+            a finished game is replaced as soon as the reset observation of its env is ready. The collection returns \
+            after ``n_episode`` episodes are finished, the unfinished games continue in the next call with the \
+            updated policy, so that the searched batch is not shrunk by the last episodes of each call.
+        Arguments:
+            - n_episode (:obj:`int`): Number of episodes to collect.
+            - train_iter (:obj:`int`): Number of training iterations completed so far.
+            - temperature (:obj:`float`): The temperature of the action selection.
+            - epsilon (:obj:`float`): The epsilon of the eps greedy exploration.
+            - collect_with_pure_policy (:obj:`bool`): Whether to collect data using pure policy without MCTS.
+        Returns:
+            - return_data (:obj:`List[Any]`): Collected data in the form of a list.
+        """
+        if self._async_games is None:
+            # The in-flight games persist across the calls.
+            self._async_games = self._init_games()
+        games = self._async_games
+
+        collected_episode = 0
+        collected_step = 0
+        retry_waiting_time = 0.001
+        while collected_episode < n_episode:
+            iteration_start = time.time()
+            obs = self._env.ready_obs
+            for env_id in obs.keys():
+                if games.game_segments[env_id] is None:
+                    self._start_game(games, env_id, obs[env_id])
+            ready_env_id = sorted(obs.keys())
+            if len(ready_env_id) == 0:
+                # All the envs are still stepping or resetting in the env manager.
+                time.sleep(retry_waiting_time)
+                continue
+
+            stack_obs = to_ndarray([games.game_segments[env_id].get_obs() for env_id in ready_env_id])
+            stack_obs = prepare_observation(stack_obs, self.policy_config.model.model_type)
+            stack_obs = torch.from_numpy(stack_obs).to(self.policy_config.device)
+            action_mask = [games.action_mask[env_id] for env_id in ready_env_id]
+            to_play = [games.to_play[env_id] for env_id in ready_env_id]
+
+            search_start = time.time()
+            policy_output = self._policy.forward(
+                stack_obs, action_mask, temperature, to_play, epsilon, ready_env_id=ready_env_id
+            )
+            search_time = time.time() - search_start
+
+            actions = {env_id: policy_output[env_id]['action'] for env_id in ready_env_id}
+            env_step_start = time.time()
+            timesteps = self._env.step(actions)
+            env_step_time = time.time() - env_step_start
+            interaction_duration = (time.time() - iteration_start) / max(len(timesteps), 1)
+
+            for env_id, timestep in timesteps.items():
+                bookkeeping_start = time.time()
+                if timestep.info.get('abnormal', False):
+                    # Reset the env, its game is restarted from the next reset observation.
+                    self._env.reset({env_id: None})
+                    self._policy.reset([env_id])
+                    self._reset_stat(env_id)
+                    games.game_segments[env_id] = None
+                    self._logger.info('Env{} returns a abnormal step, its info is {}'.format(env_id, timestep.info))
+                    continue
+                self._process_timestep(
+                    games, env_id, timestep, actions[env_id], policy_output[env_id], collect_with_pure_policy
+                )
+                self._env_info[env_id]['step'] += 1
+                collected_step += 1
+                self._env_info[env_id]['time'] += time.time() - bookkeeping_start + interaction_duration
+
+                if timestep.done:
+                    self._finish_episode(games, env_id, timestep, collect_with_pure_policy)
+                    collected_episode += 1
+                    # The env is reset by the env manager, the next game starts from its reset observation.
+                    games.game_segments[env_id] = None
+
+            self._record_phase_time(time.time() - iteration_start, search_time, env_step_time, len(ready_env_id))
+
+        return_data = self._pop_game_segment_pool()
+        self._update_collect_count(collected_step, collected_episode)
         self._output_log(train_iter)
         return return_data
 
@@ -759,6 +824,12 @@ class MuZeroCollector(ISerialCollector):
             }
             if self.policy_config.gumbel_algo:
                 info['completed_value'] = np.mean(completed_value)
+            # The time spent in the search, the env step and the bookkeeping of the game segments, and the average
+            # number of the envs searched in a batch, which is ``env_num`` when no env waits for the others.
+            info.update(self._phase_time)
+            info['avg_search_batch_size'] = np.mean(self._search_batch_sizes) if self._search_batch_sizes else 0.
+            self._phase_time = {k: 0. for k in self._phase_time}
+            self._search_batch_sizes = []
             self._episode_info.clear()
             self._logger.info("collect end:\n{}".format('\n'.join(['{}: {}'.format(k, v) for k, v in info.items()])))
             for k, v in info.items():
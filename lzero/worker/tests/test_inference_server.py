@@ -0,0 +1,146 @@
+import threading
+
+import numpy as np
+import pytest
+import torch
+import torch.multiprocessing as mp
+
+from lzero.model.common import MZNetworkOutput
+from lzero.worker import InferenceServer
+
+
+class FakeModel(torch.nn.Module):
+
+    def __init__(self, obs_dim: int = 5, latent_dim: int = 4, action_space_size: int = 3):
+        super().__init__()
+        self.action_space_size = action_space_size
+        self.representation = torch.nn.Linear(obs_dim, latent_dim)
+        self.dynamics = torch.nn.Linear(latent_dim + action_space_size, latent_dim)
+        self.prediction = torch.nn.Linear(latent_dim, action_space_size + 1)
+
+    def initial_inference(self, obs: torch.Tensor) -> MZNetworkOutput:
+        latent_state = self.representation(obs)
+        prediction = self.prediction(latent_state)
+        return MZNetworkOutput(prediction[:, :1], [0. for _ in range(obs.shape[0])], prediction[:, 1:], latent_state)
+
+    def recurrent_inference(self, latent_state: torch.Tensor, action: torch.Tensor, afterstate: bool = False):
+        action = torch.nn.functional.one_hot(action.long(), self.action_space_size).float()
+        next_latent_state = self.dynamics(torch.cat([latent_state, action], dim=1))
+        if afterstate:
+            next_latent_state = -next_latent_state
+        prediction = self.prediction(next_latent_state)
+        return MZNetworkOutput(prediction[:, :1], prediction[:, :1] * 2, prediction[:, 1:], next_latent_state)
+
+    def compute_policy_value(self, state: torch.Tensor):
+        if state.shape[1] != 5:
+            raise ValueError('wrong state')
+        prediction = self.prediction(self.representation(state))
+        return torch.softmax(prediction[:, 1:], dim=1), prediction[:, :1]
+
+
+def _search(client, seed: int, num_steps: int = 20):
+    # The outputs of a fake search through the client, with the inputs of each step.
+    rng = torch.Generator().manual_seed(seed)
+    obs = torch.randn(seed + 1, 5, generator=rng)
+    trajectory = [(obs, client.initial_inference(obs))]
+    latent_state = trajectory[0][1].latent_state
+    for step in range(num_steps):
+        action = torch.randint(3, (seed + 1, ), generator=rng)
+        output = client.recurrent_inference(latent_state, action, afterstate=step % 2 == 1)
+        trajectory.append((action, output))
+        latent_state = output.latent_state
+    return trajectory
+
+
+def _check(model, trajectory):
+    obs, output = trajectory[0]
+    expected = model.initial_inference(obs)
+    assert torch.allclose(output.latent_state, expected.latent_state, atol=1e-6)
+    assert torch.allclose(output.policy_logits, expected.policy_logits, atol=1e-6)
+    assert np.allclose(output.reward, 0.)
+    latent_state = expected.latent_state
+    for step, (action, output) in enumerate(trajectory[1:]):
+        expected = model.recurrent_inference(latent_state, action, afterstate=step % 2 == 1)
+        for name in ['value', 'reward', 'policy_logits', 'latent_state']:
+            assert torch.allclose(getattr(output, name), getattr(expected, name), atol=1e-5)
+        latent_state = expected.latent_state
+
+
+def _client_worker(client, seed, result_queue):
+    trajectory = _search(client, seed)
+    # The tensors are sent as numpy arrays, which do not depend on the shared memory of this process.
+    result_queue.put([[np.asarray(x) for x in (inputs, *vars(output).values())] for inputs, output in trajectory])
+
+
+@pytest.mark.unittest
+def test_inference_server_threads():
+    model = FakeModel()
+    server = InferenceServer(model, max_batch_size=64, max_latency=1.)
+    clients = [server.create_client() for _ in range(4)]
+    server.start()
+    trajectories = [None] * len(clients)
+
+    def search(i):
+        trajectories[i] = _search(clients[i], i)
+
+    threads = [threading.Thread(target=search, args=(i, )) for i in range(len(clients))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with torch.no_grad():
+        for trajectory in trajectories:
+            _check(model, trajectory)
+            # The lists in the outputs of the model stay lists.
+            assert isinstance(trajectory[0][1].reward, list)
+    metrics = server.get_metrics()
+    assert metrics['inference_request_num'] == 4 * 21
+    # The searches wait for each other, so that their requests of the same step are batched, except for the
+    # ``afterstate`` steps, which call the model with other keyword arguments.
+    assert metrics['inference_requests_per_call'] > 1
+    server.close()
+
+
+@pytest.mark.unittest
+def test_inference_server_process():
+    model = FakeModel()
+    ctx = mp.get_context('spawn')
+    server = InferenceServer(model, max_latency=0.01, mp_context=ctx)
+    server.start()
+    result_queue = ctx.Queue()
+    processes = [ctx.Process(target=_client_worker, args=(server.create_client(), i, result_queue)) for i in range(2)]
+    for p in processes:
+        p.start()
+    results = [result_queue.get(timeout=60) for _ in processes]
+    for p in processes:
+        p.join()
+    with torch.no_grad():
+        for result in results:
+            _check(model, [(torch.from_numpy(x), MZNetworkOutput(*map(torch.from_numpy, y))) for x, *y in result])
+    # The weights loaded into the server are used by the next requests.
+    new_model = FakeModel()
+    server.load_state_dict(new_model.state_dict())
+    client = server.create_client()
+    with torch.no_grad():
+        _check(new_model, _search(client, 0))
+    server.close()
+
+
+@pytest.mark.unittest
+def test_inference_server_error():
+    server = InferenceServer(FakeModel(), buffer_size=1024)
+    client = server.create_client()
+    server.start()
+    with pytest.raises(RuntimeError, match='compute_policy_value'):
+        client.compute_policy_value(torch.zeros(2, 4))
+    # The keyword arguments which cannot be grouped only fail their request.
+    with pytest.raises(RuntimeError, match='compute_policy_value'):
+        client.compute_policy_value(torch.zeros(2, 5), mask=[1])
+    probs, values = client.compute_policy_value(torch.zeros(2, 5))
+    assert probs.shape == (2, 3) and values.shape == (2, 1)
+    # The requests larger than the shared buffer are rejected by the client.
+    with pytest.raises(ValueError):
+        client.compute_policy_value(torch.zeros(100, 5))
+    server.close()
+    with pytest.raises(RuntimeError, match='closed'):
+        client.compute_policy_value(torch.zeros(2, 5))
@@ -0,0 +1,94 @@
+from functools import partial
+
+import numpy as np
+import pytest
+from ding.envs import BaseEnvManager
+from ding.utils import deep_merge_dicts
+from easydict import EasyDict
+
+from lzero.policy.muzero import MuZeroPolicy
+from lzero.worker import MuZeroCollector
+from zoo.board_games.tictactoe.config.tictactoe_muzero_bot_mode_config import main_config
+from zoo.board_games.tictactoe.envs.tictactoe_env import TicTacToeEnv
+
+POLICY_KWARGS = {'temperature': 1., 'epsilon': 0.}
+
+
+class FirstLegalActionPolicy(object):
+    """
+    Overview:
+        The collect mode of a MuZero-like policy which plays the first legal action, so that all the games of \
+        the self-play tictactoe are the same.
+    """
+
+    def forward(self, data, action_mask, temperature, to_play, epsilon, ready_env_id):
+        output = {}
+        for env_id, mask in zip(ready_env_id, action_mask):
+            legal_actions = np.flatnonzero(mask)
+            visit_count_distributions = [1 if action == legal_actions[0] else 0 for action in legal_actions]
+            output[env_id] = {
+                'action': int(legal_actions[0]),
+                'visit_count_distributions': visit_count_distributions,
+                'visit_count_distribution_entropy': 0.,
+                'searched_value': 0.5,
+                'predicted_value': 0.,
+            }
+        return output
+
+    def reset(self, env_id=None, **kwargs):
+        pass
+
+    def get_attribute(self, name):
+        assert name == 'cfg'
+        return EasyDict(type='muzero')
+
+
+def create_collector(tmp_path, env_num: int, collect_async: bool) -> MuZeroCollector:
+    env_cfg = EasyDict(deep_merge_dicts(TicTacToeEnv.default_config(), main_config.env))
+    env_cfg.battle_mode = 'self_play_mode'
+    env = BaseEnvManager([partial(TicTacToeEnv, env_cfg) for _ in range(env_num)], BaseEnvManager.default_config())
+    env.seed(0)
+    policy_config = EasyDict(deep_merge_dicts(MuZeroPolicy.default_config(), main_config.policy))
+    policy_config.device = 'cpu'
+    policy_config.game_segment_length = 3
+    policy_config.collect_async = collect_async
+    return MuZeroCollector(
+        env=env,
+        policy=FirstLegalActionPolicy(),
+        exp_name=str(tmp_path / 'collector'),
+        instance_name='collect_async' if collect_async else 'collect_sync',
+        policy_config=policy_config
+    )
+
+
+def assert_same_data(data, expected):
+    game_segments, meta_data = data
+    expected_game_segments, expected_meta_data = expected
+    assert len(game_segments) == len(expected_game_segments)
+    for game_segment, expected_game_segment in zip(game_segments, expected_game_segments):
+        for name in ['obs_segment', 'action_segment', 'reward_segment', 'root_value_segment', 'child_visit_segment',
+                     'to_play_segment', 'action_mask_segment']:
+            assert np.array_equal(
+                np.asarray(getattr(game_segment, name)), np.asarray(getattr(expected_game_segment, name))
+            ), name
+    assert [m['done'] for m in meta_data] == [m['done'] for m in expected_meta_data]
+    for m, expected_m in zip(meta_data, expected_meta_data):
+        assert np.array_equal(m['priorities'], expected_m['priorities'])
+
+
+@pytest.mark.unittest
+def test_muzero_collector_async(tmp_path):
+    env_num = 3
+    sync_collector = create_collector(tmp_path, env_num, collect_async=False)
+    async_collector = create_collector(tmp_path, env_num, collect_async=True)
+    expected = sync_collector.collect(n_episode=env_num, train_iter=0, policy_kwargs=POLICY_KWARGS)
+    # A game of 7 moves is saved in 3 game segments.
+    assert len(expected[0]) == 3 * env_num
+    # The games of the envs are the same and finish together, so that the async collection stops at the same step.
+    for train_iter in range(2):
+        data = async_collector.collect(n_episode=env_num, train_iter=train_iter, policy_kwargs=POLICY_KWARGS)
+        assert_same_data(data, expected)
+        assert async_collector._total_episode_count == (train_iter + 1) * env_num
+        assert async_collector.envstep == (train_iter + 1) * sync_collector.envstep
+    sync_collector.close()
+    async_collector.close()
@@ -314,6 +314,8 @@ class Connect4Env(BaseEnv):
         self.players = [1, 2]
         self.start_player_index = start_player_index
         self._current_player = self.players[self.start_player_index]
+        # The cells filled by ``push_action`` and not yet emptied by ``pop_action``.
+        self._action_stack = []
 
         self._action_space = spaces.Discrete(7)
         self._reward_space = spaces.Box(low=-1, high=1, shape=(1,), dtype=np.float32)
@@ -668,6 +670,31 @@ class Connect4Env(BaseEnv):
     def reward_space(self) -> spaces.Space:
         return self._reward_space
 
+    def push_action(self, action: int) -> None:
+        """
+        Overview:
+            Drop a piece of the current player in the column ``action`` in place and pass the turn, without computing \
+            the observation. Used by the AlphaZero MCTS to walk down the search tree, the action is undone by \
+            ``pop_action``.
+        Arguments:
+            - action (:obj:`int`): A legal column from 0 to 6.
+        """
+        piece = self.players.index(self._current_player) + 1
+        for i in range(35 + action, -1, -7):
+            if self.board[i] == 0:
+                self.board[i] = piece
+                self._action_stack.append(i)
+                break
+        self._current_player = self.next_player
+
+    def pop_action(self) -> None:
+        """
+        Overview:
+            Undo the last action applied by ``push_action``.
+        """
+        self.board[self._action_stack.pop()] = 0
+        self._current_player = self.next_player
+
     def simulate_action(self, action: int) -> Any:
         """
         Overview:
@@ -134,3 +134,17 @@ class TestConnect4Env:
                 else:
                     print('draw')
                 break
+
+    def test_push_pop_action(self) -> None:
+        cfg = Connect4Env.default_config()
+        cfg.battle_mode = 'self_play_mode'
+        env = Connect4Env(cfg)
+        env.reset()
+        init_board, init_player = list(env.board), env.current_player
+        num_actions = 0
+        while not env.get_done_winner()[0]:
+            env.push_action(env.random_action())
+            num_actions += 1
+        for _ in range(num_actions):
+            env.pop_action()
+        assert env.board == init_board and env.current_player == init_player
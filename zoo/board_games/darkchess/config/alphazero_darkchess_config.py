@@ -88,6 +88,8 @@ darkchess_alphazero_config = dict(
         entropy_weight=0.001,
         simulation_env_id='darkchess',
         simulation_env_config_type='self_play',
+        # Evaluate the MCTS leaves of all the collector envs in batched forward calls.
+        mcts=dict(batched_search=True, leaf_batch_size=8, reuse_tree=True),
 
         # NOTE：In board_games, we set large td_steps to make sure the value target is the final outcome.
         td_steps=int(board_width * board_height / 2),  # for battle_mode='play_with_bot_mode'
@@ -107,6 +109,8 @@ darkchess_alphazero_create_config = dict(         # 建立環境與 policy 的
         import_names=['zoo.board_games.darkchess.envs.darkchess_alphazero_env'],
     ),
     env_manager=dict(type='subprocess'),
+    # Steps all the envs together in one process, only for battle_mode='self_play_mode':
+    # env_manager=dict(type='darkchess_vec', import_names=['zoo.board_games.darkchess.envs.darkchess_vec_env']),
     policy=dict(
         type='alphazero',
         import_names=['lzero.policy.alphazero'],
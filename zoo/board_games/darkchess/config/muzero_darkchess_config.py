@@ -93,6 +93,8 @@ darkchess_muzero_config = dict(
         discount_factor=1,
         weight_decay=1e-4,
         game_segment_length=200,  # TODO:
+        # Store the one-hot observation planes as the int8 board, which is 64x smaller.
+        obs_codec='board',
               
     ),
 )
@@ -105,6 +107,8 @@ darkchess_muzero_create_config = dict(
         import_names=['zoo.board_games.darkchess.envs.darkchess_env'],
     ),
     env_manager=dict(type='subprocess'),
+    # Steps all the envs together in one process, only for battle_mode='self_play_mode':
+    # env_manager=dict(type='darkchess_vec', import_names=['zoo.board_games.darkchess.envs.darkchess_vec_env']),
     policy=dict(
         type='muzero',
         import_names=['lzero.policy.muzero'],
@@ -107,6 +107,8 @@ darkchess_stochastic_muzero_create_config = dict(
         import_names=['zoo.board_games.darkchess.envs.darkchess_env'],
     ),
     env_manager=dict(type='subprocess'),
+    # Steps all the envs together in one process, only for battle_mode='self_play_mode':
+    # env_manager=dict(type='darkchess_vec', import_names=['zoo.board_games.darkchess.envs.darkchess_vec_env']),
     policy=dict(
         type='stochastic_muzero',
         import_names=['lzero.policy.stochastic_muzero'],
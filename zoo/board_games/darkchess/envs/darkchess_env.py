@@ -2,8 +2,7 @@ import copy
 import logging
 import os
 import sys
-from functools import lru_cache
-from typing import List
+from typing import List, Optional, Tuple
 
 import gymnasium as gym
 import numpy as np
@@ -11,26 +10,14 @@ from ding.envs import BaseEnv, BaseEnvTimestep
 from ding.utils import ENV_REGISTRY
 from easydict import EasyDict
 
-# from zoo.board_games.darkchess.envs.get_done_winner_cython import get_done_winner_cython
-from zoo.board_games.darkchess.envs.legal_actions_cython import legal_actions_cython
+from zoo.board_games.darkchess.envs.darkchess_rules_cython import COLOR_BLACK, COLOR_RED, COLOR_UNKNOWN, \
+    legal_action_mask_cython
+from zoo.board_games.darkchess.envs.transposition_table import ZOBRIST_COLOR, ZOBRIST_PIECE, TranspositionTable, \
+    zobrist_hash
 
+# Map ``player_color`` to the color id used by the rules engine.
+_COLOR_ID = {'U': COLOR_UNKNOWN, 'R': COLOR_RED, 'B': COLOR_BLACK}
 
-@lru_cache(maxsize=1024)
-def _legal_actions_func_lru(board_tuple, player_color):
-    # Convert tuple to NumPy array.
-    board_array = np.array(board_tuple, dtype=np.int32)
-    # Convert NumPy array to memory view.
-    board_view = board_array.view(dtype=np.int32).reshape(board_array.shape)
-    return legal_actions_cython(DarkchessEnv.get_all_actions(), board_view, player_color)
-
-
-# @lru_cache(maxsize=512)
-# def _get_done_winner_func_lru(board_size, board_tuple):
-#     # Convert tuple to NumPy array.
-#     board_array = np.array(board_tuple, dtype=np.int32)
-#     # Convert NumPy array to memory view.
-#     board_view = board_array.view(dtype=np.int32).reshape(board_array.shape)
-#     return get_done_winner_cython(board_size, board_view)
 
 @ENV_REGISTRY.register('darkchess')
 class DarkchessEnv(BaseEnv):
@@ -58,6 +45,9 @@ class DarkchessEnv(BaseEnv):
         long_catch=3,
         # (int) The number of no-eat-flip moves needed to draw.
         no_eat_flip=180,
+        # (int) The max number of positions kept in the transposition table, which memoizes the legal action mask and
+        # the encoded observation of a position by its Zobrist hash. 0 disables the table.
+        transposition_table_size=int(1e5),
     )
 
     # Generate all actions
@@ -107,6 +97,7 @@ class DarkchessEnv(BaseEnv):
         self.agent_vs_human = cfg.agent_vs_human
         self.long_catch = cfg.long_catch
         self.no_eat_flip = cfg.no_eat_flip
+        self._transposition_table = TranspositionTable(cfg.get('transposition_table_size', int(1e5)))
 
         # 0 = Player 1, 1 = Player 2
         self.players = [0, 1]
@@ -149,6 +140,7 @@ class DarkchessEnv(BaseEnv):
             self.board = np.array(copy.deepcopy(init_state), dtype=np.int64)
         else:
             self.board = np.full((self.board_height, self.board_width), 15, dtype=np.int64)
+        self.zobrist_hash = zobrist_hash(self.board)
 
         """
         The remaining number of all pieces.
@@ -160,14 +152,15 @@ class DarkchessEnv(BaseEnv):
         self.flipped_chess_count = np.array([1, 2, 2, 2, 2, 2, 5, 1, 2, 2, 2, 2, 2, 5])
         self.continuous_move_count = 0
         self.action_history = []
+        # The undo records of the actions applied by ``push_action`` and not yet undone by ``pop_action``.
+        self._undo_stack = []
         # U = unknown, R = red, B = black
         self.player_color = ['U', 'U']
         self._current_player = 0
         # Chance outcome
         self.chance = 0
 
-        action_mask = np.zeros(self.total_num_actions, np.int8)
-        action_mask[self.legal_actions] = 1
+        action_mask = self.legal_action_mask
 
         # In ``play_with_bot_mode`` and ``eval_mode``, we need to set the "to_play" parameter in the "obs" dict to -1,
         # because we don't take into account the alternation between players.
@@ -185,7 +178,7 @@ class DarkchessEnv(BaseEnv):
 
     def step(self, action_id: int, flip_chess=None):
         action = self.all_actions[action_id]
-        assert (self.is_legal_action(action))
+        assert self._legal_action_mask(self.player_color[self.current_player])[action_id] == 1
 
         if self.battle_mode == 'self_play_mode':
             self.action_history.append(action_id)
@@ -284,8 +277,7 @@ class DarkchessEnv(BaseEnv):
 
         if done:
             info['eval_episode_return'] = reward
-        action_mask = np.zeros(self.total_num_actions, np.int8)
-        action_mask[self.legal_actions] = 1
+        action_mask = self.legal_action_mask
         obs = {
             'observation': self.encode_board(),
             'action_mask': action_mask,
@@ -297,6 +289,12 @@ class DarkchessEnv(BaseEnv):
         return BaseEnvTimestep(obs, reward, done, info)
 
     def encode_board(self):
+        entry = self._get_transposition_entry(self.player_color[self.current_player])
+        if 'observation' not in entry:
+            entry['observation'] = self._encode_board()
+        return entry['observation'].copy()
+
+    def _encode_board(self):
         # Each layer stands for one state, if fits then marked as 1, otherwise 0.
         # Use broadcasting in numpy to be more efficiency.
         state = np.array([_ for _ in range(16)])
@@ -402,11 +400,17 @@ class DarkchessEnv(BaseEnv):
             self.continuous_move_count = 0
         else:
             self.continuous_move_count += 1
+        src_square, dst_square = src[0] * self.board_width + src[1], dst[0] * self.board_width + dst[1]
+        self.zobrist_hash ^= ZOBRIST_PIECE[src_square][self.board[src]] ^ ZOBRIST_PIECE[src_square][14] \
+            ^ ZOBRIST_PIECE[dst_square][dst_chess] ^ ZOBRIST_PIECE[dst_square][self.board[src]]
         self.board[dst] = self.board[src]
         self.board[src] = 14
 
-    def flip(self, action: tuple, flip_chess=None):
-        if self.battle_mode == 'play_with_bot_mode':
+    def flip(self, action: tuple, flip_chess=None, chess_id=None):
+        if chess_id is not None:
+            # MCTS 的機會節點會指定翻出的棋
+            assert self.flipped_chess_count[chess_id] > 0
+        elif self.battle_mode == 'play_with_bot_mode':
             # 在使用平台對弈時翻棋會傳入翻出的棋
             chess_id = np.where(self.chess_name == flip_chess)[0][0]
         else:
@@ -423,6 +427,8 @@ class DarkchessEnv(BaseEnv):
 
         self.chess_count[15] -= 1
         self.flipped_chess_count[chess_id] -= 1
+        square = action[0][0] * self.board_width + action[0][1]
+        self.zobrist_hash ^= ZOBRIST_PIECE[square][15] ^ ZOBRIST_PIECE[square][chess_id]
         self.board[action[0]] = chess_id
         self.continuous_move_count = 0
 
@@ -431,12 +437,8 @@ class DarkchessEnv(BaseEnv):
     def get_done_winner(self):
         # TODO: get done winner
         # 若對手無步可走，則當前玩家獲勝
-        self.current_player = self.next_player
-        if len(self.legal_actions) == 0:
-            self.current_player = self.next_player
+        if not self._legal_action_mask(self.player_color[self.next_player]).any():
             return True, self.current_player
-        else:
-            self.current_player = self.next_player
 
         # 超過指定步數無吃翻
         if self.continuous_move_count >= self.no_eat_flip:
@@ -490,8 +492,91 @@ class DarkchessEnv(BaseEnv):
     def close(self) -> None:
         pass
 
+    def chance_outcomes(self, action_id: int) -> Optional[List[Tuple[int, float]]]:
+        """
+        Overview:
+            The exact distribution of the chess revealed by ``action_id``, computed from the remaining dark chess.
+            Used by the AlphaZero MCTS to expand the chance node of a flip.
+        Arguments:
+            - action_id (:obj:`int`): A legal action of the current player.
+        Returns:
+            - outcomes (:obj:`Optional[List[Tuple[int, float]]]`): The (chess_id, probability) of every chess that may \
+                be flipped, or None if ``action_id`` is a move.
+        """
+        action = self.all_actions[action_id]
+        if action[0] != action[1]:
+            return None
+        num_dark = self.chess_count[15]
+        return [(int(chess_id), self.flipped_chess_count[chess_id] / num_dark)
+                for chess_id in np.flatnonzero(self.flipped_chess_count)]
+
+    def push_action(self, action_id: int, chance: Optional[int] = None) -> None:
+        """
+        Overview:
+            Apply ``action_id`` of the current player in place and pass the turn, without computing the reward and the
+            observation. The chess of a flip is ``chance`` if given, otherwise it is sampled as in ``step``. Used by
+            the AlphaZero MCTS to walk down the search tree, the action is undone by ``pop_action``.
+        Arguments:
+            - action_id (:obj:`int`): A legal action of the current player.
+            - chance (:obj:`Optional[int]`): The chess_id revealed by a flip, one of ``chance_outcomes(action_id)``.
+        """
+        action = self.all_actions[action_id]
+        self._undo_stack.append(
+            (
+                action_id, self.board[action[0]], self.board[action[1]], list(self.player_color),
+                self.continuous_move_count, self.chance, self.zobrist_hash
+            )
+        )
+        self.action_history.append(action_id)
+        if action[0] == action[1]:
+            self.chance = self.flip(action, chess_id=chance)
+        else:
+            self.move(action)
+            self.chance = 0
+        self.current_player = self.next_player
+
+    def pop_action(self) -> None:
+        """
+        Overview:
+            Undo the last action applied by ``push_action``.
+        """
+        action_id, src_chess, dst_chess, self.player_color, self.continuous_move_count, self.chance, \
+            self.zobrist_hash = self._undo_stack.pop()
+        action = self.all_actions[action_id]
+        self.action_history.pop()
+        if action[0] == action[1]:
+            # 把翻開的棋蓋回去
+            self.chess_count[15] += 1
+            self.flipped_chess_count[self.board[action[0]]] += 1
+        elif dst_chess != 14:
+            self.chess_count[dst_chess] += 1
+        self.board[action[0]] = src_chess
+        self.board[action[1]] = dst_chess
+        self.current_player = self.next_player
+
     def clone(self):
-        return copy.deepcopy(self)
+        # The clones share the transposition table.
+        return copy.deepcopy(self, {id(self._transposition_table): self._transposition_table})
+
+    def _get_transposition_entry(self, color: str) -> dict:
+        """
+        Overview:
+            Get the transposition table entry of the current board with the player of ``color`` to play. The entry is
+            a dict filled lazily with the ``legal_action_mask`` and the ``observation`` of the position.
+        """
+        key = self.zobrist_hash ^ ZOBRIST_COLOR[color]
+        entry = self._transposition_table.get(key)
+        if entry is None:
+            entry = {}
+            self._transposition_table.put(key, entry)
+        return entry
+
+    def _legal_action_mask(self, color: str) -> np.ndarray:
+        # NOTE: the returned mask is shared with the transposition table and must not be modified.
+        entry = self._get_transposition_entry(color)
+        if 'legal_action_mask' not in entry:
+            entry['legal_action_mask'] = legal_action_mask_cython(self.board, _COLOR_ID[color])
+        return entry['legal_action_mask']
 
     def action_to_string(self, action_id: int):
         # TODO: chess_id to char
@@ -552,8 +637,15 @@ class DarkchessEnv(BaseEnv):
 
     @property
     def legal_actions(self):
-        # Convert NumPy arrays to nested tuples to make them hashable.
-        return _legal_actions_func_lru(tuple(map(tuple, self.board)), self.player_color[self.current_player])
+        return np.flatnonzero(self._legal_action_mask(self.player_color[self.current_player])).tolist()
+
+    @property
+    def legal_action_mask(self):
+        return self._legal_action_mask(self.player_color[self.current_player]).copy()
+
+    @property
+    def transposition_table(self) -> TranspositionTable:
+        return self._transposition_table
     
     # @property
     # def legal_actions(self):
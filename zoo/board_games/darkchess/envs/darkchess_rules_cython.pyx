@@ -0,0 +1,248 @@
+"""
+Overview:
+    Table-driven rules engine of Dark Chess (暗棋) on the 4x8 board.
+    The position is read as a flat array of 32 squares (square = row * 4 + col) and all geometric information is
+    precomputed once at import time: the adjacent squares of every square, the four cannon rays of every square,
+    the capture relation between piece types and the ``action_id`` of every (src, dst) pair. The legal action mask is
+    then generated in a single pass over the 32 squares instead of testing all 352 actions one by one.
+    The ``action_id`` layout is exactly the one of ``DarkchessEnv.all_actions``.
+Piece encoding:
+    0 ~ 6: 帥 (K)、仕 (G)、相 (M)、俥 (R)、傌 (N)、炮 (C)、兵 (P)
+    7 ~ 13: 將 (k)、士 (g)、象 (m)、車 (r)、馬 (n)、包 (c)、卒 (p)
+    14: 空格 (-) 15: 暗子 (X)
+"""
+from libc.stdint cimport int8_t, int64_t
+import cython
+import numpy as np
+
+cdef enum:
+    BOARD_HEIGHT = 8
+    BOARD_WIDTH = 4
+    NUM_SQUARES = 32
+    NUM_ACTIONS = 352
+    EMPTY = 14
+    DARK = 15
+
+# Player colors, consistent with ``DarkchessEnv.player_color`` ('U', 'R', 'B').
+cdef enum:
+    C_COLOR_UNKNOWN = 0
+    C_COLOR_RED = 1
+    C_COLOR_BLACK = 2
+
+COLOR_UNKNOWN = C_COLOR_UNKNOWN
+COLOR_RED = C_COLOR_RED
+COLOR_BLACK = C_COLOR_BLACK
+
+cdef int ACTION_ID[NUM_SQUARES][NUM_SQUARES]
+cdef int NEIGHBOR[NUM_SQUARES][4]
+cdef int NEIGHBOR_NUM[NUM_SQUARES]
+# Cannon rays in the order of up, down, left, right, from the nearest square to the farthest one.
+cdef int RAY[NUM_SQUARES][4][BOARD_HEIGHT - 1]
+cdef int RAY_LEN[NUM_SQUARES][4]
+# CAN_CAPTURE[attacker][target] for the capture on an adjacent square. Cannons only capture by jumping.
+cdef bint CAN_CAPTURE[14][14]
+
+
+cdef void _init_tables():
+    cdef int i, j, k, src, dst, action_id = 0
+    cdef int attacker, target, attacker_value, target_value
+    cdef int d, row, col, n
+    cdef int drow[4]
+    cdef int dcol[4]
+    drow[:] = [-1, 1, 0, 0]
+    dcol[:] = [0, 0, -1, 1]
+
+    for src in range(NUM_SQUARES):
+        for dst in range(NUM_SQUARES):
+            ACTION_ID[src][dst] = -1
+
+    # Same enumeration order as ``DarkchessEnv.all_actions``: for every square (i, j), the flip action first, then the
+    # moves along the column ending at (i, j), then the moves along the row starting from (i, j).
+    for i in range(BOARD_HEIGHT):
+        for j in range(BOARD_WIDTH):
+            dst = i * BOARD_WIDTH + j
+            ACTION_ID[dst][dst] = action_id
+            action_id += 1
+            for k in range(BOARD_HEIGHT):
+                if k != i:
+                    ACTION_ID[k * BOARD_WIDTH + j][dst] = action_id
+                    action_id += 1
+            for k in range(BOARD_WIDTH):
+                if k != j:
+                    ACTION_ID[dst][i * BOARD_WIDTH + k] = action_id
+                    action_id += 1
+
+    for src in range(NUM_SQUARES):
+        NEIGHBOR_NUM[src] = 0
+        for d in range(4):
+            RAY_LEN[src][d] = 0
+            row = src // BOARD_WIDTH + drow[d]
+            col = src % BOARD_WIDTH + dcol[d]
+            if 0 <= row < BOARD_HEIGHT and 0 <= col < BOARD_WIDTH:
+                NEIGHBOR[src][NEIGHBOR_NUM[src]] = row * BOARD_WIDTH + col
+                NEIGHBOR_NUM[src] += 1
+            while 0 <= row < BOARD_HEIGHT and 0 <= col < BOARD_WIDTH:
+                RAY[src][d][RAY_LEN[src][d]] = row * BOARD_WIDTH + col
+                RAY_LEN[src][d] += 1
+                row += drow[d]
+                col += dcol[d]
+
+    for attacker in range(14):
+        for target in range(14):
+            # The value of K/k is 7 and the value of P/p is 1.
+            attacker_value = 7 - attacker % 7
+            target_value = 7 - target % 7
+            if (attacker < 7) == (target < 7) or attacker % 7 == 5:
+                CAN_CAPTURE[attacker][target] = False
+            elif attacker % 7 == 0 and target % 7 == 6:
+                CAN_CAPTURE[attacker][target] = False  # 帥不能吃卒
+            elif attacker % 7 == 6 and target % 7 == 0:
+                CAN_CAPTURE[attacker][target] = True  # 兵可以吃將
+            else:
+                CAN_CAPTURE[attacker][target] = attacker_value >= target_value
+
+
+_init_tables()
+
+
+cdef inline bint _is_own(int chess, int color) nogil:
+    if color == C_COLOR_RED:
+        return 0 <= chess <= 6
+    elif color == C_COLOR_BLACK:
+        return 7 <= chess <= 13
+    return False
+
+
+cdef inline bint _is_opponent(int chess, int color) nogil:
+    if color == C_COLOR_RED:
+        return 7 <= chess <= 13
+    elif color == C_COLOR_BLACK:
+        return 0 <= chess <= 6
+    return False
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef int _gen_legal_actions(const int64_t[:, :] board, int color, int8_t * mask, bint stop_at_first) nogil:
+    """
+    Mark the legal actions of the player with ``color`` in ``mask`` (if not NULL) and return their number.
+    If ``stop_at_first`` is True, return as soon as one legal action is found.
+    """
+    cdef int src, dst, chess, target, n, d, k, count = 0
+    cdef bint screen
+
+    for src in range(NUM_SQUARES):
+        chess = board[src // BOARD_WIDTH, src % BOARD_WIDTH]
+        if chess == DARK:
+            # 翻棋
+            if mask != NULL:
+                mask[ACTION_ID[src][src]] = 1
+            count += 1
+            if stop_at_first:
+                return count
+        elif _is_own(chess, color):
+            # 移動到相鄰空格或吃相鄰的子
+            for n in range(NEIGHBOR_NUM[src]):
+                dst = NEIGHBOR[src][n]
+                target = board[dst // BOARD_WIDTH, dst % BOARD_WIDTH]
+                if target == EMPTY or (target < 14 and CAN_CAPTURE[chess][target]):
+                    if mask != NULL:
+                        mask[ACTION_ID[src][dst]] = 1
+                    count += 1
+                    if stop_at_first:
+                        return count
+            if chess % 7 == 5:
+                # 炮/包必須隔著一顆棋（含暗子）吃子
+                for d in range(4):
+                    screen = False
+                    for k in range(RAY_LEN[src][d]):
+                        dst = RAY[src][d][k]
+                        target = board[dst // BOARD_WIDTH, dst % BOARD_WIDTH]
+                        if target == EMPTY:
+                            continue
+                        if not screen:
+                            screen = True
+                            continue
+                        if _is_opponent(target, color):
+                            if mask != NULL:
+                                mask[ACTION_ID[src][dst]] = 1
+                            count += 1
+                            if stop_at_first:
+                                return count
+                        break
+    return count
+
+
+def legal_action_mask_cython(const int64_t[:, :] board, int color):
+    """
+    Overview:
+        Generate the legal action mask of the player with ``color`` in one pass over the board.
+    Arguments:
+        - board (:obj:`np.ndarray`): The (8, 4) int64 board.
+        - color (:obj:`int`): One of ``COLOR_UNKNOWN``, ``COLOR_RED`` and ``COLOR_BLACK``.
+    Returns:
+        - mask (:obj:`np.ndarray`): The int8 action mask of shape (352, ).
+    """
+    mask = np.zeros(NUM_ACTIONS, dtype=np.int8)
+    cdef int8_t[::1] mask_view = mask
+    _gen_legal_actions(board, color, &mask_view[0], False)
+    return mask
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def legal_action_mask_batch_cython(const int64_t[:, :, :] boards, const int64_t[:] colors):
+    """
+    Overview:
+        Batch version of ``legal_action_mask_cython`` for the stacked boards of several games.
+    Arguments:
+        - boards (:obj:`np.ndarray`): The (N, 8, 4) int64 boards.
+        - colors (:obj:`np.ndarray`): The (N, ) int64 colors of the player to play in each game.
+    Returns:
+        - masks (:obj:`np.ndarray`): The int8 action masks of shape (N, 352).
+    """
+    cdef Py_ssize_t i, n = boards.shape[0]
+    masks = np.zeros((n, NUM_ACTIONS), dtype=np.int8)
+    cdef int8_t[:, ::1] masks_view = masks
+    with nogil:
+        for i in range(n):
+            _gen_legal_actions(boards[i], <int> colors[i], &masks_view[i, 0], False)
+    return masks
+
+
+def legal_actions_cython(const int64_t[:, :] board, int color):
+    """
+    Overview:
+        Return the legal ``action_id`` of the player with ``color`` in ascending order.
+    """
+    cdef int8_t mask[NUM_ACTIONS]
+    cdef int i
+    cdef list legal_actions = []
+    for i in range(NUM_ACTIONS):
+        mask[i] = 0
+    _gen_legal_actions(board, color, mask, False)
+    for i in range(NUM_ACTIONS):
+        if mask[i]:
+            legal_actions.append(i)
+    return legal_actions
+
+
+def has_legal_action_cython(const int64_t[:, :] board, int color):
+    """
+    Overview:
+        Whether the player with ``color`` has at least one legal action. Returns at the first legal action found.
+    """
+    return _gen_legal_actions(board, color, NULL, True) > 0
+
+
+def action_id_table():
+    """
+    Overview:
+        Return the (32, 32) ``action_id`` table indexed by ``[src_square, dst_square]``, -1 for the impossible pairs.
+    """
+    table = np.empty((NUM_SQUARES, NUM_SQUARES), dtype=np.int32)
+    cdef int src, dst
+    for src in range(NUM_SQUARES):
+        for dst in range(NUM_SQUARES):
+            table[src, dst] = ACTION_ID[src][dst]
+    return table
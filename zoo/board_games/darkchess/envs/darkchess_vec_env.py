@@ -0,0 +1,258 @@
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import numpy as np
+from ding.envs import BaseEnvManager, BaseEnvTimestep
+from ding.envs.env_manager.base_env_manager import EnvState
+from ding.utils import ENV_MANAGER_REGISTRY
+from easydict import EasyDict
+
+from zoo.board_games.darkchess.envs.darkchess_rules_cython import COLOR_BLACK, COLOR_RED, action_id_table, \
+    legal_action_mask_batch_cython
+
+# The src/dst square (row * 4 + col) of every action_id, in the layout of ``DarkchessEnv.all_actions``.
+_ACTION_ID_TABLE = action_id_table()
+_ACTION_SRC, _ACTION_DST = (np.zeros(352, dtype=np.int64) for _ in range(2))
+for _src, _dst in zip(*np.nonzero(_ACTION_ID_TABLE >= 0)):
+    _ACTION_SRC[_ACTION_ID_TABLE[_src, _dst]] = _src
+    _ACTION_DST[_ACTION_ID_TABLE[_src, _dst]] = _dst
+
+_INIT_CHESS_COUNT = np.array([1, 2, 2, 2, 2, 2, 5, 1, 2, 2, 2, 2, 2, 5, 0, 32], dtype=np.int64)
+_COLOR_NAME = ['U', 'R', 'B']
+_EMPTY, _DARK = 14, 15
+
+
+@ENV_MANAGER_REGISTRY.register('darkchess_vec')
+class DarkchessVecEnv(BaseEnvManager):
+    """
+    Overview:
+        Env manager which runs ``env_num`` Dark Chess games in the main process as stacked NumPy arrays, e.g. the boards
+        are kept in one (N, 8, 4) array. Moves, flips, legal action masks, done/winner checks and observation encoding
+        are done as batch operations over all the games stepped together, so no subprocess env manager is needed.
+        The sub-environment built by ``env_fn`` is only used as the reference of the env config and spaces, both
+        ``DarkchessEnv`` and its AlphaZero variant (17 feature layers with the current player layer) are supported.
+        Only ``self_play_mode`` is supported and the reset params (e.g. ``init_state``) are ignored.
+        It is used by setting ``env_manager=dict(type='darkchess_vec', import_names=[...])`` in the create config.
+    Interfaces:
+        reset, step, seed, close, launch, default_config
+    Properties:
+        env_num, env_ref, ready_obs, ready_obs_id, ready_obs_batch, done, closed, observation_space, action_space, \
+        reward_space
+    """
+
+    def __init__(
+            self,
+            env_fn: List[Callable],
+            cfg: EasyDict = EasyDict({}),
+    ) -> None:
+        super().__init__(env_fn, cfg)
+        env = self._env_ref
+        assert env.battle_mode == 'self_play_mode', "DarkchessVecEnv only supports the self_play_mode"
+        self._board_shape = (env.board_height, env.board_width)
+        self._board_feature_layer = env.board_feature_layer
+        self._long_catch = env.long_catch
+        self._no_eat_flip = env.no_eat_flip
+        self._chess_weight = np.array(env.chess_weight, dtype=np.float32)
+        self._rng = np.random.RandomState()
+
+    def _create_state(self) -> None:
+        env_num = self._env_num
+        self._env_episode_count = {i: 0 for i in range(env_num)}
+        self._ready_obs = {i: None for i in range(env_num)}
+        self._env_states = {i: EnvState.INIT for i in range(env_num)}
+        self._board = np.full((env_num, *self._board_shape), _DARK, dtype=np.int64)
+        self._chess_count = np.tile(_INIT_CHESS_COUNT, (env_num, 1))
+        self._flipped_chess_count = np.tile(_INIT_CHESS_COUNT[:14], (env_num, 1))
+        self._continuous_move_count = np.zeros(env_num, dtype=np.int64)
+        self._current_player = np.zeros(env_num, dtype=np.int64)
+        # The color id of both players in every game, see ``darkchess_rules_cython``.
+        self._player_color = np.zeros((env_num, 2), dtype=np.int64)
+        self._chance = np.zeros(env_num, dtype=np.int64)
+        # The most recent ``long_catch * 4`` actions of every game, used to detect the long catch.
+        self._recent_actions = np.full((env_num, self._long_catch * 4), -1, dtype=np.int64)
+        self._closed = False
+
+    def reset(self, reset_param: Optional[Dict] = None) -> None:
+        """
+        Overview:
+            Reset the games of the given env_ids (all the games if ``reset_param`` is None) to the initial board.
+        """
+        self._check_closed()
+        env_ids = list(range(self._env_num)) if reset_param is None else list(reset_param.keys())
+        self._reset(np.array(env_ids, dtype=np.int64))
+
+    def _reset(self, env_ids: np.ndarray) -> None:
+        self._board[env_ids] = _DARK
+        self._chess_count[env_ids] = _INIT_CHESS_COUNT
+        self._flipped_chess_count[env_ids] = _INIT_CHESS_COUNT[:14]
+        self._continuous_move_count[env_ids] = 0
+        self._current_player[env_ids] = 0
+        self._player_color[env_ids] = 0
+        self._chance[env_ids] = 0
+        self._recent_actions[env_ids] = -1
+        action_mask = legal_action_mask_batch_cython(self._board[env_ids], self._player_color[env_ids, 0])
+        for env_id, obs in zip(env_ids.tolist(), self._encode_obs(env_ids, action_mask)):
+            self._ready_obs[env_id] = obs
+            self._env_states[env_id] = EnvState.RUN
+
+    def step(self, actions: Dict[int, Any]) -> Dict[int, BaseEnvTimestep]:
+        """
+        Overview:
+            Step all the games in ``actions`` together. The finished games are reset automatically when
+            ``auto_reset`` is True, just like ``BaseEnvManager``.
+        Arguments:
+            - actions (:obj:`Dict[int, Any]`): A dict of action_id, key is the env_id.
+        Returns:
+            - timesteps (:obj:`Dict[int, BaseEnvTimestep]`): The timesteps of the stepped games, key is the env_id.
+        """
+        self._check_closed()
+        env_ids = np.array(list(actions.keys()), dtype=np.int64)
+        action = np.array([int(actions[env_id]) for env_id in env_ids.tolist()], dtype=np.int64)
+        for env_id, action_id in zip(env_ids.tolist(), action.tolist()):
+            assert self._ready_obs[env_id]['action_mask'][action_id] == 1, (env_id, action_id)
+
+        board = self._board.reshape(self._env_num, -1)
+        src, dst = _ACTION_SRC[action], _ACTION_DST[action]
+        mover = self._current_player[env_ids]
+        reward = np.zeros(len(env_ids), dtype=np.float32)
+        self._recent_actions[env_ids, :-1] = self._recent_actions[env_ids, 1:]
+        self._recent_actions[env_ids, -1] = action
+
+        # 翻棋: sample the flipped chess from the remaining dark chess of each game.
+        is_flip = src == dst
+        flip_env_ids = env_ids[is_flip]
+        if len(flip_env_ids) > 0:
+            rand = (self._rng.random_sample(len(flip_env_ids)) * self._chess_count[flip_env_ids, _DARK]).astype(np.int64)
+            chess_id = np.argmax(np.cumsum(self._flipped_chess_count[flip_env_ids], axis=1) > rand[:, None], axis=1)
+            # 第一次翻棋後決定雙方顏色
+            flip_mover = mover[is_flip]
+            undecided = self._player_color[flip_env_ids, flip_mover] == 0
+            own_color = np.where(chess_id[undecided] <= 6, COLOR_RED, COLOR_BLACK)
+            self._player_color[flip_env_ids[undecided], flip_mover[undecided]] = own_color
+            self._player_color[flip_env_ids[undecided], 1 - flip_mover[undecided]] = COLOR_RED + COLOR_BLACK - own_color
+            self._chess_count[flip_env_ids, _DARK] -= 1
+            self._flipped_chess_count[flip_env_ids, chess_id] -= 1
+            board[flip_env_ids, src[is_flip]] = chess_id
+            self._continuous_move_count[flip_env_ids] = 0
+            self._chance[flip_env_ids] = chess_id
+
+        # 移動或吃子
+        is_move = ~is_flip
+        move_env_ids = env_ids[is_move]
+        if len(move_env_ids) > 0:
+            move_src, move_dst = src[is_move], dst[is_move]
+            target = board[move_env_ids, move_dst]
+            is_capture = target != _EMPTY
+            self._chess_count[move_env_ids[is_capture], target[is_capture]] -= 1
+            self._continuous_move_count[move_env_ids] = np.where(
+                is_capture, 0, self._continuous_move_count[move_env_ids] + 1
+            )
+            board[move_env_ids, move_dst] = board[move_env_ids, move_src]
+            board[move_env_ids, move_src] = _EMPTY
+            self._chance[move_env_ids] = 0
+            reward[is_move] = np.where(is_capture, self._chess_weight[np.minimum(target, 13)], -0.01)
+
+        # Check if the games are end. The legal action masks of the next players are reused as the next action masks.
+        next_player = 1 - mover
+        action_mask = legal_action_mask_batch_cython(self._board[env_ids], self._player_color[env_ids, next_player])
+        # 若對手無步可走，則當前玩家獲勝
+        no_legal_action = ~action_mask.any(axis=1)
+        continuous_move_count = self._continuous_move_count[env_ids]
+        # 超過指定步數無吃翻
+        draw = ~no_legal_action & (continuous_move_count >= self._no_eat_flip)
+        # 長捉（4 步一循環）
+        recent_cycles = self._recent_actions[env_ids].reshape(len(env_ids), self._long_catch, 4)
+        long_catch = (recent_cycles == recent_cycles[:, :1]).all(axis=(1, 2))
+        draw |= ~no_legal_action & (continuous_move_count >= self._long_catch * 4) & long_catch
+        done = no_legal_action | draw
+        reward += no_legal_action.astype(np.float32)  # 贏棋加一分
+
+        self._current_player[env_ids] = next_player
+        obs_list = self._encode_obs(env_ids, action_mask)
+
+        timesteps = {}
+        reset_env_ids = []
+        for i, env_id in enumerate(env_ids.tolist()):
+            info = {'next player to play': int(next_player[i])}
+            if done[i]:
+                # The eval_episode_return is calculated from Player 1's perspective.
+                info['eval_episode_return'] = -reward[i] if next_player[i] == 0 else reward[i]
+                self._env_episode_count[env_id] += 1
+                if self._env_episode_count[env_id] < self._episode_num:
+                    if self._auto_reset:
+                        reset_env_ids.append(env_id)
+                    else:
+                        self._env_states[env_id] = EnvState.NEED_RESET
+                else:
+                    self._env_states[env_id] = EnvState.DONE
+            else:
+                self._ready_obs[env_id] = obs_list[i]
+            timesteps[env_id] = BaseEnvTimestep(obs_list[i], np.array(reward[i]), bool(done[i]), info)
+        if len(reset_env_ids) > 0:
+            self._reset(np.array(reset_env_ids, dtype=np.int64))
+        return timesteps
+
+    def _encode_obs(self, env_ids: np.ndarray, action_mask: np.ndarray) -> List[dict]:
+        """
+        Overview:
+            Encode the observations of the given games in one batch. The returned obs dicts share the freshly allocated
+            batch arrays, which are never modified afterwards.
+        """
+        board = self._board[env_ids]
+        current_player = self._current_player[env_ids]
+        observation = (board[:, None] == np.arange(16).reshape(1, 16, 1, 1)).astype(np.float32)
+        if self._board_feature_layer == 17:
+            # The AlphaZero variant has an additional layer of the current player.
+            current_player_layer = np.broadcast_to(
+                current_player.reshape(-1, 1, 1, 1).astype(np.float32), (len(env_ids), 1, *self._board_shape)
+            )
+            observation = np.concatenate([observation, current_player_layer], axis=1)
+        player_color = self._player_color[env_ids].tolist()
+        chance = self._chance[env_ids].tolist()
+        flipped_chess_count = self._flipped_chess_count[env_ids]
+        return [
+            {
+                'observation': observation[i],
+                'action_mask': action_mask[i],
+                'board': board[i],
+                'current_player_index': int(current_player[i]),
+                'to_play': int(current_player[i]),
+                'chance': chance[i],
+                'player_color': [_COLOR_NAME[c] for c in player_color[i]],
+                'flipped_chess_count': flipped_chess_count[i],
+            } for i in range(len(env_ids))
+        ]
+
+    @property
+    def ready_obs_batch(self) -> Dict[str, np.ndarray]:
+        """
+        Overview:
+            The ready observations of all the running games stacked along the first axis, with the corresponding
+            ``env_id`` array, e.g. ``observation`` is of shape (N, C, 8, 4) and ``action_mask`` of shape (N, 352).
+        """
+        env_ids = self.ready_obs_id
+        ready_obs = [self._ready_obs[env_id] for env_id in env_ids]
+        return {
+            'env_id': np.array(env_ids, dtype=np.int64),
+            'observation': np.stack([obs['observation'] for obs in ready_obs]),
+            'action_mask': np.stack([obs['action_mask'] for obs in ready_obs]),
+            'board': np.stack([obs['board'] for obs in ready_obs]),
+            'to_play': np.array([obs['to_play'] for obs in ready_obs], dtype=np.int64),
+            'chance': np.array([obs['chance'] for obs in ready_obs], dtype=np.int64),
+        }
+
+    def seed(self, seed: Union[Dict[int, int], List[int], int], dynamic_seed: bool = None) -> None:
+        """
+        Overview:
+            Set the seed of the random generator used to sample the flipped chess of all the games.
+        """
+        if isinstance(seed, dict):
+            seed = seed[min(seed.keys())]
+        elif isinstance(seed, (list, tuple)):
+            seed = seed[0]
+        self._rng = np.random.RandomState(seed)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._env_ref.close()
+        self._closed = True
@@ -0,0 +1,75 @@
+from collections import OrderedDict
+from typing import Any, Optional
+
+import numpy as np
+
+# Zobrist keys of every (square, chess_id) pair on the 4x8 board, chess_id in 0 ~ 15 (14: empty, 15: dark).
+# A fixed seed keeps the hash of a position identical across processes.
+_rng = np.random.RandomState(20240101)
+ZOBRIST_PIECE = [[int(k) for k in row] for row in _rng.randint(1, 2 ** 63, size=(32, 16), dtype=np.int64)]
+# Zobrist keys of the color of the player to play ('U', 'R', 'B').
+ZOBRIST_COLOR = {color: int(k) for color, k in zip('URB', _rng.randint(1, 2 ** 63, size=3, dtype=np.int64))}
+del _rng
+
+
+def zobrist_hash(board: np.ndarray) -> int:
+    """
+    Overview:
+        Compute the Zobrist hash of ``board`` from scratch. ``DarkchessEnv`` only calls it on ``reset`` and updates the
+        hash incrementally in ``move`` and ``flip`` afterwards.
+    Arguments:
+        - board (:obj:`np.ndarray`): The (8, 4) board.
+    Returns:
+        - hash (:obj:`int`): The Zobrist hash of the board.
+    """
+    h = 0
+    for square, chess_id in enumerate(board.reshape(-1).tolist()):
+        h ^= ZOBRIST_PIECE[square][chess_id]
+    return h
+
+
+class TranspositionTable(object):
+    """
+    Overview:
+        A bounded LRU transposition table keyed by Zobrist hash. The least recently used entry is evicted when the
+        number of entries exceeds ``max_size``. A ``max_size`` of 0 disables the table.
+    """
+
+    def __init__(self, max_size: int = int(1e5)) -> None:
+        self.max_size = max_size
+        self._table = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: int) -> Optional[Any]:
+        entry = self._table.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._table.move_to_end(key)
+        return entry
+
+    def put(self, key: int, entry: Any) -> None:
+        if self.max_size <= 0:
+            return
+        self._table[key] = entry
+        self._table.move_to_end(key)
+        if len(self._table) > self.max_size:
+            self._table.popitem(last=False)
+
+    def clear(self) -> None:
+        self._table.clear()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.
+
+    def stats(self) -> dict:
+        return {'size': len(self._table), 'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hit_rate}
+
+    def __len__(self) -> int:
+        return len(self._table)
@@ -0,0 +1,67 @@
+"""
+Overview:
+    The stdin/stdout shim of the MGTP server (``mgtp_server.py``). The platform launches it as the engine of a match,
+    e.g. ``SearchPath=python`` with ``Arg=mgtp_client.py -socket /tmp/lightzero_darkchess_mgtp.sock``, and it forwards
+    the MGTP commands to a session of the server, where the model is already loaded. Only the standard library is
+    imported, so that the engine starts in milliseconds.
+"""
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+
+DEFAULT_SOCKET_PATH = '/tmp/lightzero_darkchess_mgtp.sock'
+
+
+def connect(socket_path: str, timeout: float = 0.) -> socket.socket:
+    """
+    Overview:
+        Connect to the MGTP server at ``socket_path``, retrying for ``timeout`` seconds while the server starts.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(socket_path)
+            return sock
+        except (FileNotFoundError, ConnectionRefusedError):
+            sock.close()
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.1)
+
+
+def forward_commands(sock: socket.socket) -> None:
+    """
+    Overview:
+        Forward stdin to the server. At the end of stdin, the server is told that no command follows.
+    """
+    # stdin is read unbuffered, since the interpreter aborts at exit if this thread still holds the lock of a
+    # buffered stdin.
+    for data in iter(lambda: os.read(sys.stdin.fileno(), 4096), b''):
+        sock.sendall(data)
+    sock.shutdown(socket.SHUT_WR)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='The stdin/stdout shim of the LightZero Dark Chess MGTP server')
+    parser.add_argument('-socket', default=DEFAULT_SOCKET_PATH, help='The unix socket of the MGTP server.')
+    parser.add_argument('-timeout', type=float, default=10., help='The time in seconds to wait for the server.')
+    args = parser.parse_args()
+    try:
+        sock = connect(args.socket, args.timeout)
+    except OSError as e:
+        sys.stderr.write(f"[ERROR] Failed to connect to the MGTP server at {args.socket}: {e}\n")
+        sys.exit(1)
+    # The responses are forwarded until the session ends, e.g. after quit, even if stdin is still open.
+    threading.Thread(target=forward_commands, args=(sock, ), daemon=True).start()
+    for data in iter(lambda: sock.recv(4096), b''):
+        sys.stdout.buffer.write(data)
+        sys.stdout.buffer.flush()
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
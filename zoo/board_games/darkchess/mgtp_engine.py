@@ -0,0 +1,275 @@
+"""
+Overview:
+    The MGTP engine of Dark Chess, shared by the MGTP bridges (``alphazero_mgtp.py``, ``muzero_mgtp.py`` and
+    ``stochastic_muzero_mgtp.py``) and the MGTP server (``mgtp_server.py``). ``MGTPEngine`` loads the policy of a
+    checkpoint once, and every game played with it is an ``MGTPSession`` with its own env and clock.
+"""
+import importlib
+import importlib.util
+import logging
+import sys
+import traceback
+from typing import Any, Optional, TextIO, Tuple
+
+import torch
+from ding.torch_utils import to_tensor
+from easydict import EasyDict
+
+from lzero.mcts.utils import SearchBudget
+from zoo.board_games.darkchess.mgtp_utils import TimeControl, report_search
+
+# algo -> (module of the policy, class of the policy, enable_field of the policy, module of the env).
+# The env modules are imported lazily, since both register the ``darkchess`` env.
+MGTP_ALGOS = {
+    'alphazero': ('lzero.policy.alphazero', 'AlphaZeroPolicy', ['eval'],
+                  'zoo.board_games.darkchess.envs.darkchess_alphazero_env'),
+    'muzero': ('lzero.policy.muzero', 'MuZeroPolicy', ['eval'], 'zoo.board_games.darkchess.envs.darkchess_env'),
+    # The eval of Stochastic MuZero runs the collect model.
+    'stochastic_muzero': ('lzero.policy.stochastic_muzero', 'StochasticMuZeroPolicy', ['eval', 'collect'],
+                          'zoo.board_games.darkchess.envs.darkchess_env'),
+}
+
+
+def load_config(config_path: str) -> EasyDict:
+    """
+    Overview:
+        Load ``main_config`` from a config file, e.g. the ``formatted_total_config.py`` of an experiment.
+    """
+    # 動態加載配置文件
+    try:
+        spec = importlib.util.spec_from_file_location("config_module", config_path)
+        config_module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(config_module)
+        main_config = config_module.main_config
+        logging.debug('Config loaded successfully')
+    except Exception as e:
+        sys.stderr.write(f"[ERROR] Failed to load config: {str(e)}\n")
+        sys.stderr.flush()
+        sys.exit(1)
+    return main_config
+
+
+class MGTPEngine(object):
+    """
+    Overview:
+        The policy of a checkpoint, which plays the ``genmove`` of every session created by ``new_session``.
+    Interfaces:
+        __init__, load, to_device, new_session, genmove
+    """
+
+    def __init__(
+            self,
+            algo: str,
+            policy: Any,
+            main_config: EasyDict,
+            time_control: str = 'on',
+            max_num_simulations: int = 100000
+    ) -> None:
+        """
+        Overview:
+            Initialize the engine with a loaded policy.
+        Arguments:
+            - algo (:obj:`str`): The algorithm of the policy, one of the keys of ``MGTP_ALGOS``.
+            - policy (:obj:`Any`): The policy, whose ``_forward_eval`` is called by ``genmove``.
+            - main_config (:obj:`EasyDict`): The config of the policy and the env.
+            - time_control (:obj:`str`): With ``on``, ``genmove`` runs a search budgeted by the clock of the session.
+            - max_num_simulations (:obj:`int`): The maximum number of simulations of a timed search.
+        """
+        self.algo = algo
+        self.policy = policy
+        self.main_config = main_config
+        self.time_control = time_control
+        self.max_num_simulations = max_num_simulations
+        self.env_class = importlib.import_module(MGTP_ALGOS[algo][3]).DarkchessEnv
+        # The device is chosen by ``to_device`` in the process which runs the sessions.
+        self.device = None
+
+    @classmethod
+    def load(cls, algo: str, model_path: str, config_path: str, **kwargs) -> "MGTPEngine":
+        """
+        Overview:
+            Build the policy of ``algo`` with the config of ``config_path`` and load the checkpoint of ``model_path``.
+        """
+        main_config = load_config(config_path)
+        # 設定 config 中參數
+        main_config.env.battle_mode = 'play_with_bot_mode'
+        main_config.env.render_mode = 'state_realtime_mode'
+        main_config.env.agent_vs_human = True
+
+        policy_module, policy_class, enable_field, _ = MGTP_ALGOS[algo]
+        # 載入 Policy (確保 cfg 與訓練時一致). The model stays on CPU until ``to_device``, since the policy would
+        # otherwise move it to CUDA here, in the process which ``MGTPServer`` forks for every session.
+        cuda = main_config.policy.get('cuda', False)
+        main_config.policy.cuda = False
+        policy = getattr(importlib.import_module(policy_module), policy_class)(
+            cfg=main_config.policy, enable_field=enable_field
+        )
+        main_config.policy.cuda = cuda
+        checkpoint = torch.load(model_path, map_location='cpu')
+        policy.eval_mode.load_state_dict(checkpoint)
+        return cls(algo, policy, main_config, **kwargs)
+
+    def to_device(self) -> None:
+        """
+        Overview:
+            Move the model to CUDA if it is available, or keep it on CPU. It is called by every session, and only \
+            moves the model the first time in a process, so that the sessions of ``MGTPServer`` initialize CUDA in \
+            their forked processes, never in the server process.
+        """
+        if self.device is not None:
+            return
+        # 檢查是否有可用的 CUDA 將模型移到相同設備
+        self.device = torch.device('cuda:0' if torch.cuda.is_available() else 'cpu')
+        self.policy._model.to(self.device)
+        logging.debug(f'Model moved to device: {self.device}')
+
+    def new_session(self, session_id: int = 0) -> "MGTPSession":
+        """
+        Overview:
+            Create a session for a new MGTP connection. ``session_id`` is the id of its search tree in the policy.
+        """
+        return MGTPSession(self, session_id)
+
+    def genmove(self, obs: dict, session_id: int = 0, search_budget: Optional[SearchBudget] = None) -> int:
+        """
+        Overview:
+            Bot 根據觀察產生動作 ID.
+        Arguments:
+            - obs (:obj:`dict`): The obs of the env. AlphaZero uses ``current_player_index``, ``board``, \
+                ``player_color`` and ``flipped_chess_count``, MuZero uses ``observation`` and ``action_mask``.
+            - session_id (:obj:`int`): The id of the session.
+            - search_budget (:obj:`SearchBudget`): 限時搜尋的預算, None 時使用 config 的 num_simulations.
+        Returns:
+            - action (:obj:`int`): The action id.
+        """
+        with torch.no_grad():
+            if self.algo == 'alphazero':
+                az_obs = {
+                    session_id: {
+                        "current_player_index": obs['current_player_index'],
+                        "board": obs['board'],
+                        "player_color": obs['player_color'],
+                        "flipped_chess_count": obs['flipped_chess_count'],
+                    }
+                }
+                action = self.policy._forward_eval(az_obs, search_budget=search_budget)[session_id]['action']
+            else:
+                observation_tensor = to_tensor(obs['observation']).unsqueeze(0).to(self.device)
+                action = self.policy._forward_eval(
+                    data=observation_tensor,
+                    action_mask=[obs['action_mask']],
+                    to_play=[-1],
+                    search_budget=search_budget
+                )[0]['action']
+        if isinstance(action, torch.Tensor):
+            action = action.item()
+        return action
+
+
+class MGTPSession(object):
+    """
+    Overview:
+        A game played over MGTP with the policy of an ``MGTPEngine``.
+    Interfaces:
+        __init__, run, handle
+    """
+
+    def __init__(self, engine: MGTPEngine, session_id: int = 0) -> None:
+        engine.to_device()
+        self.engine = engine
+        self.session_id = session_id
+        self.env = engine.env_class(engine.main_config.env)
+        self.env.bot_policy_fn = lambda obs: engine.genmove(obs, session_id)
+        self.obs = self.env.reset()
+        # 依平台 time_left 回報的剩餘時間分配每步的搜尋時間
+        self.time_control = TimeControl(max_num_simulations=engine.max_num_simulations)
+
+    def run(self, rfile: TextIO, wfile: TextIO) -> None:
+        """
+        Overview:
+            Answer the MGTP commands read from ``rfile`` until ``quit`` or the end of ``rfile``. A command which fails \
+            is answered with its error, since the platform waits for the response of every command.
+        """
+        wfile.write("LightZero MGTP Interface Ready\n")
+        wfile.flush()
+        for command in rfile:
+            try:
+                response, done = self.handle(command)
+                wfile.write(response)
+                wfile.flush()
+                if done:
+                    break
+            except Exception as e:
+                traceback.print_exc(file=sys.stderr)
+                sys.stderr.flush()
+                parts = command.split()
+                wfile.write(f"={parts[0] if parts else ''} error: {e!r}\n\n")
+                wfile.flush()
+
+    def handle(self, command: str) -> Tuple[str, bool]:
+        """
+        Overview:
+            Answer an MGTP command.
+        Returns:
+            - response (:obj:`str`): The response of the command.
+            - done (:obj:`bool`): Whether the command is ``quit``.
+        """
+        parts = command.split()      # 使用者輸入的一個MGTP指令
+        id = parts[0]
+        cmd = parts[1]
+        arg = parts[2:]
+        result = ""
+
+        if cmd == "protocol_version":      # 0
+            result = "1.1.0"
+        elif cmd == "name":                # 1
+            result = "LightZero_DarkChess"
+        elif cmd == "version":             # 2
+            result = "1.0.0"
+        elif cmd == "quit":                # 5
+            return f"={id}\n", True
+        elif cmd == "reset_board":         # 7
+            self.obs = self.env.reset()
+            self.time_control.reset()
+        elif cmd == "move":                # 10
+            # 轉成 action_id 並執行
+            from_pos, to_pos = arg[0], arg[1]
+            action_id = self._mgtp_to_action_id(from_pos, to_pos)
+            self.obs, _, _, _ = self.env.step(action_id)
+        elif cmd == "flip":                # 11
+            pos = arg[0]
+            flip_chess = arg[1]
+            action_id = self._mgtp_to_action_id(pos, pos)
+            self.obs, _, _, _ = self.env.step(action_id, flip_chess)
+        elif cmd == "genmove":             # 12
+            # LightZero 模型根據當前 obs 產生走步
+            search_budget = self.time_control.search_budget(arg[0]) if self.engine.time_control == 'on' else None
+            action_id = self.engine.genmove(self.obs, self.session_id, search_budget)
+            report_search(search_budget)
+            result = self.env.action_to_string(action_id)
+        elif cmd == "time_settings":       # 15
+            if arg:
+                self.time_control.set_time_settings(arg[0])
+        elif cmd == "time_left":           # 16
+            # time_left <color> <剩餘毫秒數>
+            self.time_control.set_time_left(arg[0], arg[1])
+
+        # 標準回應格式
+        return f"={id} {result}\n\n", False
+
+    def _mgtp_to_action_id(self, from_pos: str, to_pos: str) -> int:
+        """
+        Overview:
+            對接 DarkchessEnv.all_actions
+        """
+
+        def decode(p):
+            col = ord(p[0]) - ord('a')
+            row = 8 - int(p[1])
+            return (row, col)
+
+        act = (decode(from_pos), decode(to_pos))
+        try:
+            return self.env.all_actions.index(act)
+        except ValueError:
+            return -1  # 非法動作處理
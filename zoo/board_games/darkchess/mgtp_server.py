@@ -0,0 +1,91 @@
+"""
+Overview:
+    The persistent MGTP server of Dark Chess. It loads the model of a checkpoint once and serves the MGTP sessions
+    of many matches over a unix socket, so that the engine of a match starts without importing torch and loading the
+    checkpoint again. Every connection is played by a forked process of the server, which shares the loaded model,
+    so that the matches run concurrently and a failing match does not stop the server. The platform launches the
+    stdin/stdout shim ``mgtp_client.py`` as the engine, which forwards the match to the server. Example::
+
+        python mgtp_server.py -algo muzero -model_path ckpt_best.pth.tar -config_path formatted_total_config.py
+        python mgtp_client.py -socket /tmp/lightzero_darkchess_mgtp.sock
+
+    The server process itself never runs the model, since the thread pools of torch do not survive a fork, and keeps
+    it on CPU, since CUDA can not be initialized again in a forked process. Each session moves the model to its
+    device after the fork (``MGTPEngine.to_device``).
+"""
+import argparse
+import io
+import os
+import socketserver
+import sys
+from typing import List, Optional
+
+from zoo.board_games.darkchess.mgtp_client import DEFAULT_SOCKET_PATH
+from zoo.board_games.darkchess.mgtp_engine import MGTP_ALGOS, MGTPEngine
+from zoo.board_games.darkchess.mgtp_utils import add_mgtp_args
+
+
+class MGTPRequestHandler(socketserver.StreamRequestHandler):
+    """
+    Overview:
+        Play the MGTP session of a connection in the forked process of the connection.
+    """
+
+    def handle(self) -> None:
+        rfile = io.TextIOWrapper(self.rfile, encoding='utf-8')
+        wfile = io.TextIOWrapper(self.wfile, encoding='utf-8', write_through=True)
+        sys.stderr.write(f"[INFO] MGTP session {os.getpid()} started\n")
+        sys.stderr.flush()
+        self.server.engine.new_session().run(rfile, wfile)
+        sys.stderr.write(f"[INFO] MGTP session {os.getpid()} ended\n")
+        sys.stderr.flush()
+
+
+class MGTPServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    """
+    Overview:
+        The unix socket server of an ``MGTPEngine``, which forks a process for every connection.
+    """
+
+    def __init__(self, socket_path: str, engine: MGTPEngine, max_sessions: int = 40) -> None:
+        """
+        Overview:
+            Bind the server to ``socket_path``, a stale socket file left by a previous server is removed.
+        Arguments:
+            - socket_path (:obj:`str`): The path of the unix socket.
+            - engine (:obj:`MGTPEngine`): The engine with the loaded model.
+            - max_sessions (:obj:`int`): The maximum number of concurrent sessions, the further connections wait.
+        """
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        self.engine = engine
+        self.max_children = max_sessions
+        super().__init__(socket_path, MGTPRequestHandler)
+
+    def server_close(self) -> None:
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description='LightZero Dark Chess MGTP server')
+    parser.add_argument('-algo', choices=list(MGTP_ALGOS), required=True, help='The algorithm of the model.')
+    parser.add_argument('-socket', default=DEFAULT_SOCKET_PATH, help='The unix socket of the server.')
+    parser.add_argument('-max_sessions', type=int, default=40, help='The maximum number of concurrent sessions.')
+    args = add_mgtp_args(parser).parse_args(argv)
+    engine = MGTPEngine.load(
+        args.algo, args.model_path, args.config_path, time_control=args.time_control,
+        max_num_simulations=args.max_simulations
+    )
+    with MGTPServer(args.socket, engine, args.max_sessions) as server:
+        sys.stderr.write(f"[INFO] MGTP server of {args.algo} listening on {args.socket}\n")
+        sys.stderr.flush()
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Overview:
+    The utilities shared by the MGTP bridges of Dark Chess (``alphazero_mgtp.py``, ``muzero_mgtp.py`` and
+    ``stochastic_muzero_mgtp.py``) and the MGTP server: the command line arguments and the time control of
+    ``genmove``.
+"""
+import argparse
+import sys
+from typing import Dict, List, Optional
+
+from lzero.mcts.utils import SearchBudget
+
+
+def add_mgtp_args(parser: argparse.ArgumentParser) -> argparse.ArgumentParser:
+    """
+    Overview:
+        Add the arguments of an MGTP engine, e.g. ``-model_path ckpt_best.pth.tar -config_path config.py``, which are \
+        shared by the MGTP bridges and the MGTP server.
+    """
+    parser.add_argument('-model_path', required=True, help='The checkpoint of the model.')
+    parser.add_argument('-config_path', required=True, help='The config file used to train the model.')
+    parser.add_argument(
+        '-time_control',
+        choices=['on', 'off'],
+        default='on',
+        help='With "on", genmove searches until the time budget derived from the time_left of the platform is '
+        'used up. With "off", or before any time is known, it runs the num_simulations of the config.'
+    )
+    parser.add_argument(
+        '-max_simulations', type=int, default=100000, help='The maximum number of simulations of a timed search.'
+    )
+    return parser
+
+
+def parse_mgtp_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    Overview:
+        Parse the arguments of an MGTP bridge.
+    Arguments:
+        - argv (:obj:`Optional[List[str]]`): The arguments, defaults to ``sys.argv[1:]``.
+    Returns:
+        - args (:obj:`argparse.Namespace`): The parsed arguments.
+    """
+    parser = add_mgtp_args(argparse.ArgumentParser(description='LightZero Dark Chess MGTP engine'))
+    return parser.parse_args(argv)
+
+
+class TimeControl(object):
+    """
+    Overview:
+        The clock of an MGTP game. It keeps the main time sent by ``time_settings`` (in seconds) and the remaining
+        time of both colors sent by ``time_left`` (in milliseconds), and derives the time budget of every ``genmove``
+        as the remaining time (minus a safety margin) divided by the expected number of the remaining moves.
+    Interfaces:
+        __init__, reset, set_time_settings, set_time_left, move_time, search_budget
+    """
+
+    def __init__(
+            self,
+            expected_num_moves: int = 60,
+            min_moves_to_go: int = 20,
+            safety_margin: float = 1.0,
+            max_move_time: float = 30.0,
+            max_num_simulations: int = 100000
+    ) -> None:
+        """
+        Overview:
+            Initialize the clock without any known time.
+        Arguments:
+            - expected_num_moves (:obj:`int`): The expected number of moves of a player in a game.
+            - min_moves_to_go (:obj:`int`): The minimum number of moves the remaining time is divided by, so that a \
+                move never takes more than ``1 / min_moves_to_go`` of the remaining time.
+            - safety_margin (:obj:`float`): The time in seconds kept for the overhead of the engine and the platform.
+            - max_move_time (:obj:`float`): The maximum time budget of a move in seconds.
+            - max_num_simulations (:obj:`int`): The maximum number of simulations of a search.
+        """
+        self.expected_num_moves = expected_num_moves
+        self.min_moves_to_go = min_moves_to_go
+        self.safety_margin = safety_margin
+        self.max_move_time = max_move_time
+        self.max_num_simulations = max_num_simulations
+        self._main_time = None
+        self._time_left: Dict[str, float] = {}
+        self._num_moves: Dict[str, int] = {}
+
+    def reset(self) -> None:
+        """
+        Overview:
+            Reset the clock for a new game. The main time of ``time_settings`` is kept.
+        """
+        self._time_left = {}
+        self._num_moves = {}
+
+    def set_time_settings(self, main_time: float) -> None:
+        """
+        Overview:
+            Set the main time of both colors in seconds, which is used until the platform sends ``time_left``.
+        """
+        self._main_time = float(main_time)
+
+    def set_time_left(self, color: str, time_left: float) -> None:
+        """
+        Overview:
+            Set the remaining time of ``color`` (``red`` or ``black``) in milliseconds.
+        """
+        self._time_left[color] = float(time_left) / 1000
+
+    def move_time(self, color: str) -> Optional[float]:
+        """
+        Overview:
+            The time budget in seconds of the next move of ``color``, or None if the time of ``color`` is unknown.
+        """
+        time_left = self._time_left.get(color, self._main_time)
+        if time_left is None:
+            return None
+        moves_to_go = max(self.expected_num_moves - self._num_moves.get(color, 0), self.min_moves_to_go)
+        return min(max(time_left - self.safety_margin, 0.) / moves_to_go, self.max_move_time)
+
+    def search_budget(self, color: str) -> Optional[SearchBudget]:
+        """
+        Overview:
+            Start the search budget of the next move of ``color`` and count the move.
+        Returns:
+            - search_budget (:obj:`Optional[SearchBudget]`): The budget, or None if the time of ``color`` is unknown, \
+                in which case the search runs the fixed ``num_simulations``.
+        """
+        move_time = self.move_time(color)
+        self._num_moves[color] = self._num_moves.get(color, 0) + 1
+        if move_time is None:
+            return None
+        return SearchBudget(move_time, max_num_simulations=self.max_num_simulations)
+
+
+def report_search(search_budget: Optional[SearchBudget]) -> None:
+    """
+    Overview:
+        Report the number of simulations and the speed of a timed search to stderr.
+    """
+    if search_budget is None:
+        return
+    sys.stderr.write(
+        f"[INFO] genmove: {search_budget.num_simulations} simulations in {search_budget.elapsed:.2f}s "
+        f"(budget {search_budget.time_budget:.2f}s, {search_budget.simulations_per_second:.1f} simulations/s)\n"
+    )
+    sys.stderr.flush()
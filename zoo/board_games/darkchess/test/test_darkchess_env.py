@@ -41,5 +41,44 @@ class TestDarkchessEnv:
         print(env.flipped_chess_count)
 
 
+    def test_push_pop_action(self):
+        cfg = DarkchessEnv.default_config()
+        env = DarkchessEnv(cfg)
+        env.reset()
+        for _ in range(30):
+            env.step(env.random_action())
+        state = (
+            env.board.copy(), env.chess_count.copy(), env.flipped_chess_count.copy(), list(env.player_color),
+            env.current_player, env.continuous_move_count, list(env.action_history), env.zobrist_hash
+        )
+        num_actions = 0
+        while not env.get_done_winner()[0] and num_actions < 100:
+            env.push_action(env.random_action())
+            num_actions += 1
+        for _ in range(num_actions):
+            env.pop_action()
+        assert (env.board == state[0]).all() and (env.chess_count == state[1]).all()
+        assert (env.flipped_chess_count == state[2]).all() and env.player_color == state[3]
+        assert (env.current_player, env.continuous_move_count, env.action_history, env.zobrist_hash) == state[4:]
+
+    def test_chance_outcomes(self):
+        cfg = DarkchessEnv.default_config()
+        env = DarkchessEnv(cfg)
+        env.reset()
+        for _ in range(10):
+            env.step(env.random_action())
+        flip = next(action for action in env.legal_actions if env.chance_outcomes(action) is not None)
+        outcomes = env.chance_outcomes(flip)
+        assert sum(prob for _, prob in outcomes) == pytest.approx(1)
+        for chess_id, prob in outcomes:
+            assert prob == pytest.approx(env.flipped_chess_count[chess_id] / env.chess_count[15])
+            # The chess of a chance node is revealed by push_action.
+            env.push_action(flip, chess_id)
+            assert env.board[env.all_actions[flip][0]] == chess_id
+            env.pop_action()
+        move = next((action for action in env.legal_actions if env.chance_outcomes(action) is None), None)
+        assert move is None or env.all_actions[move][0] != env.all_actions[move][1]
+
+
 test = TestDarkchessEnv()
 test.test_self_play_mode()
@@ -0,0 +1,224 @@
+import os
+import sys
+from functools import partial
+
+import numpy as np
+import pytest
+
+import lzero
+from lzero.mcts.utils import SearchBudget
+from zoo.board_games.darkchess.envs.darkchess_env import DarkchessEnv
+
+# The ctree AlphaZero extension is built with CMake into ``ctree_alphazero/build``.
+sys.path.append(os.path.join(os.path.dirname(lzero.__file__), 'mcts', 'ctree', 'ctree_alphazero', 'build'))
+mcts_alphazero = pytest.importorskip('mcts_alphazero')
+
+
+@pytest.mark.unittest
+def test_darkchess_native_state():
+    cfg = DarkchessEnv.default_config()
+    env = DarkchessEnv(cfg)
+    state = mcts_alphazero.DarkchessState(cfg.long_catch, cfg.no_eat_flip, seed=1)
+    np.random.seed(0)
+    for _ in range(5):
+        env.reset()
+        state.reset()
+        done = False
+        while not done:
+            assert (state.board == env.board).all()
+            assert state.player_color == env.player_color
+            assert state.legal_actions == env.legal_actions
+            current_state = state.current_state()[1]
+            assert (current_state[:16] == env.encode_board()).all() and (current_state[16] == env.current_player).all()
+            action = np.random.choice(state.legal_actions)
+            state.step(action)
+            # Replay the flipped chess sampled by the native state in the python env.
+            env.get_random_chess_id = partial(lambda chance: chance, state.chance)
+            done = env.step(action).done
+            assert state.get_done_winner() == env.get_done_winner()
+
+
+@pytest.mark.unittest
+def test_darkchess_native_state_reset():
+    state = mcts_alphazero.DarkchessState()
+    board = np.full((8, 4), 15, dtype=np.int64)
+    board[0, 0], board[0, 1] = 0, 13
+    state.reset(1, board.tobytes(), False, {'player_color': ['B', 'R']})
+    assert (state.board == board).all()
+    assert state.player_color == ['B', 'R'] and state.current_player == 1
+    # The red king can not capture the black pawn.
+    assert state.legal_action_mask[1:8].sum() == 0
+
+
+@pytest.mark.unittest
+def test_native_batched_search():
+    rng = np.random.RandomState(0)
+
+    def policy_value_batch_fn(current_states):
+        action_probs = np.full((len(current_states), 352), 1 / 352, dtype=np.float32)
+        return action_probs, np.tanh(current_states[:, :14].sum(axis=(1, 2, 3)) - 3)
+
+    def policy_value_fn(env):
+        action_probs, value = policy_value_batch_fn(env.current_state()[1][None])
+        return dict(zip(env.legal_actions, action_probs[0][env.legal_actions])), value[0]
+
+    board = np.full((8, 4), 15, dtype=np.int64)
+    board[rng.rand(8, 4) < 0.3] = 14
+    board[3, 1], board[4, 1], board[4, 2] = 2, 10, 13
+    state_config = dict(
+        start_player_index=0, init_state=board, katago_policy_init=False, katago_game_state={'player_color': ['R', 'B']}
+    )
+
+    # With one leaf per pass and the same seed of the flipped chess, the batched search is the sequential one.
+    mcts = mcts_alphazero.MCTS(512, 50, 19652, 1.25, 0.3, 0.25, mcts_alphazero.DarkchessState(seed=1), 1, 1.0)
+    _, expected_probs = mcts.get_next_action(state_config, policy_value_fn, 1.0, False)
+    mcts = mcts_alphazero.MCTS(512, 50, 19652, 1.25, 0.3, 0.25, mcts_alphazero.DarkchessState(seed=1), 1, 1.0)
+    [(_, probs)] = mcts.get_next_actions([state_config], policy_value_batch_fn, 1.0, False)
+    assert np.allclose(probs, expected_probs)
+
+    calls = []
+
+    def counting_batch_fn(current_states):
+        calls.append(len(current_states))
+        return policy_value_batch_fn(current_states)
+
+    mcts = mcts_alphazero.MCTS(512, 50, 19652, 1.25, 0.3, 0.25, mcts_alphazero.DarkchessState(seed=1), 10, 1.0)
+    results = mcts.get_next_actions([state_config, state_config], counting_batch_fn, 1.0, True)
+    assert len(calls) == 6 and max(calls) <= 20
+    for action, probs in results:
+        assert np.isclose(sum(probs), 1) and probs[action] > 0
+
+
+@pytest.mark.unittest
+def test_native_push_pop_action():
+    state = mcts_alphazero.DarkchessState(seed=2)
+    state.reset()
+    np.random.seed(0)
+    for _ in range(20):
+        state.step(np.random.choice(state.legal_actions))
+    board, player_color, current_player = state.board, state.player_color, state.current_player
+    action_history = list(state.action_history)
+    num_actions = 0
+    while not state.get_done_winner()[0] and num_actions < 50:
+        state.push_action(np.random.choice(state.legal_actions))
+        num_actions += 1
+    for _ in range(num_actions):
+        state.pop_action()
+    assert (state.board == board).all() and state.player_color == player_color
+    assert state.current_player == current_player and state.action_history == action_history
+    with pytest.raises(IndexError):
+        state.pop_action()
+
+
+@pytest.mark.unittest
+def test_native_chance_node():
+    cfg = DarkchessEnv.default_config()
+    env = DarkchessEnv(cfg)
+    state = mcts_alphazero.DarkchessState(cfg.long_catch, cfg.no_eat_flip, seed=1)
+    np.random.seed(0)
+    env.reset()
+    for _ in range(20):
+        env.step(env.random_action())
+    game_state = {'player_color': env.player_color, 'flipped_chess_count': env.flipped_chess_count}
+    state.reset(env.current_player, env.board.tobytes(), False, game_state)
+    for action in state.legal_actions:
+        outcomes, expected_outcomes = state.chance_outcomes(action), env.chance_outcomes(action)
+        assert (outcomes is None) == (expected_outcomes is None)
+        if outcomes is not None:
+            assert np.allclose(outcomes, expected_outcomes)
+    flip = next(action for action in state.legal_actions if state.chance_outcomes(action) is not None)
+    with pytest.raises(ValueError):
+        state.push_action(flip, 14)
+
+    def policy_value_fn(state):
+        legal_actions = state.legal_actions
+        return {action: 1 / len(legal_actions) for action in legal_actions}, np.tanh(state.board.mean() - 10)
+
+    # With chance nodes, the outcomes of the flips are not sampled, so the search does not depend on the seed.
+    state_config = dict(start_player_index=0, init_state=None, katago_policy_init=False, katago_game_state=None)
+    probs = []
+    for seed in [1, 2]:
+        mcts = mcts_alphazero.MCTS(512, 100, 19652, 1.25, 0.3, 0.25, mcts_alphazero.DarkchessState(seed=seed))
+        probs.append(mcts.get_next_action(state_config, policy_value_fn, 1.0, False)[1])
+    assert np.allclose(probs[0], probs[1])
+
+
+@pytest.mark.unittest
+def test_native_tree_reuse():
+    calls = []
+
+    def policy_value_fn(state):
+        calls.append(1)
+        # A sharp prior, so that the played action gets most of the visits.
+        legal_actions = state.legal_actions
+        action_probs = {action: 0.1 / len(legal_actions) for action in legal_actions}
+        action_probs[legal_actions[0]] += 0.9
+        return action_probs, np.tanh(state.board.mean() - 10)
+
+    def get_state_config(state):
+        game_state = {'player_color': state.player_color, 'flipped_chess_count': state.flipped_chess_count}
+        return dict(
+            start_player_index=state.current_player, init_state=state.board, katago_policy_init=False,
+            katago_game_state=game_state
+        )
+
+    state = mcts_alphazero.DarkchessState(seed=3)
+    state.reset()
+    np.random.seed(0)
+    for _ in range(30):
+        state.step(np.random.choice(state.legal_actions))
+
+    mcts = mcts_alphazero.MCTS(
+        512, 200, 19652, 1.25, 0.3, 0.25, mcts_alphazero.DarkchessState(seed=1), reuse_tree=True
+    )
+    action, _ = mcts.get_next_action(get_state_config(state), policy_value_fn, 1.0, False, tree_id=5)
+    next_state = state.clone()
+    next_state.step(action)
+    # The kept subtree of the played action counts in the simulations of the next search.
+    calls.clear()
+    _, probs = mcts.get_next_action(get_state_config(next_state), policy_value_fn, 1.0, False, tree_id=5)
+    assert 0 < len(calls) < 150 and np.isclose(sum(probs), 1)
+
+    def policy_value_batch_fn(current_states):
+        calls.append(len(current_states))
+        return np.full((len(current_states), 352), 1 / 352, dtype=np.float32), np.zeros(len(current_states))
+
+    # The batched search keeps the trees by the ids of the games.
+    [(action, _)] = mcts.get_next_actions([get_state_config(state)], policy_value_batch_fn, 1.0, False, [6])
+    next_state = state.clone()
+    next_state.step(action)
+    calls.clear()
+    mcts.get_next_actions([get_state_config(next_state)], policy_value_batch_fn, 1.0, False, [6])
+    assert 0 < sum(calls) < 200
+
+
+@pytest.mark.unittest
+def test_native_search_budget():
+    calls = []
+
+    def policy_value_fn(state):
+        calls.append(1)
+        legal_actions = state.legal_actions
+        return {action: 1 / len(legal_actions) for action in legal_actions}, np.tanh(state.board.mean() - 10)
+
+    def policy_value_batch_fn(current_states):
+        calls.append(len(current_states))
+        return np.full((len(current_states), 352), 1 / 352, dtype=np.float32), np.zeros(len(current_states))
+
+    state_config = dict(start_player_index=0, init_state=None, katago_policy_init=False, katago_game_state=None)
+    mcts = mcts_alphazero.MCTS(512, 50, 19652, 1.25, 0.3, 0.25, mcts_alphazero.DarkchessState(seed=1))
+    # The budget replaces num_simulations, so the search runs up to the maximum number of simulations of the budget.
+    budget = SearchBudget(time_budget=100., max_num_simulations=120)
+    _, probs = mcts.get_next_action(state_config, policy_value_fn, 1.0, False, search_budget=budget)
+    assert 50 < budget.num_simulations <= 120 and len(calls) <= budget.num_simulations + 1
+    assert np.isclose(sum(probs), 1)
+    calls.clear()
+    budget = SearchBudget(time_budget=0., min_num_simulations=5)
+    mcts.get_next_action(state_config, policy_value_fn, 1.0, False, search_budget=budget)
+    assert budget.num_simulations == 5 and len(calls) <= 6
+
+    # The batched search checks the budget once every pass of leaf_batch_size simulations of every root.
+    calls.clear()
+    budget = SearchBudget(time_budget=100., max_num_simulations=40)
+    mcts.get_next_actions([state_config, state_config], policy_value_batch_fn, 1.0, False, search_budget=budget)
+    assert len(calls) <= 1 + 40 // 8 and budget.num_simulations % 8 == 0
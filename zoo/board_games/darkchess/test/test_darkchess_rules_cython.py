@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from zoo.board_games.darkchess.envs.darkchess_env import DarkchessEnv, _COLOR_ID
+from zoo.board_games.darkchess.envs.darkchess_rules_cython import action_id_table, has_legal_action_cython, \
+    legal_action_mask_cython, legal_actions_cython
+
+
+def _legal_actions_brute_force(env):
+    return [i for i, action in enumerate(env.all_actions) if env.is_legal_action(action)]
+
+
+@pytest.mark.unittest
+def test_action_id_table():
+    table = action_id_table()
+    assert (table >= 0).sum() == len(DarkchessEnv.all_actions) == 352
+    for action_id, (src, dst) in enumerate(DarkchessEnv.all_actions):
+        assert table[src[0] * 4 + src[1], dst[0] * 4 + dst[1]] == action_id
+
+
+@pytest.mark.unittest
+def test_legal_actions_match_is_legal_action():
+    env = DarkchessEnv(DarkchessEnv.default_config())
+    np.random.seed(0)
+    for _ in range(20):
+        env.reset()
+        done = False
+        while not done:
+            for color in ['U', 'R', 'B']:
+                saved_color = env.player_color[env.current_player]
+                env.player_color[env.current_player] = color
+                expected = _legal_actions_brute_force(env)
+                env.player_color[env.current_player] = saved_color
+                assert legal_actions_cython(env.board, _COLOR_ID[color]) == expected
+                assert list(np.flatnonzero(legal_action_mask_cython(env.board, _COLOR_ID[color]))) == expected
+                assert has_legal_action_cython(env.board, _COLOR_ID[color]) == (len(expected) > 0)
+            _, _, done, _ = env.step(env.random_action())
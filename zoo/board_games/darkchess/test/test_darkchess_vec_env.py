@@ -0,0 +1,76 @@
+from functools import partial
+
+import numpy as np
+import pytest
+
+from zoo.board_games.darkchess.envs.darkchess_env import DarkchessEnv
+from zoo.board_games.darkchess.envs.darkchess_vec_env import DarkchessVecEnv
+
+
+@pytest.mark.unittest
+def test_darkchess_vec_env():
+    env_num = 4
+    cfg = DarkchessEnv.default_config()
+    vec_env = DarkchessVecEnv([partial(DarkchessEnv, cfg=cfg) for _ in range(env_num)], DarkchessVecEnv.default_config())
+    vec_env.seed(0)
+    vec_env.launch()
+    # Replay the games of the vec env in the single envs, using the flipped chess sampled by the vec env.
+    envs = [DarkchessEnv(cfg) for _ in range(env_num)]
+    for env in envs:
+        env.reset()
+    np.random.seed(0)
+    episode_count = 0
+    while episode_count < 8:
+        obs = vec_env.ready_obs
+        for env_id, env in enumerate(envs):
+            assert (obs[env_id]['action_mask'] == env.legal_action_mask).all()
+            assert obs[env_id]['to_play'] == env.current_player
+        batch_obs = vec_env.ready_obs_batch
+        assert batch_obs['observation'].shape == (env_num, cfg.board_feature_layer, 8, 4)
+        actions = {env_id: np.random.choice(np.flatnonzero(obs[env_id]['action_mask'])) for env_id in obs}
+        timesteps = vec_env.step(actions)
+        for env_id, timestep in timesteps.items():
+            env = envs[env_id]
+            env.get_random_chess_id = partial(lambda chance: chance, timestep.obs['chance'])
+            expected = env.step(actions[env_id])
+            assert (timestep.obs['observation'] == expected.obs['observation']).all()
+            assert (timestep.obs['board'] == expected.obs['board']).all()
+            assert (timestep.obs['action_mask'] == expected.obs['action_mask']).all()
+            assert timestep.obs['chance'] == expected.obs['chance']
+            assert timestep.reward == pytest.approx(expected.reward)
+            assert timestep.done == expected.done
+            if timestep.done:
+                assert timestep.info['eval_episode_return'] == pytest.approx(expected.info['eval_episode_return'])
+                episode_count += 1
+                env.reset()
+    vec_env.close()
+
+
+@pytest.mark.unittest
+def test_darkchess_vec_env_flipped_chess_count():
+    from lzero.policy.alphazero import AlphaZeroPolicy
+    env_num = 2
+    cfg = DarkchessEnv.default_config()
+    vec_env = DarkchessVecEnv([partial(DarkchessEnv, cfg=cfg) for _ in range(env_num)], DarkchessVecEnv.default_config())
+    vec_env.seed(0)
+    vec_env.launch()
+    initial_count = vec_env.ready_obs[0]['flipped_chess_count'].copy()
+    assert initial_count.sum() == 32
+    # Every action of the first move flips a dark chess.
+    timesteps = vec_env.step({env_id: 0 for env_id in range(env_num)})
+    obs = {env_id: timestep.obs for env_id, timestep in timesteps.items()}
+    for env_id in range(env_num):
+        flipped_chess_count = obs[env_id]['flipped_chess_count']
+        assert flipped_chess_count.sum() == 31
+        assert flipped_chess_count[obs[env_id]['chance']] == initial_count[obs[env_id]['chance']] - 1
+    # The count reaches the state configs of the simulate envs, as read by ``AlphaZeroPolicy._forward_collect``.
+    ready_env_id = list(obs.keys())
+    state_configs = AlphaZeroPolicy._get_state_configs(
+        ready_env_id, {env_id: obs[env_id]['board'] for env_id in ready_env_id},
+        {env_id: obs[env_id].get('player_color', ['U', 'U']) for env_id in ready_env_id},
+        {env_id: obs[env_id].get('flipped_chess_count') for env_id in ready_env_id},
+        {env_id: {} for env_id in ready_env_id}, {env_id: obs[env_id]['current_player_index'] for env_id in ready_env_id}
+    )
+    for env_id, state_config in zip(ready_env_id, state_configs):
+        assert (state_config.katago_game_state['flipped_chess_count'] == obs[env_id]['flipped_chess_count']).all()
+    vec_env.close()
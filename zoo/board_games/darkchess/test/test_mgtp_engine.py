@@ -0,0 +1,98 @@
+import io
+import os
+import subprocess
+import sys
+import threading
+
+import numpy as np
+import pytest
+from easydict import EasyDict
+
+from zoo.board_games.darkchess.envs.darkchess_env import DarkchessEnv
+from zoo.board_games.darkchess.mgtp_engine import MGTPEngine
+from zoo.board_games.darkchess.mgtp_server import MGTPServer
+
+
+class FakeModel(object):
+
+    def __init__(self):
+        self.device = 'cpu'
+
+    def to(self, device):
+        self.device = device
+        return self
+
+
+class FirstLegalActionPolicy(object):
+    """
+    Overview:
+        A MuZero-like policy which plays the first legal action.
+    """
+
+    def __init__(self):
+        self.search_budgets = []
+        self._model = FakeModel()
+
+    def _forward_eval(self, data, action_mask, to_play, search_budget=None):
+        self.search_budgets.append(search_budget)
+        return {0: {'action': int(np.flatnonzero(action_mask[0])[0])}}
+
+
+def create_engine(time_control='on'):
+    env_cfg = DarkchessEnv.default_config()
+    env_cfg.battle_mode = 'play_with_bot_mode'
+    env_cfg.agent_vs_human = True
+    return MGTPEngine('muzero', FirstLegalActionPolicy(), EasyDict(dict(env=env_cfg)), time_control=time_control)
+
+
+COMMANDS = '1 protocol_version\n7 reset_board\n11 flip a1 K\n16 time_left red 600000\n12 genmove red\n5 quit\n'
+RESPONSES = 'LightZero MGTP Interface Ready\n=1 1.1.0\n\n=7 \n\n=11 \n\n=16 \n\n=12 a8 a8\n\n=5\n'
+
+
+@pytest.mark.unittest
+def test_mgtp_session():
+    engine = create_engine()
+    # The model is moved to its device by the first session.
+    assert engine.device is None and engine.policy._model.device == 'cpu'
+    session = engine.new_session()
+    assert engine.device is not None and engine.policy._model.device == engine.device
+    wfile = io.StringIO()
+    session.run(io.StringIO(COMMANDS + '1 name\n'), wfile)
+    # The session ends at quit.
+    assert wfile.getvalue() == RESPONSES
+    assert session.env.board[7, 0] == 0
+    # The time_left of red gives a budget to the genmove of red.
+    [search_budget] = engine.policy.search_budgets
+    assert search_budget.time_budget == pytest.approx(599 / 60)
+
+    # A command which fails is answered with its error, and the session goes on.
+    wfile = io.StringIO()
+    engine.new_session().run(io.StringIO('10 move a1\n1 protocol_version\n'), wfile)
+    assert wfile.getvalue() == \
+        "LightZero MGTP Interface Ready\n=10 error: IndexError('list index out of range')\n\n=1 1.1.0\n\n"
+
+    engine = create_engine(time_control='off')
+    engine.new_session().run(io.StringIO(COMMANDS), io.StringIO())
+    assert engine.policy.search_budgets == [None]
+
+
+@pytest.mark.unittest
+def test_mgtp_server(tmp_path):
+    socket_path = str(tmp_path / 'mgtp.sock')
+    engine = create_engine()
+    with MGTPServer(socket_path, engine) as server:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        client = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'mgtp_client.py')
+        # Concurrent matches are played by their own sessions of the server.
+        shims = [
+            subprocess.Popen(
+                [sys.executable, client, '-socket', socket_path], stdin=subprocess.PIPE, stdout=subprocess.PIPE
+            ) for _ in range(2)
+        ]
+        for shim in shims:
+            stdout, _ = shim.communicate(COMMANDS.encode(), timeout=60)
+            assert shim.returncode == 0 and stdout.decode() == RESPONSES
+        server.shutdown()
+    assert not os.path.exists(socket_path)
+    # The sessions run in the forked processes, the model of the server process stays on CPU.
+    assert engine.device is None and engine.policy._model.device == 'cpu'
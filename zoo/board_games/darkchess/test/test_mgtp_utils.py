@@ -0,0 +1,40 @@
+import pytest
+
+from zoo.board_games.darkchess.mgtp_utils import TimeControl, parse_mgtp_args
+
+
+@pytest.mark.unittest
+def test_time_control():
+    time_control = TimeControl(expected_num_moves=60, min_moves_to_go=20, safety_margin=1.0, max_move_time=30.0)
+    # Before any time is known, the search runs the fixed num_simulations.
+    assert time_control.move_time('red') is None and time_control.search_budget('red') is None
+
+    time_control.reset()
+    time_control.set_time_settings(900)
+    assert time_control.move_time('red') == pytest.approx(899 / 60)
+    time_control.set_time_left('red', 601000)
+    assert time_control.move_time('red') == pytest.approx(600 / 60)
+    # Every move counts, the remaining time is divided by at least min_moves_to_go moves.
+    for _ in range(30):
+        budget = time_control.search_budget('red')
+    assert budget.time_budget == pytest.approx(600 / 31)
+    assert time_control.move_time('red') == pytest.approx(600 / 30)
+    for _ in range(20):
+        time_control.search_budget('red')
+    assert time_control.move_time('red') == pytest.approx(600 / 20)
+    time_control.set_time_left('red', 5000000)
+    assert time_control.move_time('red') == 30.0
+    # The black player has the main time of time_settings and its own move count.
+    assert time_control.move_time('black') == pytest.approx(899 / 60)
+
+    time_control.set_time_left('black', 500)
+    assert time_control.move_time('black') == 0.
+
+
+@pytest.mark.unittest
+def test_parse_mgtp_args():
+    args = parse_mgtp_args(['-model_path', 'ckpt_best.pth.tar', '-config_path', 'config.py'])
+    assert args.model_path == 'ckpt_best.pth.tar' and args.config_path == 'config.py'
+    assert args.time_control == 'on' and args.max_simulations == 100000
+    args = parse_mgtp_args(['-model_path', 'a', '-config_path', 'b', '-time_control', 'off'])
+    assert args.time_control == 'off'
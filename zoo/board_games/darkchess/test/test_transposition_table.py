@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from zoo.board_games.darkchess.envs.darkchess_env import DarkchessEnv, _COLOR_ID
+from zoo.board_games.darkchess.envs.darkchess_rules_cython import legal_action_mask_cython
+from zoo.board_games.darkchess.envs.transposition_table import TranspositionTable, zobrist_hash
+
+
+@pytest.mark.unittest
+def test_transposition_table_lru():
+    table = TranspositionTable(max_size=2)
+    table.put(1, 'a')
+    table.put(2, 'b')
+    assert table.get(1) == 'a'
+    table.put(3, 'c')
+    # 2 is the least recently used entry.
+    assert table.get(2) is None
+    assert table.get(3) == 'c'
+    assert len(table) == 2
+    assert table.stats() == {'size': 2, 'hits': 2, 'misses': 1, 'hit_rate': 2 / 3}
+
+    disabled = TranspositionTable(max_size=0)
+    disabled.put(1, 'a')
+    assert disabled.get(1) is None and len(disabled) == 0
+
+
+@pytest.mark.unittest
+def test_incremental_zobrist_hash():
+    env = DarkchessEnv(DarkchessEnv.default_config())
+    np.random.seed(0)
+    for _ in range(10):
+        env.reset()
+        done = False
+        while not done:
+            assert env.zobrist_hash == zobrist_hash(env.board)
+            color = env.player_color[env.current_player]
+            assert (env.legal_action_mask == legal_action_mask_cython(env.board, _COLOR_ID[color])).all()
+            assert (env.encode_board() == env._encode_board()).all()
+            _, _, done, _ = env.step(env.random_action())
+    stats = env.transposition_table.stats()
+    assert stats['hits'] > 0 and stats['misses'] > 0
@@ -90,5 +90,20 @@ class TestGomokuEnv:
                 break
 
 
+    def test_push_pop_action(self):
+        cfg = GomokuEnv.default_config()
+        cfg.battle_mode = 'self_play_mode'
+        env = GomokuEnv(cfg)
+        env.reset()
+        init_board, init_player = env.board.copy(), env.current_player
+        for _ in range(20):
+            action = env.random_action()
+            env.push_action(action)
+            assert env.board[env.action_to_coord(action)] == env.to_play
+        for _ in range(20):
+            env.pop_action()
+        assert (env.board == init_board).all() and env.current_player == init_player
+
+
 # test = TestGomokuEnv()
 # test.test_play_with_bot_mode()
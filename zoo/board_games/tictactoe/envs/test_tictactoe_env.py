@@ -95,6 +95,31 @@ class TestTicTacToeEnv:
                 break
 
 
+    def test_push_pop_action(self):
+        cfg = EasyDict(
+            battle_mode='self_play_mode',
+            channel_last=False,
+            scale=True,
+            agent_vs_human=False,
+            prob_random_agent=0,
+            prob_expert_agent=0,
+            bot_action_type='v0',
+            alphazero_mcts_ctree=False,
+        )
+        env = TicTacToeEnv(cfg)
+        env.reset()
+        init_board, init_player = env.board.copy(), env.current_player
+        num_actions = 0
+        while not env.get_done_winner()[0]:
+            action = env.random_action()
+            env.push_action(action)
+            num_actions += 1
+            assert env.board[env.action_to_coord(action)] == env.next_player
+        for _ in range(num_actions):
+            env.pop_action()
+        assert (env.board == init_board).all() and env.current_player == init_player
+
+
 test = TestTicTacToeEnv()
 test.test_self_play_mode()
 test.test_play_with_bot_mode()
@@ -164,6 +164,8 @@ class TicTacToeEnv(BaseEnv):
                 self.board = self.board.reshape((self.board_size, self.board_size))
         else:
             self.board = np.zeros((self.board_size, self.board_size), dtype="int32")
+        # The actions applied by ``push_action`` and not yet undone by ``pop_action``.
+        self._action_stack = []
 
         action_mask = np.zeros(self.total_num_actions, 'int8')
         action_mask[self.legal_actions] = 1
@@ -570,6 +572,28 @@ class TicTacToeEnv(BaseEnv):
         col = action_number % self.board_size + 1
         return f"Play row {row}, column {col}"
 
+    def push_action(self, action: int) -> None:
+        """
+        Overview:
+            Apply ``action`` of the current player in place and pass the turn, without computing the observation.
+            Used by the AlphaZero MCTS to walk down the search tree, the action is undone by ``pop_action``.
+        Arguments:
+            - action (:obj:`int`): A legal action of the current player.
+        """
+        row, col = self.action_to_coord(action)
+        self.board[row, col] = self.current_player
+        self._action_stack.append(action)
+        self.current_player = self.next_player
+
+    def pop_action(self) -> None:
+        """
+        Overview:
+            Undo the last action applied by ``push_action``.
+        """
+        row, col = self.action_to_coord(self._action_stack.pop())
+        self.board[row, col] = 0
+        self.current_player = self.next_player
+
     def simulate_action(self, action):
         """
         Overview: